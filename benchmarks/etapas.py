@@ -0,0 +1,192 @@
+# coding: utf-8
+"""
+Etapas medidas pelos benchmarks. Cada função prepara o estado da etapa
+(fora da medição) e retorna a função a ser executada a cada repetição.
+
+As etapas com HTTP (sessão, cidades, simulação e Bradesco) vão até o
+ServidorReplay local, as demais medem apenas o processamento.
+"""
+__version__ = '0.3'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+from typing import Callable
+
+from simovel.config.geral import Bradesco as CfgBradesco, Caixa as CfgCaixa
+from simovel.config.geral import CacheResultados as CfgCacheResultados
+from simovel.sims import bradesco, caixa_parser
+from simovel.sims.bradesco import SimuladorBradesco
+from simovel.sims.caixa import (
+    OpcaoFinanciamento,
+    SimuladorCaixa,
+    SimulacaoResultadoCaixa
+)
+from simovel.sims.caixa_sessao import SessaoCaixa
+from simovel.util import Cpf, Decimal2, Fone
+
+from benchmarks import fixtures
+
+
+Etapa = Callable[[], Callable[[], object]]
+
+
+def _simulador_caixa() -> SimuladorCaixa:
+    sim = SimuladorCaixa(sessao=SessaoCaixa.criar())
+    sim.obter_cidades(fixtures.UF)
+    sim.cidade_indice = 0
+    sim.valor_imovel = '300000'
+    sim.cpf = '529.982.247-25'
+    sim.celular = '(62)99843-2122'
+    sim.renda_familiar = '10000'
+    sim.data_nascimento = '01/01/1990'
+    opcao = OpcaoFinanciamento(fixtures.OPCOES_FINANCIAMENTO[0][0])
+    opcao.versao = fixtures.VERSAO_SIMULADOR
+    sim.opcao_financiamento = opcao
+    return sim
+
+
+def _com_parser(
+    parser: str,
+    funcao: Callable[[], object]
+) -> Callable[[], object]:
+    def executar() -> object:
+        anterior = CfgCaixa.PARSER_HTML
+        CfgCaixa.PARSER_HTML = parser
+        try:
+            return funcao()
+        finally:
+            CfgCaixa.PARSER_HTML = anterior
+
+    return executar
+
+
+def sessao_caixa():
+    return SessaoCaixa.criar
+
+
+def obter_cidades():
+    sim = SimuladorCaixa(sessao=SessaoCaixa.criar())
+    return lambda: sim.obter_cidades(fixtures.UF)
+
+
+def extrair_cidades():
+    sim = SimuladorCaixa(sessao=SessaoCaixa())
+    texto = fixtures.resposta_cidades_caixa()
+    return lambda: sim._extrair_cidades(texto)
+
+
+def procurar2():
+    sim = SimuladorCaixa(sessao=SessaoCaixa())
+    cidades = fixtures.cidades_tuplas()
+    return lambda: sim.procurar2('aparecida goiania', cidades)
+
+
+def _opcoes_financiamento(parser: str):
+    sim = SimuladorCaixa(sessao=SessaoCaixa())
+    html = fixtures.html_opcoes_financiamento()
+    return _com_parser(parser, lambda: sim._extrair_opcoes_financiamento(html))
+
+
+def opcoes_financiamento_rapido():
+    return _opcoes_financiamento(caixa_parser.PARSER_RAPIDO)
+
+
+def opcoes_financiamento_bs4():
+    return _opcoes_financiamento(caixa_parser.PARSER_BS4)
+
+
+def _simular(cache: bool):
+    def executar() -> object:
+        anterior = CfgCacheResultados.HABILITADO
+        CfgCacheResultados.HABILITADO = cache
+        try:
+            return sim.simular()
+        finally:
+            CfgCacheResultados.HABILITADO = anterior
+
+    sim = _simulador_caixa()
+    return executar
+
+
+def simular():
+    return _simular(cache=False)
+
+
+def simular_cache():
+    return _simular(cache=True)
+
+
+def _extrair_dados(parser: str):
+    sim = SimuladorCaixa(sessao=SessaoCaixa())
+    html = sim._extrair_html_sim(fixtures.resposta_simulacao_caixa())
+    return _com_parser(
+        parser, lambda: SimulacaoResultadoCaixa().extrair_dados(html)
+    )
+
+
+def extrair_dados_rapido():
+    return _extrair_dados(caixa_parser.PARSER_RAPIDO)
+
+
+def extrair_dados_bs4():
+    return _extrair_dados(caixa_parser.PARSER_BS4)
+
+
+def _bradesco_interagir(cache: bool):
+    def executar() -> None:
+        anterior = CfgBradesco.CACHE_VIEWSTATE_HABILITADO
+        CfgBradesco.CACHE_VIEWSTATE_HABILITADO = cache
+        try:
+            sim = SimuladorBradesco()
+            sim.valor_imovel = '300000'
+            sim.data_nascimento = '01/01/1990'
+            sim._interagir_parte1()
+            if not sim._viewstate:
+                raise Exception('Não obteve __VIEWSTATE.')
+        finally:
+            CfgBradesco.CACHE_VIEWSTATE_HABILITADO = anterior
+
+    bradesco.cache_viewstate.limpar()
+    return executar
+
+
+def bradesco_interagir():
+    return _bradesco_interagir(cache=False)
+
+
+def bradesco_interagir_cache():
+    return _bradesco_interagir(cache=True)
+
+
+def formatar_moeda():
+    Decimal2.setar_local_pt_br()
+    valor = Decimal2('1234567.89')
+    valor.formatar_moeda()
+    return valor.formatar_moeda
+
+
+def cpf_validar():
+    return lambda: Cpf('529.982.247-25').validar(disparar_erro=False)
+
+
+def fone():
+    return lambda: Fone.a_partir_de_fmt_comum('62998432122').formatar()
+
+
+ETAPAS: dict[str, Etapa] = {
+    'sessao_caixa': sessao_caixa,
+    'obter_cidades': obter_cidades,
+    'extrair_cidades': extrair_cidades,
+    'procurar2': procurar2,
+    'opcoes_financiamento_rapido': opcoes_financiamento_rapido,
+    'opcoes_financiamento_bs4': opcoes_financiamento_bs4,
+    'simular': simular,
+    'simular_cache': simular_cache,
+    'extrair_dados_rapido': extrair_dados_rapido,
+    'extrair_dados_bs4': extrair_dados_bs4,
+    'bradesco_interagir': bradesco_interagir,
+    'bradesco_interagir_cache': bradesco_interagir_cache,
+    'formatar_moeda': formatar_moeda,
+    'cpf_validar': cpf_validar,
+    'fone': fone,
+}
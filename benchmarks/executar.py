@@ -0,0 +1,256 @@
+# coding: utf-8
+"""
+Benchmarks do pipeline de simulação, sem rede.
+
+Sobe um ServidorReplay com as respostas de benchmarks.fixtures (ou com
+as gravações passadas em --gravacoes), aponta os simuladores pra ele
+(Replay.URL_BASE) e mede cada etapa separadamente: p50/p99 da latência,
+vazão e pico de memória (tracemalloc, numa rodada à parte pra não
+distorcer os tempos). O resultado é gravado em JSON pra comparar entre
+commits.
+
+Da raiz do repositório:
+
+    $ PYTHONPATH=src python -m benchmarks.executar
+    $ PYTHONPATH=src python -m benchmarks.executar -n 50 simular procurar2
+    $ PYTHONPATH=src python -m benchmarks.executar --comparar base.json
+
+Com --comparar o código de saída é 1 se o p50 de alguma etapa piorou
+mais que --limite por cento.
+"""
+__version__ = '0.1'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import argparse
+import contextlib
+import io
+import json
+import locale
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from simovel.config.geral import Caixa as CfgCaixa, Replay as CfgReplay
+from simovel.replay import ServidorReplay, carregar_interacoes
+from simovel.sims.caixa_sessao import SessaoCaixa
+from simovel.util import Decimal2
+
+from benchmarks import fixtures
+from benchmarks.etapas import ETAPAS
+
+
+DIR_RESULTADOS = Path(__file__).resolve().parent / 'resultados'
+VERSAO_FORMATO = 1
+
+
+def percentil(valores: list[float], p: float) -> float:
+    """Percentil com interpolação linear (valores ordenados)."""
+    if not valores:
+        return 0.
+    pos = (len(valores) - 1) * p / 100
+    i = int(pos)
+    if i + 1 >= len(valores):
+        return valores[-1]
+    return valores[i] + (valores[i + 1] - valores[i]) * (pos - i)
+
+
+def medir(
+    funcao: Callable[[], object],
+    repeticoes: int,
+    aquecimento: int,
+    repeticoes_memoria: int
+) -> dict:
+    for _ in range(aquecimento):
+        funcao()
+
+    tempos: list[float] = []
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        t = time.perf_counter_ns()
+        funcao()
+        tempos.append((time.perf_counter_ns() - t) / 1e6)
+    total = time.perf_counter() - inicio
+    tempos.sort()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        for _ in range(repeticoes_memoria):
+            funcao()
+        pico = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'repeticoes': repeticoes,
+        'p50_ms': round(percentil(tempos, 50), 4),
+        'p99_ms': round(percentil(tempos, 99), 4),
+        'media_ms': round(sum(tempos) / len(tempos), 4),
+        'min_ms': round(tempos[0], 4),
+        'max_ms': round(tempos[-1], 4),
+        'vazao_por_s': round(repeticoes / total, 2) if total else 0.,
+        'memoria_pico_kb': round(max(pico, 0) / 1024, 1),
+        'erro': None,
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except Exception:
+        return 'desconhecido'
+
+
+def executar(
+    etapas: list[str],
+    repeticoes: int,
+    aquecimento: int,
+    gravacoes: str | None = None
+) -> dict:
+    interacoes = (
+        carregar_interacoes(gravacoes) if gravacoes else fixtures.interacoes()
+    )
+    resultados: dict[str, dict] = {}
+
+    url_base, pool = CfgReplay.URL_BASE, CfgCaixa.POOL_SESSOES_HABILITADO
+    diretorio = os.getcwd()
+    with ServidorReplay(interacoes) as srv, \
+            tempfile.TemporaryDirectory() as tmp:
+        CfgReplay.URL_BASE = srv.url_base
+        CfgCaixa.POOL_SESSOES_HABILITADO = False
+        # SessaoCaixa lê/grava o arquivo de versão no diretório atual
+        os.chdir(tmp)
+        try:
+            SessaoCaixa.setar_versao_arquivo(fixtures.VERSAO_SIMULADOR)
+            try:
+                Decimal2.setar_local_pt_br()
+            except locale.Error:
+                # etapas que formatam moeda ficam registradas com erro
+                print('locale pt_BR indisponível', file=sys.stderr)
+            for nome in etapas:
+                print(f'{nome}...', file=sys.stderr)
+                # os simuladores usam print, fora do relatório
+                with contextlib.redirect_stdout(io.StringIO()):
+                    try:
+                        funcao = ETAPAS[nome]()
+                        resultados[nome] = medir(
+                            funcao,
+                            repeticoes,
+                            aquecimento,
+                            min(repeticoes, 10)
+                        )
+                    except Exception as erro:
+                        resultados[nome] = {'erro': f'{type(erro).__name__}: {erro}'}
+        finally:
+            os.chdir(diretorio)
+            CfgReplay.URL_BASE = url_base
+            CfgCaixa.POOL_SESSOES_HABILITADO = pool
+
+    return {
+        'versao_formato': VERSAO_FORMATO,
+        'commit': _commit(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'gravacoes': gravacoes or 'fixtures',
+        'repeticoes': repeticoes,
+        'aquecimento': aquecimento,
+        'etapas': resultados,
+    }
+
+
+def imprimir(relatorio: dict) -> None:
+    print(
+        f"{'etapa':<30}{'p50 ms':>11}{'p99 ms':>11}{'ops/s':>11}"
+        f"{'pico KB':>11}"
+    )
+    for nome, r in relatorio['etapas'].items():
+        if r.get('erro'):
+            print(f'{nome:<30}  erro: {r["erro"]}')
+            continue
+        print(
+            f"{nome:<30}{r['p50_ms']:>11.3f}{r['p99_ms']:>11.3f}"
+            f"{r['vazao_por_s']:>11.1f}{r['memoria_pico_kb']:>11.1f}"
+        )
+
+
+def comparar(base: dict, atual: dict, limite: float) -> list[str]:
+    """
+    Imprime a variação do p50 de cada etapa e retorna as que pioraram
+    mais que limite (%).
+    """
+    regressoes: list[str] = []
+    print(f"\ncomparando com {base.get('commit')} ({base.get('data')})")
+    for nome, r in atual['etapas'].items():
+        b = base.get('etapas', {}).get(nome)
+        if not b or b.get('erro') or r.get('erro') or not b['p50_ms']:
+            continue
+        variacao = (r['p50_ms'] - b['p50_ms']) / b['p50_ms'] * 100
+        marca = ''
+        if variacao > limite:
+            marca = '  <-- regressão'
+            regressoes.append(nome)
+        print(
+            f"{nome:<30}{b['p50_ms']:>11.3f} -> {r['p50_ms']:>9.3f} ms "
+            f"{variacao:>+8.1f}%{marca}"
+        )
+
+    return regressoes
+
+
+def main(args: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='benchmarks.executar')
+    parser.add_argument(
+        'etapas', nargs='*', metavar='ETAPA',
+        help=f'padrão: todas ({", ".join(ETAPAS)})'
+    )
+    parser.add_argument('-n', '--repeticoes', type=int, default=200)
+    parser.add_argument('--aquecimento', type=int, default=5)
+    parser.add_argument('--gravacoes', help='jsonl gravado (simovel.replay)')
+    parser.add_argument('--saida', help='arquivo JSON do resultado')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    parser.add_argument('--limite', type=float, default=10.)
+    opcoes = parser.parse_args(args)
+
+    desconhecidas = [e for e in opcoes.etapas if e not in ETAPAS]
+    if desconhecidas:
+        parser.error(f'etapas desconhecidas: {", ".join(desconhecidas)}')
+
+    relatorio = executar(
+        opcoes.etapas or list(ETAPAS),
+        opcoes.repeticoes,
+        opcoes.aquecimento,
+        opcoes.gravacoes
+    )
+    imprimir(relatorio)
+
+    saida = Path(opcoes.saida) if opcoes.saida else (
+        DIR_RESULTADOS / f"{relatorio['commit']}.json"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    print(f'\nresultado gravado em {saida}')
+
+    if opcoes.comparar:
+        base = json.loads(Path(opcoes.comparar).read_text())
+        if comparar(base, relatorio, opcoes.limite):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# coding: utf-8
+"""
+Respostas gravadas usadas pelos benchmarks.
+
+Por padrão são geradas aqui, no mesmo formato devolvido pelos bancos
+(DWR da Caixa compactado com gzip, delta do ASP.NET AJAX do Bradesco),
+pra que a suíte rode sem rede. Gravações reais (SIMOVEL_GRAVAR=1, ver
+simovel.replay) podem ser usadas no lugar com --gravacoes.
+"""
+__version__ = '0.1'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import gzip
+import json
+
+from simovel.replay import Interacao
+from simovel.sims.bradesco import SimuladorBradesco
+from simovel.sims.caixa import SimuladorCaixa
+from simovel.sims.caixa_sessao import SessaoCaixa
+
+
+VERSAO_SIMULADOR = '3.21.69.0.1'
+UF = 'GO'
+TOTAL_CIDADES = 246
+
+_PREFIXOS = (
+    'SANTA', 'SAO', 'BOM', 'NOVA', 'PORTO', 'CAMPO', 'SERRA', 'VILA',
+    'ALTO', 'MONTE', 'RIO', 'LAGOA', 'CACHOEIRA', 'PONTE', 'BELA'
+)
+_SUFIXOS = (
+    'ALEGRE', 'ESPERANCA', 'JARDIM', 'VERDE', 'BONITA', 'AZUL', 'GRANDE',
+    'DOURADO', 'LIMPO', 'FORMOSO', 'ALTO', 'BELO', 'REAL', 'PRETO',
+    'BRANCO', 'CLARO', 'NORTE'
+)
+
+
+def nomes_cidades(total: int = TOTAL_CIDADES) -> list[str]:
+    """Nomes determinísticos, com alguns nomes reais no início."""
+    nomes = [
+        'GOIANIA', 'APARECIDA DE GOIANIA', 'ANAPOLIS', 'RIO VERDE',
+        'LUZIANIA', 'AGUAS LINDAS DE GOIAS', 'VALPARAISO DE GOIAS',
+        'TRINDADE', 'FORMOSA', 'NOVO GAMA', "SANTA RITA D'OESTE",
+    ]
+    for prefixo in _PREFIXOS:
+        for sufixo in _SUFIXOS:
+            if len(nomes) == total:
+                return nomes
+            nomes.append(f'{prefixo} {sufixo} DE GOIAS')
+
+    return nomes
+
+
+def cidades_tuplas() -> list[tuple]:
+    """Como CidadeModel.tupla: (id, cod_caixa, nome, nome_sem_aspa)."""
+    return [
+        (i + 1, 9000 + i, nome, nome.replace("'", ''))
+        for i, nome in enumerate(nomes_cidades())
+    ]
+
+
+def pagina_inicial_caixa() -> str:
+    return (
+        '<html><head><title>Simulador Habitacional CAIXA</title></head>'
+        '<body><form name="simulaOperacaoInternetForm" method="post">'
+        f'<input type="hidden" name="versao" value="{VERSAO_SIMULADOR}">'
+        '<input type="hidden" name="permitePlanilha" value="S">'
+        + '<div class="control-item"><label>campo</label></div>' * 200 +
+        '</form></body></html>'
+    )
+
+
+def resposta_cidades_caixa() -> str:
+    objs = ','.join(
+        f'{{codigo:{cod},nome:"{nome}",nomeSemAspa:"{sem_aspa}",uf:"{UF}"}}'
+        for _, cod, nome, sem_aspa in cidades_tuplas()
+    )
+    return (
+        "throw 'allowScriptTagRemoting is false.';\n"
+        '//#DWR-INSERT\n//#DWR-REPLY\n'
+        f'dwr.engine.remote.handleCallback("5","0",[{objs}]);\n'
+    )
+
+
+OPCOES_FINANCIAMENTO = (
+    (100301129, 'SBPE (TR, IPCA ou Tx FIXA): Débito em conta na CAIXA'),
+    (100301130, 'SBPE (Crédito Imobiliário Poupança CAIXA): Débito em conta'),
+    (100501103, 'Programa Casa Verde e Amarela'),
+    (105801121, 'SBPE (Crédito Imobiliário Poupança CAIXA): imóvel usado'),
+    (105801120, 'SBPE (TR, IPCA ou Tx FIXA): imóvel usado'),
+    (106001102, 'Programa Casa Verde e Amarela (imóvel usado)'),
+)
+
+
+def html_opcoes_financiamento() -> str:
+    lis = ''.join(
+        '<li class="group-block-item"><div class="group-block-header">'
+        f'<a href="#" onclick="simuladorInternet.simular(\n{cod},\n'
+        f'{VERSAO_SIMULADOR},\n\'{descricao}\'\n);jQuery(\'#x\').hide();">'
+        f'<span>{descricao}</span></a></div>'
+        '<p class="milli">Texto explicativo da modalidade de financiamento.</p>'
+        '</li>'
+        for cod, descricao in OPCOES_FINANCIAMENTO
+    )
+    return (
+        '<html><body><div id="conteudo">'
+        + '<p>Enquadramento do financiamento.</p>' * 30 +
+        f'<ul class="group-block">{lis}</ul></div></body></html>'
+    )
+
+
+def html_resultado_simulacao() -> str:
+    """html do resultado já sem os escapes do DWR."""
+    linhas_campos = ''.join(
+        f'<tr><td class="lighter milli">{descricao}</td><td>{valor}</td></tr>\n'
+        for descricao, valor in (
+            ('Valor do imóvel', 'R$ 300.000,00'),
+            ('Prazo máximo', '420 meses'),
+            ('Prazo escolhido', '360 meses'),
+            ('Cota máxima do financiamento', '80%'),
+            ('Valor da entrada', 'R$ 60.000,00'),
+            ('Valor do financiamento', 'R$ 240.000,00'),
+            ('Sistema de amortização/indexador', 'SAC / TR'),
+        )
+    )
+    linhas_prestacoes = (
+        '<tr><td>Juros nominais</td><td>10,49%</td></tr>\n' * 3
+        + '<tr><td>1ª Prestação</td><td><center>\n\tR$\n\t2.890,10\n'
+          '</center></td></tr>\n'
+        + '<tr><td>Última Prestação</td><td><center>\n\tR$\n\t700,55\n'
+          '</center></td></tr>\n'
+    )
+    selecionado = ' selected="selected"'
+    options = ''.join(
+        f'<option{selecionado if texto == "SAC / TR" else ""} '
+        f'value="{cod}@{texto}">{texto}</option>\n'
+        for cod, texto in (
+            (29, 'PRICE / IPCA'), (42, 'PRICE / TAXA FIXA'), (33, 'PRICE / TR'),
+            (27, 'SAC / IPCA'), (41, 'SAC / TAXA FIXA'), (32, 'SAC / TR'),
+        )
+    )
+    return (
+        '<div class="simulation-result">'
+        '<input type="hidden" name="prestacaoMaxDesejada" value="3.000,00"/>'
+        '<h3 class="simulation-result-title zeta">SBPE (TR, IPCA ou Tx FIXA)'
+        '</h3>\n'
+        f'<table class="simple-table"><tbody>\n{linhas_campos}</tbody></table>\n'
+        '<table class="simple-table"><tbody>\n'
+        + '<tr><td>Taxa de juros efetiva</td><td>11,02%</td></tr>\n' * 6 +
+        '</tbody></table>\n'
+        f'<table class="simple-table"><tbody>\n{linhas_prestacoes}'
+        '</tbody></table>\n'
+        '<select id="codSistemaAmortizacaoAlterado" '
+        f'name="codSistemaAmortizacaoAlterado">{options}</select>'
+        + '<p class="milli">Observações sobre a simulação.</p>\n' * 20 +
+        '</div>'
+    )
+
+
+def resposta_simulacao_caixa() -> str:
+    # escapes como no DWR: \", \/, \n e \uXXXX
+    html = json.dumps(html_resultado_simulacao())[1:-1].replace('/', '\\/')
+    return (
+        "throw 'allowScriptTagRemoting is false.';\n"
+        '//#DWR-INSERT\n//#DWR-REPLY\n'
+        f'preencheDiv("resultadoSimulacao","{html}");\n'
+        'dwr.engine.remote.handleCallback("0","0",null);\n'
+    )
+
+
+def pagina_inicial_bradesco() -> str:
+    return (
+        '<html><body><form id="form1">'
+        '<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" '
+        f'value="{"A" * 4000}" />'
+        + '<div class="campo"><select><option>UF</option></select></div>' * 100 +
+        '</form></body></html>'
+    )
+
+
+def resposta_interacao_bradesco() -> str:
+    painel = (
+        '<div id="pnlCampos">'
+        '<span id="spnValorFinanciamento">(até R$ 240.000,00)</span>'
+        '<span id="spnPrazo">360</span>'
+        + '<div class="campo"><input type="text" value="x" /></div>' * 100 +
+        '</div>'
+    )
+    return (
+        f'1|#||4|{len(painel)}|updatePanel|updPanel|{painel}|'
+        f'0|hiddenField|__EVENTTARGET||0|hiddenField|__EVENTARGUMENT||'
+        f'4000|hiddenField|__VIEWSTATE|{"B" * 4000}|'
+        '8|hiddenField|__VIEWSTATEGENERATOR|638B4BEA|'
+    )
+
+
+def interacoes() -> list[Interacao]:
+    """Todas as interações usadas pelos benchmarks."""
+    html = [('Content-Type', 'text/html; charset=ISO-8859-1')]
+    js_gzip = [
+        ('Content-Type', 'text/javascript;charset=utf-8'),
+        ('Content-Encoding', 'gzip'),
+    ]
+    return [
+        Interacao(
+            'GET', SessaoCaixa.URL_INICIAL, headers_resposta=html,
+            corpo=pagina_inicial_caixa().encode('latin-1')
+        ),
+        Interacao(
+            'POST', SimuladorCaixa.URL1, headers_resposta=js_gzip,
+            corpo=gzip.compress(resposta_cidades_caixa().encode('utf-8'))
+        ),
+        Interacao(
+            'POST', SimuladorCaixa.URL3,
+            headers_resposta=html + [('Content-Encoding', 'gzip')],
+            corpo=gzip.compress(html_opcoes_financiamento().encode('latin-1'))
+        ),
+        Interacao(
+            'POST', SimuladorCaixa.URL4, headers_resposta=js_gzip,
+            corpo=gzip.compress(resposta_simulacao_caixa().encode('utf-8'))
+        ),
+        Interacao(
+            'GET', SimuladorBradesco.URL1, headers_resposta=html,
+            corpo=pagina_inicial_bradesco().encode('utf-8')
+        ),
+        Interacao(
+            'POST', SimuladorBradesco.URL1,
+            headers_resposta=[('Content-Type', 'text/plain; charset=utf-8')],
+            corpo=resposta_interacao_bradesco().encode('utf-8')
+        ),
+    ]
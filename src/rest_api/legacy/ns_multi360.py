@@ -3,11 +3,14 @@ menus e informações. Toda a documentação da parte de comunicação com
 Bot tá inclusa no documento PDF com o título "Documentação de Integração v.15".
 """
 __author__ = 'Vanduir Santana Medeiros'
-__version__ = '1.34'
+__version__ = '1.42'
 
+import functools
+import time
 from datetime import date, datetime
+from decimal import Decimal
 from enum import Enum, auto
-from flask import request, url_for
+from flask import current_app, request, url_for
 from flask_restx import Namespace, Resource, fields
 
 from simovel.exceptions import (
@@ -39,25 +42,9 @@ from rest_api.models.simulacao import (
 )
 from rest_api.schemas.simulacao import EstadoSchema, SimulacaoSchema
 from rest_api.db import db
-from simovel.sims.caixa import (
-    OpcaoFinanciamento,
-    SimulacaoResultadoCaixa,
-    SimuladorCaixa,
-    TipoFinanciamento as TipoFinanciamentoCaixa,
-    TipoImovel as TipoImovelCaixa
-)
-from simovel.sims.bradesco import (
-    SimulacaoResultadoBradesco,
-    SimuladorBradesco,
-    TipoFinanciamento as TipoFinanciamentoBradesco,
-    TipoImovel as TipoImovelBradesco
-)
-from simovel.sims.itau import (
-    SimuladorItauS,
-    SimuladorItauL,
-    TipoImovel as TipoImovelItau
-)
-from simovel.sims.santander import SimuladorSantanderL, SimulacaoResultadoBase
+from simovel import rastreamento
+from simovel.log import obter_logger
+from simovel.db.indice_cidades import obter_indice_cidades
 from simovel.sims.base import (
     Banco,
     SimuladorBase,
@@ -65,15 +52,40 @@ from simovel.sims.base import (
     SiteImobiliaria,
     TipoFinanciamento
 )
+from simovel.sims.modelo import (
+    RequisicaoSimulacao,
+    ResultadoSimulacao,
+    formatar_moeda
+)
+from simovel.sims.disjuntor import estatisticas_disjuntores
+from simovel.sims.fila import EstadoTarefa, Tarefa, obter_fila_simulacao
+from simovel.sims.registro import (
+    chave_banco,
+    modulo_lazy,
+    obter_fabrica,
+    resolver_banco
+)
 from simovel.config.integracao import Multi360 as ConfMulti360
 from simovel.config.geral import (
     Parametros, SiteImobiliaria as ConfSiteImobliaria,
-    Itau as CfgItau, Santander as CfgSantander,
-    ItauTipoSimulacao
+    Itau as CfgItau,
+    ItauTipoSimulacao, Amortizacao as CfgAmortizacao,
+    FilaSimulacao as CfgFila
+)
+from simovel.sims.amortizacao import (
+    SistemaAmortizacao,
+    calibrar_taxa_mensal,
+    estimar_resultado,
+    resultado_de_dict,
+    resultado_para_dict
 )
 from simovel.util import Cpf, Fone, FoneFormato, Decimal2, email_aleatorio
 from simovel.util import sobrenome_aleatorio
 
+# módulos dos simuladores importados só no primeiro uso (selenium, bs4...)
+caixa = modulo_lazy(Banco.CAIXA)
+bradesco = modulo_lazy(Banco.BRADESCO)
+
 
 ENDPOINT_MENU_BANCO = 'api_multi360.simulador_menu_banco'
 ENDPOINT_MENU_TIPO_IMOVEL = 'api_multi360.simulador_menu_tipo_imovel'
@@ -104,13 +116,55 @@ ENDPOINT_QUESTAO_ALTERAR_RENDA = 'api_multi360.simulador_questao_alterar_renda'
 ENDPOINT_QUESTAO_ALTERAR_VALOR_FINANCIAMENTO_BRADESCO = 'api_multi360.simulador_questao_alterar_valor_financiamento_brad'
 ENDPOINT_MENU_DICAS = 'api_multi360.simulador_menu_dicas'
 ENDPOINT_MENU_DICA_ITEM = 'api_multi360.simulador_menu_dica_item'
+ENDPOINT_TAREFA_SIMULACAO = 'api_multi360.simulador_tarefa_simulacao'
+ENDPOINT_INICIO = 'api_multi360.simulador_inicio'
 
 T_EXIBIR_OBS = 'exibir_obs_resultado'
 
+log = obter_logger(__name__)
+
 NS_NOME = 'simulador'
 NS_DESCRICAO = 'Métodos para entrada de dados e simulação de crédito imobiliário'
 
-api = Namespace(name=NS_NOME, description=NS_DESCRICAO, )
+def rastrear_requisicao(funcao):
+    """Cada requisição vira um trecho do rastro da conversa do contato
+    (ver simovel.rastreamento), que recomeça na /inicio.
+    """
+    @functools.wraps(funcao)
+    def rastreada(*args, **kwargs):
+        if not rastreamento.habilitado():
+            return funcao(*args, **kwargs)
+
+        rastreamento.instrumentar_engine(db.engine)
+        corpo: dict = request.get_json(silent=True) or {}
+        contato = corpo.get('contact')
+        chave: str = contato.get('key', '') if isinstance(contato, dict) else ''
+        trace_id: str = ''
+        if chave:
+            trace_id = rastreamento.rastro_jornada(
+                chave, nova=request.endpoint == ENDPOINT_INICIO
+            )
+        with rastreamento.iniciar_rastro(
+            f'{request.method} {request.path}',
+            trace_id=trace_id,
+            traceparent=request.headers.get('traceparent', ''),
+            **{
+                'http.method': request.method,
+                'http.route': request.path,
+                'multi360.contato': rastreamento.anonimizar(chave) if chave else '',
+            }
+        ) as trecho:
+            resposta = funcao(*args, **kwargs)
+            if isinstance(resposta, tuple) and len(resposta) > 1:
+                trecho.definir(**{'http.status_code': resposta[1]})
+            return resposta
+
+    return rastreada
+
+
+api = Namespace(
+    name=NS_NOME, description=NS_DESCRICAO, decorators=[rastrear_requisicao]
+)
 simulacao_schema = SimulacaoSchema()
 #cidades_schema = CidadeSchema(many=True)
 estado_schema = EstadoSchema()
@@ -545,7 +599,7 @@ class MenuOpcoesFinanc(Resource):
     @api.expect(modelo_req_padrao, validate=False)
     @api.response(code=200, model=modelo_resp_informacao, description='Responde com o resultado da simulação')
     def post(self,):
-        return TratamentoRequisicao().menu_opcoes_financ()
+        return _simular_em_fila('menu_opcoes_financ')
 
 
 @api.route('/menu/resultado')
@@ -553,14 +607,44 @@ class MenuResultado(Resource):
     @api.expect(modelo_req_padrao, validate=False)
     @api.response(code=200, model=modelo_resp_menu, description='Exibe resultado.')
     def post(self,):
-        return TratamentoRequisicao().menu_resultado()
+        return _simular_em_fila('menu_resultado')
 
 @api.route('/menu/resultado_bradesco')
 class MenuResultadoBradesco(Resource):
     @api.expect(modelo_req_padrao, validate=False)
     @api.response(code=200, model=modelo_resp_menu, description='Exibe resultado.')
     def post(self,):
-        return TratamentoRequisicao().menu_resultado_bradesco()
+        return _simular_em_fila('menu_resultado_bradesco')
+
+
+@api.route('/tarefa', '/tarefa/<string:id>')
+class TarefaSimulacao(Resource):
+    @api.expect(modelo_req_padrao, validate=False)
+    @api.response(code=200, model=modelo_resp_menu, description='Resultado da simulação ou pergunta enquanto processa.')
+    def post(self, id: str = ''):
+        """Callback do chatbot pra tarefa de simulação (data.tarefa)."""
+        return _response_tarefa_simulacao(Requisicao().data.get('tarefa', id))
+
+    @api.response(code=200, description='Estado da tarefa de simulação.')
+    @api.response(code=404, description='Tarefa não encontrada ou expirada.')
+    def get(self, id: str = ''):
+        fila = obter_fila_simulacao()
+        tarefa: Tarefa | None = fila.consultar(id) if fila else None
+        if tarefa is None:
+            return {'message': f'Tarefa {id} não encontrada.'}, 404
+
+        return tarefa.para_dict(), 200
+
+
+@api.route('/saude')
+class Saude(Resource):
+    @api.response(code=200, description='Disjuntores por host e filas de simulação.')
+    def get(self):
+        fila = obter_fila_simulacao()
+        return {
+            'disjuntores': estatisticas_disjuntores(),
+            'filas': fila.estatisticas if fila else {},
+        }, 200
 
 
 @api.route('/menu/alterar_dados')
@@ -745,10 +829,9 @@ class TratamentoRequisicao:
         self.req = Requisicao()
         self.entrada = Entrada.NENHUMA
         self.flag_copiar_sim = False
-        multi360_model: Multi360Model | None = Multi360Model.buscar_por_key(
-            db.session,
-            self.req.contact.key
-        )
+        with rastreamento.trecho('db.multi360.buscar_por_key'):
+            multi360_model: Multi360Model | None = \
+                Multi360Model.buscar_por_key(db.session, self.req.contact.key)
         if multi360_model:
             self.multi360_model = multi360_model
     
@@ -766,12 +849,7 @@ class TratamentoRequisicao:
             return None
 
         # pro banco itaú vai depender de qual simulador tá configurado
-        b: Banco = Banco(simulacao.banco)
-        if b == Banco.ITAU or b == Banco.ITAU_L:
-            b = Banco.ITAU if CfgItau.TIPO_SIMULACAO ==  ItauTipoSimulacao.SEL \
-                else Banco.ITAU_L
-
-        return b
+        return resolver_banco(Banco(simulacao.banco))
 
     def _adicionar_pessoa(self, ) -> None:
         estado: EstadoModel | None
@@ -811,8 +889,10 @@ class TratamentoRequisicao:
             # registro com o mesmo CPF em outra máquina ou em modo
             # anônimo. CORRIGIDO. Testar comportamento q pd gerar o bug
             if self.multi360_model.pessoa is None:
-                print('-' * 30)
-                print('NÃO encontrou registro na tabela pessoa ao alterar registro, adicionando...')
+                log.warning(
+                    'Não encontrou registro na tabela pessoa ao alterar '
+                    'registro, adicionando'
+                )
                 self._adicionar_pessoa()
                 db.session.commit()
             
@@ -984,7 +1064,7 @@ class TratamentoRequisicao:
     def menu_tipo_imovel(self) -> tuple[dict, int]:
         # por enquanto implementado só pra Caixa
         self.entrada = Entrada.MENU_TIPO_IMOVEL
-        tipo_imovel = TipoImovelCaixa(self.req.data['valor'])
+        tipo_imovel = caixa.TipoImovel(self.req.data['valor'])
 
         simulacoes = self.multi360_model.pessoa.simulacoes
         simulacao: SimulacaoModel = simulacoes[0]
@@ -994,10 +1074,10 @@ class TratamentoRequisicao:
 
         # verifica se o tipo de financiamento é compatível com o tipo imóvel
         if simulacao.tipo_financiamento is not None:
-            sim = SimuladorCaixa()
+            sim = caixa.SimuladorCaixa()
             sim.tipo_imovel = tipo_imovel
             try:
-                sim.tipo_financiamento = TipoFinanciamentoCaixa(
+                sim.tipo_financiamento = caixa.TipoFinanciamento(
                     simulacao.tipo_financiamento
                 )
             except ErroTipoFinanciamento:
@@ -1011,7 +1091,7 @@ class TratamentoRequisicao:
         # volta ao início pra ver campos q estão faltando
         # fica voltando ao self.inicio até chegar menu_alterar_dados
         # q redefini entrada_retornar em _response_proxima_entrada
-        print('self._checar_campos()')
+        log.debug('Checando campos')
         return self._response_proxima_entrada(
             entrada=Entrada.INICIO,
             entrada_retornar=Entrada.CHECAR_CAMPOS
@@ -1029,12 +1109,10 @@ class TratamentoRequisicao:
                 ConfMulti360.Questao.CIDADE_INVALIDA
             )
 
-        sim = SimuladorCaixa()
-        cidades = EstadoModel.obter_cidades(db.session, uf=uf, lista_dicts=False)
-        cidades_filtro: list[dict] = sim.procurar2(
+        cidades_filtro: list[dict] = obter_indice_cidades().procurar(
+            db.session,
+            uf,
             q=cidade_req,
-            l=cidades,
-            key=2,
             max_res=ConfMulti360.MAX_RES_MENU_CIDADES
         )
 
@@ -1085,7 +1163,7 @@ class TratamentoRequisicao:
             )
         
         # selecionou uma cidade: salvar no DB
-        print(f'CIDADE SELECIONADA: {self.req.data["nome"]}')
+        log.debug('Cidade selecionada', cidade=self.req.data['nome'])
         self.multi360_model.pessoa.cidade = CidadeModel.buscar_por_id(
             db.session,
             cidade_id
@@ -1363,7 +1441,7 @@ class TratamentoRequisicao:
         simulacao: SimulacaoModel = self.multi360_model.pessoa.simulacoes[0]
         pessoa: PessoaModel = self.multi360_model.pessoa
 
-        tipo_financiamento_brad = TipoFinanciamentoBradesco(simulacao.tipo_financiamento_bradesco)
+        tipo_financiamento_brad = bradesco.TipoFinanciamento(simulacao.tipo_financiamento_bradesco)
         valor_imovel = simulacao.valor_imovel
         somar_renda_conjuge = bool(pessoa.mais_de_um_comprador_dependente)
         data_nasc = pessoa.data_nasc
@@ -1379,19 +1457,22 @@ class TratamentoRequisicao:
             valor_financiamento = self.req.data['opcoes_financ']['valor_financiamento']
         cpf = pessoa.cpf
 
-        sim_brad: SimuladorBradesco = SimuladorBradesco.a_partir_valor_financiamento(
-            tipo_imovel=TipoImovelBradesco.RESIDENCIAL_POUPANCA,
-            situacao_imovel=tipo_financiamento_brad,
-            valor_imovel=valor_imovel,
-            somar_renda_conjuge=somar_renda_conjuge,
-            data_nascimento=data_nasc,
-            data_nascimento_conjuge=data_nasc_conjuge,
-            valor_financiamento=valor_financiamento,
-            prazo=prazo,
-            cpf=cpf
-        )
+        # a construção já vai ao site (ViewState, valor e prazo máximos)
+        with rastreamento.trecho('simulador.construir', banco='bradesco'):
+            sim_brad: bradesco.SimuladorBradesco = bradesco.SimuladorBradesco.a_partir_valor_financiamento(
+                tipo_imovel=bradesco.TipoImovel.RESIDENCIAL_POUPANCA,
+                situacao_imovel=tipo_financiamento_brad,
+                valor_imovel=valor_imovel,
+                somar_renda_conjuge=somar_renda_conjuge,
+                data_nascimento=data_nasc,
+                data_nascimento_conjuge=data_nasc_conjuge,
+                valor_financiamento=valor_financiamento,
+                prazo=prazo,
+                cpf=cpf
+            )
         try:
-            sim_brad_res: SimulacaoResultadoBradesco = sim_brad.simular()
+            with rastreamento.trecho('simulador.simular', banco='bradesco'):
+                sim_brad_res: bradesco.SimulacaoResultadoBradesco = sim_brad.simular()
         except ErroResultadoCampoNaoRetornado:
             raise
         txt_res: str = str(sim_brad_res)
@@ -1422,50 +1503,34 @@ class TratamentoRequisicao:
         simulacao: SimulacaoModel = self.multi360_model.pessoa.simulacoes[0]
         pessoa: PessoaModel = self.multi360_model.pessoa
         
-        nome: str = sobrenome_aleatorio(pessoa.nome)
-        email: str = email_aleatorio()
-        valor_imovel = simulacao.valor_imovel
-        valor_entrada = simulacao.valor_entrada
-        data_nasc = pessoa.data_nasc
-        prazo: int
-        renda = simulacao.renda_bruta
-
-        if not alterar:
-            prazo = CfgItau.PRAZO_MAX \
-                if self.banco == Banco.ITAU or self.banco == Banco.ITAU_L \
-                else CfgSantander.PRAXO_MAX
-        else:
-            prazo = self.req.data['opcoes_financ']['prazo']
-
-        sim: SimuladorBaseL
-        sim_res = SimulacaoResultadoBase
-        if self.banco == Banco.ITAU:
-            cpf: str = pessoa.cpf
-            celular: str = pessoa.fone
-            tipo_imovel: TipoImovelItau = TipoImovelItau.RESIDENCIAL
-            sim = SimuladorItauS.a_partir_de_dados_financiamento(
-                cpf, nome, email, celular, tipo_imovel, valor_imovel, 
-                valor_entrada, data_nasc, prazo
+        # prazo em anos, a requisição é em meses (0 = prazo máximo)
+        prazo: int = 0
+        if alterar:
+            prazo = 12 * int(
+                str(self.req.data['opcoes_financ']['prazo']).split(' ')[0]
             )
-            sim_res = sim.simular()
-        elif self.banco == Banco.ITAU_L:
-            sim = SimuladorItauL(
-                nome, email, valor_imovel, valor_entrada, 
-                data_nasc, prazo, renda
-            )
-            sim_res = sim.simular()
-        elif self.banco == Banco.SANTANDER:
-            sim = SimuladorSantanderL(
-                nome, email, valor_imovel, valor_entrada,
-                data_nasc, prazo, renda
-            )
-            sim_res = sim.simular()
+
+        requisicao = RequisicaoSimulacao(
+            valor_imovel=simulacao.valor_imovel,
+            renda_familiar=simulacao.renda_bruta,
+            data_nascimento=pessoa.data_nasc,
+            cpf=pessoa.cpf,
+            celular=pessoa.fone,
+            nome=sobrenome_aleatorio(pessoa.nome),
+            email=email_aleatorio(),
+            valor_entrada=simulacao.valor_entrada,
+            prazo=prazo
+        )
+        with rastreamento.trecho(
+            'simulador.simular', banco=chave_banco(self.banco)
+        ):
+            sim_res: ResultadoSimulacao = obter_fabrica(self.banco)(requisicao)
         txt_res: str = str(sim_res)
 
         self.req.data['opcoes_financ'] = {
-            'entrada': sim.valor_entrada,
-            'prazo': sim.prazo,
-            'prazo_max': sim.prazo_max
+            'entrada': formatar_moeda(sim_res.valor_entrada, retirar_rs=True),
+            'prazo': sim_res.formatar_prazo(sim_res.prazo),
+            'prazo_max': sim_res.formatar_prazo(sim_res.prazo_max)
         }
 
         return self._response_proxima_entrada(
@@ -1502,32 +1567,30 @@ class TratamentoRequisicao:
             tuple[dict, int]: retorno Flask nos padrões do chatbot.
         """
         nome: str
-        opcao_financ: OpcaoFinanciamento
+        opcao_financ: caixa.OpcaoFinanciamento
         versao: str
         if not alterar_opcoes_financ:
             # pega do data do item do menu
             nome = self.req.data['nome']
-            opcao_financ = OpcaoFinanciamento(self.req.data['valor'])
+            opcao_financ = caixa.OpcaoFinanciamento(self.req.data['valor'])
             versao = self.req.data['versao']
         else:
             # pega do data passado entre as requisições
             nome = self.req.data['opcoes_financ']['descricao']
-            opcao_financ = OpcaoFinanciamento(
+            opcao_financ = caixa.OpcaoFinanciamento(
                 self.req.data['opcoes_financ']['opcao_financ']
             )
             versao = self.req.data['opcoes_financ']['versao']
 
-        sim = SimuladorCaixa()
+        with rastreamento.trecho('simulador.construir', banco='caixa'):
+            sim = caixa.SimuladorCaixa()
         try:
             opcao_financ.versao = versao
             opcao_financ.descricao = nome
             sim.opcao_financiamento = opcao_financ
-        except Exception as erro:
-            # TODO: capturar erro e salvar no log 
+        except Exception:
             # TODO: enviar notificação desenvolvedor
-            print('#' * 100)
-            print(f'Erro ao setar opção de financianciamento: {erro=}')
-            print('#' * 100)
+            log.exception('Erro ao setar opção de financiamento')
             return _response_tipo_informacao(
                 txt=ConfMulti360.Menu.OPCOES_FINANCIAMENTO_ERRO2
             )
@@ -1541,8 +1604,8 @@ class TratamentoRequisicao:
         sim.adicionar_cidade(cod_caixa, nome, nome_sem_aspa)
         sim.cidade_indice = 0
 
-        sim.tipo_imovel = TipoImovelCaixa(simulacao.tipo_imovel)
-        sim.tipo_financiamento = TipoFinanciamentoCaixa(simulacao.tipo_financiamento)
+        sim.tipo_imovel = caixa.TipoImovel(simulacao.tipo_imovel)
+        sim.tipo_financiamento = caixa.TipoFinanciamento(simulacao.tipo_financiamento)
         sim.valor_imovel = simulacao.valor_imovel
         sim.cpf = self.multi360_model.pessoa.cpf
         sim.celular = self.multi360_model.pessoa.fone
@@ -1558,15 +1621,13 @@ class TratamentoRequisicao:
                 self.req.data['opcoes_financ']['cod_sistema_amortizacao']
             sim.prestacao_max = self.req.data['opcoes_financ']['prestacao_max']
 
-        sim_resultado: SimulacaoResultadoCaixa
+        sim_resultado: caixa.SimulacaoResultadoCaixa
         try:
-            sim_resultado: SimulacaoResultadoCaixa = sim.simular()
+            with rastreamento.trecho('simulador.simular', banco='caixa'):
+                sim_resultado: caixa.SimulacaoResultadoCaixa = sim.simular()
             if sim_resultado.msg_erro:
-                # TODO: registrar erro no log
                 # TODO: emitir alerta pra desenvolvedor com detalhes do erro
-                print('#' * 100)
-                print(f'Erro ao simular: {sim_resultado.msg_erro}')
-                print('#' * 100)
+                log.error('Erro ao simular', erro=sim_resultado.msg_erro)
                 return _response_tipo_informacao(
                     ConfMulti360.Informacao.SIMULACAO_ERRO
                 )
@@ -1618,12 +1679,12 @@ class TratamentoRequisicao:
             else:
                 raise
         except Exception as erro:
-            # TODO: registrar erro no log
             # TODO: emitir alerta pra desenvolvedor
-            print('#' * 100)
-            print(f'Erro ao simular: {erro}')
-            print('#' * 100)
+            log.exception('Erro ao simular')
             return _response_tipo_informacao(txt=str(erro))
+        finally:
+            # sessão volta pro pool pra próxima requisição
+            sim.liberar_sessao()
 
         # salvar opção financ. no DB
         simulacao.data = datetime.now()
@@ -1660,6 +1721,8 @@ class TratamentoRequisicao:
             'prestacao_max': sim_resultado.prestacao_max,
             'renda_familiar': sim.renda_familiar,
         }
+        if CfgAmortizacao.ESTIMAR_ALTERACOES_LOCALMENTE:
+            self._salvar_base_estimativa_caixa(sim_resultado)
         self._exibir_obs_resultado_simulacao = False
         
         return self._response_proxima_entrada(
@@ -1667,6 +1730,85 @@ class TratamentoRequisicao:
             txt
         )
     
+    def _salvar_base_estimativa_caixa(
+        self,
+        sim_resultado: caixa.SimulacaoResultadoCaixa
+    ) -> None:
+        """Guarda o último resultado real e a taxa mensal calibrada pra
+        que alterações de prazo e valor de entrada sejam estimadas
+        localmente, sem uma nova simulação na Caixa.
+        """
+        try:
+            sistema = SistemaAmortizacao.a_partir_de_texto(
+                sim_resultado.sistema_amortizacao
+            )
+            taxa_juros_mes = calibrar_taxa_mensal(
+                sim_resultado._valor_financiamento,
+                sim_resultado._prazo,
+                sim_resultado._primeira_prestacao,
+                sistema,
+                sim_resultado._valor_imovel
+            )
+        except (ValueError, ArithmeticError) as erro:
+            log.info(
+                'Não foi possível calibrar taxa da simulação', erro=str(erro)
+            )
+            return
+
+        self.req.data['opcoes_financ']['estimativa'] = {
+            'taxa_juros_mes': str(taxa_juros_mes),
+            'resultado': resultado_para_dict(sim_resultado),
+        }
+
+    def _resultado_caixa_estimado(
+        self,
+        prazo: int | None = None,
+        valor_entrada: Decimal2 | None = None
+    ) -> tuple[dict, int] | None:
+        """Estima o resultado da Caixa a partir da última simulação real.
+
+        Returns:
+            tuple[dict, int] | None: resposta com o resultado estimado ou
+                None quando não é possível estimar, nesse caso a
+                simulação deve ser feita normalmente.
+        """
+        if not CfgAmortizacao.ESTIMAR_ALTERACOES_LOCALMENTE:
+            return None
+
+        base: dict | None = self.req.data['opcoes_financ'].get('estimativa')
+        if not base:
+            return None
+
+        try:
+            ultimo: caixa.SimulacaoResultadoCaixa = resultado_de_dict(
+                caixa.SimulacaoResultadoCaixa, base['resultado']
+            )
+            if prazo and not 0 < prazo <= ultimo._prazo_max:
+                return None
+            if valor_entrada is not None and \
+               valor_entrada >= ultimo._valor_imovel:
+                return None
+
+            sim_resultado = estimar_resultado(
+                ultimo,
+                prazo=prazo,
+                valor_entrada=valor_entrada,
+                taxa_juros_mes=Decimal(base['taxa_juros_mes'])
+            )
+        except (KeyError, ValueError, ArithmeticError) as erro:
+            log.warning('Erro ao estimar resultado localmente', erro=str(erro))
+            return None
+
+        txt: str = (
+            f'{sim_resultado}'
+            f'{"-" * Parametros.TAM_TRACEJADO}\n'
+            f'{ConfMulti360.Informacao.RESULTADO_ESTIMADO}'
+        )
+        return self._response_proxima_entrada(
+            Entrada.MENU_RESULTADO_SIMULACAO,
+            txt
+        )
+
     def menu_resultado(self) -> tuple[dict, int]:
         self.entrada = Entrada.MENU_RESULTADO_SIMULACAO
 
@@ -1677,12 +1819,12 @@ class TratamentoRequisicao:
             case Entrada.ALTERAR_PRAZO:
                 texto2 = self.req.data['opcoes_financ']['prazo_max']
             case Entrada.ALTERAR_VALOR_ENTRADA_CAIXA:
-                sim = SimuladorCaixa()
+                sim = caixa.SimuladorCaixa()
                 sim.valor_entrada = self.req.data['opcoes_financ'] \
                                                  ['valor_entrada']
                 texto2 = sim._valor_entrada.formatar_moeda()
             case Entrada.ALTERAR_RENDA_FAMILIAR:
-                sim = SimuladorCaixa()
+                sim = caixa.SimuladorCaixa()
                 sim.renda_familiar = self.req.data['opcoes_financ'] \
                                                   ['renda_familiar']
                 texto2 = sim._renda_familiar.formatar_moeda()
@@ -1753,6 +1895,9 @@ class TratamentoRequisicao:
         # por enquanto não precisa salvar prazo no DB
         match self.banco:
             case Banco.CAIXA:
+                estimado = self._resultado_caixa_estimado(prazo=sim._prazo)
+                if estimado is not None:
+                    return estimado
                 return self.menu_resultado_caixa(alterar_opcoes_financ=True)
             case Banco.BRADESCO:
                 try:
@@ -1774,7 +1919,7 @@ class TratamentoRequisicao:
         self.entrada = Entrada.ALTERAR_VALOR_ENTRADA_CAIXA
 
         valor_entrada: str = self.req.text
-        sim = SimuladorCaixa()
+        sim = caixa.SimuladorCaixa()
         try:
             sim.valor_entrada = valor_entrada
         except ErroValorEntrada as erro:
@@ -1785,6 +1930,12 @@ class TratamentoRequisicao:
             )
         self.req.data['opcoes_financ']['valor_entrada'] = sim.valor_entrada
 
+        estimado = self._resultado_caixa_estimado(
+            valor_entrada=sim._valor_entrada
+        )
+        if estimado is not None:
+            return estimado
+
         # por enquanto não precisa salvar valor entrada no DB
         return self.menu_resultado_caixa(alterar_opcoes_financ=True)
 
@@ -1804,7 +1955,7 @@ class TratamentoRequisicao:
         self.entrada = Entrada.ALTERAR_PRESTACAO_MAX
 
         prestacao_max: str = self.req.text
-        sim = SimuladorCaixa()
+        sim = caixa.SimuladorCaixa()
         try:
             sim.prestacao_max = prestacao_max
         except ErroPrestacaoMax as erro:
@@ -1833,7 +1984,7 @@ class TratamentoRequisicao:
         valor_financiamento: str = self.req.text
         valor_max_financiamento: str = self.req.data['opcoes_financ']['valor_max_financiamento']
 
-        sim_brad = SimuladorBradesco()
+        sim_brad = bradesco.SimuladorBradesco()
         sim_brad._setar_valor_max_financiamento(valor_max_financiamento)
         try:
             sim_brad.valor_financiamento = valor_financiamento
@@ -2073,10 +2224,9 @@ class TratamentoRequisicao:
                         endpoint=ENDPOINT_MENU_OPCOES_FINANCIAMENTO
                     )
                 except ErroObterOpcaoFinanciamento as erro:
-                    print('#' * 100)
-                    print('Erro ao obter opções de financiamento')
-                    print(erro)
-                    print('#' * 100)
+                    log.error(
+                        'Erro ao obter opções de financiamento', erro=str(erro)
+                    )
                     return _response_tipo_informacao(
                         txt=ConfMulti360.Menu.OPCOES_FINANCIAMENTO_ERRO
                     )
@@ -2238,13 +2388,13 @@ class TratamentoRequisicao:
             list[dict]: lista de dicionários com os nomes e valores de
             cada opção.
         """
-        tipo_imovel: TipoImovelCaixa
+        tipo_imovel: caixa.TipoImovel
         itens_menu: list[dict] = [
             {
                 'nome': tipo_imovel.name,
                 'valor': tipo_imovel.value,
                 'entrada_seq': self.req.entrada_seq.json()
-            } for tipo_imovel in TipoImovelCaixa
+            } for tipo_imovel in caixa.TipoImovel
         ]
         return itens_menu
 
@@ -2269,22 +2419,22 @@ class TratamentoRequisicao:
             list[dict]: retorna lista de dicionários com apenas as opções
             novo e usado.
         """
-        #TF = TipoFinanciamentoCaixa if self.banco != Banco.BRADESCO else TipoFinanciamentoBradesco
+        #TF = caixa.TipoFinanciamento if self.banco != Banco.BRADESCO else bradesco.TipoFinanciamento
 
-        TF: TipoFinanciamento | tuple[TipoFinanciamentoCaixa]
+        TF: TipoFinanciamento | tuple[caixa.TipoFinanciamento]
         if self.banco == Banco.CAIXA:
             # obtem tipo_imovel do DB
             simulacao: SimulacaoModel = self.multi360_model.pessoa.simulacoes[0]
 
-            tipo_imovel = TipoImovelCaixa(simulacao.tipo_imovel)
-            if tipo_imovel == TipoImovelCaixa.RESIDENCIAL:
-                TF = TipoFinanciamentoCaixa
-            elif tipo_imovel == TipoImovelCaixa.COMERCIAL:
-                TF = TipoFinanciamentoCaixa.obter_tipos_financiamento_comercial()
+            tipo_imovel = caixa.TipoImovel(simulacao.tipo_imovel)
+            if tipo_imovel == caixa.TipoImovel.RESIDENCIAL:
+                TF = caixa.TipoFinanciamento
+            elif tipo_imovel == caixa.TipoImovel.COMERCIAL:
+                TF = caixa.TipoFinanciamento.obter_tipos_financiamento_comercial()
             else:   # TODO: implementar RURAL?
                 pass
         else:   # Bradesco
-            TF = TipoFinanciamentoBradesco
+            TF = bradesco.TipoFinanciamento
 
         itens_menu: list[dict] = [
             {
@@ -2330,11 +2480,11 @@ class TratamentoRequisicao:
         nome: str = self.multi360_model.pessoa.cidade.nome
         nome_sem_aspa: str = self.multi360_model.pessoa.cidade.nome_sem_aspa
 
-        sim: SimuladorCaixa = SimuladorCaixa()
-        sim.tipo_imovel = TipoImovelCaixa(simulacao.tipo_imovel)
+        sim: caixa.SimuladorCaixa = caixa.SimuladorCaixa()
+        sim.tipo_imovel = caixa.TipoImovel(simulacao.tipo_imovel)
         sim.adicionar_cidade(cod_caixa, nome, nome_sem_aspa)
         sim.cidade_indice = 0
-        sim.tipo_financiamento = TipoFinanciamentoCaixa(simulacao.tipo_financiamento)
+        sim.tipo_financiamento = caixa.TipoFinanciamento(simulacao.tipo_financiamento)
         sim.possui_imovel_cidade = self.multi360_model.pessoa.possui_imovel_cidade
         sim.valor_imovel = simulacao.valor_imovel
         sim.cpf = self.multi360_model.pessoa.cpf
@@ -2347,15 +2497,17 @@ class TratamentoRequisicao:
         sim.servidor_publico = \
             self.multi360_model.pessoa.servidor_publico
 
-        opcoes_financiamento: list[OpcaoFinanciamento]
+        opcoes_financiamento: list[caixa.OpcaoFinanciamento]
         try:
             opcoes_financiamento = sim.obter_opcoes_financiamento()
         except ErroObterOpcaoFinanciamento as erro:
             # TODO: relatar problema ao desenvolvedor e registrar log
             # TODO: exibir informação simplificada ao contato?
             raise
+        finally:
+            sim.liberar_sessao()
 
-        opcao_financiamento: OpcaoFinanciamento
+        opcao_financiamento: caixa.OpcaoFinanciamento
         itens_menu: list[dict] = []
         for opcao_financiamento in opcoes_financiamento:
             itens_menu.append(
@@ -2448,10 +2600,10 @@ class TratamentoRequisicao:
                 data_nasc_conjuge: str = date.strftime(pessoa.data_nasc_conjuge, '%d/%m/%Y') \
                     if pessoa.data_nasc_conjuge is not None else ''
 
-                tipo_financiamento_bradesco: str = TipoFinanciamentoBradesco(
+                tipo_financiamento_bradesco: str = bradesco.TipoFinanciamento(
                     simulacao.tipo_financiamento_bradesco
                 ).name if simulacao.tipo_financiamento_bradesco is not None \
-                    else TipoFinanciamentoBradesco.NOVO
+                    else bradesco.TipoFinanciamento.NOVO
                 
                 itens += [
                     ('CPF:', cpf, E.CPF.value),
@@ -2466,13 +2618,13 @@ class TratamentoRequisicao:
                     ('Simular', '', E.MENU_RESULTADO_SIMULACAO_BRADESCO.value)
                 ]
             case Banco.CAIXA:
-                tipo_imovel: TipoImovelCaixa = TipoImovelCaixa(simulacao.tipo_imovel)
+                tipo_imovel: caixa.TipoImovel = caixa.TipoImovel(simulacao.tipo_imovel)
                 cidade: str = pessoa.cidade.nome
                 possui_imovel_cidade: str = 'SIM' \
                     if pessoa.possui_imovel_cidade else 'NÃO'
                 tres_anos_fgts: str = 'SIM' if pessoa.tres_anos_fgts else 'NÃO'
                 servidor_publico: str = 'SIM' if pessoa.servidor_publico else 'NÃO'
-                tipo_financiamento: str = TipoFinanciamentoCaixa(
+                tipo_financiamento: str = caixa.TipoFinanciamento(
                     simulacao.tipo_financiamento
                 ).name
 
@@ -2573,7 +2725,7 @@ class TratamentoRequisicao:
     #     anexos: list = []
 
     #     PERC_VARIACAO = ConfSiteImobliaria.VALOR_IMOVEL_PERC_VARIACAO
-    #     sim = SimuladorCaixa()
+    #     sim = caixa.SimuladorCaixa()
     #     simulacao: SimulacaoModel = self.multi360_model.pessoa.simulacoes[0]
     #     sim.valor_imovel = simulacao.valor_imovel
     #     si = SiteImobiliaria.a_partir_de_valor_imovel(
@@ -2594,16 +2746,15 @@ class TratamentoRequisicao:
 
     def _obter_url_site_imobiliaria(self) -> str:
         PERC_VARIACAO = ConfSiteImobliaria.VALOR_IMOVEL_PERC_VARIACAO
-        sim = SimuladorCaixa()
+        sim = caixa.SimuladorCaixa()
         simulacao: SimulacaoModel = self.multi360_model.pessoa.simulacoes[0]
         sim.valor_imovel = simulacao.valor_imovel
         si = SiteImobiliaria.a_partir_de_valor_imovel(
             sim._valor_imovel,
             PERC_VARIACAO
         )
-        print('*' * 100)
-        print(si.url)
-        
+        log.debug('Url do site imobiliária', url=si.url)
+
         return si.url
 
 
@@ -2656,6 +2807,85 @@ class TratamentoRequisicao:
         return itens_menu
 
 
+def _simular_em_fila(metodo: str) -> tuple[dict, int]:
+    """Executa o método de TratamentoRequisicao que simula num worker
+    da fila do banco, fora da thread da requisição. Espera até
+    FilaSimulacao.ESPERA_INICIAL segundos, se não terminar responde com
+    uma questão de "processando" cujo callback é o endpoint da tarefa.
+
+    Args:
+        metodo (str): nome do método de TratamentoRequisicao.
+
+    Returns:
+        tuple[dict, int]: resposta do método ou questão "processando".
+    """
+    fila = obter_fila_simulacao()
+    if fila is None:
+        return getattr(TratamentoRequisicao(), metodo)()
+
+    tratamento = TratamentoRequisicao()
+    banco: Banco | None = (
+        tratamento.banco if hasattr(tratamento, 'multi360_model') else None
+    )
+
+    # o worker não tem a requisição, refaz o contexto com o mesmo json
+    app = current_app._get_current_object()
+    caminho: str = request.path
+    url_root: str = request.url_root
+    corpo: dict = request.get_json()
+
+    def executar() -> tuple[dict, int]:
+        # a fila copia o contexto, o trecho fica no rastro da requisição
+        with app.test_request_context(
+            caminho, base_url=url_root, method='POST', json=corpo
+        ), rastreamento.trecho(f'fila.{metodo}', fila=chave_banco(banco)):
+            return getattr(TratamentoRequisicao(), metodo)()
+
+    tarefa = fila.submeter(
+        chave_banco(banco),
+        executar,
+        dados={
+            'metodo': metodo,
+            'contact': tratamento.req.req_json['contact']
+        }
+    )
+    return _response_tarefa_simulacao(tarefa.id)
+
+
+def _response_tarefa_simulacao(id: str) -> tuple[dict, int]:
+    """Resposta da tarefa: o resultado quando concluída, senão questão
+    com callback pro endpoint da tarefa.
+    """
+    fila = obter_fila_simulacao()
+    tarefa: Tarefa | None = (
+        fila.aguardar(id, CfgFila.ESPERA_INICIAL) if fila else None
+    )
+    if tarefa is None:
+        return _response_tipo_informacao(
+            ConfMulti360.Informacao.SIMULACAO_EXPIRADA
+        )
+
+    match tarefa.estado:
+        case EstadoTarefa.CONCLUIDA:
+            # lista quando lida do SQLite
+            if isinstance(tarefa.resultado, dict):
+                return tarefa.resultado
+            return tuple(tarefa.resultado)
+        case EstadoTarefa.ERRO:
+            return _response_tipo_informacao(
+                ConfMulti360.Informacao.SIMULACAO_ERRO
+            )
+
+    txt: str = (
+        ConfMulti360.Questao.SIMULACAO_PROCESSANDO
+        if time.time() - tarefa.criada_em < 2 * CfgFila.ESPERA_INICIAL
+        else ConfMulti360.Questao.SIMULACAO_PROCESSANDO2
+    )
+    return _response_tipo_questao(
+        txt, {'tarefa': tarefa.id}, ENDPOINT_TAREFA_SIMULACAO
+    )
+
+
 def _response_tipo_questao(txt: str, dados: dict, 
                            endpoint: str
                            ) -> tuple[dict, int]:
@@ -1,8 +1,17 @@
-from fastapi import FastAPI, Depends
+from decimal import Decimal
+from typing import Annotated
+
+from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from rest_api.deps.db import get_session
+from simovel import metricas
+from simovel.config.geral import Amortizacao as CfgAmortizacao
 from simovel.db.models import CidadeModel
+from simovel.sims.amortizacao import taxa_mensal
+from simovel.sims.amortizacao_grade import GradeAmortizacao
 
 
 app = FastAPI(
@@ -16,6 +25,20 @@ def healthcheck():
     return { "status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def exportar_metricas():
+    """
+    Métricas no formato texto do Prometheus (ver simovel.metricas).
+    """
+    if not metricas.habilitadas():
+        raise HTTPException(status_code=404, detail="Métricas desabilitadas.")
+
+    return PlainTextResponse(
+        metricas.exportar(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/uf/{uf}/cidades")
 def obter_cidades_por_uf(
     uf: str,
@@ -30,3 +53,53 @@ def obter_cidades_por_uf(
     )
 
     return CidadeModel.cidades_to_list(cidades)
+
+
+class GradeAmortizacaoEntrada(BaseModel):
+    valor_imovel: float = Field(gt=0)
+    prazos: list[
+        Annotated[int, Field(ge=1, le=CfgAmortizacao.GRADE_PRAZO_MAX)]
+    ] = Field(min_length=1, max_length=500)
+    valores_entrada: list[Annotated[float, Field(ge=0)]] = Field(
+        min_length=1, max_length=500
+    )
+    # informar taxa mensal (ex: calibrada de uma simulação real) ou anual
+    taxa_juros_mes: float | None = Field(
+        default=None, ge=0, le=CfgAmortizacao.GRADE_TAXA_JUROS_MES_MAX
+    )
+    taxa_juros_ano: float | None = Field(
+        default=None, ge=0, le=CfgAmortizacao.GRADE_TAXA_JUROS_ANO_MAX
+    )
+
+
+@app.post("/amortizacao/grade")
+def obter_grade_amortizacao(entrada: GradeAmortizacaoEntrada):
+    """
+    Matrizes de primeira/última prestação e somatório das parcelas SAC
+    e PRICE, com uma linha por valor de entrada e uma coluna por prazo.
+    """
+    taxa: float | None = entrada.taxa_juros_mes
+    if taxa is None:
+        if entrada.taxa_juros_ano is None:
+            raise HTTPException(
+                status_code=422,
+                detail="Informar taxa_juros_mes ou taxa_juros_ano."
+            )
+        taxa = float(taxa_mensal(Decimal(str(entrada.taxa_juros_ano))))
+
+    try:
+        grade = GradeAmortizacao.prazo_x_entrada(
+            entrada.valor_imovel,
+            entrada.prazos,
+            entrada.valores_entrada,
+            taxa
+        )
+    except ValueError as erro:
+        raise HTTPException(status_code=422, detail=str(erro))
+
+    return {
+        "prazos": entrada.prazos,
+        "valores_entrada": entrada.valores_entrada,
+        "taxa_juros_mes": taxa,
+        **grade.para_dict(),
+    }
@@ -0,0 +1,181 @@
+"""
+Cache em memória com expiração (TTL) e descarte do item menos usado
+recentemente (LRU) quando atinge o tamanho máximo.
+
+Pode ser associado a uma versão (ex: versão do simulador da Caixa):
+quando a versão informada em validar_versao muda, todo o conteúdo é
+descartado.
+
+ChamadaCompartilhada junta chamadas simultâneas com a mesma chave numa
+só execução e guarda o resultado num CacheTTL.
+"""
+
+__author__ = 'Vanduir Santana Medeiros'
+__version__ = '0.2'
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class CacheTTL:
+    def __init__(self, tamanho_max: int = 256, ttl: float = 300.) -> None:
+        """
+        Args:
+            tamanho_max (int, optional): quantidade máxima de itens.
+            ttl (float, optional): segundos até o item expirar.
+        """
+        self.tamanho_max = tamanho_max
+        self.ttl = ttl
+        self.versao: str | None = None
+        self.acertos = 0
+        self.falhas = 0
+        # chave -> (expira_em, valor)
+        self._itens: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        return self.obter(chave, contar=False) is not None
+
+    def obter(self, chave: Hashable, contar: bool = True) -> Any | None:
+        """
+        Retorna o valor da chave ou None se não existir ou expirou.
+        """
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] <= time.monotonic():
+                del self._itens[chave]
+                item = None
+
+            if item is None:
+                if contar:
+                    self.falhas += 1
+                return None
+
+            self._itens.move_to_end(chave)
+            if contar:
+                self.acertos += 1
+            return item[1]
+
+    def definir(
+        self,
+        chave: Hashable,
+        valor: Any,
+        ttl: float | None = None
+    ) -> None:
+        """
+        Guarda o valor, descartando o item usado há mais tempo se o
+        cache estiver cheio.
+        """
+        expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._itens[chave] = (expira_em, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_max:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave: Hashable) -> None:
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    def validar_versao(self, versao: str) -> bool:
+        """
+        Associa o cache à versão. Se for diferente da anterior o cache
+        é limpo.
+
+        Returns:
+            bool: True se a versão mudou e o cache foi limpo.
+        """
+        with self._lock:
+            if versao == self.versao:
+                return False
+
+            mudou = self.versao is not None
+            self.versao = versao
+            if mudou:
+                self._itens.clear()
+
+            return mudou
+
+    @property
+    def estatisticas(self) -> dict:
+        return {
+            'itens': len(self._itens),
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+        }
+
+
+class _Chamada:
+    def __init__(self) -> None:
+        self.concluida = threading.Event()
+        self.valor: Any = None
+        self.erro: BaseException | None = None
+
+
+class ChamadaCompartilhada:
+    """
+    Quem chamar executar com uma chave que já está sendo executada
+    espera e recebe o mesmo resultado (ou o mesmo erro), em vez de
+    repetir a chamada. Resultados ficam em cache por ttl segundos.
+    """
+    def __init__(self, tamanho_max: int = 256, ttl: float = 60.) -> None:
+        self.cache = CacheTTL(tamanho_max=tamanho_max, ttl=ttl)
+        self.executadas = 0
+        self.compartilhadas = 0
+        self._em_andamento: dict[Hashable, _Chamada] = {}
+        self._lock = threading.Lock()
+
+    def executar(self, chave: Hashable, funcao: Callable[[], Any]) -> Any:
+        valor = self.cache.obter(chave)
+        if valor is not None:
+            return valor
+
+        with self._lock:
+            # pode ter terminado entre a consulta acima e o lock
+            valor = self.cache.obter(chave, contar=False)
+            if valor is not None:
+                return valor
+
+            chamada = self._em_andamento.get(chave)
+            executar = chamada is None
+            if executar:
+                chamada = self._em_andamento[chave] = _Chamada()
+                self.executadas += 1
+            else:
+                self.compartilhadas += 1
+
+        if not executar:
+            chamada.concluida.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.valor
+
+        try:
+            chamada.valor = funcao()
+            if chamada.valor is not None:
+                self.cache.definir(chave, chamada.valor)
+            return chamada.valor
+        except BaseException as erro:
+            chamada.erro = erro
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            chamada.concluida.set()
+
+    @property
+    def estatisticas(self) -> dict:
+        return {
+            **self.cache.estatisticas,
+            'executadas': self.executadas,
+            'compartilhadas': self.compartilhadas,
+        }
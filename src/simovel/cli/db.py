@@ -3,32 +3,59 @@ Executa funções ligadas ao banco de dados via CLI.
 Para fazer bootstrap do banco de dados contendo UF e cidades, execute:
 
     $ uv run -m simovel.cli.db bootstrap
+
+Por padrão são obtidas as cidades de todas as UFs, pra apenas algumas:
+
+    $ uv run -m simovel.cli.db bootstrap GO DF
+
+Se for interrompido basta rodar novamente, as UFs já concluídas são
+puladas.
+
+Pra atualizar as cidades já cadastradas com a lista atual da Caixa
+(UFs sem alterações são puladas), execute:
+
+    $ uv run -m simovel.cli.db atualizar-cidades [UF ...]
 """
 
 __author__ = 'Vanduir Santana Medeiros'
-__version__ = '0.1'
+__version__ = '0.3'
 
 import sys
 
 from simovel.db.session import SessionLocal
 from simovel.db.bootstrap import bootstrap_db
+from simovel.db.bootstrap import atualizar_cidades as atualizar_cidades_db
+
+
+def bootstrap(ufs: list[str] | None = None) -> None:
+    with SessionLocal() as session:
+        if ufs:
+            bootstrap_db(session, tuple(ufs))
+        else:
+            bootstrap_db(session)
 
 
-def bootstrap() -> None:
+def atualizar_cidades(ufs: list[str] | None = None) -> None:
     with SessionLocal() as session:
-        bootstrap_db(session)
+        if ufs:
+            atualizar_cidades_db(session, tuple(ufs))
+        else:
+            atualizar_cidades_db(session)
 
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print('Uso:')
-        print('uv run -m simovel.cli.db bootstrap')
+        print('uv run -m simovel.cli.db bootstrap [UF ...]')
+        print('uv run -m simovel.cli.db atualizar-cidades [UF ...]')
         sys.exit(1)
 
     comando = sys.argv[1]
 
     if comando == 'bootstrap':
-        bootstrap()
+        bootstrap(sys.argv[2:])
+    elif comando == 'atualizar-cidades':
+        atualizar_cidades(sys.argv[2:])
     else:
         print(f'Comando desconhecido: {comando}')
 
@@ -0,0 +1,116 @@
+"""
+Relatório do custo de importação (partida a frio) por módulo.
+
+Importa cada módulo num interpretador novo com -X importtime e mostra
+os que mais pesam, pra conferir que o selenium e cia. só entram com o
+banco que precisa deles (ver simovel.sims.registro):
+
+    $ uv run -m simovel.cli.importacao [MODULO ...] [--top 15]
+
+Sem módulos mede o registro, o simulador de cada banco e a API.
+"""
+
+__author__ = 'Vanduir Santana Medeiros'
+__version__ = '0.1'
+
+import argparse
+import os
+import subprocess
+import sys
+
+from simovel.sims.registro import MODULOS
+
+
+MODULOS_PADRAO: list[str] = [
+    'simovel.sims.registro',
+    *dict.fromkeys(MODULOS.values()),
+    'rest_api.legacy.ns_multi360',
+]
+
+
+def analisar_importtime(texto: str) -> list[tuple[str, int, int]]:
+    """
+    Extrai as linhas da saída de -X importtime.
+
+    Returns:
+        list[tuple[str, int, int]]: (módulo, próprio µs, acumulado µs)
+        na ordem em que terminaram de importar.
+    """
+    linhas: list[tuple[str, int, int]] = []
+    for linha in texto.splitlines():
+        if not linha.startswith('import time:'):
+            continue
+        campos = linha[len('import time:'):].split('|')
+        if len(campos) != 3 or not campos[0].strip().isdigit():
+            # cabeçalho
+            continue
+        linhas.append(
+            (campos[2].strip(), int(campos[0]), int(campos[1]))
+        )
+
+    return linhas
+
+
+def medir(modulo: str) -> tuple[list[tuple[str, int, int]], str]:
+    """
+    Importa o módulo num processo novo.
+
+    Returns:
+        tuple: linhas de analisar_importtime e a mensagem de erro (vazia
+        quando importou).
+    """
+    r = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        capture_output=True,
+        text=True,
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}
+    )
+    erro: str = ''
+    if r.returncode:
+        erro = r.stderr.strip().splitlines()[-1]
+
+    return analisar_importtime(r.stderr), erro
+
+
+def relatorio(modulos: list[str], top: int) -> None:
+    for modulo in modulos:
+        linhas, erro = medir(modulo)
+        total: int = next(
+            (acumulado for nome, _, acumulado in linhas if nome == modulo), 0
+        )
+        print(f'{modulo}: {total / 1000:.1f} ms, {len(linhas)} módulos')
+        if erro:
+            print(f'    erro: {erro}')
+            continue
+
+        pesados = sorted(linhas, key=lambda l: l[1], reverse=True)[:top]
+        for nome, proprio, acumulado in pesados:
+            print(
+                f'    {proprio / 1000:8.1f} ms {acumulado / 1000:8.1f} ms  '
+                f'{nome}'
+            )
+
+        carregados = {nome for nome, _, _ in linhas}
+        for pacote in ('selenium', 'webdriver_manager', 'bs4', 'ngram'):
+            if pacote in carregados:
+                print(f'    carrega {pacote}')
+        print()
+
+
+def main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog='simovel.cli.importacao')
+    parser.add_argument(
+        'modulos', nargs='*', metavar='MODULO',
+        help='padrão: ' + ', '.join(MODULOS_PADRAO)
+    )
+    parser.add_argument(
+        '--top', type=int, default=15,
+        help='módulos com maior tempo próprio (padrão 15)'
+    )
+    opcoes = parser.parse_args(args)
+    print('tempo próprio / acumulado\n')
+    relatorio(opcoes.modulos or MODULOS_PADRAO, opcoes.top)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,68 @@
+"""
+Servidor de replay: responde no lugar dos bancos a partir das
+interações gravadas pelos simuladores (ver simovel.replay).
+
+Pra gravar, rode a aplicação (ou os testes) com SIMOVEL_GRAVAR=1, as
+interações vão pra SIMOVEL_ARQUIVO_GRAVACOES (padrão gravacoes.jsonl).
+Pra responder a partir das gravações:
+
+    $ uv run -m simovel.cli.replay servidor gravacoes.jsonl \\
+        [--porta 8765] [--latencia 0.05 0.3] [--taxa-erro 0.02] [--semente 1]
+
+E aponte os simuladores pro servidor:
+
+    $ SIMOVEL_URL_BASE=http://127.0.0.1:8765 uv run ...
+"""
+
+__author__ = 'Vanduir Santana Medeiros'
+__version__ = '0.1'
+
+import argparse
+import sys
+
+from simovel.config.geral import Replay as CfgReplay
+from simovel.replay import ServidorReplay, carregar_interacoes
+
+
+def servidor(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog='simovel.cli.replay servidor')
+    parser.add_argument('arquivo')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=CfgReplay.SERVIDOR_PORTA)
+    parser.add_argument(
+        '--latencia', type=float, nargs=2, default=(0., 0.),
+        metavar=('MIN', 'MAX'), help='segundos'
+    )
+    parser.add_argument('--taxa-erro', type=float, default=0.)
+    parser.add_argument('--semente', type=int, default=None)
+    opcoes = parser.parse_args(args)
+
+    interacoes = carregar_interacoes(opcoes.arquivo)
+    srv = ServidorReplay(
+        interacoes,
+        host=opcoes.host,
+        porta=opcoes.porta,
+        latencia_min=opcoes.latencia[0],
+        latencia_max=opcoes.latencia[1],
+        taxa_erro=opcoes.taxa_erro,
+        semente=opcoes.semente
+    )
+    print(f'{len(interacoes)} interações carregadas, atendendo em {srv.url_base}')
+    try:
+        srv.servir()
+    except KeyboardInterrupt:
+        print(srv.estatisticas)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Uso:')
+        print('uv run -m simovel.cli.replay servidor ARQUIVO [opções]')
+        sys.exit(1)
+
+    comando = sys.argv[1]
+
+    if comando == 'servidor':
+        servidor(sys.argv[2:])
+    else:
+        print(f'Comando desconhecido: {comando}')
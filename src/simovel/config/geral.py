@@ -1,14 +1,15 @@
 # coding: utf-8
 """Configurações gerais do simulador
 """
-__version__ = '0.16'
+__version__ = '0.30'
 __author__ = 'Vanduir Santana Medeiros'
 
 
+import os
 from enum import Enum
 from decimal import Decimal
 
-from simovel.db.paths import SQLITE_DB_PATH
+from simovel.db.paths import DATA_DIR, SQLITE_DB_PATH
 
 class ItauTipoSimulacao(Enum):
     SEL = 1
@@ -52,6 +53,154 @@ class Parametros:
     VALOR_ENTRADA_MAX_PERC = Decimal(90)
     TAM_TRACEJADO = 35      # tracejado q aparece no resultado da simulação
                             # ou pra separar linhas
+    # índice de cidades em memória, ver simovel.db.indice_cidades
+    INDICE_CIDADES_INTERVALO_VERIFICACAO = 60   # segundos
+
+
+class CatalogoCidades:
+    # requisições simultâneas à Caixa no bootstrap/atualização das
+    # cidades, ver simovel.db.bootstrap
+    TRABALHADORES = 6
+
+
+class Replay:
+    # grava as trocas HTTP dos simuladores com os bancos (url, payload,
+    # headers e corpo) em ARQUIVO_GRAVACOES, ver simovel.replay
+    GRAVAR = os.getenv('SIMOVEL_GRAVAR', '') == '1'
+    ARQUIVO_GRAVACOES = os.getenv('SIMOVEL_ARQUIVO_GRAVACOES', 'gravacoes.jsonl')
+    # quando definida, as requisições aos bancos vão pra esse servidor
+    # (ex: http://127.0.0.1:8765) no formato URL_BASE/host/caminho
+    URL_BASE = os.getenv('SIMOVEL_URL_BASE', '')
+    # servidor de replay (simovel.cli.replay)
+    SERVIDOR_PORTA = 8765
+    SERVIDOR_STATUS_ERRO = 503
+
+
+class Http:
+    # sessões requests compartilhadas por host (Bradesco, Loft), com
+    # keep-alive e novas tentativas, ver simovel.sims.sessao_http
+    POOL_TAMANHO = 10                       # conexões mantidas por host
+    TENTATIVAS = 3
+    BACKOFF = 0.5                           # segundos, dobra a cada tentativa
+    STATUS_TENTAR_NOVAMENTE = (500, 502, 503, 504)
+    # timeout padrão (conexão, leitura) em segundos
+    TIMEOUT_CONEXAO = 5
+    TIMEOUT_LEITURA = 30
+
+
+class Disjuntor:
+    # limite de concorrência e disjuntor (circuit breaker) por host,
+    # compartilhados pelos simuladores, ver simovel.sims.disjuntor
+    HABILITADO = True
+    CONCORRENCIA_PADRAO = 8                 # chamadas simultâneas por host
+    CONCORRENCIA = {                        # por hostname
+        'www8.caixa.gov.br': 8,
+        'wspf.banco.bradesco': 4,
+        'credito-imobiliario.itau.com.br': 2,
+    }
+    ESPERA_VAGA = 10                        # segundos esperando uma vaga
+    JANELA = 20                             # últimas chamadas avaliadas
+    MINIMO_CHAMADAS = 5                     # na janela antes de poder abrir
+    LIMIAR_ERROS = 0.5                      # taxa de falhas que abre
+    TEMPO_ABERTO = 30                       # segundos até meio abrir
+    CHAMADAS_MEIO_ABERTO = 1                # chamadas de teste simultâneas
+
+
+class Metricas:
+    # contadores e histogramas exportados em /metrics, ver
+    # simovel.metricas. Desabilitadas a instrumentação não custa nada
+    HABILITADAS = os.getenv('SIMOVEL_METRICAS', '1') != '0'
+    # segundos
+    BUCKETS_CHAMADA = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    BUCKETS_LOCAL = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+
+
+class Log:
+    # logs dos simuladores e da API, ver simovel.log
+    # DEBUG, INFO, WARNING, ERROR
+    NIVEL = os.getenv('SIMOVEL_LOG_NIVEL', 'INFO').upper()
+    # 'texto' ou 'json' (um objeto por linha)
+    FORMATO = os.getenv('SIMOVEL_LOG_FORMATO', 'texto')
+    # vazio escreve no stderr
+    ARQUIVO = os.getenv('SIMOVEL_LOG_ARQUIVO', '')
+    # despejos de depuração (html, cookies, respostas inteiras), mesmo
+    # com NIVEL DEBUG só saem com SIMOVEL_LOG_DESPEJOS=1
+    DESPEJOS = os.getenv('SIMOVEL_LOG_DESPEJOS', '') == '1'
+    TAMANHO_DESPEJO = 2000                  # caracteres por valor despejado
+    # registros esperando a thread de escrita, os que passam são
+    # descartados em vez de travar quem loga
+    TAMANHO_FILA = 10000
+    # mesma mensagem (logger, nível e linha) no máximo LIMITE_REPETICOES
+    # vezes a cada JANELA_REPETICOES segundos
+    LIMITE_REPETICOES = 10
+    JANELA_REPETICOES = 60
+
+
+class Rastreamento:
+    # rastros (tracing) das jornadas do Multi360, ver
+    # simovel.rastreamento
+    HABILITADO = os.getenv('SIMOVEL_RASTREAMENTO', '') == '1'
+    # fração das jornadas rastreadas (0 a 1)
+    TAXA_AMOSTRAGEM = float(os.getenv('SIMOVEL_RASTREAMENTO_TAXA', '0.1'))
+    # 'arquivo' (json por linha) ou 'otlp' (coletor OpenTelemetry)
+    EXPORTADOR = os.getenv('SIMOVEL_RASTREAMENTO_EXPORTADOR', 'arquivo')
+    ARQUIVO = str(DATA_DIR / 'rastros.jsonl')
+    OTLP_URL = os.getenv(
+        'SIMOVEL_RASTREAMENTO_OTLP_URL', 'http://localhost:4318/v1/traces'
+    )
+    SERVICO = 'simovel'
+    LOTE = 64                               # trechos por envio OTLP
+    INTERVALO_ENVIO = 5                     # segundos entre envios OTLP
+    TIMEOUT_ENVIO = 10
+    # segundos sem requisições até a conversa virar uma nova jornada
+    JORNADA_TTL = 30 * 60
+    JORNADAS_TAMANHO = 10000
+
+
+class CacheResultados:
+    # resposta bruta das simulações (Caixa, Bradesco, Loft) pelo hash das
+    # entradas, ver simovel.sims.cache_resultados
+    HABILITADO = True
+    TAMANHO = 1024                          # itens em memória por origem
+    TTL_PADRAO = 30 * 60                    # segundos
+    TTL = {                                 # segundos, por origem
+        'caixa': 30 * 60,
+        'bradesco': 60 * 60,
+        'loft': 15 * 60,
+    }
+    # guarda também num SQLite pra sobreviver a reinícios
+    PERSISTIR = os.getenv('SIMOVEL_CACHE_RESULTADOS_PERSISTIR', '') == '1'
+    ARQUIVO_SQLITE = str(DATA_DIR / 'cache_resultados.db')
+
+
+class FilaSimulacao:
+    # simulações do Multi360 executadas fora da thread da requisição,
+    # ver simovel.sims.fila
+    HABILITADA = True
+    # workers por fila (banco), um banco lento não ocupa os dos outros
+    TRABALHADORES_PADRAO = 2
+    TRABALHADORES = {
+        'caixa': 4,
+        'bradesco': 2,
+        'itau': 2,                          # selenium, cada um abre um chrome
+        'santander': 2,
+    }
+    # segundos que a requisição espera antes de responder "processando",
+    # simulações rápidas (cache) continuam respondendo direto
+    ESPERA_INICIAL = 3.
+    TTL = 30 * 60                           # segundos que a tarefa fica guardada
+    # estado das tarefas num SQLite compartilhado pelos workers do
+    # gunicorn (o callback /tarefa pode chegar em outro processo) e
+    # consultável após reinício. Desligar (SIMOVEL_FILA_PERSISTIR=0) só
+    # com um único worker
+    PERSISTIR = os.getenv('SIMOVEL_FILA_PERSISTIR', '1') == '1'
+    ARQUIVO_SQLITE = str(DATA_DIR / 'fila_simulacao.db')
+    # segundos entre leituras do SQLite ao aguardar tarefa de outro worker
+    INTERVALO_CONSULTA = .2
+    # quando definida recebe um POST json com a resposta de cada tarefa
+    # concluída
+    URL_CALLBACK = os.getenv('SIMOVEL_FILA_URL_CALLBACK', '')
+    TIMEOUT_CALLBACK = 10
 
 
 class SiteImobiliaria:
@@ -100,21 +249,91 @@ class Caixa:
         108701134,  # CRÉDITO REAL FÁCIL POUPANÇA CAIXA: Setor Privado - Garantia Imóvel Comercial
     ]
     
+    # sessões pré-aquecidas (cookies, versão, scriptSessionId), ver
+    # simovel.sims.caixa_sessao
+    POOL_SESSOES_HABILITADO = True
+    POOL_SESSOES_TAMANHO = 4
+    SESSAO_TTL = 15 * 60                    # segundos
+    SESSAO_INTERVALO_VERIFICACAO = 60       # segundos
+    TIMEOUT_REQUISICAO = 30                 # segundos
+    TIMEOUT_SIMULACAO = 60                  # segundos, simular_todos
+
+    # cache das opções de financiamento por perfil, descartado quando
+    # muda a versão do simulador
+    CACHE_OPCOES_HABILITADO = True
+    CACHE_OPCOES_TAMANHO = 512
+    CACHE_OPCOES_TTL = 6 * 60 * 60          # segundos
+
+    # extração do html: 'rapido' (expressões regulares, ver
+    # simovel.sims.caixa_parser) ou 'bs4' (BeautifulSoup). O rápido usa
+    # o BeautifulSoup quando o html não tiver o layout esperado.
+    PARSER_HTML = 'rapido'
+
     class ObservacaoSistemaAmortizacao:
         EXIBIR_OBS_SISTEMA_AMORTIZACAO = True
         OBS_SISTEMA_AMORTIZACAO_PRICE = '*Dica: Você pode optar por parcelas decrescentes alterando o sistema de amortização para SAC, com isso as prestações ficam maiores*'
         OBS_SISTEMA_AMORTIZACAO_SAC = '*Dica: Você pode optar por parcelas fixas alterando o sistema de amortização para PRICE com isso as prestações ficam menores*'
 
 
+class Amortizacao:
+    # taxas mensais padrão usadas no cálculo local da tabela de
+    # amortização, ver simovel.sims.amortizacao
+    TAXA_MIP_MES = Decimal('0.00025')      # sobre o saldo devedor
+    TAXA_DFI_MES = Decimal('0.00007')      # sobre o valor do imóvel
+    TAXA_ADMINISTRACAO = Decimal(25)       # R$ por parcela
+    # responde alteração de prazo/valor de entrada com estimativa local
+    # a partir da taxa da última simulação, sem simular novamente
+    ESTIMAR_ALTERACOES_LOCALMENTE = False
+    # limites das entradas de /amortizacao/grade
+    GRADE_PRAZO_MAX = 600                   # meses
+    GRADE_TAXA_JUROS_MES_MAX = .1
+    GRADE_TAXA_JUROS_ANO_MAX = 2.
+
+
 class Bradesco:
     PRAZO_MIN = 90  # meses
     # prazo máximo é extraído da própria simulação
+    TIMEOUT_SIMULACAO = 60  # segundos, simular_todos
+
+    # __VIEWSTATE guardado depois de cada prefixo das interações iniciais
+    # (página inicial, UF, tipo e situação do imóvel, ...) e reaproveitado
+    # por simulações com as mesmas entradas, ver
+    # SimuladorBradesco._interagir_parte1
+    CACHE_VIEWSTATE_HABILITADO = True
+    CACHE_VIEWSTATE_TAMANHO = 1024
+    CACHE_VIEWSTATE_TTL = 30 * 60           # segundos
 
 
 class Itau:
     PRAZO_MAX = 30                          # anos
     TIPO_SIMULACAO = ItauTipoSimulacao.LOF  # tipo de simulação, SEL simula direto no simulador do Itaú
                                             # como as vezes pd falhar, é possível fazer a mudança
+    TIMEOUT_SIMULACAO = 90                  # segundos, simular_todos (selenium é mais lento)
+
+    # navegadores Chrome headless mantidos abertos pro SimuladorItauS,
+    # cada simulação num contexto anônimo novo, ver simovel.sims.navegador
+    NAVEGADOR_POOL_TAMANHO = 2
+    NAVEGADOR_MAX_USOS = 50                 # simulações até reiniciar o Chrome
+    NAVEGADOR_TIMEOUT_OBTER = 30            # segundos esperando um navegador livre
+    NAVEGADOR_TIMEOUT_ETAPA = 20            # segundos, espera de cada formulário
+    NAVEGADOR_TIMEOUT_SIMULACAO = 60        # segundos, simulação inteira
+    # não carregados (imagens, fontes e CSS)
+    NAVEGADOR_URLS_BLOQUEADAS = (
+        '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.webp', '*.ico',
+        '*.woff', '*.woff2', '*.ttf', '*.css',
+    )
+    # caminho do chromedriver, vazio baixa/usa o do ChromeDriverManager
+    NAVEGADOR_CHROMEDRIVER = os.getenv('SIMOVEL_CHROMEDRIVER', '')
+
+class Loft:
+    # Itaú e Santander (SimuladorBaseL) vêm na mesma resposta da Loft:
+    # chamadas simultâneas pro mesmo perfil viram uma só e a resposta
+    # fica em cache por CACHE_TTL, ver SimuladorBaseL._obter_json_simulacao
+    CHAMADA_COMPARTILHADA_HABILITADA = True
+    CACHE_TAMANHO = 256
+    CACHE_TTL = 2 * 60                      # segundos
+
 
 class Santander:
     PRAXO_MAX = 30 # anos, na vdd são 35 anos, mas por compatibilidade é melhor deixar 30 anos (por enquanto)
+    TIMEOUT_SIMULACAO = 30  # segundos, simular_todos
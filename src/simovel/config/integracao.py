@@ -2,7 +2,7 @@
 """
 
 __author__ = 'Vanduir Santana Medeiros'
-__version__ = '0.20'
+__version__ = '0.22'
 
 
 class Multi360:
@@ -21,6 +21,8 @@ Por exemplo: pra cidade de Goiânia, digite: Goian"""
         CIDADE_INVALIDA = 'A cidade precisa ter pelo menos 3 caracteres!'
         CIDADE_PESQUISA_VAZIA = '*Não* encontrou nenhum resultado para a pesquisa *{}*. Digite novamente o nome ou parte do nome da *cidade*'
         VALOR_IMOVEL = 'Qual o valor do imóvel?'
+        SIMULACAO_PROCESSANDO = 'Estamos simulando no banco, isso pode levar alguns segundos. Envie qualquer mensagem pra ver o resultado.'
+        SIMULACAO_PROCESSANDO2 = 'Ainda processando a simulação, aguarde mais alguns segundos e envie qualquer mensagem.'
         VALOR_ENTRADA = 'Digite o *Valor da Entrada (R$):*'
         CPF = """Digite seu *CPF*
 
@@ -85,7 +87,9 @@ Formatos aceitos:
 
     class Informacao:
         """Configurações das mensagens de informação."""
+        SIMULACAO_EXPIRADA = 'A simulação expirou, favor simular novamente.'
         SIMULACAO_ERRO = 'Erro ao efetuar simulação. O erro foi reportado e em breve será corrigido. Agradecemos a compreensão!'
+        RESULTADO_ESTIMADO = '*Valores estimados* a partir da taxa da última simulação, podem variar um pouco em relação ao simulador do banco.'
 
 
     class MenuDicas:
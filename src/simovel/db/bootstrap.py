@@ -1,31 +1,186 @@
 """
 Contém inicializações necessárias para banco de dados.
 Aqui é verificado se existe ao menos uma UF no BD e suas respectivas
-cidades. Inicialmente será populado apenas dados da UF GO.
+cidades. As cidades das UFs são obtidas em paralelo no simulador da
+Caixa (todas usando uma mesma sessão) e gravadas uma UF por vez, cada
+uma em uma única transação junto com a situação da UF em
+CatalogoCidadesModel. Se o bootstrap for interrompido, ao rodar
+novamente as UFs já concluídas são puladas.
+
+Depois de populado, atualizar_cidades mantém o catálogo em dia: obtém
+novamente as cidades de cada UF, pula as que não mudaram (hash do
+conteúdo) e aplica apenas inserções, renomeações e exclusões.
 
 Será usado pela cli db. Verificar docstring de simovel.cli.db.
 """
 
 __author__ = 'Vanduir Santana Medeiros'
-__version__ = '0.5'
+__version__ = '0.10'
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from simovel.db.models.simulacao import EstadoModel, CidadeModel
+from simovel.config.geral import CatalogoCidades as CfgCatalogoCidades
+from simovel.db.models.simulacao import (
+    EstadoModel,
+    CidadeModel,
+    CatalogoCidadesModel,
+    PessoaModel
+)
+from simovel.db.indice_cidades import obter_indice_cidades
+from simovel.sims.base import UFS
 from simovel.sims.caixa import SimuladorCaixa
+from simovel.sims.caixa_sessao import SessaoCaixa
+
+
+def hash_cidades(cidades: list[dict]) -> str:
+    """
+    Hash do conteúdo da lista de cidades de uma UF, independente da
+    ordem em que a Caixa retornou.
+    """
+    linhas = sorted(
+        f"{int(c['cod_caixa'])}|{c['nome']}|{c['nome_sem_aspa']}"
+        for c in cidades
+    )
+    return hashlib.sha256('\n'.join(linhas).encode('utf-8')).hexdigest()
+
+
+def obter_cidades_caixa(uf: str, sessao: SessaoCaixa) -> list[dict]:
+    """
+    Obtém as cidades da UF no simulador da Caixa usando a sessão
+    passada (a sessão não é devolvida ao pool).
+
+    Raises:
+        Exception: quando não retornou cidades.
+    """
+    cidades: list[dict] | None = SimuladorCaixa(sessao=sessao).obter_cidades(uf)
+    if not cidades:
+        raise Exception(f'Não encontrou cidades no endpoint Caixa pra {uf}!')
+
+    for cidade in cidades:
+        cidade['cod_caixa'] = int(cidade['cod_caixa'])
+
+    return cidades
+
+
+def _obter_cidades_paralelo(
+    ufs: list[str],
+    trabalhadores: int
+) -> Iterator[tuple[str, list[dict] | None, Exception | None]]:
+    """
+    Obtém as cidades das UFs em paralelo, todas com a mesma sessão
+    Caixa, e entrega (uf, cidades, erro) à medida que ficam prontas.
+    """
+    # uma única sessão (página inicial, cookies) pra todas as UFs
+    sessao = SessaoCaixa.criar()
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(trabalhadores, len(ufs))),
+        thread_name_prefix='catalogo-cidades'
+    ) as executor:
+        futures = {
+            executor.submit(obter_cidades_caixa, uf, sessao): uf
+            for uf in ufs
+        }
+        for future in as_completed(futures):
+            uf = futures[future]
+            try:
+                yield uf, future.result(), None
+            except Exception as erro:
+                yield uf, None, erro
+
+
+def _gravar_cidades_uf(
+    session: Session,
+    uf: str,
+    cidades: list[dict]
+) -> int:
+    """
+    Insere as cidades da UF que ainda não existem e marca a UF como
+    concluída, tudo na mesma transação.
+
+    Returns:
+        int: quantidade de cidades inseridas.
+    """
+    estado_id: int = EstadoModel.obter_id_por_uf(session, uf)
+    existentes: set[int] = CidadeModel.obter_cods_caixa_por_uf(session, uf)
+    novas: list[dict] = [
+        dict(cidade, estado_id=estado_id)
+        for cidade in cidades
+        if cidade['cod_caixa'] not in existentes
+    ]
+
+    try:
+        CidadeModel.inserir_cidades(session, novas, commit=False)
+        CatalogoCidadesModel.registrar(
+            session,
+            estado_id,
+            CatalogoCidadesModel.CONCLUIDO,
+            hash_cidades(cidades),
+            len(cidades)
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    obter_indice_cidades().invalidar(uf)
+    return len(novas)
+
+
+def _registrar_erro_uf(session: Session, uf: str, erro: Exception) -> None:
+    CatalogoCidadesModel.registrar(
+        session,
+        EstadoModel.obter_id_por_uf(session, uf),
+        CatalogoCidadesModel.ERRO,
+        erro=str(erro)
+    )
+    session.commit()
+
+
+def obter_ufs_pendentes(session: Session, ufs: tuple[str, ...]) -> list[str]:
+    """
+    UFs que ainda não foram concluídas. Bancos antigos, populados antes
+    do catálogo existir, são considerados concluídos se já tiverem
+    cidades.
+    """
+    pendentes: list[str] = []
+    for uf in ufs:
+        catalogo = CatalogoCidadesModel.obter_por_uf(session, uf)
+        if catalogo is not None:
+            if catalogo.status != CatalogoCidadesModel.CONCLUIDO:
+                pendentes.append(uf)
+        elif CidadeModel.contar_pof_uf(session, uf) == 0:
+            pendentes.append(uf)
+
+    return pendentes
 
 
-CIDADES_UF = ('GO', 'MG', 'SP', 'RS', 'SC', 'ES', 'MT', 'MS', 'TO', 'PR')
+def bootstrap_db(
+    session: Session,
+    ufs: tuple[str, ...] = UFS,
+    trabalhadores: int = CfgCatalogoCidades.TRABALHADORES
+) -> dict[str, str]:
+    """
+    Popula estados e as cidades das UFs pendentes.
 
+    Args:
+        session (Session): sessão do banco de dados.
+        ufs (tuple[str, ...], optional): UFs a popular. Defaults to
+          todas.
+        trabalhadores (int, optional): requisições simultâneas à Caixa.
 
-def bootstrap_db(session: Session):
+    Returns:
+        dict[str, str]: situação final de cada UF processada.
+    """
     # separar responsabilidades: banco será criado por outro comando
     # em produção rodar com comando alembic (estudar mais a respeito)
-    # cria banco de dados
-    #db.create_all()
 
     # popular tabela de estados se estiver vazia
-    #if session.query(EstadoModel).count() == 0: # poderia tb ser dessa forma
     if EstadoModel.contar(session) == 0:
         print(
             'Não encontrou registros de estados, criando a partir do csv...'
@@ -33,27 +188,180 @@ def bootstrap_db(session: Session):
         EstadoModel.inserir_estados(session)
     else:
         print('Já existem registros de UFs em EstadoModel!')
-    
-    # popular cidades com dados obtidos do simulador da caixa
-    # por enquanto popula apenas cidades para UFs em CIDADES_UF
-    for UF in CIDADES_UF:
-        if CidadeModel.contar_pof_uf(session, UF) > 0:
-            print(f"Já existem cidades pra UF: {UF}.")
-            continue
 
-        print(f"Não existem cidades pra UF: {UF}, obter da Caixa...")
-        estado_id: int = EstadoModel.obter_id_por_uf(session, UF)
-        sim = SimuladorCaixa()
-        cidades: list[dict] | None = sim.obter_cidades(UF)
+    ufs = tuple(uf.upper() for uf in ufs)
+    pendentes: list[str] = obter_ufs_pendentes(session, ufs)
+    situacao: dict[str, str] = {
+        uf: CatalogoCidadesModel.CONCLUIDO for uf in ufs if uf not in pendentes
+    }
+    for uf in situacao:
+        print(f'Já existem cidades pra UF: {uf}.')
+
+    if pendentes:
+        print(f'Obtendo cidades da Caixa pras UFs: {", ".join(pendentes)}...')
+        # gravação no banco apenas nessa thread, uma UF por vez
+        for uf, cidades, erro in _obter_cidades_paralelo(
+            pendentes, trabalhadores
+        ):
+            try:
+                if erro is not None:
+                    raise erro
+                inseridas = _gravar_cidades_uf(session, uf, cidades)
+            except Exception as erro:
+                print(f'Erro ao obter/gravar cidades da UF {uf}: {erro}')
+                _registrar_erro_uf(session, uf, erro)
+                situacao[uf] = CatalogoCidadesModel.ERRO
+                continue
+
+            print(f'{uf}: {inseridas} cidades inseridas.')
+            situacao[uf] = CatalogoCidadesModel.CONCLUIDO
+
+    # índice FTS5 (trigramas) usado por CidadeModel.buscar_fuzzy
+    print('Criando índice de busca de cidades...')
+    CidadeModel.criar_indice_busca(session)
+
+    erros = [uf for uf, s in situacao.items() if s != CatalogoCidadesModel.CONCLUIDO]
+    if erros:
+        print(
+            f'UFs com erro: {", ".join(erros)}. Rode o bootstrap novamente '
+            'pra continuar de onde parou.'
+        )
+
+    return situacao
+
+
+class AlteracoesCidadesUF:
+    """Resumo da atualização das cidades de uma UF."""
+    def __init__(self, uf: str) -> None:
+        self.uf = uf
+        self.sem_alteracao = False
+        self.inseridas = 0
+        self.renomeadas = 0
+        self.excluidas = 0
+        # cidades que sumiram da Caixa mas estão ligadas a alguma pessoa
+        self.mantidas = 0
+        self.erro = ''
+
+    def __repr__(self) -> str:
+        if self.erro:
+            return f'<{self.uf}: erro {self.erro}>'
+        if self.sem_alteracao:
+            return f'<{self.uf}: sem alteração>'
+        return (
+            f'<{self.uf}: {self.inseridas} inseridas, {self.renomeadas} '
+            f'renomeadas, {self.excluidas} excluídas, {self.mantidas} '
+            'mantidas>'
+        )
+
+
+def _aplicar_alteracoes_uf(
+    session: Session,
+    uf: str,
+    cidades: list[dict]
+) -> AlteracoesCidadesUF:
+    """
+    Compara as cidades da Caixa com as do banco pelo cod_caixa e aplica
+    as diferenças em uma única transação.
+    """
+    alteracoes = AlteracoesCidadesUF(uf)
+    hash_conteudo = hash_cidades(cidades)
+    catalogo = CatalogoCidadesModel.obter_por_uf(session, uf)
+    if (catalogo is not None
+        and catalogo.status == CatalogoCidadesModel.CONCLUIDO
+        and catalogo.hash_conteudo == hash_conteudo):
+        alteracoes.sem_alteracao = True
+        return alteracoes
+
+    estado_id: int = EstadoModel.obter_id_por_uf(session, uf)
+    remotas: dict[int, dict] = {c['cod_caixa']: c for c in cidades}
+    locais: dict[int, CidadeModel] = {
+        c.cod_caixa: c for c in CidadeModel.obter_cidades_por_uf(session, uf)
+    }
+
+    try:
+        novas: list[dict] = [
+            dict(c, estado_id=estado_id)
+            for cod, c in remotas.items() if cod not in locais
+        ]
+        CidadeModel.inserir_cidades(session, novas, commit=False)
+        alteracoes.inseridas = len(novas)
+
+        for cod, cidade in locais.items():
+            remota = remotas.get(cod)
+            if remota is not None:
+                if (cidade.nome != remota['nome']
+                    or cidade.nome_sem_aspa != remota['nome_sem_aspa']):
+                    cidade.nome = remota['nome']
+                    cidade.nome_sem_aspa = remota['nome_sem_aspa']
+                    alteracoes.renomeadas += 1
+                continue
+
+            # não exclui cidade referenciada por pessoa (FK)
+            referenciada = session.scalar(
+                select(PessoaModel.id)
+                .where(PessoaModel.cidade_id == cidade.id)
+                .limit(1)
+            )
+            if referenciada is not None:
+                alteracoes.mantidas += 1
+                continue
+
+            session.delete(cidade)
+            alteracoes.excluidas += 1
+
+        # o catálogo muda na mesma transação: é por ele que os índices
+        # de cidades dos workers da API (outros processos) percebem as
+        # renomeações, ver simovel.db.indice_cidades
+        CatalogoCidadesModel.registrar(
+            session,
+            estado_id,
+            CatalogoCidadesModel.CONCLUIDO,
+            hash_conteudo,
+            len(cidades)
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    # índice deste processo
+    obter_indice_cidades().invalidar(uf)
+    CidadeModel.criar_indice_busca(session, uf)
+    return alteracoes
+
 
-        if not cidades:
-            raise Exception('Não encontrou cidades no endpoint Caixa!')
+def atualizar_cidades(
+    session: Session,
+    ufs: tuple[str, ...] = UFS,
+    trabalhadores: int = CfgCatalogoCidades.TRABALHADORES
+) -> dict[str, AlteracoesCidadesUF]:
+    """
+    Atualiza o catálogo de cidades com a lista atual da Caixa. UFs cujo
+    conteúdo não mudou desde a última atualização não são alteradas.
 
-        print(f'Inserindo cidades pra UF -> {UF} no banco de dados')
-        for cidade in cidades:
-            cidade['estado_id'] = estado_id
+    Args:
+        session (Session): sessão do banco de dados.
+        ufs (tuple[str, ...], optional): UFs a atualizar. Defaults to
+          todas.
+        trabalhadores (int, optional): requisições simultâneas à Caixa.
 
-        CidadeModel.inserir_cidades(session, cidades)
+    Returns:
+        dict[str, AlteracoesCidadesUF]: o que foi alterado em cada UF.
+    """
+    ufs = tuple(uf.upper() for uf in ufs)
+    resultado: dict[str, AlteracoesCidadesUF] = {}
 
+    for uf, cidades, erro in _obter_cidades_paralelo(list(ufs), trabalhadores):
+        try:
+            if erro is not None:
+                raise erro
+            alteracoes = _aplicar_alteracoes_uf(session, uf, cidades)
+        except Exception as erro:
+            print(f'Erro ao atualizar cidades da UF {uf}: {erro}')
+            alteracoes = AlteracoesCidadesUF(uf)
+            alteracoes.erro = str(erro)
 
+        print(alteracoes)
+        resultado[uf] = alteracoes
 
+    return resultado
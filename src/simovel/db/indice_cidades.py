@@ -0,0 +1,242 @@
+"""
+Índice de busca de cidades em memória.
+
+O índice NGram de cada UF é montado uma única vez por processo a
+partir de CidadeModel e reaproveitado em todas as buscas do chatbot,
+em vez de recarregar as cidades do banco e montar um NGram novo a cada
+pesquisa (SimuladorCaixa.procurar2).
+
+O índice de uma UF é remontado quando a tabela muda: alterações feitas
+pelo ORM e chamadas a invalidar() marcam a UF na hora no próprio
+processo. Nos outros processos (workers da API) a mudança é detectada
+comparando a assinatura da UF no máximo a cada
+Parametros.INDICE_CIDADES_INTERVALO_VERIFICACAO segundos: total de
+cidades, maior id e maior cod_caixa, que pegam inserções e exclusões, e
+o hash_conteudo e atualizado_em de CatalogoCidadesModel, que pegam
+renomeações. O bootstrap e o atualizar-cidades registram o catálogo na
+mesma transação das cidades; quem alterar cidades por fora deve chamar
+CatalogoCidadesModel.registrar também, senão uma renomeação só aparece
+depois de reiniciar os workers.
+"""
+
+__author__ = 'Vanduir Santana Medeiros'
+__version__ = '0.3'
+
+import bisect
+import threading
+import time
+
+import ngram
+from sqlalchemy import event, func, select
+
+from simovel.config.geral import Parametros
+from simovel.db.models.simulacao import (
+    CatalogoCidadesModel,
+    CidadeModel,
+    EstadoModel
+)
+from simovel.db.types import SessionType
+from simovel.log import obter_logger
+from simovel.util import remover_acentos
+
+
+log = obter_logger(__name__)
+
+
+def normalizar(s: str) -> str:
+    return remover_acentos(s.strip().upper())
+
+
+class IndiceUF:
+    """
+    Índice das cidades de uma única UF.
+    """
+    def __init__(self, uf: str, cidades: list[tuple], assinatura: tuple):
+        self.uf = uf
+        self.assinatura = assinatura
+        self.verificado_em = time.monotonic()
+        # tuplas (id, cod_caixa, nome, nome_sem_aspa) como em
+        # CidadeModel.tupla
+        self._ngram = ngram.NGram(cidades, key=lambda c: normalizar(c[2]))
+        self._por_nome: dict[str, tuple] = {
+            normalizar(c[2]): c for c in cidades
+        }
+        # nomes ordenados pra busca por prefixo com bisect
+        self._nomes = sorted(self._por_nome)
+
+    @property
+    def total(self) -> int:
+        return len(self._por_nome)
+
+    @staticmethod
+    def _pra_dict(cidade: tuple, rank: float) -> dict:
+        id, cod_caixa, nome, nome_sem_aspa = cidade
+        return {
+            'id': id,
+            'cod_caixa': cod_caixa,
+            'nome': nome,
+            'nome_sem_aspa': nome_sem_aspa,
+            'rank': rank
+        }
+
+    def _prefixo(self, q: str, max_res: int) -> list[str]:
+        nomes: list[str] = []
+        i = bisect.bisect_left(self._nomes, q)
+        while i < len(self._nomes) and len(nomes) < max_res:
+            if not self._nomes[i].startswith(q):
+                break
+            nomes.append(self._nomes[i])
+            i += 1
+
+        return nomes
+
+    def procurar(self, q: str, max_res: int = 10) -> list[dict]:
+        """
+        Mesmo retorno de SimuladorCaixa.procurar2: se o nome for
+        idêntico retorna apenas a cidade com rank 1.0, senão as cidades
+        mais parecidas (trigramas), incluindo as que começam com q.
+        """
+        q = normalizar(q)
+        if q in self._por_nome:
+            return [self._pra_dict(self._por_nome[q], 1.0)]
+
+        ranks: dict[str, float] = {}
+        for cidade, rank in self._ngram.search(query=q, threshold=0.1):
+            ranks[normalizar(cidade[2])] = rank
+            if len(ranks) == max_res:
+                break
+
+        for nome in self._prefixo(q, max_res):
+            if nome not in ranks:
+                ranks[nome] = self._ngram.compare(q, nome)
+
+        melhores = sorted(ranks.items(), key=lambda t: t[1], reverse=True)
+        return [
+            self._pra_dict(self._por_nome[nome], rank)
+            for nome, rank in melhores[:max_res]
+        ]
+
+
+class IndiceCidades:
+    """
+    Índices de todas as UFs do processo. Usar obter_indice_cidades().
+    """
+    def __init__(
+        self,
+        intervalo_verificacao: float =
+            Parametros.INDICE_CIDADES_INTERVALO_VERIFICACAO
+    ) -> None:
+        self.intervalo_verificacao = intervalo_verificacao
+        self._indices: dict[str, IndiceUF] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _obter_assinatura(session: SessionType, uf: str) -> tuple:
+        stmt = (
+            select(
+                func.count(CidadeModel.id),
+                func.max(CidadeModel.id),
+                func.max(CidadeModel.cod_caixa)
+            )
+            .join(EstadoModel, CidadeModel.estado_id == EstadoModel.id)
+            .where(EstadoModel.uf == uf)
+        )
+        catalogo = session.execute(
+            select(
+                CatalogoCidadesModel.hash_conteudo,
+                CatalogoCidadesModel.atualizado_em
+            )
+            .join(
+                EstadoModel, CatalogoCidadesModel.estado_id == EstadoModel.id
+            )
+            .where(EstadoModel.uf == uf)
+        ).first()
+        return (*session.execute(stmt).one(), *(catalogo or (None, None)))
+
+    def _montar(self, session: SessionType, uf: str) -> IndiceUF:
+        assinatura = self._obter_assinatura(session, uf)
+        cidades = [
+            c.tupla() for c in CidadeModel.obter_cidades_por_uf(session, uf)
+        ]
+        return IndiceUF(uf, cidades, assinatura)
+
+    def _atualizado(self, session: SessionType, indice: IndiceUF) -> bool:
+        if time.monotonic() - indice.verificado_em < self.intervalo_verificacao:
+            return True
+
+        if self._obter_assinatura(session, indice.uf) != indice.assinatura:
+            return False
+
+        indice.verificado_em = time.monotonic()
+        return True
+
+    def obter(self, session: SessionType, uf: str) -> IndiceUF:
+        """
+        Retorna o índice da UF, montando ou remontando se necessário.
+        """
+        uf = uf.upper()
+        indice = self._indices.get(uf)
+        if indice is not None and self._atualizado(session, indice):
+            return indice
+
+        with self._lock:
+            indice = self._indices.get(uf)
+            if indice is None or not self._atualizado(session, indice):
+                indice = self._montar(session, uf)
+                self._indices[uf] = indice
+
+        return indice
+
+    def procurar(
+        self,
+        session: SessionType,
+        uf: str,
+        q: str,
+        max_res: int = 10
+    ) -> list[dict]:
+        """
+        Procura cidades da UF por similaridade, ver IndiceUF.procurar.
+        """
+        if not uf:
+            log.warning('É preciso definir UF pra procurar cidades')
+            return []
+
+        return self.obter(session, uf).procurar(q, max_res)
+
+    def invalidar(self, uf: str | None = None) -> None:
+        """
+        Descarta o índice da UF (ou de todas) pra ser remontado na
+        próxima busca. Chamar após alterar cidades em massa.
+        """
+        with self._lock:
+            if uf is None:
+                self._indices.clear()
+            else:
+                self._indices.pop(uf.upper(), None)
+
+
+_indice: IndiceCidades | None = None
+_lock_indice = threading.Lock()
+
+
+def obter_indice_cidades() -> IndiceCidades:
+    """
+    Retorna o índice de cidades do processo.
+    """
+    global _indice
+
+    with _lock_indice:
+        if _indice is None:
+            _indice = IndiceCidades()
+
+        return _indice
+
+
+@event.listens_for(CidadeModel, 'after_insert')
+@event.listens_for(CidadeModel, 'after_update')
+@event.listens_for(CidadeModel, 'after_delete')
+def _cidade_alterada(mapper, connection, target: CidadeModel) -> None:
+    # alterações pelo ORM, inserções em massa não disparam esse evento
+    # e são detectadas pela assinatura ou por invalidar()
+    if _indice is not None:
+        _indice.invalidar()
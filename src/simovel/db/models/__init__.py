@@ -4,6 +4,7 @@ from simovel.db.models.simulacao import (
     PessoaModel,
     EstadoModel,
     CidadeModel,
+    CatalogoCidadesModel,
     SimulacaoModel,
 )
 
@@ -13,6 +14,7 @@ __all__ = [
     "PessoaModel",
     "EstadoModel",
     "CidadeModel",
+    "CatalogoCidadesModel",
     "SimulacaoModel",
     "Multi360Model",
 ]
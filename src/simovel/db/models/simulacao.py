@@ -5,7 +5,7 @@ from __future__ import annotations
 from simovel.exceptions import ErroResultadoCampoNaoRetornado
 
 __author__ = 'Vanduir Santana Medeiros'
-__version__ = '0.11'
+__version__ = '0.13'
 
 from datetime import date, datetime
 from decimal import Decimal
@@ -23,19 +23,25 @@ from sqlalchemy import (
     ForeignKey,
     desc,
     select,
-    func
+    func,
+    text
 )
+from sqlalchemy.exc import OperationalError
+import ngram
 
 from simovel.config.geral import Parametros
-from simovel.util import csv_pra_lista_de_dic
+from simovel.util import csv_pra_lista_de_dic, remover_acentos
 from simovel.db.base import Base
 from simovel.db.types import SessionType
+from simovel.log import obter_logger
 
 if TYPE_CHECKING:
     from simovel.db.models.integracao import Multi360Model
 
 UFS_CSV = Parametros.UFS_CSV
 
+log = obter_logger(__name__)
+
 
 class BaseModel(Base):
     __abstract__ = True
@@ -352,8 +358,84 @@ class EstadoModel(BaseModel):
     #         return [cidade.tupla() for cidade in estado_model.cidades]
 
 
+class CatalogoCidadesModel(BaseModel):
+    """Situação do catálogo de cidades de cada UF: usado pra retomar o
+    bootstrap de onde parou e pra pular UFs sem alterações na
+    atualização das cidades.
+    """
+    __tablename__ = 'catalogo_cidades'
+
+    PENDENTE = 'pendente'
+    CONCLUIDO = 'concluido'
+    ERRO = 'erro'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    estado_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey('estado.id'),
+        unique=True,
+        nullable=False
+    )
+    status: Mapped[str] = mapped_column(String(10), nullable=False)
+    # sha256 da lista de cidades retornada pela Caixa
+    hash_conteudo: Mapped[Optional[str]] = mapped_column(String(64))
+    total_cidades: Mapped[int] = mapped_column(Integer, default=0)
+    erro: Mapped[Optional[str]] = mapped_column(String(250))
+    atualizado_em: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.now
+    )
+
+    estado: Mapped["EstadoModel"] = relationship('EstadoModel')
+
+    @classmethod
+    def obter_por_uf(
+        cls,
+        session: SessionType,
+        uf: str
+    ) -> Self | None:
+        stmt = (
+            select(cls)
+            .join(EstadoModel, cls.estado_id == EstadoModel.id)
+            .where(EstadoModel.uf == uf.upper())
+        )
+        return session.scalars(stmt).first()
+
+    @classmethod
+    def registrar(
+        cls,
+        session: SessionType,
+        estado_id: int,
+        status: str,
+        hash_conteudo: str | None = None,
+        total_cidades: int = 0,
+        erro: str = ''
+    ) -> Self:
+        """Cria ou atualiza a situação da UF. Não faz commit, assim o
+        registro entra na mesma transação das cidades.
+        """
+        catalogo = session.scalars(
+            select(cls).where(cls.estado_id == estado_id)
+        ).first()
+        if catalogo is None:
+            catalogo = cls(estado_id=estado_id)
+            session.add(catalogo)
+
+        catalogo.status = status
+        catalogo.total_cidades = total_cidades
+        catalogo.erro = erro[:250] if erro else None
+        catalogo.atualizado_em = datetime.now()
+        if hash_conteudo is not None:
+            catalogo.hash_conteudo = hash_conteudo
+
+        return catalogo
+
+
 class CidadeModel(BaseModel):
     __tablename__ = 'cidade'
+    # tabela virtual FTS5 com o nome sem acentos, rowid = cidade.id
+    TABELA_BUSCA = 'cidade_busca'
+    TAM_TRIGRAMA = 3
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     cod_caixa: Mapped[int] = mapped_column(Integer, unique=True)
@@ -420,7 +502,7 @@ class CidadeModel(BaseModel):
         # nos novos métodos usar o padrão do sqlalchemy 2.0
         uf = uf.upper()
         if not uf:
-            print('É preciso definir UF antes de chamar contar_por_uf()')
+            log.warning('É preciso definir UF antes de chamar contar_por_uf()')
             return 0
 
         stmt = (
@@ -448,9 +530,12 @@ class CidadeModel(BaseModel):
     def inserir_cidades(
         cls,
         session: SessionType,
-        lista_cidades: list[dict]
+        lista_cidades: list[dict],
+        commit: bool = True
     ) -> bool:
-        """Insere cidades a partir de uma lista de dicionários.
+        """Insere cidades a partir de uma lista de dicionários. Com
+        commit False a inserção fica na transação aberta, que deve ser
+        confirmada por quem chamou.
         """
         if not lista_cidades:
             return False
@@ -459,10 +544,21 @@ class CidadeModel(BaseModel):
             cls.__mapper__,
             lista_cidades
         )
-        session.commit()
+        if commit:
+            session.commit()
 
         return True
 
+    @classmethod
+    def obter_cods_caixa_por_uf(cls, session: SessionType, uf: str) -> set[int]:
+        """Códigos Caixa de todas as cidades já cadastradas na UF."""
+        stmt = (
+            select(cls.cod_caixa)
+            .join(EstadoModel, cls.estado_id == EstadoModel.id)
+            .where(EstadoModel.uf == uf.upper())
+        )
+        return set(session.scalars(stmt))
+
     @staticmethod
     def obter_cidades_por_uf(
         session: SessionType,
@@ -477,9 +573,9 @@ class CidadeModel(BaseModel):
         uf = uf.upper()
 
         if not uf:
-            print(
+            log.warning(
                 'Não é possível obter cidades por UF se a UF não for '
-                'passada como parâmetro!'
+                'passada como parâmetro'
             )
             return []
 
@@ -496,4 +592,140 @@ class CidadeModel(BaseModel):
 
         return cidades
 
+    @classmethod
+    def criar_indice_busca(
+        cls,
+        session: SessionType,
+        uf: str | None = None
+    ) -> bool:
+        """
+        Cria (se não existir) e popula a tabela FTS5 usada por
+        buscar_fuzzy. Se a UF for passada reindexa apenas as cidades
+        dela, senão todas.
+
+        Returns:
+            bool: False quando o SQLite não tem suporte a FTS5.
+        """
+        try:
+            session.execute(text(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {cls.TABELA_BUSCA} '
+                "USING fts5(nome, uf UNINDEXED, tokenize='trigram')"
+            ))
+        except OperationalError as erro:
+            log.warning(
+                'Não foi possível criar índice de busca FTS5', erro=str(erro)
+            )
+            session.rollback()
+            return False
+
+        stmt = (
+            select(cls.id, cls.nome, EstadoModel.uf)
+            .join(EstadoModel, cls.estado_id == EstadoModel.id)
+        )
+        if uf:
+            uf = uf.upper()
+            stmt = stmt.where(EstadoModel.uf == uf)
+            session.execute(
+                text(f'DELETE FROM {cls.TABELA_BUSCA} WHERE uf = :uf'),
+                {'uf': uf}
+            )
+        else:
+            session.execute(text(f'DELETE FROM {cls.TABELA_BUSCA}'))
+
+        linhas: list[dict] = [
+            {'id': id, 'nome': remover_acentos(nome), 'uf': uf_cidade}
+            for id, nome, uf_cidade in session.execute(stmt)
+        ]
+        if linhas:
+            session.execute(
+                text(
+                    f'INSERT INTO {cls.TABELA_BUSCA} (rowid, nome, uf) '
+                    'VALUES (:id, :nome, :uf)'
+                ),
+                linhas
+            )
+        session.commit()
+
+        return True
+
+    @classmethod
+    def _trigramas_fts(cls, q: str) -> str:
+        """Expressão MATCH com os trigramas de q unidos por OR."""
+        trigramas = {
+            q[i:i + cls.TAM_TRIGRAMA]
+            for i in range(len(q) - cls.TAM_TRIGRAMA + 1)
+        }
+        return ' OR '.join(
+            '"{}"'.format(t.replace('"', '""')) for t in sorted(trigramas)
+        )
+
+    @classmethod
+    def buscar_fuzzy(
+        cls,
+        session: SessionType,
+        uf: str,
+        q: str,
+        limit: int = 10
+    ) -> list[dict]:
+        """
+        Busca cidades da UF por similaridade (trigramas) sem acentos,
+        direto no banco, sem carregar todas as cidades da UF. Quando a
+        tabela FTS5 não existe ou q é curta demais usa LIKE.
+
+        Returns:
+            list[dict]: mesmo formato de SimuladorCaixa.procurar2, se o
+              nome for idêntico retorna apenas um item com rank 1.0.
+        """
+        uf = uf.upper()
+        q = remover_acentos(q.strip())
+        if not uf or not q:
+            return []
 
+        cidades: list[CidadeModel] = []
+        if len(q) >= cls.TAM_TRIGRAMA:
+            try:
+                ids: list[int] = list(session.scalars(
+                    text(
+                        f'SELECT rowid FROM {cls.TABELA_BUSCA} '
+                        f'WHERE {cls.TABELA_BUSCA} MATCH :q AND uf = :uf '
+                        'ORDER BY rank LIMIT :limit'
+                    ),
+                    {'q': cls._trigramas_fts(q), 'uf': uf, 'limit': limit * 5}
+                ))
+                cidades = list(
+                    session.scalars(select(cls).where(cls.id.in_(ids)))
+                ) if ids else []
+            except OperationalError:
+                session.rollback()
+                cidades = cls._buscar_like(session, uf, q, limit)
+        else:
+            cidades = cls._buscar_like(session, uf, q, limit)
+
+        resultado: list[dict] = []
+        for cidade in cidades:
+            d = cidade.to_dict()
+            d['rank'] = ngram.NGram.compare(q, remover_acentos(cidade.nome))
+            resultado.append(d)
+
+        resultado.sort(key=lambda d: d['rank'], reverse=True)
+        if resultado and resultado[0]['rank'] == 1.0:
+            return resultado[:1]
+
+        return resultado[:limit]
+
+    @classmethod
+    def _buscar_like(
+        cls,
+        session: SessionType,
+        uf: str,
+        q: str,
+        limit: int
+    ) -> list[CidadeModel]:
+        stmt = (
+            select(cls)
+            .join(EstadoModel, cls.estado_id == EstadoModel.id)
+            .where(EstadoModel.uf == uf)
+            .where(cls.nome_sem_aspa.like(f'%{q}%'))
+            .limit(limit)
+        )
+        return list(session.scalars(stmt))
@@ -10,6 +10,9 @@ from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 
 from simovel.config.geral import Parametros
+from simovel import rastreamento
+from simovel.log import obter_logger
+from simovel.metricas import instrumentar_engine
 
 
 engine = create_engine(
@@ -18,6 +21,13 @@ engine = create_engine(
     future=True
 )
 
+# duração das consultas nas métricas (simovel.metricas)
+instrumentar_engine(engine)
+# e um trecho por consulta no rastro atual (simovel.rastreamento)
+rastreamento.instrumentar_engine(engine)
+
+log = obter_logger(__name__)
+
 SessionLocal = sessionmaker(
     bind=engine,
     class_=Session,
@@ -26,5 +36,5 @@ SessionLocal = sessionmaker(
 
 @event.listens_for(engine, "connect")
 def enable_fk(dbapi_connection, connection_record):
-    print('Habilitando foreign_keys para SQLite via Sessão Local...')
+    log.debug('Habilitando foreign_keys para SQLite via Sessão Local')
     dbapi_connection.execute("PRAGMA foreign_keys=ON")
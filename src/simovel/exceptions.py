@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-__version__ = '0.9'
+__version__ = '0.12'
 __author__ = 'Vanduir Santana Medeiros'
 
 
@@ -197,3 +197,43 @@ class ErroEmail(Erro):
 
 class ErroResultadoSimulacao(Erro):
     """Ocorre quando não consegue obter o resultado da simulação."""
+
+
+class ErroTempoEsgotadoSimulacao(Erro):
+    """Simulação de um banco não terminou dentro do tempo limite
+    configurado pra ele (ver simular_todos).
+    """
+    pass
+
+
+class ErroNavegadorIndisponivel(Erro):
+    """Nenhum navegador do pool ficou livre dentro do tempo limite
+    (ver simovel.sims.navegador).
+    """
+    pass
+
+
+class ErroBancoNaoRegistrado(Erro):
+    """Banco sem fábrica de simulação registrada (ver
+    simovel.sims.registro).
+    """
+    pass
+
+
+class ErroHostIndisponivel(Erro):
+    """Chamada ao host do banco recusada antes de ser feita (ver
+    simovel.sims.disjuntor).
+    """
+    pass
+
+
+class ErroCircuitoAberto(ErroHostIndisponivel):
+    """Disjuntor do host aberto depois de muitas falhas seguidas."""
+    pass
+
+
+class ErroLimiteConcorrencia(ErroHostIndisponivel):
+    """Nenhuma vaga no limite de chamadas simultâneas ao host dentro do
+    tempo de espera.
+    """
+    pass
@@ -0,0 +1,242 @@
+"""
+Logs dos simuladores e da API.
+
+Cada módulo tem o seu logger, filho de simovel (ou rest_api):
+
+    log = obter_logger(__name__)
+
+    log.warning('Cidade não encontrada', uf=uf, cidade=nome)
+    log.debug('Cookie %s recebido', nome)
+    log.despejo('Resposta URL4', html)
+
+Os argumentos nomeados viram campos estruturados do registro (key=valor
+no formato texto, chaves no json). Junto vão o trace_id e o span_id do
+trecho atual quando o rastreamento está habilitado (simovel.rastreamento).
+
+Quem loga só formata a mensagem e a põe numa fila; a escrita (stderr ou
+Log.ARQUIVO) é feita numa thread própria. Com a fila cheia o registro é
+descartado, logar nunca trava uma simulação. Mensagens repetidas (mesmo
+logger, nível e linha) passam no máximo Log.LIMITE_REPETICOES vezes por
+Log.JANELA_REPETICOES segundos, a primeira depois da janela conta as
+suprimidas.
+
+Mensagens abaixo de Log.NIVEL não são nem formatadas, e os despejos de
+valores inteiros (html, cookies) só saem com Log.DESPEJOS.
+"""
+
+__author__ = 'Vanduir Santana Medeiros'
+__version__ = '0.1'
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Any
+
+from simovel.config.geral import Log as CfgLog
+
+
+LOGGERS_RAIZ = ('simovel', 'rest_api')
+
+# argumentos nomeados do logging, os outros viram campos
+_ARGUMENTOS_LOGGING = frozenset(
+    ('exc_info', 'stack_info', 'stacklevel', 'extra')
+)
+
+
+class Logger(logging.LoggerAdapter):
+    """Logger que aceita campos estruturados como argumentos nomeados."""
+    def process(self, msg: Any, kwargs: Any) -> tuple[Any, Any]:
+        campos = {
+            k: kwargs.pop(k) for k in list(kwargs)
+            if k not in _ARGUMENTOS_LOGGING
+        }
+        if campos:
+            kwargs['extra'] = {**kwargs.get('extra', {}), 'campos': campos}
+        return msg, kwargs
+
+    def despejo(self, msg: str, valor: Any, **campos: Any) -> None:
+        """
+        Valor inteiro (html, cookies, resposta) em DEBUG, só com
+        Log.DESPEJOS e cortado em Log.TAMANHO_DESPEJO caracteres.
+        """
+        if not CfgLog.DESPEJOS or not self.isEnabledFor(logging.DEBUG):
+            return
+
+        texto = str(valor)
+        if len(texto) > CfgLog.TAMANHO_DESPEJO:
+            texto = (
+                f'{texto[:CfgLog.TAMANHO_DESPEJO]}... '
+                f'({len(texto)} caracteres)'
+            )
+        self.debug('%s: %s', msg, texto, stacklevel=2, **campos)
+
+
+class FiltroRepeticao(logging.Filter):
+    """
+    Deixa passar limite registros iguais (logger, nível e linha) por
+    janela de segundos.
+    """
+    def __init__(
+        self,
+        limite: int = CfgLog.LIMITE_REPETICOES,
+        janela: float = CfgLog.JANELA_REPETICOES
+    ) -> None:
+        super().__init__()
+        self.limite = limite
+        self.janela = janela
+        # chave -> [início da janela, registros na janela]
+        self._contagens: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        chave = (record.name, record.levelno, record.pathname, record.lineno)
+        agora = time.monotonic()
+        with self._lock:
+            contagem = self._contagens.get(chave)
+            if contagem is None or agora - contagem[0] >= self.janela:
+                suprimidas = (
+                    max(contagem[1] - self.limite, 0) if contagem else 0
+                )
+                self._contagens[chave] = [agora, 1]
+            else:
+                contagem[1] += 1
+                if contagem[1] > self.limite:
+                    return False
+                suprimidas = 0
+
+        if suprimidas:
+            campos = getattr(record, 'campos', {})
+            record.campos = {**campos, 'suprimidas': suprimidas}
+        return True
+
+
+class FiltroRastro(logging.Filter):
+    """trace_id e span_id do trecho atual, lidos na thread de quem loga."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        from simovel import rastreamento
+
+        atual = rastreamento.trecho_atual() if rastreamento.habilitado() \
+            else None
+        if atual is not None and atual.amostrado:
+            record.trace_id = atual.trace_id
+            record.span_id = atual.span_id
+        return True
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (e conta) em vez de bloquear."""
+    def __init__(self, fila: queue.Queue) -> None:
+        super().__init__(fila)
+        self.descartados: int = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+class FormatadorTexto(logging.Formatter):
+    def __init__(self) -> None:
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        texto = super().format(record)
+        extras = {**getattr(record, 'campos', {})}
+        if getattr(record, 'trace_id', ''):
+            extras['trace_id'] = record.trace_id
+        if not extras:
+            return texto
+
+        primeira, _, resto = texto.partition('\n')
+        pares = ' '.join(f'{k}={v!r}' for k, v in extras.items())
+        return f'{primeira} {pares}' + (f'\n{resto}' if resto else '')
+
+
+class FormatadorJson(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados: dict[str, Any] = {
+            'ts': self.formatTime(record),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            **getattr(record, 'campos', {}),
+        }
+        if getattr(record, 'trace_id', ''):
+            dados['trace_id'] = record.trace_id
+            dados['span_id'] = record.span_id
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+_handler: HandlerFila | None = None
+_ouvinte: logging.handlers.QueueListener | None = None
+_lock = threading.RLock()
+
+
+def configurar(
+    nivel: str = CfgLog.NIVEL,
+    formato: str = CfgLog.FORMATO,
+    saida: logging.Handler | None = None
+) -> None:
+    """
+    (Re)configura os loggers simovel e rest_api: nível, formato e saída
+    (padrão Log.ARQUIVO ou stderr), escrita pela thread da fila.
+    """
+    global _handler, _ouvinte
+
+    with _lock:
+        if _ouvinte is not None:
+            _ouvinte.stop()
+        if saida is None:
+            saida = (
+                logging.FileHandler(CfgLog.ARQUIVO, encoding='utf-8')
+                if CfgLog.ARQUIVO else logging.StreamHandler(sys.stderr)
+            )
+        saida.setFormatter(
+            FormatadorJson() if formato == 'json' else FormatadorTexto()
+        )
+
+        handler = HandlerFila(queue.Queue(CfgLog.TAMANHO_FILA))
+        handler.addFilter(FiltroRepeticao())
+        handler.addFilter(FiltroRastro())
+        for nome in LOGGERS_RAIZ:
+            logger = logging.getLogger(nome)
+            if _handler is not None:
+                logger.removeHandler(_handler)
+            logger.addHandler(handler)
+            logger.setLevel(nivel)
+            # a aplicação (uvicorn, flask) tem os próprios handlers
+            logger.propagate = False
+
+        _handler = handler
+        _ouvinte = logging.handlers.QueueListener(
+            handler.queue, saida, respect_handler_level=True
+        )
+        _ouvinte.start()
+
+
+def encerrar() -> None:
+    """Escreve o que está na fila e para a thread."""
+    global _ouvinte
+
+    with _lock:
+        if _ouvinte is not None:
+            _ouvinte.stop()
+            _ouvinte = None
+
+
+def obter_logger(nome: str) -> Logger:
+    """Logger do módulo (__name__), configurando na primeira chamada."""
+    if _handler is None:
+        with _lock:
+            if _handler is None:
+                configurar()
+    return Logger(logging.getLogger(nome), {})
+
+
+atexit.register(encerrar)
@@ -0,0 +1,380 @@
+"""
+Métricas em processo (contadores e histogramas) exportadas no formato
+texto do Prometheus pelo endpoint /metrics da API.
+
+As métricas comuns já ficam definidas aqui:
+
+- CHAMADAS_REMOTAS: duração de cada chamada aos bancos por host e etapa
+  (URL0 a URL4 da Caixa, cada Interacao do Bradesco, POST da Loft,
+  simulação selenium do Itaú), medida em simovel.sims.disjuntor;
+- EXTRACOES e FALHAS_EXTRACAO: duração de cada etapa de extração e as
+  falhas por tipo de exceção (ErroRendaFamiliarInsuficente...);
+- CONSULTAS_DB: duração das consultas SQL (instrumentar_engine);
+- CACHE: acertos e falhas dos caches;
+- NOVAS_TENTATIVAS: novas tentativas das sessões HTTP.
+
+    with EXTRACOES.medir(banco='caixa', etapa='simulacao'):
+        ...
+    CACHE.inc(cache='resultados', origem='caixa', resultado='acerto')
+
+Com Metricas.HABILITADAS False (SIMOVEL_METRICAS=0) inc e observar
+retornam na primeira linha e medir devolve um contexto vazio
+compartilhado, sem ler o relógio. Coletores (registrar_coletor)
+acrescentam valores calculados só na exportação, como o estado dos
+disjuntores.
+"""
+
+__author__ = 'Vanduir Santana Medeiros'
+__version__ = '0.2'
+
+import functools
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Iterable
+
+from simovel.config.geral import Metricas as CfgMetricas
+from simovel.log import obter_logger
+
+
+# (nome, descrição, tipo, [(rótulos, valor)])
+Amostras = tuple[str, str, str, list[tuple[dict[str, str], float]]]
+
+log = obter_logger(__name__)
+
+_habilitadas: bool = CfgMetricas.HABILITADAS
+_NULO = nullcontext()
+
+
+def habilitadas() -> bool:
+    return _habilitadas
+
+
+def habilitar(habilitar: bool = True) -> None:
+    global _habilitadas
+    _habilitadas = habilitar
+
+
+class Metrica:
+    tipo: str = ''
+
+    def __init__(
+        self,
+        nome: str,
+        descricao: str,
+        rotulos: tuple[str, ...] = ()
+    ) -> None:
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self._valores: dict[tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._valores.clear()
+
+    def _chave(self, rotulos: dict[str, Any]) -> tuple[str, ...]:
+        return tuple(str(rotulos.get(nome, '')) for nome in self.rotulos)
+
+    def _rotulos(self, chave: tuple[str, ...]) -> dict[str, str]:
+        return dict(zip(self.rotulos, chave))
+
+    def amostras(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        raise NotImplementedError
+
+
+class Contador(Metrica):
+    tipo = 'counter'
+
+    def inc(self, valor: float = 1., **rotulos: Any) -> None:
+        if not _habilitadas:
+            return
+
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.) + valor
+
+    def valor(self, **rotulos: Any) -> float:
+        with self._lock:
+            return self._valores.get(self._chave(rotulos), 0.)
+
+    def amostras(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            valores = list(self._valores.items())
+        for chave, valor in valores:
+            yield self.nome, self._rotulos(chave), valor
+
+
+class Histograma(Metrica):
+    tipo = 'histogram'
+
+    def __init__(
+        self,
+        nome: str,
+        descricao: str,
+        rotulos: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = CfgMetricas.BUCKETS_CHAMADA
+    ) -> None:
+        super().__init__(nome, descricao, rotulos)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor: float, **rotulos: Any) -> None:
+        if not _habilitadas:
+            return
+
+        chave = self._chave(rotulos)
+        with self._lock:
+            # [contagem por bucket..., soma, total]
+            dados = self._valores.get(chave)
+            if dados is None:
+                dados = [0] * len(self.buckets) + [0., 0]
+                self._valores[chave] = dados
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    dados[i] += 1
+                    break
+            dados[-2] += valor
+            dados[-1] += 1
+
+    def medir(
+        self,
+        falhas: Contador | None = None,
+        **rotulos: Any
+    ) -> ContextManager:
+        """
+        Mede a duração do bloco. Com falhas, uma exceção que sai do bloco
+        também incrementa o contador com o rótulo erro (nome da classe).
+        """
+        if not _habilitadas:
+            return _NULO
+
+        return _Medicao(self, rotulos, falhas)
+
+    def contagem(self, **rotulos: Any) -> int:
+        with self._lock:
+            dados = self._valores.get(self._chave(rotulos))
+            return dados[-1] if dados else 0
+
+    def amostras(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            valores = [
+                (chave, list(dados)) for chave, dados in self._valores.items()
+            ]
+        for chave, dados in valores:
+            rotulos = self._rotulos(chave)
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, dados):
+                acumulado += contagem
+                yield (
+                    f'{self.nome}_bucket', {**rotulos, 'le': f'{limite:g}'},
+                    acumulado
+                )
+            yield f'{self.nome}_bucket', {**rotulos, 'le': '+Inf'}, dados[-1]
+            yield f'{self.nome}_sum', rotulos, dados[-2]
+            yield f'{self.nome}_count', rotulos, dados[-1]
+
+
+class _Medicao:
+    __slots__ = ('histograma', 'rotulos', 'falhas', 'inicio')
+
+    def __init__(
+        self,
+        histograma: Histograma,
+        rotulos: dict[str, Any],
+        falhas: Contador | None
+    ) -> None:
+        self.histograma = histograma
+        self.rotulos = rotulos
+        self.falhas = falhas
+        self.inicio = 0.
+
+    def __enter__(self) -> '_Medicao':
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traceback) -> bool:
+        self.histograma.observar(
+            time.perf_counter() - self.inicio, **self.rotulos
+        )
+        if tipo is not None and self.falhas is not None:
+            self.falhas.inc(**self.rotulos, erro=tipo.__name__)
+
+        return False
+
+
+_metricas: dict[str, Metrica] = {}
+_coletores: list[Callable[[], Iterable[Amostras]]] = []
+_lock_registro = threading.Lock()
+
+
+def _registrar(metrica: Metrica) -> Metrica:
+    with _lock_registro:
+        return _metricas.setdefault(metrica.nome, metrica)
+
+
+def contador(
+    nome: str,
+    descricao: str,
+    rotulos: tuple[str, ...] = ()
+) -> Contador:
+    """Contador registrado com o nome, criado na primeira chamada."""
+    return _registrar(Contador(nome, descricao, rotulos))
+
+
+def histograma(
+    nome: str,
+    descricao: str,
+    rotulos: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = CfgMetricas.BUCKETS_CHAMADA
+) -> Histograma:
+    """Histograma registrado com o nome, criado na primeira chamada."""
+    return _registrar(Histograma(nome, descricao, rotulos, buckets))
+
+
+def registrar_coletor(coletor: Callable[[], Iterable[Amostras]]) -> None:
+    """
+    Registra uma função chamada a cada exportação, que retorna
+    (nome, descrição, tipo, [(rótulos, valor)]), ex: medidores (gauge)
+    com o estado dos disjuntores.
+    """
+    with _lock_registro:
+        if coletor not in _coletores:
+            _coletores.append(coletor)
+
+
+def limpar() -> None:
+    """Zera todas as métricas (os registros continuam)."""
+    with _lock_registro:
+        metricas = list(_metricas.values())
+    for metrica in metricas:
+        metrica.limpar()
+
+
+def _formatar_rotulos(rotulos: dict[str, str]) -> str:
+    if not rotulos:
+        return ''
+
+    def escapar(v: str) -> str:
+        return v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return '{' + ','.join(
+        f'{nome}="{escapar(str(v))}"' for nome, v in rotulos.items()
+    ) + '}'
+
+
+def exportar() -> str:
+    """Todas as métricas no formato texto do Prometheus (0.0.4)."""
+    with _lock_registro:
+        metricas = list(_metricas.values())
+        coletores = list(_coletores)
+
+    linhas: list[str] = []
+
+    def cabecalho(nome: str, descricao: str, tipo: str) -> None:
+        linhas.append(f'# HELP {nome} {descricao}')
+        linhas.append(f'# TYPE {nome} {tipo}')
+
+    for metrica in metricas:
+        cabecalho(metrica.nome, metrica.descricao, metrica.tipo)
+        for nome, rotulos, valor in metrica.amostras():
+            linhas.append(f'{nome}{_formatar_rotulos(rotulos)} {valor:g}')
+
+    for coletor in coletores:
+        try:
+            grupos = list(coletor())
+        except Exception:
+            log.exception(
+                'Erro no coletor de métricas', coletor=coletor.__name__
+            )
+            continue
+        for nome, descricao, tipo, amostras in grupos:
+            cabecalho(nome, descricao, tipo)
+            for rotulos, valor in amostras:
+                linhas.append(f'{nome}{_formatar_rotulos(rotulos)} {valor:g}')
+
+    return '\n'.join(linhas) + '\n'
+
+
+def instrumentar_engine(engine: Any) -> None:
+    """
+    Mede as consultas SQL do engine (SQLAlchemy) em CONSULTAS_DB pela
+    operação (SELECT, INSERT...). Não registra nada quando as métricas
+    estão desabilitadas.
+    """
+    if not _habilitadas:
+        return
+
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('simovel_inicio_consulta', []).append(
+            time.perf_counter()
+        )
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicios: list = conn.info.get('simovel_inicio_consulta')
+        if not inicios:
+            return
+        operacao = statement.lstrip().split(None, 1)[0].upper() \
+            if statement.strip() else ''
+        CONSULTAS_DB.observar(
+            time.perf_counter() - inicios.pop(), operacao=operacao
+        )
+
+
+CHAMADAS_REMOTAS = histograma(
+    'simovel_chamada_remota_segundos',
+    'Duração das chamadas aos bancos.',
+    ('host', 'etapa', 'resultado'),
+    CfgMetricas.BUCKETS_CHAMADA
+)
+EXTRACOES = histograma(
+    'simovel_extracao_segundos',
+    'Duração das etapas de extração das respostas dos bancos.',
+    ('banco', 'etapa'),
+    CfgMetricas.BUCKETS_LOCAL
+)
+FALHAS_EXTRACAO = contador(
+    'simovel_falhas_extracao_total',
+    'Exceções nas etapas de extração por tipo.',
+    ('banco', 'etapa', 'erro')
+)
+CONSULTAS_DB = histograma(
+    'simovel_db_consulta_segundos',
+    'Duração das consultas SQL.',
+    ('operacao',),
+    CfgMetricas.BUCKETS_LOCAL
+)
+CACHE = contador(
+    'simovel_cache_total',
+    'Consultas aos caches por resultado (acerto, falha).',
+    ('cache', 'origem', 'resultado')
+)
+NOVAS_TENTATIVAS = contador(
+    'simovel_novas_tentativas_total',
+    'Novas tentativas das sessões HTTP.',
+    ('host', 'motivo')
+)
+
+
+def medir_extracao(banco: str, etapa: str) -> ContextManager:
+    """EXTRACOES.medir contando as exceções em FALHAS_EXTRACAO."""
+    return EXTRACOES.medir(FALHAS_EXTRACAO, banco=banco, etapa=etapa)
+
+
+def extracao(banco: str, etapa: str) -> Callable:
+    """Decorador que mede a função com medir_extracao."""
+    def decorar(funcao: Callable) -> Callable:
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not _habilitadas:
+                return funcao(*args, **kwargs)
+            with medir_extracao(banco, etapa):
+                return funcao(*args, **kwargs)
+
+        return medida
+
+    return decorar
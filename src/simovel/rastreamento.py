@@ -0,0 +1,467 @@
+"""
+Rastreamento (tracing) das jornadas do Multi360.
+
+Uma conversa do Multi360 passa por muitos POSTs (/inicio,
+/questao/cidade, /menu/opcoes_financ, /menu/resultado...) ligados só
+pelo json da Requisicao e pela key do Multi360Model. Aqui cada jornada
+(da /inicio até o fim da conversa) é um rastro (trace) e cada POST,
+acesso ao banco de dados, construção de simulador e chamada remota um
+trecho (span) dentro dele, pra ver onde vai o tempo da jornada inteira
+e não só de uma requisição.
+
+    with iniciar_rastro('POST /menu/resultado', trace_id=...):
+        with trecho('simulador.simular', banco='caixa'):
+            ...
+
+O trecho atual fica num ContextVar (threads e tarefas da fila copiam o
+contexto). A amostragem (Rastreamento.TAXA_AMOSTRAGEM) é decidida pelo
+trace_id, então uma jornada é amostrada inteira ou não é. Trechos de um
+rastro não amostrado, ou com o rastreamento desabilitado, são um objeto
+vazio compartilhado.
+
+Os trechos finalizados vão pro exportador de Rastreamento.EXPORTADOR:
+'arquivo' (json por linha em Rastreamento.ARQUIVO) ou 'otlp' (OTLP/HTTP
+json, em lotes, pra Rastreamento.OTLP_URL de um coletor OpenTelemetry).
+"""
+
+__author__ = 'Vanduir Santana Medeiros'
+__version__ = '0.2'
+
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+import weakref
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from simovel.cache import CacheTTL
+from simovel.config.geral import Rastreamento as CfgRastreamento
+from simovel.log import obter_logger
+
+
+log = obter_logger(__name__)
+
+_habilitado: bool = CfgRastreamento.HABILITADO
+
+
+def habilitado() -> bool:
+    return _habilitado
+
+
+def habilitar(habilitar: bool = True) -> None:
+    global _habilitado
+    _habilitado = habilitar
+
+
+def gerar_trace_id() -> str:
+    return os.urandom(16).hex()
+
+
+def gerar_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+def amostrar(trace_id: str, taxa: float | None = None) -> bool:
+    """Decisão de amostragem pelo trace_id (igual em todo o rastro)."""
+    taxa = CfgRastreamento.TAXA_AMOSTRAGEM if taxa is None else taxa
+    return int(trace_id[:16], 16) < taxa * 2 ** 64
+
+
+class Trecho:
+    __slots__ = (
+        'trace_id',
+        'span_id',
+        'pai_id',
+        'nome',
+        'atributos',
+        'inicio_ns',
+        'fim_ns',
+        'erro',
+        'amostrado',
+        '_token',
+    )
+
+    def __init__(
+        self,
+        nome: str,
+        trace_id: str,
+        pai_id: str = '',
+        amostrado: bool = True,
+        atributos: dict[str, Any] | None = None
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = gerar_span_id()
+        self.pai_id = pai_id
+        self.nome = nome
+        self.atributos = atributos or {}
+        self.inicio_ns = 0
+        self.fim_ns = 0
+        self.erro = ''
+        self.amostrado = amostrado
+        self._token = None
+
+    def definir(self, **atributos: Any) -> None:
+        self.atributos.update(atributos)
+
+    def iniciar(self) -> 'Trecho':
+        """Inicia sem tornar o trecho o atual (ver __enter__)."""
+        self.inicio_ns = time.time_ns()
+        return self
+
+    def finalizar(self, erro: str = '') -> None:
+        self.fim_ns = time.time_ns()
+        self.erro = erro
+        if self.amostrado:
+            exportador = obter_exportador()
+            if exportador is not None:
+                exportador.exportar(self)
+
+    def __enter__(self) -> 'Trecho':
+        self.iniciar()
+        self._token = _trecho_atual.set(self)
+        return self
+
+    def __exit__(self, tipo, valor, traceback) -> bool:
+        _trecho_atual.reset(self._token)
+        self.finalizar(f'{tipo.__name__}: {valor}' if tipo else '')
+        return False
+
+    def para_dict(self) -> dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'pai_id': self.pai_id,
+            'nome': self.nome,
+            'inicio_ns': self.inicio_ns,
+            'fim_ns': self.fim_ns,
+            'duracao_ms': (self.fim_ns - self.inicio_ns) / 1e6,
+            'atributos': self.atributos,
+            'erro': self.erro,
+        }
+
+    def traceparent(self) -> str:
+        """Cabeçalho W3C traceparent pra propagar o contexto."""
+        return f'00-{self.trace_id}-{self.span_id}-0{int(self.amostrado)}'
+
+
+class _TrechoNulo:
+    """Trecho que não registra nada (desabilitado ou não amostrado)."""
+    __slots__ = ()
+    amostrado = False
+
+    def definir(self, **atributos: Any) -> None:
+        pass
+
+    def __enter__(self) -> '_TrechoNulo':
+        return self
+
+    def __exit__(self, tipo, valor, traceback) -> bool:
+        return False
+
+
+_NULO = _TrechoNulo()
+_trecho_atual: ContextVar[Trecho | None] = ContextVar(
+    'simovel_trecho_atual', default=None
+)
+
+
+def trecho_atual() -> Trecho | None:
+    return _trecho_atual.get()
+
+
+def trecho(nome: str, **atributos: Any) -> Trecho | _TrechoNulo:
+    """
+    Trecho filho do atual. Sem trecho atual inicia um rastro novo
+    (amostrado por Rastreamento.TAXA_AMOSTRAGEM).
+    """
+    if not _habilitado:
+        return _NULO
+
+    pai = _trecho_atual.get()
+    if pai is None:
+        return iniciar_rastro(nome, **atributos)
+    if not pai.amostrado:
+        return _NULO
+
+    return Trecho(nome, pai.trace_id, pai.span_id, True, atributos)
+
+
+def iniciar_rastro(
+    nome: str,
+    trace_id: str = '',
+    pai_id: str = '',
+    amostrado: bool | None = None,
+    traceparent: str = '',
+    **atributos: Any
+) -> Trecho | _TrechoNulo:
+    """
+    Trecho raiz (ou continuação de um rastro de fora).
+
+    Args:
+        trace_id (str, optional): rastro da jornada, vazio gera um novo.
+        pai_id (str, optional): trecho pai de outro processo.
+        amostrado (bool, optional): None decide pelo trace_id.
+        traceparent (str, optional): cabeçalho W3C, tem precedência
+            sobre trace_id e pai_id quando válido.
+    """
+    if not _habilitado:
+        return _NULO
+
+    partes = traceparent.split('-') if traceparent else []
+    if len(partes) == 4 and len(partes[1]) == 32 and len(partes[2]) == 16:
+        trace_id, pai_id = partes[1], partes[2]
+        amostrado = partes[3] == '01'
+
+    trace_id = trace_id or gerar_trace_id()
+    if amostrado is None:
+        amostrado = amostrar(trace_id)
+
+    # mesmo não amostrado fica como atual, pros filhos não iniciarem
+    # rastros próprios
+    return Trecho(nome, trace_id, pai_id, amostrado, atributos)
+
+
+class ExportadorArquivo:
+    """Um json por linha com cada trecho finalizado."""
+    def __init__(self, arquivo: str) -> None:
+        self.arquivo = arquivo
+        self._lock = threading.Lock()
+
+    def exportar(self, trecho: Trecho) -> None:
+        linha = json.dumps(trecho.para_dict(), ensure_ascii=False, default=str)
+        with self._lock, open(self.arquivo, 'a', encoding='utf-8') as f:
+            f.write(linha + '\n')
+
+    def encerrar(self) -> None:
+        pass
+
+
+class ExportadorOtlp:
+    """
+    Envia os trechos em lotes pra um coletor OpenTelemetry (OTLP/HTTP
+    json, /v1/traces), numa thread própria.
+    """
+    def __init__(
+        self,
+        url: str,
+        servico: str = CfgRastreamento.SERVICO,
+        lote: int = CfgRastreamento.LOTE,
+        intervalo: float = CfgRastreamento.INTERVALO_ENVIO,
+        timeout: float = CfgRastreamento.TIMEOUT_ENVIO
+    ) -> None:
+        self.url = url
+        self.servico = servico
+        self.lote = lote
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self._pendentes: list[Trecho] = []
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._encerrar = threading.Event()
+        self._thread = threading.Thread(
+            target=self._enviar_continuamente,
+            name='rastreamento-otlp',
+            daemon=True
+        )
+        self._thread.start()
+
+    def exportar(self, trecho: Trecho) -> None:
+        with self._lock:
+            self._pendentes.append(trecho)
+            cheio = len(self._pendentes) >= self.lote
+        if cheio:
+            self._acordar.set()
+
+    def encerrar(self) -> None:
+        self._encerrar.set()
+        self._acordar.set()
+        self._thread.join(self.timeout)
+
+    def _enviar_continuamente(self) -> None:
+        while not self._encerrar.is_set():
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            self.enviar()
+        self.enviar()
+
+    def enviar(self) -> None:
+        with self._lock:
+            trechos, self._pendentes = self._pendentes, []
+        if not trechos:
+            return
+
+        corpo = json.dumps(self.montar(trechos)).encode('utf-8')
+        req = urllib.request.Request(
+            self.url,
+            data=corpo,
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout):
+                pass
+        except Exception as erro:
+            log.warning(
+                'Erro ao enviar trechos', trechos=len(trechos), erro=repr(erro)
+            )
+
+    def montar(self, trechos: list[Trecho]) -> dict[str, Any]:
+        """Corpo OTLP json (ExportTraceServiceRequest)."""
+        def atributos(d: dict[str, Any]) -> list[dict]:
+            return [
+                {'key': k, 'value': _valor_otlp(v)} for k, v in d.items()
+            ]
+
+        return {
+            'resourceSpans': [{
+                'resource': {
+                    'attributes': atributos({'service.name': self.servico})
+                },
+                'scopeSpans': [{
+                    'scope': {'name': 'simovel.rastreamento'},
+                    'spans': [
+                        {
+                            'traceId': t.trace_id,
+                            'spanId': t.span_id,
+                            'parentSpanId': t.pai_id,
+                            'name': t.nome,
+                            'kind': 1,
+                            'startTimeUnixNano': str(t.inicio_ns),
+                            'endTimeUnixNano': str(t.fim_ns),
+                            'attributes': atributos(t.atributos),
+                            'status': (
+                                {'code': 2, 'message': t.erro} if t.erro
+                                else {'code': 1}
+                            ),
+                        }
+                        for t in trechos
+                    ],
+                }],
+            }],
+        }
+
+
+def _valor_otlp(v: Any) -> dict[str, Any]:
+    if isinstance(v, bool):
+        return {'boolValue': v}
+    if isinstance(v, int):
+        return {'intValue': str(v)}
+    if isinstance(v, float):
+        return {'doubleValue': v}
+    return {'stringValue': str(v)}
+
+
+_exportador: ExportadorArquivo | ExportadorOtlp | None = None
+_lock_exportador = threading.Lock()
+
+
+def obter_exportador() -> ExportadorArquivo | ExportadorOtlp | None:
+    """
+    Exportador de Rastreamento.EXPORTADOR, criado na primeira chamada.
+    None quando o rastreamento está desabilitado.
+    """
+    global _exportador
+
+    if not _habilitado:
+        return None
+
+    with _lock_exportador:
+        if _exportador is None:
+            if CfgRastreamento.EXPORTADOR == 'otlp':
+                _exportador = ExportadorOtlp(CfgRastreamento.OTLP_URL)
+            else:
+                _exportador = ExportadorArquivo(CfgRastreamento.ARQUIVO)
+
+        return _exportador
+
+
+def definir_exportador(
+    exportador: ExportadorArquivo | ExportadorOtlp | None
+) -> None:
+    global _exportador
+
+    with _lock_exportador:
+        if _exportador is not None and _exportador is not exportador:
+            _exportador.encerrar()
+        _exportador = exportador
+
+
+# chave da jornada (key do Multi360) -> trace_id
+_jornadas = CacheTTL(
+    tamanho_max=CfgRastreamento.JORNADAS_TAMANHO,
+    ttl=CfgRastreamento.JORNADA_TTL
+)
+
+
+def rastro_jornada(chave: str, nova: bool = False) -> str:
+    """
+    trace_id da jornada da chave, renovando a validade a cada chamada.
+    Uma jornada nova começa com nova=True (/inicio) ou depois de
+    Rastreamento.JORNADA_TTL segundos sem requisições.
+    """
+    trace_id: str | None = None if nova else _jornadas.obter(chave)
+    trace_id = trace_id or gerar_trace_id()
+    _jornadas.definir(chave, trace_id)
+    return trace_id
+
+
+def anonimizar(v: str) -> str:
+    """Identificador estável sem expor o dado (telefone, e-mail)."""
+    return hashlib.sha256(v.encode('utf-8')).hexdigest()[:16]
+
+
+_engines: 'weakref.WeakSet[Any]' = weakref.WeakSet()
+
+
+def instrumentar_engine(engine: Any) -> None:
+    """
+    Um trecho por consulta SQL do engine (SQLAlchemy), filho do trecho
+    atual. Só instrumenta uma vez cada engine e não registra nada com o
+    rastreamento desabilitado.
+    """
+    if not _habilitado or engine in _engines:
+        return
+    _engines.add(engine)
+
+    from sqlalchemy import event
+
+    # os trechos das consultas não viram o atual: com erro o
+    # after_cursor_execute não é chamado
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        atual = _trecho_atual.get()
+        t: Trecho | None = None
+        if atual is not None and atual.amostrado:
+            operacao = statement.lstrip().split(None, 1)[0].upper() \
+                if statement.strip() else ''
+            t = Trecho(
+                f'db {operacao}', atual.trace_id, atual.span_id,
+                atributos={'db.statement': statement[:500]}
+            ).iniciar()
+        conn.info.setdefault('simovel_trechos', []).append(t)
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        trechos: list = conn.info.get('simovel_trechos')
+        t = trechos.pop() if trechos else None
+        if t is not None:
+            t.finalizar()
+
+    @event.listens_for(engine, 'handle_error')
+    def _erro(contexto):
+        conexao = contexto.connection
+        trechos: list = conexao.info.get('simovel_trechos') if conexao else None
+        t = trechos.pop() if trechos else None
+        if t is not None:
+            t.finalizar(repr(contexto.original_exception))
+
+
+def ler_arquivo(arquivo: str) -> Iterator[dict[str, Any]]:
+    """Trechos exportados por ExportadorArquivo."""
+    with open(arquivo, encoding='utf-8') as f:
+        for linha in f:
+            if linha.strip():
+                yield json.loads(linha)
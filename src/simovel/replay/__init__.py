@@ -0,0 +1,19 @@
+from simovel.replay.gravacao import (
+    Interacao,
+    GravadorHttp,
+    HandlerReplay,
+    carregar_interacoes,
+    obter_gravador,
+    resolver_url,
+)
+from simovel.replay.servidor import ServidorReplay
+
+__all__ = [
+    "Interacao",
+    "GravadorHttp",
+    "HandlerReplay",
+    "carregar_interacoes",
+    "obter_gravador",
+    "resolver_url",
+    "ServidorReplay",
+]
@@ -0,0 +1,273 @@
+# coding: utf-8
+"""
+Gravação das trocas HTTP dos simuladores com os bancos.
+
+Com Replay.GRAVAR habilitado, cada requisição feita pelo SimuladorCaixa
+(urllib e httpx), SimuladorBradesco e SimuladorBaseL (requests) é
+gravada em Replay.ARQUIVO_GRAVACOES, uma Interacao por linha (jsonl):
+método, url, payload, headers e o corpo da resposta. No urllib o corpo
+é gravado como veio do servidor (gzip); requests e httpx já entregam o
+corpo descompactado, então Content-Encoding é removido.
+
+Com Replay.URL_BASE definida as URLs dos bancos são reescritas pra
+URL_BASE/host/caminho, apontando os simuladores pro ServidorReplay
+(ver simovel.replay.servidor).
+"""
+__version__ = '0.1'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import base64
+import io
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+from urllib.request import BaseHandler, Request
+from urllib.response import addinfourl
+
+from simovel.config.geral import Replay as CfgReplay
+
+
+# headers que deixam de valer quando o corpo é regravado
+HEADERS_IGNORADOS = ('content-length', 'transfer-encoding', 'connection')
+
+
+def resolver_url(url: str) -> str:
+    """
+    Reescreve a URL de um banco pra Replay.URL_BASE, se definida:
+    https://www8.caixa.gov.br/a?b -> URL_BASE/www8.caixa.gov.br/a?b
+    """
+    url_base = CfgReplay.URL_BASE.rstrip('/')
+    if not url_base or url.startswith(url_base + '/'):
+        return url
+
+    host = urlsplit(url).netloc
+    caminho = url.split(host, 1)[1]
+    return f'{url_base}/{host}{caminho}'
+
+
+def url_original(url: str) -> str:
+    """
+    Inverso de resolver_url. Assume https, usado por todos os bancos.
+    """
+    url_base = CfgReplay.URL_BASE.rstrip('/')
+    if not url_base or not url.startswith(url_base + '/'):
+        return url
+
+    return 'https://' + url[len(url_base) + 1:]
+
+
+def _bytes(corpo: bytes | str | None) -> bytes:
+    if corpo is None:
+        return b''
+    if isinstance(corpo, str):
+        return corpo.encode('utf-8')
+    return bytes(corpo)
+
+
+class Interacao:
+    """
+    Uma requisição e sua resposta.
+    """
+    def __init__(
+        self,
+        metodo: str,
+        url: str,
+        payload: bytes = b'',
+        headers: dict[str, str] | None = None,
+        status: int = 200,
+        headers_resposta: list[tuple[str, str]] | None = None,
+        corpo: bytes = b'',
+        duracao: float = 0.
+    ) -> None:
+        self.metodo = metodo.upper()
+        self.url = url
+        self.payload = payload
+        self.headers = headers or {}
+        self.status = status
+        self.headers_resposta = headers_resposta or []
+        self.corpo = corpo
+        self.duracao = duracao
+
+    @property
+    def chave(self) -> tuple[str, str]:
+        """Método e host/caminho?query, usados pelo ServidorReplay."""
+        partes = urlsplit(self.url)
+        caminho = partes.path + (f'?{partes.query}' if partes.query else '')
+        return self.metodo, f'/{partes.netloc}{caminho}'
+
+    def para_dict(self) -> dict:
+        return {
+            'metodo': self.metodo,
+            'url': self.url,
+            'payload': base64.b64encode(self.payload).decode('ascii'),
+            'headers': self.headers,
+            'status': self.status,
+            'headers_resposta': self.headers_resposta,
+            'corpo': base64.b64encode(self.corpo).decode('ascii'),
+            'duracao': self.duracao,
+        }
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> 'Interacao':
+        return cls(
+            dados['metodo'],
+            dados['url'],
+            base64.b64decode(dados['payload']),
+            dados['headers'],
+            dados['status'],
+            [tuple(h) for h in dados['headers_resposta']],
+            base64.b64decode(dados['corpo']),
+            dados.get('duracao', 0.)
+        )
+
+
+def carregar_interacoes(arquivo: str) -> list[Interacao]:
+    with open(arquivo, encoding='utf-8') as f:
+        return [
+            Interacao.de_dict(json.loads(linha))
+            for linha in f if linha.strip()
+        ]
+
+
+class GravadorHttp:
+    """
+    Acrescenta as interações no arquivo de gravações. Pode ser usado
+    por várias threads.
+    """
+    def __init__(self, arquivo: str) -> None:
+        self.arquivo = arquivo
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def gravar(self, interacao: Interacao) -> None:
+        linha = json.dumps(interacao.para_dict(), ensure_ascii=False)
+        with self._lock:
+            with open(self.arquivo, 'a', encoding='utf-8') as f:
+                f.write(linha + '\n')
+            self.total += 1
+
+    def gravar_requests(self, response, *args, **kwargs):
+        """Hook 'response' do requests."""
+        req = response.request
+        self.gravar(Interacao(
+            req.method,
+            url_original(req.url),
+            _bytes(req.body),
+            dict(req.headers),
+            response.status_code,
+            [
+                (k, v) for k, v in response.headers.items()
+                if k.lower() not in HEADERS_IGNORADOS + ('content-encoding',)
+            ],
+            response.content,
+            response.elapsed.total_seconds()
+        ))
+        return response
+
+    async def gravar_httpx(self, response) -> None:
+        """Event hook 'response' do httpx."""
+        await response.aread()
+        req = response.request
+        self.gravar(Interacao(
+            req.method,
+            url_original(str(req.url)),
+            req.content,
+            dict(req.headers),
+            response.status_code,
+            [
+                (k, v) for k, v in response.headers.multi_items()
+                if k.lower() not in HEADERS_IGNORADOS + ('content-encoding',)
+            ],
+            response.content
+        ))
+
+
+_gravador: GravadorHttp | None = None
+_lock_gravador = threading.Lock()
+
+
+def obter_gravador() -> GravadorHttp | None:
+    """
+    Gravador do processo ou None se Replay.GRAVAR estiver desabilitado.
+    """
+    global _gravador
+
+    if not CfgReplay.GRAVAR:
+        return None
+
+    with _lock_gravador:
+        arquivo = CfgReplay.ARQUIVO_GRAVACOES
+        if _gravador is None or _gravador.arquivo != arquivo:
+            _gravador = GravadorHttp(arquivo)
+
+        return _gravador
+
+
+def hooks_requests() -> dict:
+    """Parâmetro hooks das chamadas requests.get/post."""
+    gravador = obter_gravador()
+    if gravador is None:
+        return {}
+    return {'response': gravador.gravar_requests}
+
+
+def event_hooks_httpx() -> dict:
+    """Parâmetro event_hooks do httpx.AsyncClient."""
+    gravador = obter_gravador()
+    if gravador is None:
+        return {}
+    return {'response': [gravador.gravar_httpx]}
+
+
+class HandlerReplay(BaseHandler):
+    """
+    Handler do urllib: reescreve a URL (Replay.URL_BASE) e grava a
+    resposta sem descompactar. Roda antes dos demais handlers, então
+    o Host e os cookies já saem pra URL reescrita e respostas de erro
+    também são gravadas (antes do HTTPErrorProcessor).
+    """
+    handler_order = 100
+
+    def http_request(self, req: Request) -> Request:
+        if not hasattr(req, 'inicio_replay'):
+            req.inicio_replay = time.monotonic()
+        url = resolver_url(req.full_url)
+        if url != req.full_url:
+            req.full_url = url
+        return req
+
+    https_request = http_request
+
+    def http_response(
+        self,
+        req: Request,
+        response: addinfourl
+    ) -> addinfourl:
+        gravador = obter_gravador()
+        if gravador is None:
+            return response
+
+        corpo: bytes = response.read()
+        gravador.gravar(Interacao(
+            req.get_method(),
+            url_original(req.full_url),
+            _bytes(req.data),
+            dict(req.header_items()),
+            response.status,
+            [
+                (k, v) for k, v in response.headers.items()
+                if k.lower() not in HEADERS_IGNORADOS
+            ],
+            corpo,
+            time.monotonic() - getattr(req, 'inicio_replay', time.monotonic())
+        ))
+
+        nova = addinfourl(
+            io.BytesIO(corpo), response.headers, response.url, response.status
+        )
+        nova.msg = response.msg
+        return nova
+
+    https_response = http_response
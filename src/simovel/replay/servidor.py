@@ -0,0 +1,226 @@
+# coding: utf-8
+"""
+Servidor HTTP local que responde no lugar dos bancos a partir das
+interações gravadas (ver simovel.replay.gravacao).
+
+As requisições chegam como URL_BASE/host/caminho (Replay.URL_BASE) e
+são respondidas pela interação gravada com o mesmo método e
+host/caminho?query. Se houver mais de uma, usa a que tiver o mesmo
+payload; senão responde as gravações daquela chave em sequência,
+voltando à primeira no final. Assim o replay é determinístico mesmo
+com payloads que mudam a cada chamada (scriptSessionId, batchId).
+
+Latência e erros podem ser injetados pra testes de carga: cada
+resposta aguarda um tempo sorteado entre latencia_min e latencia_max e,
+com probabilidade taxa_erro, devolve status_erro. O sorteio usa a
+semente informada, então a sequência se repete entre execuções.
+
+Exemplo:
+
+    with ServidorReplay(carregar_interacoes('gravacoes.jsonl')) as srv:
+        Replay.URL_BASE = srv.url_base
+        SimuladorCaixa().obter_cidades('GO')
+"""
+__version__ = '0.2'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from simovel.config.geral import Replay as CfgReplay
+from simovel.replay.gravacao import Interacao
+
+
+class _RespostaReplay:
+    def __init__(
+        self,
+        status: int,
+        headers: list[tuple[str, str]],
+        corpo: bytes
+    ) -> None:
+        self.status = status
+        self.headers = headers
+        self.corpo = corpo
+
+
+def _hash_payload(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ServidorReplay:
+    def __init__(
+        self,
+        interacoes: list[Interacao],
+        host: str = '127.0.0.1',
+        porta: int = 0,
+        latencia_min: float = 0.,
+        latencia_max: float = 0.,
+        taxa_erro: float = 0.,
+        status_erro: int = CfgReplay.SERVIDOR_STATUS_ERRO,
+        semente: int | None = None
+    ) -> None:
+        """
+        Args:
+            interacoes (list[Interacao]): gravações a serem respondidas.
+            host (str, optional): endereço de escuta.
+            porta (int, optional): 0 escolhe uma porta livre.
+            latencia_min (float, optional): segundos.
+            latencia_max (float, optional): segundos.
+            taxa_erro (float, optional): entre 0 e 1.
+            status_erro (int, optional): status das respostas com erro.
+            semente (int | None, optional): semente do sorteio de
+              latência e erros.
+        """
+        if not 0 <= taxa_erro <= 1:
+            raise ValueError('taxa_erro precisa estar entre 0 e 1.')
+        if latencia_max < latencia_min:
+            raise ValueError('latencia_max menor que latencia_min.')
+
+        self.latencia_min = latencia_min
+        self.latencia_max = latencia_max
+        self.taxa_erro = taxa_erro
+        self.status_erro = status_erro
+        self.respondidas = 0
+        self.erros_injetados = 0
+        self.nao_encontradas = 0
+
+        self._por_chave: dict[tuple[str, str], list[Interacao]] = {}
+        for interacao in interacoes:
+            self._por_chave.setdefault(interacao.chave, []).append(interacao)
+        self._cursores: dict[tuple[str, str], int] = {}
+        self._random = random.Random(semente)
+        self._lock = threading.Lock()
+
+        self._httpd = ThreadingHTTPServer((host, porta), self._criar_handler())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url_base(self) -> str:
+        host, porta = self._httpd.server_address[:2]
+        return f'http://{host}:{porta}'
+
+    def __enter__(self) -> 'ServidorReplay':
+        self.iniciar()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.parar()
+
+    def iniciar(self) -> None:
+        """Atende em segundo plano."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            name='servidor-replay',
+            daemon=True
+        )
+        self._thread.start()
+
+    def servir(self) -> None:
+        """Atende na thread atual até ser interrompido."""
+        self._httpd.serve_forever()
+
+    def parar(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def _escolher(
+        self,
+        chave: tuple[str, str],
+        payload: bytes
+    ) -> Interacao | None:
+        candidatas = self._por_chave.get(chave)
+        if not candidatas:
+            return None
+
+        hash_payload = _hash_payload(payload)
+        for interacao in candidatas:
+            if _hash_payload(interacao.payload) == hash_payload:
+                return interacao
+
+        i = self._cursores.get(chave, 0)
+        self._cursores[chave] = (i + 1) % len(candidatas)
+        return candidatas[i]
+
+    def responder(
+        self,
+        metodo: str,
+        caminho: str,
+        payload: bytes
+    ) -> tuple[float, _RespostaReplay]:
+        """
+        Resposta pra requisição e a latência a ser aplicada antes de
+        enviá-la.
+        """
+        with self._lock:
+            latencia = self._random.uniform(
+                self.latencia_min, self.latencia_max
+            )
+            if self.taxa_erro and self._random.random() < self.taxa_erro:
+                self.erros_injetados += 1
+                return latencia, _RespostaReplay(
+                    self.status_erro, [], b'erro injetado (replay)'
+                )
+
+            interacao = self._escolher((metodo.upper(), caminho), payload)
+            if interacao is None:
+                self.nao_encontradas += 1
+                return latencia, _RespostaReplay(
+                    404, [], f'sem gravação: {metodo} {caminho}'.encode()
+                )
+
+            self.respondidas += 1
+            return latencia, _RespostaReplay(
+                interacao.status, interacao.headers_resposta, interacao.corpo
+            )
+
+    @property
+    def estatisticas(self) -> dict:
+        return {
+            'respondidas': self.respondidas,
+            'erros_injetados': self.erros_injetados,
+            'nao_encontradas': self.nao_encontradas,
+        }
+
+    def _criar_handler(self) -> type[BaseHTTPRequestHandler]:
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers e corpo saem em writes separados: com keep-alive o
+            # Nagle segura o corpo até o ACK atrasado do cliente (~40ms)
+            disable_nagle_algorithm = True
+
+            def _atender(self) -> None:
+                tamanho = int(self.headers.get('Content-Length') or 0)
+                payload = self.rfile.read(tamanho) if tamanho else b''
+                latencia, resposta = servidor.responder(
+                    self.command, self.path, payload
+                )
+                if latencia:
+                    time.sleep(latencia)
+
+                self.send_response(resposta.status)
+                for nome, valor in resposta.headers:
+                    # enviados pelo próprio send_response/abaixo
+                    if nome.lower() not in (
+                        'date', 'server', 'content-length'
+                    ):
+                        self.send_header(nome, valor)
+                self.send_header('Content-Length', str(len(resposta.corpo)))
+                self.end_headers()
+                self.wfile.write(resposta.corpo)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _atender
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,383 @@
+# coding: utf-8
+"""
+Cálculo local de tabelas de amortização (SAC e PRICE).
+
+Os simuladores trazem apenas os números extraídos do HTML/JSON dos
+bancos (primeira e última prestação, valor financiado, ...). Aqui a
+tabela completa é calculada localmente, parcela a parcela, a partir
+do valor financiado, prazo, taxa de juros, seguros (MIP sobre o saldo
+devedor e DFI sobre o valor do imóvel) e taxa de administração.
+
+Com a taxa calibrada a partir de uma simulação real (calibrar_taxa_mensal)
+é possível responder alterações de prazo ou de valor de entrada sem
+fazer uma nova simulação no banco (estimar_resultado).
+"""
+__version__ = '0.1'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import copy
+from decimal import Decimal, ROUND_HALF_UP
+from enum import Enum
+
+from simovel.config.geral import Amortizacao as CfgAmortizacao
+from simovel.sims.base import SimulacaoResultadoBase
+from simovel.util import Decimal2
+
+
+CENTAVOS = Decimal('0.01')
+
+
+def arredondar(v: Decimal) -> Decimal:
+    return v.quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+class SistemaAmortizacao(Enum):
+    SAC = 'SAC'
+    PRICE = 'PRICE'
+
+    @classmethod
+    def a_partir_de_texto(cls, texto: str) -> 'SistemaAmortizacao':
+        """
+        Converte o texto retornado pelos bancos (ex: 'SAC/TR',
+        'PRICE/TR', 'S', 'P') pro sistema de amortização.
+        """
+        t = texto.strip().upper()
+        if t.startswith('PRICE') or t == 'P':
+            return cls.PRICE
+        if t.startswith('SAC') or t == 'S':
+            return cls.SAC
+
+        raise ValueError(f'Sistema de amortização desconhecido: {texto}')
+
+
+def taxa_mensal(taxa_ano: Decimal, efetiva: bool = True) -> Decimal:
+    """
+    Converte taxa anual (fração, ex: 0.1049) pra mensal.
+
+    Args:
+        taxa_ano (Decimal): taxa ao ano.
+        efetiva (bool, optional): taxa efetiva (capitalização composta),
+            senão nominal (dividida por 12). Defaults to True.
+    """
+    taxa_ano = Decimal(taxa_ano)
+    if not efetiva:
+        return taxa_ano / 12
+
+    return (1 + taxa_ano) ** (Decimal(1) / 12) - 1
+
+
+def taxa_anual(taxa_mes: Decimal) -> Decimal:
+    """
+    Converte taxa mensal em taxa anual efetiva.
+    """
+    return (1 + Decimal(taxa_mes)) ** 12 - 1
+
+
+class Parcela:
+    """
+    Uma linha da tabela de amortização.
+    """
+    def __init__(
+        self,
+        numero: int,
+        amortizacao: Decimal,
+        juros: Decimal,
+        seguro_mip: Decimal,
+        seguro_dfi: Decimal,
+        taxa_administracao: Decimal,
+        saldo_devedor: Decimal
+    ) -> None:
+        self.numero = numero
+        self.amortizacao = amortizacao
+        self.juros = juros
+        self.seguro_mip = seguro_mip
+        self.seguro_dfi = seguro_dfi
+        self.taxa_administracao = taxa_administracao
+        # saldo devedor após o pagamento da parcela
+        self.saldo_devedor = saldo_devedor
+
+    @property
+    def prestacao(self) -> Decimal:
+        return (
+            self.amortizacao + self.juros + self.seguro_mip +
+            self.seguro_dfi + self.taxa_administracao
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f'<Parcela {self.numero}: {self.prestacao} '
+            f'(saldo {self.saldo_devedor})>'
+        )
+
+
+class TabelaAmortizacao:
+    """
+    Tabela de amortização SAC ou PRICE calculada localmente.
+
+    As taxas de seguro são mensais e em fração (ex: 0.00025). O seguro
+    MIP incide sobre o saldo devedor e o DFI sobre o valor do imóvel.
+    """
+    def __init__(
+        self,
+        valor_financiamento: Decimal,
+        prazo: int,
+        taxa_juros_mes: Decimal,
+        sistema: SistemaAmortizacao = SistemaAmortizacao.SAC,
+        valor_imovel: Decimal = Decimal(0),
+        taxa_mip_mes: Decimal = CfgAmortizacao.TAXA_MIP_MES,
+        taxa_dfi_mes: Decimal = CfgAmortizacao.TAXA_DFI_MES,
+        taxa_administracao: Decimal = CfgAmortizacao.TAXA_ADMINISTRACAO
+    ) -> None:
+        if prazo <= 0:
+            raise ValueError('Prazo precisa ser maior que zero.')
+
+        if valor_financiamento <= 0:
+            raise ValueError('Valor do financiamento precisa ser positivo.')
+
+        self.valor_financiamento = Decimal(valor_financiamento)
+        self.prazo = prazo
+        self.taxa_juros_mes = Decimal(taxa_juros_mes)
+        self.sistema = sistema
+        self.valor_imovel = Decimal(valor_imovel)
+        self.taxa_mip_mes = Decimal(taxa_mip_mes)
+        self.taxa_dfi_mes = Decimal(taxa_dfi_mes)
+        self.taxa_administracao = Decimal(taxa_administracao)
+        self.parcelas: list[Parcela] = []
+        self.calcular()
+
+    @classmethod
+    def a_partir_de_taxa_anual(
+        cls,
+        valor_financiamento: Decimal,
+        prazo: int,
+        taxa_juros_ano: Decimal,
+        sistema: SistemaAmortizacao = SistemaAmortizacao.SAC,
+        efetiva: bool = True,
+        **kwargs
+    ) -> 'TabelaAmortizacao':
+        return cls(
+            valor_financiamento,
+            prazo,
+            taxa_mensal(taxa_juros_ano, efetiva),
+            sistema,
+            **kwargs
+        )
+
+    def _prestacao_price(self) -> Decimal:
+        """
+        Parcela fixa (juros + amortização) do sistema PRICE.
+        """
+        i, n, p = self.taxa_juros_mes, self.prazo, self.valor_financiamento
+        if i == 0:
+            return p / n
+
+        return p * i / (1 - (1 + i) ** -n)
+
+    def calcular(self) -> list[Parcela]:
+        """
+        Calcula todas as parcelas. Valores arredondados em centavos a
+        cada parcela, como fazem os bancos; a última parcela amortiza o
+        resíduo do arredondamento.
+        """
+        self.parcelas = []
+        saldo = self.valor_financiamento
+        seguro_dfi = arredondar(self.valor_imovel * self.taxa_dfi_mes)
+        amortizacao_sac = arredondar(self.valor_financiamento / self.prazo)
+        prestacao_price = arredondar(self._prestacao_price())
+
+        for n in range(1, self.prazo + 1):
+            juros = arredondar(saldo * self.taxa_juros_mes)
+            seguro_mip = arredondar(saldo * self.taxa_mip_mes)
+
+            if n == self.prazo:
+                amortizacao = saldo
+            elif self.sistema == SistemaAmortizacao.SAC:
+                amortizacao = amortizacao_sac
+            else:
+                amortizacao = prestacao_price - juros
+
+            amortizacao = min(amortizacao, saldo)
+            saldo -= amortizacao
+            self.parcelas.append(
+                Parcela(
+                    n, amortizacao, juros, seguro_mip, seguro_dfi,
+                    self.taxa_administracao, saldo
+                )
+            )
+
+        return self.parcelas
+
+    @property
+    def prestacoes(self) -> list[Decimal]:
+        return [p.prestacao for p in self.parcelas]
+
+    @property
+    def amortizacoes(self) -> list[Decimal]:
+        return [p.amortizacao for p in self.parcelas]
+
+    @property
+    def juros(self) -> list[Decimal]:
+        return [p.juros for p in self.parcelas]
+
+    @property
+    def saldos_devedores(self) -> list[Decimal]:
+        return [p.saldo_devedor for p in self.parcelas]
+
+    @property
+    def primeira_prestacao(self) -> Decimal:
+        return self.parcelas[0].prestacao
+
+    @property
+    def ultima_prestacao(self) -> Decimal:
+        return self.parcelas[-1].prestacao
+
+    @property
+    def somatorio_parcelas(self) -> Decimal:
+        return sum(self.prestacoes, Decimal(0))
+
+    def preencher_resultado(self, sim_res: SimulacaoResultadoBase) -> None:
+        """
+        Preenche primeira/última prestação, somatório das parcelas,
+        prazo e valor financiado no resultado da simulação.
+        """
+        sim_res.primeira_prestacao = Decimal2(self.primeira_prestacao)
+        sim_res.ultima_prestacao = Decimal2(self.ultima_prestacao)
+        sim_res.somatorio_parcelas = Decimal2(self.somatorio_parcelas)
+        sim_res.valor_financiamento = Decimal2(self.valor_financiamento)
+        sim_res.prazo = self.prazo
+
+
+def calibrar_taxa_mensal(
+    valor_financiamento: Decimal,
+    prazo: int,
+    primeira_prestacao: Decimal,
+    sistema: SistemaAmortizacao,
+    valor_imovel: Decimal = Decimal(0),
+    taxa_mip_mes: Decimal = CfgAmortizacao.TAXA_MIP_MES,
+    taxa_dfi_mes: Decimal = CfgAmortizacao.TAXA_DFI_MES,
+    taxa_administracao: Decimal = CfgAmortizacao.TAXA_ADMINISTRACAO
+) -> Decimal:
+    """
+    Obtém a taxa de juros mensal que reproduz a primeira prestação
+    retornada pelo banco. Encargos que não são informados pelo banco
+    acabam incorporados na taxa, o que é suficiente pra estimar
+    alterações de prazo e valor de entrada.
+
+    Returns:
+        Decimal: taxa mensal (fração).
+    """
+    p = Decimal(valor_financiamento)
+    encargos = (
+        p * Decimal(taxa_mip_mes) +
+        Decimal(valor_imovel) * Decimal(taxa_dfi_mes) +
+        Decimal(taxa_administracao)
+    )
+    pmt = Decimal(primeira_prestacao) - encargos
+
+    if sistema == SistemaAmortizacao.SAC:
+        return max((pmt - p / prazo) / p, Decimal(0))
+
+    # PRICE: pmt cresce com a taxa, então basta uma busca binária
+    if pmt <= p / prazo:
+        return Decimal(0)
+
+    minimo, maximo = Decimal(0), Decimal('0.1')
+    for _ in range(60):
+        i = (minimo + maximo) / 2
+        if p * i / (1 - (1 + i) ** -prazo) > pmt:
+            maximo = i
+        else:
+            minimo = i
+
+    return (minimo + maximo) / 2
+
+
+def estimar_resultado(
+    sim_res: SimulacaoResultadoBase,
+    prazo: int | None = None,
+    valor_entrada: Decimal | None = None,
+    taxa_juros_mes: Decimal | None = None
+) -> SimulacaoResultadoBase:
+    """
+    Estima localmente o resultado de uma simulação com outro prazo ou
+    valor de entrada, usando a taxa calibrada do último resultado real.
+
+    Args:
+        sim_res (SimulacaoResultadoBase): último resultado real, precisa
+            ter valor do imóvel, valor financiado, prazo, primeira
+            prestação e sistema de amortização.
+        prazo (int, optional): novo prazo em meses.
+        valor_entrada (Decimal, optional): novo valor de entrada,
+            recalcula o valor financiado (valor imóvel - entrada).
+        taxa_juros_mes (Decimal, optional): taxa já calibrada, evita
+            calibrar novamente.
+
+    Returns:
+        SimulacaoResultadoBase: cópia do resultado com os valores
+        estimados (atributo estimado = True).
+    """
+    sistema = SistemaAmortizacao.a_partir_de_texto(sim_res.sistema_amortizacao)
+    valor_imovel = Decimal(sim_res._valor_imovel)
+
+    if taxa_juros_mes is None:
+        taxa_juros_mes = calibrar_taxa_mensal(
+            Decimal(sim_res._valor_financiamento),
+            sim_res._prazo,
+            Decimal(sim_res._primeira_prestacao),
+            sistema,
+            valor_imovel
+        )
+
+    valor_financiamento = Decimal(sim_res._valor_financiamento)
+    if valor_entrada is not None:
+        valor_financiamento = valor_imovel - Decimal(valor_entrada)
+
+    tabela = TabelaAmortizacao(
+        valor_financiamento,
+        prazo or sim_res._prazo,
+        taxa_juros_mes,
+        sistema,
+        valor_imovel
+    )
+
+    estimado = copy.copy(sim_res)
+    tabela.preencher_resultado(estimado)
+    if valor_entrada is not None and hasattr(estimado, '_valor_entrada'):
+        estimado._valor_entrada = Decimal2(valor_entrada)
+
+    estimado.estimado = True
+    return estimado
+
+
+def resultado_para_dict(sim_res: SimulacaoResultadoBase) -> dict:
+    """
+    Converte os atributos do resultado pra um dicionário serializável
+    (JSON), permitindo guardar o último resultado real entre as
+    requisições e estimar alterações depois com resultado_de_dict.
+    """
+    decimais: dict[str, str] = {}
+    outros: dict = {}
+    for k, v in vars(sim_res).items():
+        if isinstance(v, Decimal):
+            decimais[k] = format(v, 'f')
+        elif isinstance(v, (str, int, float, bool, dict)) or v is None:
+            outros[k] = v
+
+    return {'decimais': decimais, 'outros': outros}
+
+
+def resultado_de_dict(
+    cls: type[SimulacaoResultadoBase],
+    dados: dict
+) -> SimulacaoResultadoBase:
+    """
+    Reconstrói um resultado salvo com resultado_para_dict.
+    """
+    sim_res = cls()
+    for k, v in dados['decimais'].items():
+        setattr(sim_res, k, Decimal2(v))
+    for k, v in dados['outros'].items():
+        setattr(sim_res, k, v)
+
+    return sim_res
@@ -0,0 +1,211 @@
+# coding: utf-8
+"""
+Grades de prestações (prazo x valor de entrada) calculadas com NumPy.
+
+Em vez de montar a tabela parcela a parcela como TabelaAmortizacao,
+usa as fórmulas fechadas do SAC e da PRICE pra obter, de uma só vez,
+primeira prestação, última prestação e somatório das parcelas de
+qualquer combinação de valores financiados, prazos e taxas. Os
+parâmetros seguem as regras de broadcasting do NumPy.
+
+Os valores não são arredondados parcela a parcela, então podem
+diferir alguns centavos da TabelaAmortizacao.
+
+Exemplo:
+
+    grade = GradeAmortizacao.a_partir_de_resultado(
+        sim_resultado,
+        prazos=range(120, 421, 12),
+        valores_entrada=range(50000, 150001, 5000)
+    )
+    grade.price.primeira_prestacao  # matriz entradas x prazos
+"""
+__version__ = '0.3'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+from decimal import Decimal
+from typing import Iterable
+
+import numpy as np
+
+from simovel.config.geral import Amortizacao as CfgAmortizacao
+from simovel.sims.amortizacao import (
+    SistemaAmortizacao,
+    calibrar_taxa_mensal
+)
+from simovel.sims.base import SimulacaoResultadoBase
+
+
+class PrestacoesGrade:
+    """
+    Matrizes de primeira prestação, última prestação e somatório das
+    parcelas de um sistema de amortização.
+    """
+    def __init__(
+        self,
+        sistema: SistemaAmortizacao,
+        primeira_prestacao: np.ndarray,
+        ultima_prestacao: np.ndarray,
+        somatorio_parcelas: np.ndarray
+    ) -> None:
+        self.sistema = sistema
+        self.primeira_prestacao = primeira_prestacao
+        self.ultima_prestacao = ultima_prestacao
+        self.somatorio_parcelas = somatorio_parcelas
+
+    def para_dict(self) -> dict:
+        return {
+            'primeira_prestacao': np.round(self.primeira_prestacao, 2).tolist(),
+            'ultima_prestacao': np.round(self.ultima_prestacao, 2).tolist(),
+            'somatorio_parcelas': np.round(self.somatorio_parcelas, 2).tolist(),
+        }
+
+
+def _calcular_sac(p, n, i, mip, encargos_fixos) -> PrestacoesGrade:
+    amortizacao = p / n
+    # saldo antes da última parcela é igual à amortização
+    primeira = amortizacao + p * (i + mip) + encargos_fixos
+    ultima = amortizacao + amortizacao * (i + mip) + encargos_fixos
+    # soma dos saldos devedores = p * (n + 1) / 2
+    somatorio = p + (i + mip) * p * (n + 1) / 2 + n * encargos_fixos
+    return PrestacoesGrade(SistemaAmortizacao.SAC, primeira, ultima, somatorio)
+
+
+def _calcular_price(p, n, i, mip, encargos_fixos) -> PrestacoesGrade:
+    sem_juros = i == 0
+    # evita divisão por zero, o resultado de i == 0 é tratado à parte
+    i_ = np.where(sem_juros, 1.0, i)
+    fator = (1 + i_) ** n
+    pmt = np.where(sem_juros, p / n, p * i_ * fator / (fator - 1))
+
+    # soma dos saldos devedores antes de cada parcela
+    g = (fator - 1) / i_
+    soma_saldos = np.where(
+        sem_juros,
+        p * (n + 1) / 2,
+        p * g - pmt * (g - n) / i_
+    )
+    saldo_ultima = np.where(sem_juros, p / n, pmt / (1 + i_))
+
+    primeira = pmt + p * mip + encargos_fixos
+    ultima = pmt + saldo_ultima * mip + encargos_fixos
+    somatorio = n * pmt + mip * soma_saldos + n * encargos_fixos
+    return PrestacoesGrade(
+        SistemaAmortizacao.PRICE, primeira, ultima, somatorio
+    )
+
+
+class GradeAmortizacao:
+    """
+    Prestações SAC e PRICE de todas as combinações de valor financiado,
+    prazo (meses) e taxa de juros mensal.
+    """
+    def __init__(
+        self,
+        valores_financiamento: np.ndarray | Iterable[float] | float,
+        prazos: np.ndarray | Iterable[int] | int,
+        taxas_juros_mes: np.ndarray | Iterable[float] | float,
+        valor_imovel: float = 0.,
+        taxa_mip_mes: float = float(CfgAmortizacao.TAXA_MIP_MES),
+        taxa_dfi_mes: float = float(CfgAmortizacao.TAXA_DFI_MES),
+        taxa_administracao: float = float(CfgAmortizacao.TAXA_ADMINISTRACAO)
+    ) -> None:
+        p, n, i = np.broadcast_arrays(
+            np.asarray(valores_financiamento, dtype=np.float64),
+            np.asarray(prazos, dtype=np.float64),
+            np.asarray(taxas_juros_mes, dtype=np.float64)
+        )
+        if np.any(n <= 0):
+            raise ValueError('Prazo precisa ser maior que zero.')
+
+        self.valores_financiamento = p
+        self.prazos = n
+        self.taxas_juros_mes = i
+
+        encargos_fixos = valor_imovel * taxa_dfi_mes + taxa_administracao
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            self.sac = _calcular_sac(p, n, i, taxa_mip_mes, encargos_fixos)
+            self.price = _calcular_price(p, n, i, taxa_mip_mes, encargos_fixos)
+
+        # (1 + i) ** n estoura com prazos ou taxas muito grandes
+        for prestacoes in (self.sac, self.price):
+            if not all(
+                np.all(np.isfinite(matriz)) for matriz in (
+                    prestacoes.primeira_prestacao,
+                    prestacoes.ultima_prestacao,
+                    prestacoes.somatorio_parcelas
+                )
+            ):
+                raise ValueError(
+                    'Prazo ou taxa de juros grande demais pro cálculo.'
+                )
+
+    @classmethod
+    def prazo_x_entrada(
+        cls,
+        valor_imovel: float,
+        prazos: Iterable[int],
+        valores_entrada: Iterable[float],
+        taxa_juros_mes: float,
+        **kwargs
+    ) -> 'GradeAmortizacao':
+        """
+        Grade com uma linha por valor de entrada e uma coluna por prazo.
+
+        Raises:
+            ValueError: valor de entrada negativo ou igual/acima do
+              valor do imóvel (nada a financiar).
+        """
+        entradas = np.asarray(list(valores_entrada), dtype=np.float64)
+        if np.any(entradas >= valor_imovel):
+            raise ValueError(
+                'Valor de entrada precisa ser menor que o valor do imóvel.'
+            )
+        if np.any(entradas < 0):
+            raise ValueError('Valor de entrada não pode ser negativo.')
+
+        prazos = np.asarray(list(prazos), dtype=np.float64)
+        return cls(
+            (valor_imovel - entradas)[:, np.newaxis],
+            prazos[np.newaxis, :],
+            taxa_juros_mes,
+            valor_imovel=valor_imovel,
+            **kwargs
+        )
+
+    @classmethod
+    def a_partir_de_resultado(
+        cls,
+        sim_res: SimulacaoResultadoBase,
+        prazos: Iterable[int],
+        valores_entrada: Iterable[float],
+        **kwargs
+    ) -> 'GradeAmortizacao':
+        """
+        Grade prazo x entrada usando a taxa calibrada a partir de um
+        resultado real (ex: SimulacaoResultadoCaixa).
+        """
+        valor_imovel = Decimal(sim_res._valor_imovel)
+        taxa = calibrar_taxa_mensal(
+            Decimal(sim_res._valor_financiamento),
+            sim_res._prazo,
+            Decimal(sim_res._primeira_prestacao),
+            SistemaAmortizacao.a_partir_de_texto(sim_res.sistema_amortizacao),
+            valor_imovel
+        )
+        return cls.prazo_x_entrada(
+            float(valor_imovel), prazos, valores_entrada, float(taxa),
+            **kwargs
+        )
+
+    def obter(self, sistema: SistemaAmortizacao) -> PrestacoesGrade:
+        if sistema == SistemaAmortizacao.SAC:
+            return self.sac
+        return self.price
+
+    def para_dict(self) -> dict:
+        return {
+            SistemaAmortizacao.SAC.value: self.sac.para_dict(),
+            SistemaAmortizacao.PRICE.value: self.price.para_dict(),
+        }
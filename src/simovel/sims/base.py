@@ -4,15 +4,16 @@
 
 from __future__ import annotations
 
-__version__ = '0.11'
+__version__ = '0.17'
 __author__ = 'Vanduir Santana Medeiros'
 
 from enum import Enum, auto
 from decimal import Decimal
 from datetime import date, timedelta
+import json
 import requests
 from abc import ABC, abstractmethod
-from typing import Self
+from typing import Callable, Self
 
 from simovel.util import (
     Decimal2,
@@ -20,7 +21,8 @@ from simovel.util import (
     Fone,
     FoneTam,
     data_eh_valida,
-    email_valido
+    email_valido,
+    remover_acentos
 )
 from simovel.exceptions import (
     ErroEmail,
@@ -42,6 +44,13 @@ from simovel.config.geral import (
     Parametros, Itau as CfgItau, Bradesco as ConfigBradesco
 )
 from simovel.config.geral import Santander as CfgSantander
+from simovel.cache import ChamadaCompartilhada
+from simovel.config.geral import Http as CfgHttp, Loft as CfgLoft
+from simovel.replay.gravacao import hooks_requests, resolver_url
+from simovel.sims.disjuntor import chamada_host
+from simovel.metricas import extracao
+from simovel.sims.sessao_http import obter_sessao
+from simovel.sims.cache_resultados import obter_cache_resultados
 
 
 UFS = (
@@ -78,6 +87,22 @@ class TipoFinanciamento(Enum):
 #    HTML = auto()           # gera uma página html
 
 
+def _fone_itau(v: str) -> Fone:
+    fone = Fone.a_partir_de_fmt_somente_numeros_sem_ddi(v)
+    # não aceita sem o 9 adicional
+    if len(fone.valor) < FoneTam.DDD_CELULAR_NORMAL.value:
+        raise ErroCelular('Celular com o tamanho errado.')
+    return fone
+
+
+# formato do celular aceito por banco, os demais usam o formato comum
+FORMATOS_CELULAR: dict[Banco, Callable[[str], Fone]] = {
+    Banco.CAIXA: Fone.a_partir_de_fmt_caixa,
+    Banco.ITAU: _fone_itau,
+    Banco.ITAU_L: _fone_itau,
+}
+
+
 class SimuladorBase(ABC):
     URL1 = ''
     URL2 = ''
@@ -96,7 +121,7 @@ class SimuladorBase(ABC):
         self._prazo_min: int
         
         if self.banco != Banco.BRADESCO:
-            self._praxo_min = 1
+            self._prazo_min = 1
         else:
             self._prazo_min = ConfigBradesco.PRAZO_MIN
 
@@ -189,18 +214,10 @@ class SimuladorBase(ABC):
 
     @celular.setter
     def celular(self, v):
+        formato = FORMATOS_CELULAR.get(self._banco, Fone.a_partir_de_fmt_comum)
         fone: Fone
         try:
-            match self._banco:
-                case Banco.CAIXA:
-                    fone = Fone.a_partir_de_fmt_caixa(v)
-                case (Banco.ITAU | Banco.ITAU_L):
-                    fone = Fone.a_partir_de_fmt_somente_numeros_sem_ddi(v)
-                    # não aceita sem o 9 adicional
-                    if len(fone.valor) < FoneTam.DDD_CELULAR_NORMAL.value:
-                        raise ErroCelular('Celular com o tamanho errado.')
-                case _:
-                    fone = Fone.a_partir_de_fmt_comum(v)
+            fone = formato(v)
         except ValueError as erro:
             self._celular = ''
             raise ErroCelular(f'{erro}')
@@ -537,6 +554,13 @@ class SimuladorBase(ABC):
     #     print(f'{prestacao=}')
 
 
+# respostas da Loft por perfil, ver SimuladorBaseL._obter_json_simulacao
+chamadas_loft = ChamadaCompartilhada(
+    tamanho_max=CfgLoft.CACHE_TAMANHO,
+    ttl=CfgLoft.CACHE_TTL
+)
+
+
 class SimuladorBaseL(SimuladorBase):
     """
     Implementação simulador de crédito imobiliário Itaú e Santander
@@ -546,6 +570,8 @@ class SimuladorBaseL(SimuladorBase):
         'https://credit-bff.loft.com.br/mortgage-simulation/'
         'potential_with_bank_rates'
     )
+    # segundos, as novas tentativas ficam com a sessão (sessao_http)
+    TIMEOUT = 30
 
     def __init__(
         self,
@@ -651,53 +677,115 @@ class SimuladorBaseL(SimuladorBase):
         Returns:
             list: contem os banco(s) com o(s) resultado(s) da simulação.
         """
-        headers: dict = self._obter_headers()
-        payload: dict = self._obter_payload()
-
-        r = requests.post(self.URL, json=payload, headers=headers)
-        json: dict = r.json()
-
-        if not json:
-            raise ErroResultadoSimulacao('Resultado da simulação vazio.')
-        elif not 'banksSimulation' in json and 'statusCode' in json:
-            raise ErroResultadoSimulacao(
-                'Resultado da simulação retornou erro.'
-            )
+        resposta: dict = self._obter_json_simulacao()
 
-        resultados: list[dict] = []
         T_ITAU, T_SANTANDER = 'Itaú', 'Santander'
 
+        bancos: list[str]
         if self._banco == Banco.ITAU_L:
-            resultados.append(json['banksSimulation'][2])
-            if resultados[0]['bankProvider'] != T_ITAU:
-                raise ErroResultadoSimulacao(
-                    f'Banco {T_ITAU} não encontrado no resultado '
-                    f'da simulação.'
-                )
+            bancos = [T_ITAU]
         elif self._banco == Banco.SANTANDER:
-            resultados.append(json['banksSimulation'][3])
-            if resultados[0]['bankProvider'] != T_SANTANDER:
-                raise ErroResultadoSimulacao(
-                    f'Banco {T_SANTANDER} não encontrado no resultado '
-                    f'da simulação.'
-                )
+            bancos = [T_SANTANDER]
         elif self._banco == Banco.ITAU_E_SANTANDER_L:
-            resultados.append(json['banksSimulation'][2])
-            resultados.append(json['banksSimulation'][3])
-            if resultados[0]['bankProvider'] != T_ITAU \
-               or resultados[1]['bankProvider'] != T_SANTANDER:
-                raise ErroResultadoSimulacao(
-                    f'Banco {T_ITAU} ou {T_SANTANDER} não encontrado no '
-                    f'resultado da simulação.'
-                )
+            bancos = [T_ITAU, T_SANTANDER]
         else:
             raise ErroResultadoSimulacao(
                 f'Banco {self._banco} não implementado no resultado '
                 f'da simulação.'
             )
 
-        return resultados
-    
+        return [
+            self._procurar_banco(resposta.get('banksSimulation') or [], banco)
+            for banco in bancos
+        ]
+
+    @staticmethod
+    @extracao('loft', 'banco')
+    def _procurar_banco(bancos: list[dict], nome: str) -> dict:
+        """
+        Resultado do banco em banksSimulation pelo bankProvider (a
+        posição na lista pode mudar).
+
+        Raises:
+            ErroResultadoSimulacao: banco não encontrado.
+        """
+        nome_normalizado = remover_acentos(nome)
+        for banco in bancos:
+            if remover_acentos(banco.get('bankProvider') or '') == nome_normalizado:
+                return banco
+
+        raise ErroResultadoSimulacao(
+            f'Banco {nome} não encontrado no resultado da simulação.'
+        )
+
+    def _chave_chamada(self, payload: dict) -> str:
+        """
+        Payload normalizado, sem nome e e-mail: a resposta da Loft só
+        depende dos valores, prazo e data de nascimento.
+        """
+        chave = {**payload, 'user': {
+            k: v for k, v in payload['user'].items()
+            if k not in ('name', 'email')
+        }}
+        return json.dumps(chave, sort_keys=True, separators=(',', ':'))
+
+    def _obter_json_simulacao(self) -> dict:
+        """
+        Resposta da Loft com todos os bancos. Chamadas simultâneas (ex:
+        Itaú e Santander do mesmo usuário) pro mesmo perfil fazem uma
+        só requisição e a resposta fica em cache por Loft.CACHE_TTL.
+        Respostas válidas também vão pro cache de resultados (origem
+        'loft').
+
+        Raises:
+            ErroResultadoSimulacao: falha na requisição, sem nenhum
+                retorno ou resultado da simulação retornou erro.
+        """
+        headers: dict = self._obter_headers()
+        payload: dict = self._obter_payload()
+        chave: str = self._chave_chamada(payload)
+
+        def requisitar() -> dict:
+            cache = obter_cache_resultados()
+            if cache is not None:
+                resposta = cache.obter('loft', chave)
+                if resposta is not None:
+                    return resposta
+
+            url: str = resolver_url(self.URL)
+            try:
+                with chamada_host(url, 'simulacao') as chamada:
+                    r = obter_sessao(url).post(
+                        url,
+                        json=payload,
+                        headers=headers,
+                        timeout=(CfgHttp.TIMEOUT_CONEXAO, self.TIMEOUT),
+                        hooks=hooks_requests()
+                    )
+                    if r.status_code >= 500:
+                        chamada.falhou()
+                resposta: dict = r.json()
+            except (requests.RequestException, ValueError) as erro:
+                raise ErroResultadoSimulacao(
+                    f'Falha na requisição da simulação: {erro}'
+                )
+
+            if not resposta:
+                raise ErroResultadoSimulacao('Resultado da simulação vazio.')
+            elif not 'banksSimulation' in resposta and 'statusCode' in resposta:
+                raise ErroResultadoSimulacao(
+                    'Resultado da simulação retornou erro.'
+                )
+
+            if cache is not None:
+                cache.guardar('loft', chave, resposta)
+            return resposta
+
+        if not CfgLoft.CHAMADA_COMPARTILHADA_HABILITADA:
+            return requisitar()
+
+        return chamadas_loft.executar(chave, requisitar)
+
 
 class SimuladorItauSantanderL(SimuladorBaseL):
     """
@@ -4,18 +4,27 @@
 """
 
 __author__ = 'Vanduir Santana Medeiros'
-__version__ = '0.10'
+__version__ = '0.17'
 
 
 from datetime import date
 from decimal import Decimal
 from bs4 import BeautifulSoup
 import requests
-import time
 from simovel.sims.base import Banco, SimuladorBase, SimulacaoResultadoBase
 from simovel.sims.base import TipoFinanciamento
-from simovel.config.geral import Parametros
+from simovel.config.geral import Parametros, Bradesco as CfgBradesco
+from simovel.config.geral import Http as CfgHttp
+from simovel.cache import CacheTTL
 from simovel.config import geral as config_geral
+from simovel.replay.gravacao import hooks_requests, resolver_url
+from simovel.sims.disjuntor import chamada_host
+from simovel.log import obter_logger
+from simovel.metricas import extracao
+from simovel.sims.sessao_http import obter_sessao
+from simovel.sims.cache_resultados import obter_cache_resultados
+from simovel.sims.modelo import RequisicaoSimulacao, ResultadoSimulacao
+from simovel.sims.registro import registrar_fabrica
 from enum import Enum, auto
 from simovel.exceptions import ErroDataNascimento, ErroDataNascimentoConjuge
 from simovel.exceptions import ErroFinanciarDespesas, ErroFormaPagamentoInvalida
@@ -26,6 +35,9 @@ from simovel.exceptions import ErroValorMaxFinanciamento, ErroResultadoCampoNaoR
 from simovel.util import Decimal2, Cpf, data_eh_valida
 
 
+log = obter_logger(__name__)
+
+
 class TipoImovel(Enum):
     RESIDENCIAL_POUPANCA = 14   # RESIDENCIAL POUPANCA
     RESIDENCIAL = 1             # RESIDENCIAL
@@ -73,10 +85,19 @@ class Interacao(Enum):
     SIMULAR = auto()
 
 
+# __VIEWSTATE depois de cada prefixo de _interagir_parte1, ver
+# SimuladorBradesco._passos_parte1
+cache_viewstate = CacheTTL(
+    tamanho_max=CfgBradesco.CACHE_VIEWSTATE_TAMANHO,
+    ttl=CfgBradesco.CACHE_VIEWSTATE_TTL
+)
+
+
 class SimuladorBradesco(SimuladorBase):
     URL1 = 'https://wspf.banco.bradesco/CRIM/Simulacao.aspx'
-    REQUISICAO_AGUARDAR = 2
-    REQUISICAO_TENTATIVAS = 3
+    # segundos, as novas tentativas ficam com a sessão (sessao_http)
+    TIMEOUT_PAGINA_INICIAL = 5
+    TIMEOUT_INTERACAO = 10
 
     def __init__(self) -> None:
         super().__init__(banco=Banco.BRADESCO)
@@ -110,6 +131,11 @@ class SimuladorBradesco(SimuladorBase):
 
         self._simulacao_resultado: SimulacaoResultadoBradesco = None
 
+        # cache de resultados, só com a_partir_valor_financiamento
+        self._entradas_cache: dict | None = None
+        self._simulacao_cache: dict | None = None
+        self._html_simulacao: str = ''
+
     @classmethod
     def a_partir_valor_financiamento(cls, tipo_imovel: TipoImovel,
             situacao_imovel: SituacaoImovel, valor_imovel: str | Decimal2,
@@ -156,8 +182,16 @@ class SimuladorBradesco(SimuladorBase):
         if somar_renda_conjuge:
             sim_bradesco.data_nascimento_conjuge = data_nascimento_conjuge
 
+        sim_bradesco._entradas_cache = sim_bradesco._entradas_simulacao(
+            valor_financiamento, prazo, cpf, financiar_despesas,
+            sistema_amortizacao, forma_pagamento, seguradora
+        )
+        # simulação em cache: só refaz as validações, sem interagir
+        em_cache: bool = sim_bradesco._restaurar_simulacao_cache()
+
         # interagi com o bradesco desde o attr tipo_imovel até dt_nasc
-        sim_bradesco._interagir_parte1()
+        if not em_cache:
+            sim_bradesco._interagir_parte1()
 
         if not valor_financiamento:
             valor_financiamento = sim_bradesco.valor_max_financiamento
@@ -167,7 +201,8 @@ class SimuladorBradesco(SimuladorBase):
             raise
         except ErroValorMaxFinanciamento:
             raise 
-        sim_bradesco._interagir(Interacao.VALOR_FINANCIAMENTO)
+        if not em_cache:
+            sim_bradesco._interagir(Interacao.VALOR_FINANCIAMENTO)
 
         if not prazo:
             prazo = sim_bradesco._prazo_max
@@ -175,16 +210,19 @@ class SimuladorBradesco(SimuladorBase):
             sim_bradesco.prazo = prazo
         except ErroPrazo:
             raise
-        sim_bradesco._interagir(Interacao.PRAZO)
+        if not em_cache:
+            sim_bradesco._interagir(Interacao.PRAZO)
 
         sim_bradesco.financiar_despesas = financiar_despesas
-        sim_bradesco._interagir(Interacao.FINANCIAR_DESPESAS)
+        if not em_cache:
+            sim_bradesco._interagir(Interacao.FINANCIAR_DESPESAS)
 
         sim_bradesco.cpf = cpf
         sim_bradesco.sistema_amortizacao = sistema_amortizacao
         sim_bradesco.forma_pagamento = forma_pagamento
         sim_bradesco.seguradora = seguradora
-        sim_bradesco._interagir(Interacao.PARTE_FINAL)
+        if not em_cache:
+            sim_bradesco._interagir(Interacao.PARTE_FINAL)
 
         #sim_bradesco._interagir(Interacao.SIMULAR)
         
@@ -360,28 +398,99 @@ class SimuladorBradesco(SimuladorBase):
         if self._somar_renda_conjuge and not self._data_nascimento_conjuge:
             raise ErroDataNascimentoConjuge('É preciso preencher data nascimento do cônjuge.')
 
-        if not self._viewstate:
-            if not self._obter_viewstate_ini():
-                # TODO: implementar log e mensage de erro
-                pass
-
-        if not self._interagir(Interacao.UF):
-            pass
-        if not self._interagir(Interacao.TIPO_IMOVEL):
-            pass
-        if not self._interagir(Interacao.SITUACAO_IMOVEL):
-            pass
-        if not self._interagir(Interacao.VALOR_IMOVEL):
-            pass
-        if not self._interagir(Interacao.SOMAR_RENDA_CONJUGE):
-            pass
-        if not self._interagir(Interacao.DATA_NASC):
-            pass
+        passos = self._passos_parte1()
+        inicio: int = self._restaurar_viewstate_cache(passos)
+        if not self._executar_passos_parte1(passos, inicio) and inicio:
+            # __VIEWSTATE em cache não foi aceito, refaz do início
+            log.info(
+                '__VIEWSTATE do cache recusado, interagindo desde o início'
+            )
+            for _, chave in passos:
+                cache_viewstate.remover(chave)
+            self._viewstate = ''
+            self._executar_passos_parte1(passos, 0)
+
+    def _passos_parte1(self) -> list[tuple[Interacao | None, tuple]]:
+        """Interações da primeira parte com a chave do cache de cada
+        uma: as entradas consumidas até ela. O primeiro passo (None) é
+        a página inicial, que não depende de entrada nenhuma.
+        """
+        entradas: list[tuple[Interacao, object]] = [
+            (Interacao.UF, self.uf),
+            (Interacao.TIPO_IMOVEL, self.tipo_imovel.value),
+            (Interacao.SITUACAO_IMOVEL, self.situacao_imovel.value),
+            (Interacao.VALOR_IMOVEL, self._valor_imovel.valor),
+            (Interacao.SOMAR_RENDA_CONJUGE, self._somar_renda_conjuge),
+            (Interacao.DATA_NASC, self._data_nascimento),
+        ]
         if self._somar_renda_conjuge:
-            if not self._interagir(Interacao.DATA_NASC_CONJUGE):
-                pass
-        if not self._interagir(Interacao.A_PARTIR_VALOR_FINANCIAMENTO):
-            pass
+            entradas.append(
+                (Interacao.DATA_NASC_CONJUGE, self._data_nascimento_conjuge)
+            )
+        entradas.append((Interacao.A_PARTIR_VALOR_FINANCIAMENTO, None))
+
+        chave: tuple = ()
+        passos: list[tuple[Interacao | None, tuple]] = [(None, chave)]
+        for campo, valor in entradas:
+            chave = chave + ((campo.name, valor),)
+            passos.append((campo, chave))
+
+        return passos
+
+    def _restaurar_viewstate_cache(
+        self,
+        passos: list[tuple[Interacao | None, tuple]]
+    ) -> int:
+        """Procura o __VIEWSTATE do passo mais adiantado em cache.
+
+        Returns:
+            int: índice do próximo passo a executar, 0 quando não tiver
+            nada em cache.
+        """
+        if not CfgBradesco.CACHE_VIEWSTATE_HABILITADO:
+            return 0
+
+        for i in range(len(passos) - 1, -1, -1):
+            item = cache_viewstate.obter(passos[i][1])
+            if item is None:
+                continue
+            self._viewstate, valor_max_financiamento = item
+            if valor_max_financiamento is not None:
+                self._valor_max_financiamento = valor_max_financiamento
+            return i + 1
+
+        return 0
+
+    def _executar_passos_parte1(
+        self,
+        passos: list[tuple[Interacao | None, tuple]],
+        inicio: int
+    ) -> bool:
+        """Executa as interações a partir de inicio, guardando o
+        __VIEWSTATE de cada passo no cache.
+
+        Returns:
+            bool: False quando algum passo não retornou __VIEWSTATE.
+        """
+        for campo, chave in passos[inicio:]:
+            if campo is None:
+                if not self._viewstate and not self._obter_viewstate_ini():
+                    # TODO: implementar log e mensage de erro
+                    return False
+            elif not self._interagir(campo) or not self._viewstate:
+                return False
+
+            if CfgBradesco.CACHE_VIEWSTATE_HABILITADO:
+                valor_max_financiamento = (
+                    self._valor_max_financiamento
+                    if campo is Interacao.A_PARTIR_VALOR_FINANCIAMENTO
+                    else None
+                )
+                cache_viewstate.definir(
+                    chave, (self._viewstate, valor_max_financiamento)
+                )
+
+        return True
 
     def _obter_viewstate_ini(self) -> bool:
         """O simulador Bradesco passa entre as interações um parâmetro
@@ -394,26 +503,23 @@ class SimuladorBradesco(SimuladorBase):
         """
         self._viewstate = ''
 
-        eh_timeout: bool
-        eh_erro_conexao: bool
-        for i in range(self.REQUISICAO_TENTATIVAS):
-            eh_timeout = False
-            eh_erro_conexao = False
-            try:
-                r = requests.get(self.URL1, timeout=5)
-                break
-            except requests.Timeout:
-                # TODO: log e alerta
-                eh_timeout = True
-                print(f'TIMEOUT em _obter_viewstate_ini, aguardando {self.REQUISICAO_AGUARDAR}s...')
-                time.sleep(self.REQUISICAO_AGUARDAR)
-                print('Tentando novamente...')
-            except requests.ConnectionError:
-                eh_erro_conexao = True
-            
-        if eh_timeout or eh_erro_conexao:
-            # TODO: log e alerta
-            print(f'Problema em _obter_view_state_ini depois de tentar {self.TENTATIVAS}.')
+        url: str = resolver_url(self.URL1)
+        try:
+            with chamada_host(url, 'PAGINA_INICIAL') as chamada:
+                r = obter_sessao(url).get(
+                    url,
+                    timeout=(CfgHttp.TIMEOUT_CONEXAO,
+                             self.TIMEOUT_PAGINA_INICIAL),
+                    hooks=hooks_requests()
+                )
+                if r.status_code >= 500:
+                    chamada.falhou()
+        except requests.RequestException as erro:
+            # TODO: alerta
+            log.error(
+                'Problema em _obter_viewstate_ini depois de tentar %s vezes',
+                CfgHttp.TENTATIVAS, erro=str(erro)
+            )
             return False
 
         html: str = r.text
@@ -439,9 +545,10 @@ class SimuladorBradesco(SimuladorBase):
             bool: True quando conseguir obter o _viewstate com sucesso
         """
         if not self._viewstate:
-            # TODO: implementar log
-            print('#' * 100)
-            print('Não foi definido o _viewstate inicial, executar _obter_viewstate_ini.')
+            log.warning(
+                'Não foi definido o _viewstate inicial, executar '
+                '_obter_viewstate_ini'
+            )
             return False
 
         extrair_valor_max_financiamento: bool = False
@@ -926,28 +1033,24 @@ class SimuladorBradesco(SimuladorBase):
                         }
                     )
 
-        eh_timeout: bool
-        eh_erro_conexao: bool
-        for i in range(self.REQUISICAO_TENTATIVAS):
-            eh_timeout = False
-            eh_erro_conexao = False
-            try:
-                r = requests.post(
-                    self.URL1, data=payload, headers=headers, timeout=10
+        url: str = resolver_url(self.URL1)
+        try:
+            with chamada_host(url, campo.name) as chamada:
+                r = obter_sessao(url).post(
+                    url,
+                    data=payload,
+                    headers=headers,
+                    timeout=(CfgHttp.TIMEOUT_CONEXAO, self.TIMEOUT_INTERACAO),
+                    hooks=hooks_requests()
                 )
-                break
-            except requests.Timeout:
-                # TODO: log e alerta
-                eh_timeout = True
-                print(f'TIMEOUT em _interagir, aguardando {self.REQUISICAO_AGUARDAR}s...')
-                time.sleep(self.REQUISICAO_AGUARDAR)
-                print('Tentando novamente...')
-            except requests.ConnectionError:
-                eh_erro_conexao = True
-            
-        if eh_timeout or eh_erro_conexao:
-            # TODO: log e alerta
-            print(f'Problema em _obter_view_state_ini depois de tentar {self.TENTATIVAS}.')
+                if r.status_code >= 500:
+                    chamada.falhou()
+        except requests.RequestException as erro:
+            # TODO: alerta
+            log.error(
+                'Problema em _interagir depois de tentar %s vezes',
+                CfgHttp.TENTATIVAS, campo=campo.name, erro=str(erro)
+            )
             return False
 
         html: str = r.text
@@ -963,9 +1066,11 @@ class SimuladorBradesco(SimuladorBase):
             self._extrair_btn_simular(html)
         if extrair_simulacao:
             self._extrair_simulacao(html)
+            self._html_simulacao = html
 
         return True
     
+    @extracao('bradesco', 'viewstate')
     def _extrair_viewstate_response(self, txt: str) -> str:
         """O parâmetro __VIEWSTATE é essencial pras interações fica no
         final de cada response, na última linha.
@@ -998,9 +1103,7 @@ class SimuladorBradesco(SimuladorBase):
             )
             self._setar_valor_max_financiamento(valor_max_financiamento)
         else:
-            # TODO:  implementar log
-            print('#' * 100)
-            print('Span com o valor máx. do financiamento NÃO encontrado.')
+            log.warning('Span com o valor máx. do financiamento NÃO encontrado')
     
     def _extrair_prazo_max(self, html: str) -> None:
         bs = BeautifulSoup(html, 'html.parser')
@@ -1008,9 +1111,9 @@ class SimuladorBradesco(SimuladorBase):
         if el_span:
             self.prazo_max  = el_span.text
         else:
-            # TODO: implementar log
-            print('Span com o vlaor do prazo máxi. NÃO encontrado.')
+            log.warning('Span com o valor do prazo máx. NÃO encontrado')
     
+    @extracao('bradesco', 'parametros_finais')
     def _extrair_parametros_finais(self, html: str) -> bool:
         bs = BeautifulSoup(html, 'html.parser')
         el_table_financiar_despesas = bs.find(
@@ -1073,9 +1176,82 @@ class SimuladorBradesco(SimuladorBase):
         return True
 
     def simular(self) -> 'SimulacaoResultadoBradesco':
+        if self._simulacao_cache is not None:
+            self._extrair_simulacao(self._simulacao_cache['html'])
+            return self._simulacao_resultado
+
         if self._interagir(Interacao.SIMULAR):
+            self._guardar_simulacao_cache()
             return self._simulacao_resultado
 
+    def _entradas_simulacao(
+        self,
+        valor_financiamento: str | Decimal2,
+        prazo: int,
+        cpf: str | Cpf,
+        financiar_despesas: bool,
+        sistema_amortizacao: SistemaAmortizacao,
+        forma_pagamento: FormaPagamento,
+        seguradora: Seguradora
+    ) -> dict:
+        """Entradas de a_partir_valor_financiamento pro cache de
+        resultados. Valor e prazo do financiamento vão como recebidos:
+        vazios (máximo) não dependem do valor máximo retornado.
+        """
+        return {
+            'uf': self.uf,
+            'tipo_imovel': self.tipo_imovel,
+            'situacao_imovel': self.situacao_imovel,
+            'valor_imovel': self._valor_imovel.valor,
+            'somar_renda_conjuge': self._somar_renda_conjuge,
+            'data_nascimento': self._data_nascimento,
+            'data_nascimento_conjuge': (
+                self._data_nascimento_conjuge
+                if self._somar_renda_conjuge else None
+            ),
+            'valor_financiamento': valor_financiamento or None,
+            'prazo': prazo or None,
+            'cpf': cpf,
+            'financiar_despesas': financiar_despesas,
+            'sistema_amortizacao': sistema_amortizacao,
+            'forma_pagamento': forma_pagamento,
+            'seguradora': seguradora,
+        }
+
+    def _restaurar_simulacao_cache(self) -> bool:
+        """Com a simulação em cache restaura os máximos retornados pelo
+        banco, que validam valor e prazo do financiamento.
+
+        Returns:
+            bool: True quando encontrou a simulação no cache.
+        """
+        cache = obter_cache_resultados()
+        if cache is None or self._entradas_cache is None:
+            return False
+
+        simulacao = cache.obter('bradesco', self._entradas_cache)
+        if simulacao is None:
+            return False
+
+        self._valor_max_financiamento = Decimal2(
+            Decimal(simulacao['valor_max_financiamento'])
+        )
+        self._prazo_max = simulacao['prazo_max']
+        self._simulacao_cache = simulacao
+        return True
+
+    def _guardar_simulacao_cache(self) -> None:
+        cache = obter_cache_resultados()
+        if cache is None or self._entradas_cache is None:
+            return
+
+        cache.guardar('bradesco', self._entradas_cache, {
+            'html': self._html_simulacao,
+            'valor_max_financiamento': str(self._valor_max_financiamento.valor),
+            'prazo_max': self._prazo_max,
+        })
+
+    @extracao('bradesco', 'simulacao')
     def _extrair_simulacao(self, html: str) -> bool:
         self._simulacao_resultado = SimulacaoResultadoBradesco(html)
 
@@ -1208,6 +1384,24 @@ class SimulacaoResultadoBradesco(SimulacaoResultadoBase):
         )
 
 
+@registrar_fabrica(Banco.BRADESCO)
+def simular_requisicao(req: RequisicaoSimulacao) -> ResultadoSimulacao:
+    """Simula a partir do valor máximo do financiamento."""
+    somar_renda_conjuge = bool(req.data_nascimento_conjuge)
+    sim = SimuladorBradesco.a_partir_valor_financiamento(
+        tipo_imovel=TipoImovel.RESIDENCIAL_POUPANCA,
+        situacao_imovel=SituacaoImovel.NOVO,
+        valor_imovel=req.valor_imovel,
+        somar_renda_conjuge=somar_renda_conjuge,
+        data_nascimento=req.data_nascimento,
+        data_nascimento_conjuge=req.data_nascimento_conjuge or None,
+        valor_financiamento='',
+        prazo=req.prazo,
+        cpf=req.cpf
+    )
+    return ResultadoSimulacao.a_partir_de(Banco.BRADESCO, sim.simular(), sim)
+
+
 def test1():
     sim_brad = SimuladorBradesco()
     print(f'{sim_brad._obter_viewstate_ini()=}')
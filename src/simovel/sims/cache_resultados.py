@@ -0,0 +1,209 @@
+# coding: utf-8
+"""
+Cache dos resultados das simulações.
+
+Voltar nos menus do Multi360 (alterar dados, resultado) repete
+simulações com as mesmas entradas, cada uma refazendo toda a conversa
+com o banco. Aqui fica guardada a resposta bruta do banco (html/DWR da
+Caixa, html do Bradesco, json da Loft) pelo hash das entradas que
+influenciam a simulação, e o simulador só refaz a extração, que é
+local. Guardar a resposta, e não o objeto do resultado, mantém o cache
+serializável e independente do objeto simulador.
+
+Cada origem ('caixa', 'bradesco', 'loft') tem o seu TTL e tamanho
+máximo em memória (LRU). Com CacheResultados.PERSISTIR as respostas
+também vão pra um SQLite e sobrevivem a reinícios.
+"""
+__version__ = '0.2'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from simovel.cache import CacheTTL
+from simovel.config.geral import CacheResultados as CfgCacheResultados
+from simovel.metricas import CACHE
+
+
+def gerar_chave(entradas: Any) -> str:
+    """Hash canônico (independe da ordem das chaves) das entradas."""
+    texto = json.dumps(
+        entradas,
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+class CacheResultados:
+    def __init__(
+        self,
+        tamanho_max: int = CfgCacheResultados.TAMANHO,
+        ttls: dict[str, float] | None = None,
+        ttl_padrao: float = CfgCacheResultados.TTL_PADRAO,
+        arquivo_sqlite: str = ''
+    ) -> None:
+        """
+        Args:
+            tamanho_max (int, optional): itens em memória por origem.
+            ttls (dict[str, float], optional): segundos por origem.
+            ttl_padrao (float, optional): origens fora de ttls.
+            arquivo_sqlite (str, optional): vazio guarda só em memória.
+        """
+        self.tamanho_max = tamanho_max
+        self.ttls = CfgCacheResultados.TTL if ttls is None else ttls
+        self.ttl_padrao = ttl_padrao
+        self._caches: dict[str, CacheTTL] = {}
+        # origem -> [acertos, falhas]
+        self._contadores: dict[str, list[int]] = {}
+        self._lock = threading.Lock()
+
+        self._conexao: sqlite3.Connection | None = None
+        self._lock_sqlite = threading.Lock()
+        if arquivo_sqlite:
+            self._conexao = sqlite3.connect(
+                arquivo_sqlite, check_same_thread=False
+            )
+            with self._lock_sqlite, self._conexao:
+                self._conexao.execute(
+                    'CREATE TABLE IF NOT EXISTS cache_resultado ('
+                    'chave TEXT PRIMARY KEY, origem TEXT NOT NULL, '
+                    'expira_em REAL NOT NULL, valor TEXT NOT NULL)'
+                )
+                self._conexao.execute(
+                    'DELETE FROM cache_resultado WHERE expira_em <= ?',
+                    (time.time(),)
+                )
+
+    def ttl(self, origem: str) -> float:
+        return self.ttls.get(origem, self.ttl_padrao)
+
+    def obter(self, origem: str, entradas: Any) -> Any | None:
+        """
+        Resposta guardada pras entradas ou None.
+        """
+        chave = gerar_chave(entradas)
+        cache = self._cache(origem)
+        valor = cache.obter(chave, contar=False)
+        if valor is None and self._conexao is not None:
+            valor, expira_em = self._obter_sqlite(origem, chave)
+            if valor is not None:
+                cache.definir(chave, valor, ttl=expira_em - time.time())
+
+        with self._lock:
+            self._contadores[origem][0 if valor is not None else 1] += 1
+        CACHE.inc(
+            cache='resultados', origem=origem,
+            resultado='acerto' if valor is not None else 'falha'
+        )
+
+        return valor
+
+    def guardar(self, origem: str, entradas: Any, valor: Any) -> None:
+        """
+        Guarda a resposta (precisa ser serializável em json quando
+        persistida).
+        """
+        chave = gerar_chave(entradas)
+        ttl = self.ttl(origem)
+        self._cache(origem).definir(chave, valor, ttl=ttl)
+        if self._conexao is None:
+            return
+
+        with self._lock_sqlite, self._conexao:
+            self._conexao.execute(
+                'INSERT OR REPLACE INTO cache_resultado '
+                '(chave, origem, expira_em, valor) VALUES (?, ?, ?, ?)',
+                (f'{origem}:{chave}', origem, time.time() + ttl,
+                 json.dumps(valor, ensure_ascii=False))
+            )
+
+    def limpar(self) -> None:
+        with self._lock:
+            for cache in self._caches.values():
+                cache.limpar()
+            for contadores in self._contadores.values():
+                contadores[:] = [0, 0]
+
+        if self._conexao is not None:
+            with self._lock_sqlite, self._conexao:
+                self._conexao.execute('DELETE FROM cache_resultado')
+
+    def fechar(self) -> None:
+        if self._conexao is not None:
+            with self._lock_sqlite:
+                self._conexao.close()
+                self._conexao = None
+
+    @property
+    def estatisticas(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                origem: {
+                    'itens': len(self._caches[origem]),
+                    'acertos': acertos,
+                    'falhas': falhas,
+                }
+                for origem, (acertos, falhas) in self._contadores.items()
+            }
+
+    def _cache(self, origem: str) -> CacheTTL:
+        with self._lock:
+            cache = self._caches.get(origem)
+            if cache is None:
+                cache = self._caches[origem] = CacheTTL(
+                    tamanho_max=self.tamanho_max, ttl=self.ttl(origem)
+                )
+                self._contadores[origem] = [0, 0]
+
+            return cache
+
+    def _obter_sqlite(
+        self,
+        origem: str,
+        chave: str
+    ) -> tuple[Any | None, float]:
+        with self._lock_sqlite:
+            linha = self._conexao.execute(
+                'SELECT valor, expira_em FROM cache_resultado '
+                'WHERE chave = ? AND expira_em > ?',
+                (f'{origem}:{chave}', time.time())
+            ).fetchone()
+
+        if linha is None:
+            return None, 0.
+
+        return json.loads(linha[0]), linha[1]
+
+
+_cache: CacheResultados | None = None
+_lock_cache = threading.Lock()
+
+
+def obter_cache_resultados() -> CacheResultados | None:
+    """
+    Cache de resultados do processo, criado na primeira chamada. None
+    quando CacheResultados.HABILITADO for False.
+    """
+    global _cache
+
+    if not CfgCacheResultados.HABILITADO:
+        return None
+
+    with _lock_cache:
+        if _cache is None:
+            _cache = CacheResultados(
+                arquivo_sqlite=(
+                    CfgCacheResultados.ARQUIVO_SQLITE
+                    if CfgCacheResultados.PERSISTIR else ''
+                )
+            )
+
+        return _cache
@@ -9,7 +9,7 @@ possível automatizar tarefas, como integrar a uma API REST ou em
 para aplicações IA como chatbots.
 """
 
-__version__ = '0.72'
+__version__ = '0.82'
 __author__ = 'Vanduir Santana Medeiros'
 
 
@@ -18,12 +18,7 @@ import gzip
 import re
 import os
 
-from urllib.request import (
-    Request,
-    build_opener,
-    HTTPCookieProcessor,
-    OpenerDirector
-)
+from urllib.request import Request, OpenerDirector
 from urllib.response import addinfourl
 import http.cookiejar
 import urllib.parse
@@ -35,15 +30,27 @@ import ngram
 
 from simovel.exceptions import *
 from simovel.util import remover_acentos
-from simovel.util import Decimal2, dwr_gerar_dwrsess, dwr_gerar_page_id
+from simovel.util import Decimal2
 from simovel.config.geral import Caixa as CfgCaixa, Parametros
 from simovel.config import layout as config_layout
 from simovel.sims.base import SimuladorBase, Banco
 from simovel.sims.base import SimulacaoResultadoBase
+from simovel.sims.caixa_sessao import SessaoCaixa, obter_pool_sessoes
+from simovel.sims import caixa_parser
+from simovel.sims.cache_resultados import obter_cache_resultados
+from simovel.sims.disjuntor import chamada_host
+from simovel.log import obter_logger
+from simovel.metricas import extracao
+from simovel.sims.modelo import RequisicaoSimulacao, ResultadoSimulacao
+from simovel.sims.registro import registrar_fabrica
+from simovel.cache import CacheTTL
 from simovel.db.session import SessionLocal
 from simovel.db.models.simulacao import CidadeModel
 
 
+log = obter_logger(__name__)
+
+
 class TipoImovel(Enum):
     RESIDENCIAL = 1
     COMERCIAL = 2
@@ -159,16 +166,21 @@ class MsgsCaixa(Enum):
     )
 
 
+# opções de financiamento por perfil, ver
+# SimuladorCaixa._chave_cache_opcoes_financiamento
+cache_opcoes_financiamento = CacheTTL(
+    tamanho_max=CfgCaixa.CACHE_OPCOES_TAMANHO,
+    ttl=CfgCaixa.CACHE_OPCOES_TTL
+)
+
+
 class SimuladorCaixa(SimuladorBase):
     """
     Comunica com os simulador da Caixa Econômica Federal para executar
     sua API (oculta) de simulação de Crédito Imobiliário retornando
     dados do resultado da simulação.
     """
-    URL0 = (
-        'https://www8.caixa.gov.br/siopiinternet-web/'
-        'simulaOperacaoInternet.do?method=inicializarCasoUso'
-    )
+    URL0 = SessaoCaixa.URL_INICIAL
     URL1 = (
         'https://www8.caixa.gov.br/siopiinternet-web/dwr/call/plaincall/'
         'SIOPIAjaxFrontController.callActionForwardMethodLista.dwr'
@@ -199,9 +211,9 @@ class SimuladorCaixa(SimuladorBase):
     #  'preencheDiv("resultadoSimulacao","aqui fica o html");'
     RE_RESULTADO_SIMULACAO = \
         r'\s*preencheDiv\("resultadoSimulacao",\s*"(.*?)"\);'
-    ARQUIVO_VERSAO = '.sim-caixa-versao'
+    ARQUIVO_VERSAO = SessaoCaixa.ARQUIVO_VERSAO
 
-    def __init__(self) -> None:
+    def __init__(self, sessao: SessaoCaixa | None = None) -> None:
         super().__init__(banco=Banco.CAIXA)
         self._tipo_imovel = TipoImovel.RESIDENCIAL
         self._tipo_financiamento = TipoFinanciamento.NOVO
@@ -218,110 +230,108 @@ class SimuladorCaixa(SimuladorBase):
         self._cidades: list[dict] = []
         self.cidades_filtro: list[str] = []
         self.cidade_indice: int = -1
-        self._versao_salva: str = ''
-        self._versao_atual: str = ''
-
-        # melhoria: inicia sessão com cookies compartilhados entre URLs
-        self._user_agent = (
-            "Mozilla/5.0 (X11; Linux x86_64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/138.0.0.0 Safari/537.36"
-        )
-        self._cookie_jar = http.cookiejar.CookieJar()
-        self._opener: OpenerDirector = build_opener(
-            HTTPCookieProcessor(self._cookie_jar)
-        )
-        self._headers_base = {
-            "User-Agent": self._user_agent,
-            "Accept": (
-                "text/html,application/xhtml+xml,application/xml;q=0.9,image/"
-                "avif,image/webp,image/apng,*/*;q=0.8,application/"
-                "signed-exchange;v=b3;q=0.7"
-            ),
-            "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-        }
-        self._iniciar_sessao()
-        self._script_session_id = self._gerar_script_session_id()
 
-    def _iniciar_sessao(self,):
+        # sessão (cookies, versão, scriptSessionId) obtida do pool de
+        # sessões pré-aquecidas na primeira chamada ao simulador
+        self._sessao: SessaoCaixa | None = sessao
+        self._user_agent = SessaoCaixa.USER_AGENT
+
+    def _iniciar_sessao(self) -> None:
         """
-        Abre página inicial do simulador sempre que instanciar classe.
-        Isso garante que os cookies serão salvos e compartilhados entre
-        as aberturas de URLs.
+        Obtém uma sessão pronta do pool de sessões. Se o pool estiver
+        desabilitado abre uma nova sessão, o que garante que os cookies
+        serão salvos e compartilhados entre as aberturas de URLs.
         """
-        req = Request(self.URL0, headers=self._headers_base)
-        html: str = ''
-        with self._opener.open(req) as response:
-            response: addinfourl
-            html = response.read().decode('latin-1')
+        if CfgCaixa.POOL_SESSOES_HABILITADO:
+            self._sessao = obter_pool_sessoes().obter()
+        else:
+            self._sessao = SessaoCaixa.criar()
 
-        # obtem versão simulador (atual e salva)
-        self._versao_salva = self._obter_versao_salva()
-        self._versao_atual = self._obter_versao_atual(html)
-        self._comparar_versoes()
-    
-    def _obter_versao_salva(self) -> str:
+        self._registrar_versao_sessao()
+
+    def _registrar_versao_sessao(self) -> None:
         """
-        Obtem versão salva localmete no arquivo de versão do simulador
-        (site).
+        Informa ao cache de opções a versão do simulador vista pela
+        sessão obtida. Se mudou, as opções guardadas com a versão anterior
+        são descartadas. O cache só conhece versões de sessões já obtidas,
+        assim uma consulta que acerta o cache não precisa de sessão.
         """
-        if not os.path.exists(self.ARQUIVO_VERSAO):
-            raise Exception(f'Favor criar arquivo {self.ARQUIVO_VERSAO}.')
+        if cache_opcoes_financiamento.validar_versao(self._versao_atual):
+            log.info(
+                'Versão do simulador mudou, cache de opções descartado',
+                versao=self._versao_atual
+            )
 
-        versao: str = ''
-        with open(self.ARQUIVO_VERSAO, 'r') as f:
-            versao = f.readline().strip()
+    def liberar_sessao(self) -> None:
+        """
+        Devolve a sessão pro pool pra ser reaproveitada por outro
+        simulador. Chamar ao final do uso do objeto.
+        """
+        if self._sessao is None:
+            return
 
-        if not versao:
-            raise Exception(f'Arquivo de versão está vazio!')
+        if CfgCaixa.POOL_SESSOES_HABILITADO:
+            obter_pool_sessoes().devolver(self._sessao)
 
-        return versao 
+        self._sessao = None
 
-    def _obter_versao_atual(self, html: str) -> str:
+    @property
+    def sessao(self) -> SessaoCaixa:
         """
-        Obtem versão a partir da página inicial do simulador (site).
-        Chamar quando estiver na fase de opções de financiamento.
+        Sessão usada nas chamadas ao simulador. É obtida apenas quando
+        necessária, assim instanciar o simulador só pra validar dados
+        não custa nenhuma requisição.
         """
-        bs = BeautifulSoup(html, 'html.parser')
-        input_versao = bs.find(
-            'input',
-            attrs={'type': 'hidden', 'name': 'versao'}
-        )
+        if self._sessao is None:
+            self._iniciar_sessao()
 
-        if not input_versao:
-            raise Exception('NÃO encontrou input com a versão!')
+        return self._sessao
 
-        if isinstance(input_versao, Tag):
-            return str(input_versao.get('value', '')).strip()
+    @property
+    def _cookie_jar(self) -> http.cookiejar.CookieJar:
+        return self.sessao.cookie_jar
 
-        raise Exception('Não conseguiu obter versão atual do simulaodr!')
+    @property
+    def _opener(self) -> OpenerDirector:
+        return self.sessao.opener
 
-    def setar_versao_arquivo(self, versao: str) -> None:
-        """
-        Seta versão em arquivo texto quando acessar URL inicial do simulador.
+    def _abrir(self, req: Request, etapa: str) -> bytes:
+        """Abre a requisição com timeout (Caixa.TIMEOUT_REQUISICAO) e
+        pelo disjuntor do host (ver simovel.sims.disjuntor).
+
+        Args:
+            etapa (str): URL1... nas métricas.
+
+        Raises:
+            ErroHostIndisponivel: disjuntor aberto ou sem vaga no host.
+
+        Returns:
+            bytes: corpo já descompactado (gzip).
         """
-        with open(self.ARQUIVO_VERSAO, 'w') as f:
-            f.write(versao)
+        with chamada_host(req.full_url, etapa):
+            with self._opener.open(
+                req, timeout=CfgCaixa.TIMEOUT_REQUISICAO
+            ) as response:
+                response: addinfourl
+                return gzip.decompress(response.read())
+
+    @property
+    def _script_session_id(self) -> str:
+        return self.sessao.script_session_id
+
+    @property
+    def _versao_salva(self) -> str:
+        return self.sessao.versao_salva
 
-    def _comparar_versoes(self) -> None:
+    @property
+    def _versao_atual(self) -> str:
+        return self.sessao.versao_atual
+
+    def setar_versao_arquivo(self, versao: str) -> None:
         """
-        Comparar versão salva com versão atual. Atualiza versão salva
-        se tiver diferente. Disparar evento quando versões forem
-        diferentes.
+        Seta versão em arquivo texto quando acessar URL inicial do simulador.
         """
-        print(f'Versão salva: "{self._versao_salva}"')
-        print(f'Versão atual: "{self._versao_atual}"')
-
-        if self._versao_atual != self._versao_salva:
-            # TODO: disparar evento para enviar e-mail avisando mudança
-            # de versão. Útil para fazer ajustes no layout
-            print('#' * 44)
-            print('Versão salva diferente da versão atual!')
-            print('#' * 44)
-            print('Salvando versão atual em arquivo...')
-            self.setar_versao_arquivo(self._versao_atual)
-            self._versao_salva = self._obter_versao_salva()
-            print(f'Versão salva: {self._versao_salva}')
+        SessaoCaixa.setar_versao_arquivo(versao)
 
     def _obter_valor_cookie(self, nome: str) -> str | None:
         """
@@ -329,30 +339,10 @@ class SimuladorCaixa(SimuladorBase):
         """
         for c in self._cookie_jar:
             if c.name == nome:
-                print(
-                    f'>>> _obter_valor_cookie():{nome}={c.value}'
-                )
+                log.despejo('Cookie', c.value, nome=nome)
                 return c.value
 
         return ''
-    
-    def _gerar_script_session_id(self) -> str:
-        """
-        Gerar o scriptSessionId, que geralmente é gerado a partir da
-        lib engine.js, no carregamento do simulador (site). Como a
-        urllib não roda o JS, então é preciso converter o trecho
-        onde o scriptSessionId é gerado para código Python.
-        scriptSessionId é gerado a partir da combinação do cookie
-        DWRSESSIONID e _pageId. Tanto a primeira de scriptSessionId,
-        quanto a segunda parte são gerados por funções (começam com
-        as iniciais dwr_) que foram convertidas do engine.js para
-        Python.
-        """
-        dwr_session_id: str = dwr_gerar_dwrsess()
-        page_id: str = dwr_gerar_page_id()
-
-        script_session_id = f"{dwr_session_id}/{page_id}"
-        return script_session_id
 
     @classmethod
     def a_partir_nome_cidade(
@@ -568,7 +558,7 @@ class SimuladorCaixa(SimuladorBase):
         else:
             uf = self.uf
 
-        print(f'Buscando cidades no banco de dados para a UF: {uf}...')
+        log.debug('Buscando cidades no banco de dados', uf=uf)
 
         with SessionLocal() as session:
             cidades: list[CidadeModel] = CidadeModel.obter_cidades_por_uf(
@@ -577,7 +567,9 @@ class SimuladorCaixa(SimuladorBase):
             )
 
             if len(cidades) == 0:
-                print('Não conseguiu carregar cidades do banco de dados!')
+                log.warning(
+                    'Não conseguiu carregar cidades do banco de dados', uf=uf
+                )
                 return []
 
             cidades_list_dict: list[dict] = CidadeModel.cidades_to_list(cidades)
@@ -597,6 +589,27 @@ class SimuladorCaixa(SimuladorBase):
             string sem aspas com o nome cidade; o valor é uma tupla com
             o código da cidade e o nome dela com aspas.
         """
+        req = self._montar_requisicao_cidades(uf)
+        # TODO: tratamento de exceções: quando a página não existir,
+        # mudar url, quando tiver sem conexão, etc
+        try:
+            cidades_js = self._abrir(req, 'URL1').decode('utf-8')
+        except urllib.error.URLError as erro:
+            log.warning('Problemas com a URL', url=self.URL1, erro=str(erro))
+            return None
+        except Exception:
+            log.exception('Erro ao obter cidades', uf=uf)
+            return None
+        
+        # TODO: implementar tratamento de exceções 
+        self._extrair_cidades(cidades_js)
+        return self._cidades
+
+    def _montar_requisicao_cidades(self, uf: str = '') -> Request:
+        """
+        Monta a requisição DWR que lista as cidades da UF. Compartilhada
+        entre o simulador síncrono e o assíncrono.
+        """
         if uf:
             self.uf = uf
         else:
@@ -629,25 +642,9 @@ class SimuladorCaixa(SimuladorBase):
         }
 
         dados = urllib.parse.urlencode(params).encode('utf-8')
-        # TODO: tratamento de exceções: quando a página não existir,
-        # mudar url, quando tiver sem conexão, etc
-        req = Request(self.URL1, data=dados, headers=headers)
-        try:
-            with self._opener.open(req) as response:
-                response: addinfourl
-                raw: bytes = gzip.decompress(response.read())
-                cidades_js = raw.decode('utf-8')
-        except urllib.error.URLError as erro:
-            print(f'Problemas com a URL: {self.URL1} -> {erro}')
-            return None
-        except Exception as erro:
-            print(f'Erro ao obter cidades: {erro=}')
-            return None
-        
-        # TODO: implementar tratamento de exceções 
-        self._extrair_cidades(cidades_js)
-        return self._cidades
+        return Request(self.URL1, data=dados, headers=headers)
 
+    @extracao('caixa', 'cidades')
     def _extrair_cidades(self, texto: str) -> list[dict]:
         """
         Extrai cidades de str contendo javascript retornado pela Caixa.
@@ -669,11 +666,12 @@ class SimuladorCaixa(SimuladorBase):
         match = re.search(self.RE_PADRAO_CIDADES, texto, re.DOTALL)
 
         if not match:
-            print('Não encontrou padrão RE_PADRAO_CIDADES!')
-            breakpoint()
+            log.warning(
+                'Não encontrou padrão RE_PADRAO_CIDADES', tamanho=len(texto)
+            )
+            log.despejo('Retorno sem cidades', texto)
             return []
 
-        print('Encontrou padrão de array de objetos contendo cidades!')
         array_js = match.group(1)
 
         codigo: str = '' 
@@ -760,15 +758,15 @@ class SimuladorCaixa(SimuladorBase):
             bool: True em caso de sucesso.
         """
         if cod_caixa == 0:
-            print('cod_caixa não pode ser zero!')
+            log.debug('cod_caixa não pode ser zero', nome=nome)
             return False
         
         if len(nome) < 4:
-            print('nome muito curto!')
+            log.debug('Nome muito curto', nome=nome)
             return False
         
         if len(nome_sem_aspa) < 4:
-            print('É preciso preencher nome_sem_aspa!')
+            log.debug('É preciso preencher nome_sem_aspa', nome=nome)
             return False
     
         self._cidades.append(
@@ -788,7 +786,7 @@ class SimuladorCaixa(SimuladorBase):
             bool: True quando existir cidade
         """
         if self.cidade_indice == -1:
-            print(
+            log.warning(
                 'Não foi definido um índice. É preciso obter cidades e '
                 'depois pesquisar código da cidade por nome.'
             )
@@ -816,20 +814,125 @@ class SimuladorCaixa(SimuladorBase):
             str: lista de Enums OpcaoFinanciamento com os campos versão
             de descrição preenchidos.
         """
+        if self._validar_dados_opcoes_financiamento() is None:
+            return []
+
+        # a sessão só é obtida se não tiver em cache
+        opcoes = self._obter_opcoes_financiamento_cache()
+        if opcoes is not None:
+            return opcoes
+
+        req = self._montar_requisicao_opcoes_financiamento()
+
+        # TODO: tratamento de exceções: quando a página não existir,
+        # quando  tiver sem conexão, etc
+        html: str = self._abrir(req, 'URL3').decode('latin-1')
+
+        opcoes = self._extrair_opcoes_financiamento(html)
+        self._guardar_opcoes_financiamento_cache(opcoes)
+        return opcoes
+
+    def _chave_cache_opcoes_financiamento(self) -> tuple:
+        """
+        Chave do perfil usada no cache das opções de financiamento: tudo
+        que vai pro enquadrarProdutos, menos CPF e celular. Renda e valor
+        do imóvel entram exatos, os limites dos programas (faixas do MCMV,
+        teto do SFH, subsídios) não caem em faixas redondas e um perfil
+        logo acima de um limite não pode receber as opções de um logo
+        abaixo. Chamar depois de _validar_dados_opcoes_financiamento.
+        """
+        relacionamento_caixa = (
+            (not CfgCaixa.PERGUNTAR_CLIENTE_CAIXA and CfgCaixa.CLIENTE_CAIXA)
+            or self.possui_relacionamento_caixa
+        )
+
+        return (
+            self.uf,
+            str(self._cidades[self.cidade_indice]['cod_caixa']),
+            self.tipo_imovel.value,
+            self.tipo_financiamento.value,
+            str(self._renda_familiar.valor),
+            str(self._valor_imovel.valor),
+            self.data_nascimento,
+            self._possui_imovel_cidade,
+            self.tres_anos_fgts,
+            self.mais_de_um_comprador_dependente,
+            relacionamento_caixa,
+            relacionamento_caixa and self._servidor_publico,
+        )
+
+    def _obter_opcoes_financiamento_cache(
+        self
+    ) -> list[OpcaoFinanciamento] | None:
+        """
+        Opções de financiamento em cache pro perfil atual. Não obtém
+        sessão: o cache já foi descartado se alguma sessão obtida depois
+        trouxe outra versão do simulador (_registrar_versao_sessao).
+        """
+        if not CfgCaixa.CACHE_OPCOES_HABILITADO:
+            return None
+
+        itens = cache_opcoes_financiamento.obter(
+            self._chave_cache_opcoes_financiamento()
+        )
+        if itens is None:
+            return None
+
+        # objetos novos a cada chamada, quem chama pode alterá-los
+        opcoes: list[OpcaoFinanciamento] = []
+        for value, versao, descricao in itens:
+            opcao = OpcaoFinanciamento(value)
+            opcao.versao = versao
+            opcao.descricao = descricao
+            opcoes.append(opcao)
+
+        return opcoes
+
+    def _guardar_opcoes_financiamento_cache(
+        self,
+        opcoes: list[OpcaoFinanciamento]
+    ) -> None:
+        if not CfgCaixa.CACHE_OPCOES_HABILITADO or not opcoes:
+            return
+
+        # sessão passada no construtor não passou por _iniciar_sessao
+        self._registrar_versao_sessao()
+        cache_opcoes_financiamento.definir(
+            self._chave_cache_opcoes_financiamento(),
+            tuple((o.value, o.versao, o.descricao) for o in opcoes)
+        )
+
+    def _validar_dados_opcoes_financiamento(self) -> int | None:
+        """
+        Valida os dados usados pra obter as opções de financiamento sem
+        obter sessão, assim o cache pode ser consultado antes.
+
+        Raises:
+            ErroCidadeNaoSelecionada: é preciso selecionar uma cidade.
+            ErroValorImovel: é preciso definir o valor do imóvel.
+            ErroCPF: é preciso definir um CPF.
+            ErroCelular: celular inválido ou não definido.
+            ErroRendaFamiliar: renda familiar não definida ou
+            inválida.
+            ErroDataNascimento: data de nascimento não definida ou
+            inválida.
+
+        Returns:
+            int | None: código da cidade, None quando não o encontrou.
+        """
         if not self._existe_cidade_selecionada():
             raise ErroCidadeNaoSelecionada(
                 'É preciso primeiro selecionar uma cidade.'
             )
         
         cod_cidade = self._cidades[self.cidade_indice]['cod_caixa']
-        cidade_sem_aspa = self._cidades[self.cidade_indice]['nome_sem_aspa']
         
         if type(cod_cidade) is not int:
             if cod_cidade and cod_cidade.isdigit():
                 cod_cidade = int(cod_cidade)
             else:
-                print('Não encontrou o código da cidade!')
-                return []
+                log.warning('Não encontrou o código da cidade')
+                return None
 
         if not self._valor_imovel:
             raise ErroValorImovel('É preciso definir o valor do imóvel')
@@ -850,6 +953,28 @@ class SimuladorCaixa(SimuladorBase):
                 'É preciso definir a data de nascimento.'
             )
 
+        return cod_cidade
+
+    def _montar_requisicao_opcoes_financiamento(self) -> Request | None:
+        """
+        Valida os dados e monta a requisição que enquadra os produtos
+        (opções de financiamento). Compartilhada entre o simulador
+        síncrono e o assíncrono. Obtém a sessão, pela versão do
+        simulador.
+
+        Raises:
+            as mesmas de _validar_dados_opcoes_financiamento.
+
+        Returns:
+            Request | None: None quando não encontrou o código da
+            cidade.
+        """
+        cod_cidade = self._validar_dados_opcoes_financiamento()
+        if cod_cidade is None:
+            return None
+
+        cidade_sem_aspa = self._cidades[self.cidade_indice]['nome_sem_aspa']
+
         texto_tipo_financiamento: str = 'Residencial' \
             if self._tipo_imovel == TipoImovel.RESIDENCIAL else 'Comercial'
         texto_categoria_imovel = self.tipo_financiamento.texto_categoria_imovel
@@ -959,18 +1084,44 @@ class SimuladorCaixa(SimuladorBase):
 
         payload_str = urllib.parse.urlencode(params, encoding='latin-1')
         dados_bytes = payload_str.encode('latin-1')
-        # TODO: tratamento de exceções: quando a página não existir,
-        # quando  tiver sem conexão, etc
-        html: str = ''
-        req = Request(self.URL3, data=dados_bytes, headers=headers)
+        return Request(self.URL3, data=dados_bytes, headers=headers)
+
+    def _extrair_onclicks_opcoes_financiamento_bs(
+        self,
+        html: str
+    ) -> list[str]:
+        """
+        Obtém com BeautifulSoup o evento onclick do link de cada opção
+        de financiamento.
+        """
+        bs = BeautifulSoup(html, "html.parser")
+
+        lis = bs.find_all('li', attrs={'class': 'group-block-item'})
+        if len(lis) == 0:
+            log.despejo('Html sem opções de financiamento', html)
+            raise ErroObterOpcaoFinanciamento(
+                "Não encontrou os li's em _extrair_opcoes_financiamento."
+            )
 
-        with self._opener.open(req) as response:
-            response: addinfourl
-            raw: bytes = gzip.decompress(response.read())
-            html = raw.decode('latin-1')
+        onclicks: list[str] = []
+        for i in range(len(lis)):
+            a = lis[i].find('a')
+            if not a:
+                raise ErroObterOpcaoFinanciamento(
+                    'Não encontrou os links ao _extrair_opcoes_financiamento.'
+                )
+                
+            onclick = a.get('onclick')
+            if not onclick:
+                raise ErroObterOpcaoFinanciamento(
+                    'Não conseguiu obter os ev. onclick dos links em '
+                    '_extrair_opcoes_financiamento.'
+                )
+            onclicks.append(onclick)
 
-        return self._extrair_opcoes_financiamento(html)
+        return onclicks
 
+    @extracao('caixa', 'opcoes_financiamento')
     def _extrair_opcoes_financiamento(
         self,
         html: str
@@ -1003,14 +1154,11 @@ class SimuladorCaixa(SimuladorBase):
             financiamento.
         """
 
-        bs = BeautifulSoup(html, "html.parser")
-
-        lis = bs.find_all('li', attrs={'class': 'group-block-item'})
-        if len(lis) == 0:
-            breakpoint()
-            raise ErroObterOpcaoFinanciamento(
-                "Não encontrou os li's em _extrair_opcoes_financiamento."
-            )
+        onclicks: list[str] | None = None
+        if caixa_parser.usar_parser_rapido():
+            onclicks = caixa_parser.extrair_onclicks_opcoes_financiamento(html)
+        if onclicks is None:
+            onclicks = self._extrair_onclicks_opcoes_financiamento_bs(html)
 
         layout_obter_opcoes_financ = \
             config_layout.CaixaObterOpcoesFinanciamento
@@ -1028,20 +1176,7 @@ class SimuladorCaixa(SimuladorBase):
             )
 
         opcoes_financiamento: list = []
-        for i in range(len(lis)):
-            a = lis[i].find('a')
-            if not a:
-                raise ErroObterOpcaoFinanciamento(
-                    'Não encontrou os links ao _extrair_opcoes_financiamento.'
-                )
-                
-            onclick = a.get('onclick')
-            if not onclick:
-                raise ErroObterOpcaoFinanciamento(
-                    'Não conseguiu obter os ev. onclick dos links em '
-                    '_extrair_opcoes_financiamento.'
-                )
-            
+        for onclick in onclicks:
             pos: int
             pos = onclick.find(T_OBTER_OPCOES_FINANCIAMENTO_JS)
             if pos == -1:
@@ -1086,9 +1221,9 @@ class SimuladorCaixa(SimuladorBase):
 
             if OPCOES_FINANCIAMENTO_ACEITAS:
                 if not cod in OPCOES_FINANCIAMENTO_ACEITAS:
-                    print(
-                        f'Opção de financiamento NÃO aceita: '
-                        f'{cod}: {descricao}'
+                    log.debug(
+                        'Opção de financiamento não aceita',
+                        cod=cod, descricao=descricao
                     )
                     continue
 
@@ -1127,6 +1262,58 @@ class SimuladorCaixa(SimuladorBase):
             HTML pra esse objeto que contém as principais informações
             da simulação.
         """
+        req = self._montar_requisicao_simulacao()
+        entradas = self._entradas_simulacao(req)
+        simulacao_raw: str | None = self._obter_simulacao_cache(entradas)
+        if simulacao_raw is not None:
+            return self._processar_simulacao(simulacao_raw)
+
+        # TODO: tratamento de exceções: quando a página não existir,
+        # quando tiver sem conexão, etc
+        simulacao_raw = self._abrir(req, 'URL4').decode('utf-8')
+
+        sim_resultado = self._processar_simulacao(simulacao_raw)
+        self._guardar_simulacao_cache(entradas, simulacao_raw)
+        return sim_resultado
+
+    @staticmethod
+    def _entradas_simulacao(req: Request) -> dict[str, str]:
+        """
+        Entradas da simulação pro cache de resultados: os parâmetros
+        DWR menos o id da sessão. O c0-param2 já traz todos os dados
+        informados e a versão da opção de financiamento.
+        """
+        params = urllib.parse.parse_qs(req.data.decode('latin-1'))
+        return {
+            nome: valores[0]
+            for nome, valores in params.items()
+            if nome != 'scriptSessionId'
+        }
+
+    @staticmethod
+    def _obter_simulacao_cache(entradas: dict[str, str]) -> str | None:
+        cache = obter_cache_resultados()
+        if cache is None:
+            return None
+
+        return cache.obter('caixa', entradas)
+
+    @staticmethod
+    def _guardar_simulacao_cache(
+        entradas: dict[str, str],
+        simulacao_raw: str
+    ) -> None:
+        """Só chamado depois de processar a resposta sem erro."""
+        cache = obter_cache_resultados()
+        if cache is not None:
+            cache.guardar('caixa', entradas, simulacao_raw)
+
+    def _montar_requisicao_simulacao(self) -> Request:
+        """
+        Valida os atributos e monta a requisição DWR da simulação.
+        Compartilhada entre o simulador síncrono e o assíncrono. As
+        exceções são as mesmas documentadas em simular().
+        """
         if not self._existe_cidade_selecionada():
             raise ErroCidadeNaoSelecionada(
                 'É preciso primeiro selecionar uma cidade.'
@@ -1302,16 +1489,17 @@ class SimuladorCaixa(SimuladorBase):
         }
 
         dados = urllib.parse.urlencode(params).encode('latin-1')
-        req = Request(self.URL4, dados, headers)
-        simulacao_raw: str = ''
+        return Request(self.URL4, dados, headers)
 
-        # TODO: tratamento de exceções: quando a página não existir,
-        # quando tiver sem conexão, etc
-        with self._opener.open(req) as response:
-            response: addinfourl
-            raw: bytes = gzip.decompress(response.read())
-            simulacao_raw: str = raw.decode('utf-8')
-        
+    @extracao('caixa', 'simulacao')
+    def _processar_simulacao(
+        self,
+        simulacao_raw: str
+    ) -> 'SimulacaoResultadoCaixa':
+        """
+        Extrai o resultado do retorno DWR da simulação e guarda o
+        código do sistema de amortização selecionado.
+        """
         html = self._extrair_html_sim(simulacao_raw)
         sim_resultado = SimulacaoResultadoCaixa()
 
@@ -1329,7 +1517,7 @@ class SimuladorCaixa(SimuladorBase):
 
     def _extrair_html_sim(self, simulacao_raw: str) -> str:
         if not simulacao_raw:
-            print('É preciso executar simulação antes de extrair html!')
+            log.warning('É preciso executar simulação antes de extrair html')
             return ''
         
         match = re.search(self.RE_RESULTADO_SIMULACAO, simulacao_raw)
@@ -1341,7 +1529,8 @@ class SimuladorCaixa(SimuladorBase):
         html = match.group(1)
 
         if not html:
-            print('Não encontrou html no resultado da simulação!')
+            log.warning('Não encontrou html no resultado da simulação')
+            log.despejo('Resultado sem html', simulacao_raw)
             return ''
         
         return html
@@ -1435,7 +1624,7 @@ class SimuladorCaixa(SimuladorBase):
             list: lista com todas as cidades.
         """
         if len(self._cidades) == 0:
-            print('Favor obter cidades antes de converter pra lista.')
+            log.warning('Favor obter cidades antes de converter pra lista')
             return []
 
         return [d['nome'] for d in self._cidades]
@@ -1453,11 +1642,13 @@ class SimuladorCaixa(SimuladorBase):
             int: código da cidade
         """
         if not cidade:
-            print('Definir cidade!')
+            log.warning('Definir cidade')
             return 0
 
         if not self._cidades:
-            print('self._cidades está vazia. Tente obj_sim.obter_cidades()')
+            log.warning(
+                'self._cidades está vazia. Tente obj_sim.obter_cidades()'
+            )
             return 0
         
         for i, d in enumerate(self._cidades):
@@ -1566,8 +1757,7 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
         if v in self._cods_sistema_amortizacao:
             self._sistema_amortizacao_chave_sel = v
         else:
-            print()
-            print('Key Sistema Amortização inválida.')
+            log.warning('Key Sistema Amortização inválida', chave=v)
 
     @property
     def prestacao_max(self) -> str:
@@ -1592,12 +1782,10 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
             None: sem retorno.
         """
         if not el_select:
-            # TODO: implementar log e alerta ao desenvolvedor
-            print('#' * 50)
-            print(
-                'Elemento select com taxas de amortização NÃO encontrado.'
+            # TODO: alerta ao desenvolvedor
+            log.error(
+                'Elemento select com taxas de amortização NÃO encontrado'
             )
-            print('#' * 50)
             return {}
 
         el_option: bs4.element.Tag
@@ -1614,6 +1802,48 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
             if el_option == el_option_selected:
                 self._sistema_amortizacao_chave_sel = el_option.text
 
+    @staticmethod
+    def _ajustar_primeira_prestacao(valor: str) -> str:
+        # TODO: NÃO É MAIS NECESSÁRIO (ver abaixo): disparar
+        # alerta quando retornar "." e mais de duas casas decimais
+        pos_ponto, pos_virg = valor.rfind('.'), valor.rfind(',')
+
+        if pos_virg < pos_ponto:
+            if pos_ponto < len(valor) - 3:
+                raise ErroValorPrimeiraPrestacao(valor)
+            else:
+                # CORRIGIDO: retornava certamente por conta das 
+                # headers q não tavam definidas
+                valor = Decimal2.a_partir_de_valor(valor).formatar_moeda()
+        return valor
+
+    def _setar_dados(self, dados: dict) -> None:
+        """
+        Seta os atributos a partir do retorno de
+        caixa_parser.extrair_resultado, na mesma ordem do caminho com
+        BeautifulSoup.
+        """
+        if dados['prestacao_max'] is not None:
+            self._prestacao_max = dados['prestacao_max']
+
+        if dados['titulo'] is not None:
+            self.titulo = dados['titulo']
+
+        for campo, valor in dados['campos']:
+            setattr(self, campo, valor)
+
+        self.primeira_prestacao = self._ajustar_primeira_prestacao(
+            dados['primeira_prestacao']
+        )
+        self.ultima_prestacao = dados['ultima_prestacao']
+
+        self._cods_sistema_amortizacao.update(
+            dados['cods_sistema_amortizacao']
+        )
+        if dados['sistema_amortizacao_chave_sel'] is not None:
+            self._sistema_amortizacao_chave_sel = \
+                dados['sistema_amortizacao_chave_sel']
+
     def extrair_dados(self, html_str: str) -> bool:
         """
         Extrai dados, valor do imóvel, prazos, cota, valor de entrada,
@@ -1631,7 +1861,7 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
 
         # decodificar as entidades html pra evitar conteúdo com escapes
         # remove barra invertida do fechamento de tags
-        html_str = re.sub(r'\\/', '/', html_str)
+        html_str = html_str.replace('\\/', '/')
 
         # resolve escapes (como \n, \t, \r)
         # usamos 'latin-1' no encode para preservar caracteres
@@ -1642,6 +1872,12 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
             # Fallback caso a string contenha caracteres não-latin1
             html_str = html_str.encode('utf-8').decode('unicode_escape')        
 
+        if caixa_parser.usar_parser_rapido():
+            dados: dict | None = caixa_parser.extrair_resultado(html_str)
+            if dados is not None:
+                self._setar_dados(dados)
+                return True
+
         bs = BeautifulSoup(html_str, 'html.parser')
 
         self._setar_prestacao_max(bs)
@@ -1689,8 +1925,8 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
 
         trs = tables[0].find_all('tr')
         if not trs:
-            print(
-                'Não encontrou linhas da tabela com o resultado da simulação!'
+            log.warning(
+                'Não encontrou linhas da tabela com o resultado da simulação'
             )
             return False
 
@@ -1717,21 +1953,21 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
                 self.sistema_amortizacao = valor
         
         # extrair primeira e última prestações
-        # TODO: substituir prints abaixo por raise
+        # TODO: substituir logs abaixo por raise
         trs = tables[2].find_all('tr')
         if not trs:
-            print('Não encontrou nenhuma linha das prestações.')
+            log.warning('Não encontrou nenhuma linha das prestações')
             return False
 
         I_LINHA_ULT_PREST = config_layout.CaixaResultado.ULTIMA_PRESTACAO[0]
         if len(trs) < I_LINHA_ULT_PREST:
-            print('Não encontrou linhas das prestações.')
+            log.warning('Não encontrou linhas das prestações')
             return False
 
         I_LINHA_PRIM_PREST = config_layout.CaixaResultado.PRIMEIRA_PRESTACAO[0]
         tds = trs[I_LINHA_PRIM_PREST].findChildren('td')
         if not tds:
-            print('Não encontrou células da primeira prestação.')
+            log.warning('Não encontrou células da primeira prestação')
             return False
 
         def get_valor2(c):
@@ -1749,27 +1985,19 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
         if tds[0].text.strip() == T_PRIM_PREST:
             center = tds[1].find("center")
             if not center:
-                print('Não encontrou center onde tá o valor da prestação.')
+                log.warning(
+                    'Não encontrou center onde tá o valor da prestação'
+                )
                 return False
 
-            valor = get_valor2(center)
-            # TODO: NÃO É MAIS NECESSÁRIO (ver abaixo): disparar
-            # alerta quando retornar "." e mais de duas casas decimais
-            pos_ponto, pos_virg = valor.rfind('.'), valor.rfind(',')
-
-            if pos_virg < pos_ponto:
-                if pos_ponto < len(valor) - 3:
-                    raise ErroValorPrimeiraPrestacao(valor)
-                else:
-                    # CORRIGIDO: retornava certamente por conta das 
-                    # headers q não tavam definidas
-                    valor = Decimal2.a_partir_de_valor(valor).formatar_moeda()
-            self.primeira_prestacao = valor
+            self.primeira_prestacao = self._ajustar_primeira_prestacao(
+                get_valor2(center)
+            )
 
         tds = trs[I_LINHA_ULT_PREST].findChildren('td')
 
         if not tds:
-            print('Não encontrou células da última prestação.')
+            log.warning('Não encontrou células da última prestação')
             return False
 
         T_ULT_PREST = config_layout.CaixaResultado.ULTIMA_PRESTACAO[1]
@@ -1777,9 +2005,9 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
         if tds[0].text.strip() == T_ULT_PREST:
             center = tds[1].find('center')
             if not center:
-                print(
+                log.warning(
                     'Não encontrou center onde tá o valor da última '
-                    'prestação.'
+                    'prestação'
                 )
                 return False
 
@@ -1853,6 +2081,50 @@ class SimulacaoResultadoCaixa(SimulacaoResultadoBase):
         return txt
 
 
+@registrar_fabrica(Banco.CAIXA)
+def simular_requisicao(req: RequisicaoSimulacao) -> ResultadoSimulacao:
+    """
+    Simula a requisição na cidade req.cod_cidade_caixa com a opção de
+    financiamento req.opcao_financiamento_caixa (ou a primeira
+    retornada).
+    """
+    sim = SimuladorCaixa()
+    try:
+        sim.uf = req.uf
+        sim.adicionar_cidade(
+            req.cod_cidade_caixa,
+            req.nome_cidade,
+            req.nome_cidade_sem_aspa
+        )
+        sim.cidade_indice = 0
+        sim.valor_imovel = req.valor_imovel
+        sim.cpf = req.cpf
+        sim.celular = req.celular
+        sim.renda_familiar = req.renda_familiar
+        sim.data_nascimento = req.data_nascimento
+        sim.tres_anos_fgts = req.tres_anos_fgts
+        sim.mais_de_um_comprador_dependente = \
+            req.mais_de_um_comprador_dependente
+
+        opcoes: list[OpcaoFinanciamento] = sim.obter_opcoes_financiamento()
+        if not opcoes:
+            raise ValueError('Caixa não retornou opções de financiamento.')
+
+        opcao = opcoes[0]
+        if req.opcao_financiamento_caixa is not None:
+            for o in opcoes:
+                if o.value == req.opcao_financiamento_caixa:
+                    opcao = o
+                    break
+
+        sim.opcao_financiamento = opcao
+        return ResultadoSimulacao.a_partir_de(
+            Banco.CAIXA, sim.simular(), sim
+        )
+    finally:
+        sim.liberar_sessao()
+
+
 def test1():
     print('#' * 100)
     print('>> Simulação Caixa a partir do nome da cidade.')
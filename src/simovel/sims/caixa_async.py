@@ -0,0 +1,232 @@
+# coding: utf-8
+"""
+Simulador Caixa assíncrono.
+
+Mesmas operações do SimuladorCaixa (obter_cidades,
+obter_opcoes_financiamento e simular), porém aguardáveis e feitas com
+um cliente HTTP não bloqueante (httpx). A montagem dos parâmetros e a
+extração dos dados são herdadas do SimuladorCaixa, apenas o transporte
+muda. Assim uma única event loop (FastAPI) consegue atender várias
+simulações ao mesmo tempo sem prender uma thread por conversa DWR.
+
+Exemplo:
+
+    async with AsyncSimuladorCaixa() as sim:
+        await sim.obter_cidades('GO')
+        ...
+        opcoes = await sim.obter_opcoes_financiamento()
+        sim.opcao_financiamento = opcoes[0]
+        resultado = await sim.simular()
+"""
+__version__ = '0.7'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from urllib.request import Request
+
+import httpx
+
+from simovel import metricas, rastreamento
+from simovel.config.geral import Caixa as CfgCaixa
+from simovel.metricas import CHAMADAS_REMOTAS
+from simovel.replay.gravacao import event_hooks_httpx, resolver_url
+from simovel.sims.caixa import (
+    SimuladorCaixa,
+    SimulacaoResultadoCaixa,
+    OpcaoFinanciamento
+)
+from simovel.sims.caixa_sessao import SessaoCaixa, obter_pool_sessoes
+from simovel.sims.disjuntor import extrair_host
+from simovel.log import obter_logger
+
+
+log = obter_logger(__name__)
+
+
+@contextmanager
+def _medir_chamada(url: str, etapa: str) -> Iterator[None]:
+    """
+    Métrica (metricas.CHAMADAS_REMOTAS) e trecho no rastro da chamada,
+    como em disjuntor.chamada_host, mas sem o disjuntor: ele bloqueia a
+    thread e a chamada aqui é feita na event loop.
+    """
+    host: str = extrair_host(url)
+    inicio: float = time.perf_counter() if metricas.habilitadas() else 0.
+    resultado: str = 'falha'
+    with rastreamento.trecho(
+        f'chamada {etapa}', host=host, etapa=etapa
+    ) as trecho:
+        try:
+            yield
+            resultado = 'ok'
+        finally:
+            trecho.definir(resultado=resultado)
+            if inicio:
+                CHAMADAS_REMOTAS.observar(
+                    time.perf_counter() - inicio,
+                    host=host, etapa=etapa, resultado=resultado
+                )
+
+
+class AsyncSimuladorCaixa(SimuladorCaixa):
+    """
+    Versão assíncrona do SimuladorCaixa. Usar preferencialmente como
+    gerenciador de contexto assíncrono pra que o cliente HTTP seja
+    fechado e a sessão devolvida ao pool.
+    """
+    # httpx decodifica o corpo de acordo com o Content-Encoding, então
+    # pede apenas codificações suportadas sem dependências extras
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+    def __init__(self, sessao: SessaoCaixa | None = None) -> None:
+        super().__init__(sessao=sessao)
+        self._cliente: httpx.AsyncClient | None = None
+
+    async def __aenter__(self) -> 'AsyncSimuladorCaixa':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Fecha o cliente HTTP e devolve a sessão ao pool.
+        """
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+        self.liberar_sessao()
+
+    async def iniciar_sessao(self) -> None:
+        """
+        Obtém uma sessão sem bloquear a event loop. Com o pool
+        habilitado a sessão normalmente já está pronta; caso contrário
+        a página inicial é aberta pelo próprio cliente assíncrono.
+        """
+        if self._sessao is not None:
+            return
+
+        if CfgCaixa.POOL_SESSOES_HABILITADO:
+            self._sessao = await asyncio.to_thread(
+                obter_pool_sessoes().obter
+            )
+            self._registrar_versao_sessao()
+            return
+
+        sessao = SessaoCaixa()
+        cliente = self._obter_cliente(sessao)
+        with _medir_chamada(sessao.URL_INICIAL, 'URL0'):
+            response = await cliente.get(
+                resolver_url(sessao.URL_INICIAL),
+                headers=sessao.headers_base
+            )
+            response.raise_for_status()
+        sessao.processar_pagina_inicial(response.content.decode('latin-1'))
+        self._sessao = sessao
+        self._registrar_versao_sessao()
+
+    def _obter_cliente(
+        self,
+        sessao: SessaoCaixa | None = None
+    ) -> httpx.AsyncClient:
+        """
+        Cliente HTTP compartilhando o cookie jar da sessão, dessa forma
+        os cookies continuam válidos quando a sessão volta pro pool.
+        """
+        if self._cliente is None:
+            sessao = sessao or self._sessao
+            self._cliente = httpx.AsyncClient(
+                cookies=sessao.cookie_jar,
+                timeout=CfgCaixa.TIMEOUT_REQUISICAO,
+                follow_redirects=True,
+                event_hooks=event_hooks_httpx()
+            )
+
+        return self._cliente
+
+    async def _enviar(self, req: Request, etapa: str) -> bytes:
+        """
+        Envia a requisição montada pelo SimuladorCaixa e retorna o corpo
+        já descompactado.
+
+        Args:
+            etapa (str): URL1, URL3 ou URL4, rótulo da métrica e do
+              trecho.
+        """
+        headers = dict(req.header_items())
+        headers['Accept-encoding'] = self.ACCEPT_ENCODING
+
+        cliente = self._obter_cliente()
+        with _medir_chamada(req.full_url, etapa):
+            response = await cliente.request(
+                req.get_method(),
+                resolver_url(req.full_url),
+                content=req.data,
+                headers=headers
+            )
+            response.raise_for_status()
+        return response.content
+
+    async def obter_cidades(self, uf: str = '') -> list[dict] | None:
+        """
+        Obtém cidades com seus respectivos códigos no modo raw.
+
+        Args:
+            uf (str): sigla do estado.
+
+        Returns:
+            list[dict]: mesma lista de SimuladorCaixa.obter_cidades.
+        """
+        await self.iniciar_sessao()
+        req = self._montar_requisicao_cidades(uf)
+        try:
+            cidades_js = (await self._enviar(req, 'URL1')).decode('utf-8')
+        except httpx.HTTPError as erro:
+            log.warning('Problemas com a URL', url=self.URL1, erro=str(erro))
+            return None
+
+        self._extrair_cidades(cidades_js)
+        return self._cidades
+
+    async def obter_opcoes_financiamento(self) -> list[OpcaoFinanciamento]:
+        """
+        Obtem as opções de financiamento de acordo com os dados
+        passados. Mesmas validações e exceções de
+        SimuladorCaixa.obter_opcoes_financiamento.
+        """
+        if self._validar_dados_opcoes_financiamento() is None:
+            return []
+
+        # a sessão só é obtida se não tiver em cache
+        opcoes = self._obter_opcoes_financiamento_cache()
+        if opcoes is not None:
+            return opcoes
+
+        await self.iniciar_sessao()
+        req = self._montar_requisicao_opcoes_financiamento()
+        html = (await self._enviar(req, 'URL3')).decode('latin-1')
+        opcoes = self._extrair_opcoes_financiamento(html)
+        self._guardar_opcoes_financiamento_cache(opcoes)
+        return opcoes
+
+    async def simular(self) -> SimulacaoResultadoCaixa:
+        """
+        Executa a simulação a partir dos atributos definidos. Mesmas
+        validações e exceções de SimuladorCaixa.simular.
+        """
+        await self.iniciar_sessao()
+        req = self._montar_requisicao_simulacao()
+        entradas = self._entradas_simulacao(req)
+        simulacao_raw = self._obter_simulacao_cache(entradas)
+        if simulacao_raw is not None:
+            return self._processar_simulacao(simulacao_raw)
+
+        simulacao_raw = (await self._enviar(req, 'URL4')).decode('utf-8')
+        sim_resultado = self._processar_simulacao(simulacao_raw)
+        self._guardar_simulacao_cache(entradas, simulacao_raw)
+        return sim_resultado
@@ -0,0 +1,270 @@
+# coding: utf-8
+"""
+Extração rápida do html do Simulador Caixa.
+
+SimulacaoResultadoCaixa.extrair_dados, SimuladorCaixa.
+_extrair_opcoes_financiamento e SessaoCaixa._obter_versao_atual
+montavam uma árvore BeautifulSoup (html.parser) completa só pra ler
+algumas tabelas, links e inputs. As funções abaixo localizam esses
+trechos com expressões regulares guiadas por config.layout e devolvem
+os mesmos valores (texto como em Tag.text).
+
+Quando o html não tem a estrutura esperada (layout mudou, página de
+erro, tags aninhadas, etc.) retornam None e o chamador usa o
+BeautifulSoup, que continua sendo a referência. O parser usado é
+definido em config.geral.Caixa.PARSER_HTML.
+"""
+__version__ = '0.1'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import html as html_lib
+import re
+
+from simovel.config.geral import Caixa as CfgCaixa
+from simovel.config import layout as config_layout
+
+
+PARSER_RAPIDO = 'rapido'
+PARSER_BS4 = 'bs4'
+
+_ATRIBUTO = re.compile(
+    r'([^\s"\'<>/=]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?'
+)
+_TAG = re.compile(r'<[^>]*>')
+_INPUT = re.compile(r'<input\b([^>]*)>', re.I)
+_TABLE = re.compile(r'<table\b([^>]*)>(.*?)</table\s*>', re.I | re.S)
+_TR = re.compile(r'<tr\b[^>]*>(.*?)</tr\s*>', re.I | re.S)
+_TD = re.compile(r'<td\b[^>]*>(.*?)</td\s*>', re.I | re.S)
+_H3 = re.compile(r'<h3\b([^>]*)>(.*?)</h3\s*>', re.I | re.S)
+_CENTER = re.compile(r'<center\b[^>]*>(.*?)</center\s*>', re.I | re.S)
+_SELECT = re.compile(r'<select\b([^>]*)>(.*?)</select\s*>', re.I | re.S)
+_OPTION = re.compile(r'<option\b([^>]*)>(.*?)</option\s*>', re.I | re.S)
+_LI = re.compile(r'<li\b([^>]*)>', re.I)
+_A = re.compile(r'<a\b([^>]*)>', re.I)
+_ESPACOS = re.compile(r'\s+')
+
+# trechos que o BeautifulSoup trata de forma diferente de um simples
+# "remover tags": nesses casos usa o caminho completo
+_NAO_SUPORTADO = re.compile(r'<!--|<!\[CDATA\[|<script\b|<style\b', re.I)
+
+
+def usar_parser_rapido() -> bool:
+    return CfgCaixa.PARSER_HTML == PARSER_RAPIDO
+
+
+def _atributos(s: str) -> dict[str, str]:
+    """
+    Atributos de uma tag de abertura (sem o nome da tag).
+    """
+    atributos: dict[str, str] = {}
+    for m in _ATRIBUTO.finditer(s):
+        nome = m.group(1).lower()
+        if nome in atributos:
+            continue
+        valor = next((v for v in m.group(2, 3, 4) if v is not None), '')
+        atributos[nome] = html_lib.unescape(valor)
+
+    return atributos
+
+
+def _tem_classe(atributos: dict[str, str], classe: str) -> bool:
+    valor = atributos.get('class')
+    if valor is None:
+        return False
+    return valor == classe or classe in valor.split()
+
+
+def _texto(fragmento: str) -> str:
+    """Equivalente ao Tag.text do fragmento."""
+    return html_lib.unescape(_TAG.sub('', fragmento))
+
+
+def _linhas(corpo: str) -> list[list[str]] | None:
+    """
+    Células (html interno dos td) de cada linha de uma tabela. None se
+    houver tr/td sem fechamento.
+    """
+    trs = _TR.findall(corpo)
+    if len(trs) != len(re.findall(r'<tr\b', corpo, re.I)):
+        return None
+
+    linhas: list[list[str]] = []
+    for tr in trs:
+        tds = _TD.findall(tr)
+        if len(tds) != len(re.findall(r'<td\b', tr, re.I)):
+            return None
+        linhas.append(tds)
+
+    return linhas
+
+
+def _valor_prestacao(td: str) -> str | None:
+    """
+    Duas primeiras linhas não vazias do center (valor e indexador).
+    """
+    m = _CENTER.search(td)
+    if not m:
+        return None
+
+    valores = [
+        s for s in
+        _texto(m.group(1)).replace('\r', '').replace('\t', '').split('\n')
+        if s
+    ]
+    if len(valores) >= 2:
+        return ' '.join(valores[0:2])
+    return ''
+
+
+def extrair_versao(html: str) -> str | None:
+    """
+    Valor do input hidden "versao" da página inicial do simulador.
+    """
+    for m in _INPUT.finditer(html):
+        atributos = _atributos(m.group(1))
+        if (atributos.get('type') == 'hidden'
+            and atributos.get('name') == 'versao'):
+            return atributos.get('value', '').strip()
+
+    return None
+
+
+def extrair_onclicks_opcoes_financiamento(html: str) -> list[str] | None:
+    """
+    Evento onclick do link de cada opção de financiamento (li com a
+    classe group-block-item).
+    """
+    if _NAO_SUPORTADO.search(html):
+        return None
+
+    lis = [m for m in _LI.finditer(html)
+           if _tem_classe(_atributos(m.group(1)), 'group-block-item')]
+    if not lis:
+        return None
+
+    onclicks: list[str] = []
+    for i, m in enumerate(lis):
+        fim = lis[i + 1].start() if i + 1 < len(lis) else len(html)
+        trecho = html[m.end():fim]
+        pos = trecho.lower().find('</li')
+        if pos == -1:
+            return None
+
+        a = _A.search(trecho, 0, pos)
+        if not a:
+            return None
+
+        onclick = _atributos(a.group(1)).get('onclick')
+        if not onclick:
+            return None
+        onclicks.append(onclick)
+
+    return onclicks
+
+
+def extrair_resultado(html: str) -> dict | None:
+    """
+    Dados da página de resultado da simulação (já sem os escapes, ver
+    SimulacaoResultadoCaixa.extrair_dados).
+
+    Returns:
+        dict | None: chaves prestacao_max, titulo, campos (lista de
+          tuplas atributo/valor na ordem da tabela), primeira_prestacao,
+          ultima_prestacao, cods_sistema_amortizacao e
+          sistema_amortizacao_chave_sel. None quando a página não tem o
+          layout esperado, inclusive páginas de erro.
+    """
+    if _NAO_SUPORTADO.search(html):
+        return None
+
+    layout = config_layout.CaixaResultado
+    dados: dict = {'prestacao_max': None, 'titulo': None}
+
+    for m in _INPUT.finditer(html):
+        atributos = _atributos(m.group(1))
+        if atributos.get('name') == 'prestacaoMaxDesejada':
+            if 'value' not in atributos:
+                return None
+            dados['prestacao_max'] = atributos['value']
+            break
+
+    for m in _H3.finditer(html):
+        if _tem_classe(_atributos(m.group(1)), 'simulation-result-title zeta'):
+            dados['titulo'] = _texto(m.group(2)).strip()
+            break
+
+    tables = [
+        corpo for atributos, corpo in _TABLE.findall(html)
+        if _tem_classe(_atributos(atributos), 'simple-table')
+    ]
+    if len(tables) < 3 or any(re.search(r'<table\b', t, re.I) for t in tables):
+        return None
+
+    # campos do financiamento
+    linhas = _linhas(tables[0])
+    if not linhas:
+        return None
+
+    campos_layout: dict = layout.SIMULACAO_RESULTADO_CAIXA_CAMPOS
+    campos: list[tuple[str, str]] = []
+    for tds in linhas:
+        if len(tds) < 2:
+            return None
+
+        descricao = _ESPACOS.sub(' ', _texto(tds[0]).strip())
+        valor = _ESPACOS.sub(' ', _texto(tds[1]).strip())
+        if descricao in campos_layout:
+            campos.append((campos_layout[descricao], valor))
+        elif descricao.startswith(layout.TXT_SUBSIDIO_CASA_VERDE_AMARELA_INI):
+            campos.append(('subsidio_casa_verde_amarela', valor))
+        elif descricao.startswith(layout.TXT_SISTEMA_AMORTIZACAO_INI):
+            campos.append(('sistema_amortizacao', valor))
+    dados['campos'] = campos
+
+    # primeira e última prestações
+    linhas = _linhas(tables[2])
+    i_prim, t_prim = layout.PRIMEIRA_PRESTACAO
+    i_ult, t_ult = layout.ULTIMA_PRESTACAO
+    if not linhas or len(linhas) <= max(i_prim, i_ult):
+        return None
+
+    for chave, i, descricao in (
+        ('primeira_prestacao', i_prim, t_prim),
+        ('ultima_prestacao', i_ult, t_ult)
+    ):
+        tds = linhas[i]
+        if len(tds) < 2 or _texto(tds[0]).strip() != descricao:
+            return None
+        valor = _valor_prestacao(tds[1])
+        if valor is None:
+            return None
+        dados[chave] = valor
+
+    # códigos do sistema de amortização
+    select = next(
+        (corpo for atributos, corpo in _SELECT.findall(html)
+         if _atributos(atributos).get('id') == 'codSistemaAmortizacaoAlterado'),
+        None
+    )
+    if select is None:
+        return None
+
+    options = _OPTION.findall(select)
+    if len(options) != len(re.findall(r'<option\b', select, re.I)):
+        return None
+
+    cods: dict[str, str] = {}
+    chave_sel: str | None = None
+    for atributos, corpo in options:
+        atributos = _atributos(atributos)
+        if 'value' not in atributos:
+            return None
+        texto = _texto(corpo)
+        cods[texto] = atributos['value']
+        if chave_sel is None and atributos.get('selected') == 'selected':
+            chave_sel = texto
+
+    dados['cods_sistema_amortizacao'] = cods
+    dados['sistema_amortizacao_chave_sel'] = chave_sel
+    return dados
@@ -0,0 +1,456 @@
+# coding: utf-8
+"""
+Sessões pré-aquecidas do Simulador Caixa.
+
+Antes de qualquer chamada ao simulador da Caixa é preciso abrir a
+página inicial (cookies, versão do simulador) e gerar o
+scriptSessionId do DWR. Esse aperto de mão era feito a cada
+SimuladorCaixa instanciado, o que custava uma ida ao servidor da
+Caixa por requisição. O PoolSessoesCaixa mantém um número fixo de
+sessões prontas, verificadas periodicamente e recicladas quando
+expiram, e as entrega aos simuladores.
+"""
+__version__ = '0.6'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import os
+import threading
+import time
+from collections import deque
+from http.cookiejar import CookieJar
+from urllib.request import (
+    Request,
+    build_opener,
+    HTTPCookieProcessor,
+    OpenerDirector
+)
+from urllib.response import addinfourl
+
+from bs4 import BeautifulSoup, Tag
+
+from simovel.config.geral import Caixa as CfgCaixa
+from simovel.log import obter_logger
+from simovel.replay.gravacao import HandlerReplay
+from simovel.sims.disjuntor import chamada_host
+from simovel.sims import caixa_parser
+from simovel.util import dwr_gerar_dwrsess, dwr_gerar_page_id
+
+
+log = obter_logger(__name__)
+
+class SessaoCaixa:
+    """
+    Guarda o estado de uma sessão aberta no simulador da Caixa:
+    cookies, opener (urllib), scriptSessionId e versão do simulador.
+    """
+    URL_INICIAL = (
+        'https://www8.caixa.gov.br/siopiinternet-web/'
+        'simulaOperacaoInternet.do?method=inicializarCasoUso'
+    )
+    USER_AGENT = (
+        "Mozilla/5.0 (X11; Linux x86_64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/138.0.0.0 Safari/537.36"
+    )
+    ARQUIVO_VERSAO = '.sim-caixa-versao'
+
+    # evita que duas sessões abertas ao mesmo tempo gravem o arquivo
+    # de versão simultaneamente
+    _lock_arquivo_versao = threading.Lock()
+
+    def __init__(self) -> None:
+        self.cookie_jar = CookieJar()
+        # HandlerReplay: gravação e redirecionamento pro servidor de
+        # replay quando habilitados (config.geral.Replay)
+        self.opener: OpenerDirector = build_opener(
+            HTTPCookieProcessor(self.cookie_jar),
+            HandlerReplay()
+        )
+        self.headers_base = {
+            "User-Agent": self.USER_AGENT,
+            "Accept": (
+                "text/html,application/xhtml+xml,application/xml;q=0.9,image/"
+                "avif,image/webp,image/apng,*/*;q=0.8,application/"
+                "signed-exchange;v=b3;q=0.7"
+            ),
+            "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
+        }
+        self.script_session_id: str = ''
+        self.versao_salva: str = ''
+        self.versao_atual: str = ''
+        self.criada_em: float = 0.
+        self.verificada_em: float = 0.
+
+    @classmethod
+    def criar(cls) -> 'SessaoCaixa':
+        """
+        Cria e já inicia uma sessão no simulador da Caixa.
+        """
+        sessao = cls()
+        sessao.iniciar()
+        return sessao
+
+    def iniciar(self) -> None:
+        """
+        Abre página inicial do simulador. Isso garante que os cookies
+        serão salvos e compartilhados entre as aberturas de URLs. Também
+        obtém a versão do simulador e gera o scriptSessionId.
+        """
+        html = self._abrir_pagina_inicial()
+        self.processar_pagina_inicial(html)
+
+    def processar_pagina_inicial(self, html: str) -> None:
+        """
+        Obtém a versão a partir do html da página inicial e gera o
+        scriptSessionId. Separado de iniciar() pra que a página inicial
+        também possa ser aberta por um cliente HTTP assíncrono.
+        """
+        # obtem versão simulador (atual e salva)
+        self.versao_salva = self._obter_versao_salva()
+        self.versao_atual = self._obter_versao_atual(html)
+        self._comparar_versoes()
+
+        self.script_session_id = self.gerar_script_session_id()
+        self.criada_em = self.verificada_em = time.monotonic()
+
+    def _abrir_pagina_inicial(self) -> str:
+        req = Request(self.URL_INICIAL, headers=self.headers_base)
+        with chamada_host(self.URL_INICIAL, 'URL0'), self.opener.open(
+            req, timeout=CfgCaixa.TIMEOUT_REQUISICAO
+        ) as response:
+            response: addinfourl
+            return response.read().decode('latin-1')
+
+    def verificar(self) -> bool:
+        """
+        Verifica se a sessão continua válida reabrindo a página inicial,
+        o que também mantém a sessão viva no servidor da Caixa.
+
+        Returns:
+            bool: False quando não conseguiu abrir a página ou a versão
+            do simulador mudou (sessão precisa ser descartada).
+        """
+        try:
+            html = self._abrir_pagina_inicial()
+            versao = self._obter_versao_atual(html)
+        except Exception as erro:
+            log.info('Sessão Caixa inválida', erro=repr(erro))
+            return False
+
+        if versao != self.versao_atual:
+            log.info(
+                'Versão do simulador mudou, descartando sessão',
+                versao=versao
+            )
+            return False
+
+        self.verificada_em = time.monotonic()
+        return True
+
+    @property
+    def idade(self) -> float:
+        """
+        Tempo em segundos desde que a sessão foi iniciada.
+        """
+        return time.monotonic() - self.criada_em
+
+    @property
+    def expirada(self) -> bool:
+        return self.idade >= CfgCaixa.SESSAO_TTL
+
+    @property
+    def ociosa(self) -> bool:
+        """
+        Sessão que não é verificada há mais tempo que o intervalo de
+        verificação do pool.
+        """
+        return (
+            time.monotonic() - self.verificada_em
+            >= CfgCaixa.SESSAO_INTERVALO_VERIFICACAO
+        )
+
+    def renovar_script_session_id(self) -> None:
+        """
+        Gera um novo scriptSessionId (novo _pageId) mantendo os cookies.
+        Usado quando a sessão volta pro pool pra ser reaproveitada.
+        """
+        self.script_session_id = self.gerar_script_session_id()
+
+    @staticmethod
+    def gerar_script_session_id() -> str:
+        """
+        Gerar o scriptSessionId, que geralmente é gerado a partir da
+        lib engine.js, no carregamento do simulador (site). Como a
+        urllib não roda o JS, então é preciso converter o trecho
+        onde o scriptSessionId é gerado para código Python.
+        scriptSessionId é gerado a partir da combinação do cookie
+        DWRSESSIONID e _pageId. Tanto a primeira de scriptSessionId,
+        quanto a segunda parte são gerados por funções (começam com
+        as iniciais dwr_) que foram convertidas do engine.js para
+        Python.
+        """
+        dwr_session_id: str = dwr_gerar_dwrsess()
+        page_id: str = dwr_gerar_page_id()
+
+        script_session_id = f"{dwr_session_id}/{page_id}"
+        return script_session_id
+
+    def _obter_versao_salva(self) -> str:
+        """
+        Obtem versão salva localmete no arquivo de versão do simulador
+        (site).
+        """
+        if not os.path.exists(self.ARQUIVO_VERSAO):
+            raise Exception(f'Favor criar arquivo {self.ARQUIVO_VERSAO}.')
+
+        versao: str = ''
+        with open(self.ARQUIVO_VERSAO, 'r') as f:
+            versao = f.readline().strip()
+
+        if not versao:
+            raise Exception(f'Arquivo de versão está vazio!')
+
+        return versao
+
+    def _obter_versao_atual(self, html: str) -> str:
+        """
+        Obtem versão a partir da página inicial do simulador (site).
+        """
+        if caixa_parser.usar_parser_rapido():
+            versao = caixa_parser.extrair_versao(html)
+            if versao is not None:
+                return versao
+
+        bs = BeautifulSoup(html, 'html.parser')
+        input_versao = bs.find(
+            'input',
+            attrs={'type': 'hidden', 'name': 'versao'}
+        )
+
+        if not input_versao:
+            raise Exception('NÃO encontrou input com a versão!')
+
+        if isinstance(input_versao, Tag):
+            return str(input_versao.get('value', '')).strip()
+
+        raise Exception('Não conseguiu obter versão atual do simulaodr!')
+
+    @classmethod
+    def setar_versao_arquivo(cls, versao: str) -> None:
+        """
+        Seta versão em arquivo texto quando acessar URL inicial do simulador.
+        """
+        with open(cls.ARQUIVO_VERSAO, 'w') as f:
+            f.write(versao)
+
+    def _comparar_versoes(self) -> None:
+        """
+        Comparar versão salva com versão atual. Atualiza versão salva
+        se tiver diferente. Disparar evento quando versões forem
+        diferentes.
+        """
+        log.debug(
+            'Versões do simulador',
+            salva=self.versao_salva, atual=self.versao_atual
+        )
+
+        if self.versao_atual == self.versao_salva:
+            return
+
+        with self._lock_arquivo_versao:
+            # TODO: disparar evento para enviar e-mail avisando mudança
+            # de versão. Útil para fazer ajustes no layout
+            log.warning(
+                'Versão salva diferente da versão atual, salvando em arquivo',
+                salva=self.versao_salva, atual=self.versao_atual
+            )
+            self.setar_versao_arquivo(self.versao_atual)
+            self.versao_salva = self._obter_versao_salva()
+
+
+class PoolSessoesCaixa:
+    """
+    Mantém sessões do simulador Caixa pré-aquecidas.
+
+    Uma thread em segundo plano completa o pool até o tamanho
+    configurado, descarta sessões expiradas (TTL) e verifica as que
+    estão ociosas. Quando não há sessão pronta, obter() cria uma na
+    hora, então o pool nunca deixa um simulador esperando pelo
+    aquecimento.
+
+    Sessões devolvidas depois de usadas numa simulação só voltam a ser
+    entregues depois que a thread as verifica (verificar()), a Caixa
+    pode ter invalidado a sessão no meio da conversa.
+    """
+    def __init__(
+        self,
+        tamanho: int = CfgCaixa.POOL_SESSOES_TAMANHO,
+        intervalo_verificacao: float = CfgCaixa.SESSAO_INTERVALO_VERIFICACAO
+    ) -> None:
+        self.tamanho = tamanho
+        self.intervalo_verificacao = intervalo_verificacao
+        self._sessoes: deque[SessaoCaixa] = deque()
+        # devolvidas, aguardando verificação pela thread
+        self._usadas: list[SessaoCaixa] = []
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def total_disponiveis(self) -> int:
+        return len(self._sessoes)
+
+    def iniciar(self) -> None:
+        """
+        Inicia a thread que mantém o pool aquecido.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._parar.clear()
+        self._thread = threading.Thread(
+            target=self._manter,
+            name='pool-sessoes-caixa',
+            daemon=True
+        )
+        self._thread.start()
+
+    def encerrar(self) -> None:
+        self._parar.set()
+        self._acordar.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        with self._lock:
+            self._sessoes.clear()
+            self._usadas.clear()
+
+    def obter(self) -> SessaoCaixa:
+        """
+        Entrega uma sessão pronta pra uso exclusivo do simulador. A
+        sessão sai do pool e só volta através de devolver().
+
+        Returns:
+            SessaoCaixa: sessão iniciada e dentro do TTL.
+        """
+        sessao: SessaoCaixa | None = None
+        with self._lock:
+            while self._sessoes:
+                s = self._sessoes.popleft()
+                if not s.expirada:
+                    sessao = s
+                    break
+
+        # pede pra thread repor a sessão entregue
+        self._acordar.set()
+
+        if sessao is None:
+            sessao = SessaoCaixa.criar()
+
+        return sessao
+
+    def devolver(self, sessao: SessaoCaixa) -> None:
+        """
+        Devolve a sessão pro pool pra ser reaproveitada depois de
+        verificada pela thread. Sessões expiradas ou excedentes são
+        descartadas.
+        """
+        if sessao.expirada:
+            return
+
+        with self._lock:
+            if self._vagas() <= 0:
+                return
+
+            self._usadas.append(sessao)
+
+        self._acordar.set()
+
+    def _vagas(self) -> int:
+        """Chamar com o lock."""
+        return self.tamanho - len(self._sessoes) - len(self._usadas)
+
+    def _manter(self) -> None:
+        while not self._parar.is_set():
+            try:
+                self._reciclar()
+                self._abastecer()
+            except Exception:
+                log.exception('Erro ao manter pool de sessões Caixa')
+
+            self._acordar.wait(self.intervalo_verificacao)
+            self._acordar.clear()
+
+    def _reciclar(self) -> None:
+        """
+        Descarta sessões expiradas e verifica as ociosas e as usadas.
+        """
+        # as ociosas saem do pool enquanto são verificadas, as demais
+        # continuam disponíveis pros simuladores
+        ociosas: list[SessaoCaixa] = []
+        with self._lock:
+            prontas: deque[SessaoCaixa] = deque()
+            for sessao in self._sessoes:
+                if sessao.expirada:
+                    continue
+
+                if sessao.ociosa:
+                    ociosas.append(sessao)
+                else:
+                    prontas.append(sessao)
+
+            self._sessoes = prontas
+            usadas, self._usadas = self._usadas, []
+
+        validas = [
+            s for s in ociosas + usadas
+            if not s.expirada and s.verificar()
+        ]
+        for sessao in usadas:
+            if sessao in validas:
+                sessao.renovar_script_session_id()
+
+        with self._lock:
+            for sessao in validas:
+                if self._vagas() > 0:
+                    self._sessoes.append(sessao)
+
+    def _abastecer(self) -> None:
+        """
+        Cria sessões até completar o tamanho do pool.
+        """
+        while not self._parar.is_set():
+            with self._lock:
+                if self._vagas() <= 0:
+                    return
+
+            sessao = SessaoCaixa.criar()
+            # uma devolvida pode ter ocupado a vaga durante a criação
+            with self._lock:
+                if self._vagas() <= 0:
+                    return
+
+                self._sessoes.append(sessao)
+
+
+_pool: PoolSessoesCaixa | None = None
+_lock_pool = threading.Lock()
+
+
+def obter_pool_sessoes() -> PoolSessoesCaixa:
+    """
+    Retorna o pool de sessões do processo, iniciando na primeira
+    chamada. Iniciar de forma preguiçosa evita criar a thread antes
+    do fork dos workers (gunicorn).
+    """
+    global _pool
+
+    with _lock_pool:
+        if _pool is None:
+            _pool = PoolSessoesCaixa()
+            _pool.iniciar()
+
+        return _pool
@@ -0,0 +1,343 @@
+# coding: utf-8
+"""
+Disjuntor (circuit breaker) e limite de concorrência por host.
+
+Quando caixa.gov.br ou o app ASP.NET do Bradesco degradam, cada
+simulação em andamento fica presa até o timeout do socket, as
+requisições se acumulam e derrubam a API junto. Cada host tem aqui um
+Disjuntor compartilhado por todos os simuladores (SimuladorCaixa,
+SimuladorBradesco, SimuladorBaseL, SimuladorItauS) que:
+
+- limita as chamadas simultâneas ao host (Disjuntor.CONCORRENCIA),
+  esperando uma vaga até Disjuntor.ESPERA_VAGA segundos;
+- abre quando a taxa de falhas das últimas Disjuntor.JANELA chamadas
+  passa de Disjuntor.LIMIAR_ERROS, recusando na hora as chamadas
+  seguintes (ErroCircuitoAberto);
+- depois de Disjuntor.TEMPO_ABERTO segundos fica meio aberto e deixa
+  passar Disjuntor.CHAMADAS_MEIO_ABERTO chamadas de teste, que fecham o
+  disjuntor quando dão certo ou o abrem de novo quando falham.
+
+    with obter_disjuntor(url).chamada() as chamada:
+        r = sessao.get(url, timeout=...)
+        if r.status_code >= 500:
+            chamada.falhou()
+
+Só contam como falha as exceções em erros (padrão OSError, que inclui
+urllib.error.URLError, socket.timeout e requests.RequestException) e
+chamada.falhou(). Erros de negócio (renda insuficiente...) são
+respostas do host e contam como sucesso.
+
+O estado de todos os disjuntores sai em estatisticas_disjuntores() e
+nas métricas (simovel.metricas), junto com a duração de cada chamada
+feita por chamada_host, que também é um trecho do rastro atual
+(simovel.rastreamento).
+"""
+__version__ = '0.4'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from enum import Enum
+from typing import Iterator
+from urllib.parse import urlsplit
+
+from simovel import metricas, rastreamento
+from simovel.config.geral import Disjuntor as CfgDisjuntor
+from simovel.exceptions import ErroCircuitoAberto, ErroLimiteConcorrencia
+from simovel.log import obter_logger
+from simovel.metricas import CHAMADAS_REMOTAS, Amostras
+
+
+log = obter_logger(__name__)
+
+class EstadoDisjuntor(Enum):
+    FECHADO = 0
+    ABERTO = 1
+    MEIO_ABERTO = 2
+
+
+class Chamada:
+    """Chamada em andamento, falhou() marca falha sem exceção."""
+    __slots__ = ('teste', 'falha')
+
+    def __init__(self, teste: bool) -> None:
+        # chamada de teste com o disjuntor meio aberto
+        self.teste = teste
+        self.falha = False
+
+    def falhou(self) -> None:
+        self.falha = True
+
+
+class Disjuntor:
+    def __init__(
+        self,
+        host: str,
+        concorrencia: int = CfgDisjuntor.CONCORRENCIA_PADRAO,
+        espera_vaga: float = CfgDisjuntor.ESPERA_VAGA,
+        janela: int = CfgDisjuntor.JANELA,
+        minimo_chamadas: int = CfgDisjuntor.MINIMO_CHAMADAS,
+        limiar_erros: float = CfgDisjuntor.LIMIAR_ERROS,
+        tempo_aberto: float = CfgDisjuntor.TEMPO_ABERTO,
+        chamadas_meio_aberto: int = CfgDisjuntor.CHAMADAS_MEIO_ABERTO
+    ) -> None:
+        """
+        Args:
+            host (str): scheme://host[:porta].
+            concorrencia (int, optional): chamadas simultâneas ao host.
+            espera_vaga (float, optional): segundos esperando uma vaga.
+            janela (int, optional): últimas chamadas consideradas na
+                taxa de falhas.
+            minimo_chamadas (int, optional): chamadas na janela antes de
+                poder abrir.
+            limiar_erros (float, optional): taxa de falhas (0 a 1) que
+                abre o disjuntor.
+            tempo_aberto (float, optional): segundos até meio abrir.
+            chamadas_meio_aberto (int, optional): chamadas de teste
+                simultâneas com o disjuntor meio aberto.
+        """
+        self.host = host
+        self.concorrencia = concorrencia
+        self.espera_vaga = espera_vaga
+        self.minimo_chamadas = minimo_chamadas
+        self.limiar_erros = limiar_erros
+        self.tempo_aberto = tempo_aberto
+        self.chamadas_meio_aberto = chamadas_meio_aberto
+
+        self._estado = EstadoDisjuntor.FECHADO
+        self._aberto_em: float = 0.
+        # True = falha
+        self._janela: deque[bool] = deque(maxlen=janela)
+        self._testes: int = 0
+        self._em_andamento: int = 0
+        self._vagas = threading.BoundedSemaphore(concorrencia)
+        self._lock = threading.Lock()
+
+        self.chamadas: int = 0
+        self.falhas: int = 0
+        self.recusadas: int = 0
+        self.aberturas: int = 0
+
+    @property
+    def estado(self) -> EstadoDisjuntor:
+        with self._lock:
+            self._atualizar_estado()
+            return self._estado
+
+    @contextmanager
+    def chamada(
+        self,
+        erros: tuple[type[BaseException], ...] = (OSError,)
+    ) -> Iterator[Chamada]:
+        """
+        Raises:
+            ErroCircuitoAberto: disjuntor aberto (ou meio aberto com os
+                testes já em andamento).
+            ErroLimiteConcorrencia: nenhuma vaga no host a tempo.
+        """
+        chamada = self._entrar()
+        if not self._vagas.acquire(timeout=self.espera_vaga):
+            with self._lock:
+                self.recusadas += 1
+                if chamada.teste:
+                    self._testes -= 1
+            raise ErroLimiteConcorrencia(
+                f'{self.host}: {self.concorrencia} chamadas em andamento, '
+                f'nenhuma vaga em {self.espera_vaga}s.'
+            )
+
+        with self._lock:
+            self._em_andamento += 1
+        try:
+            yield chamada
+        except erros:
+            chamada.falhou()
+            raise
+        finally:
+            self._vagas.release()
+            self._sair(chamada)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            self._atualizar_estado()
+            falhas_janela = sum(self._janela)
+            return {
+                'estado': self._estado.name.lower(),
+                'estado_codigo': self._estado.value,
+                'em_andamento': self._em_andamento,
+                'concorrencia': self.concorrencia,
+                'chamadas': self.chamadas,
+                'falhas': self.falhas,
+                'recusadas': self.recusadas,
+                'aberturas': self.aberturas,
+                'taxa_erros': (
+                    falhas_janela / len(self._janela) if self._janela else 0.
+                ),
+            }
+
+    def _atualizar_estado(self) -> None:
+        # com o lock
+        if (self._estado == EstadoDisjuntor.ABERTO
+                and time.monotonic() - self._aberto_em >= self.tempo_aberto):
+            self._estado = EstadoDisjuntor.MEIO_ABERTO
+            self._testes = 0
+
+    def _entrar(self) -> Chamada:
+        with self._lock:
+            self._atualizar_estado()
+            teste = self._estado == EstadoDisjuntor.MEIO_ABERTO
+            if (self._estado == EstadoDisjuntor.ABERTO
+                    or teste and self._testes >= self.chamadas_meio_aberto):
+                self.recusadas += 1
+                raise ErroCircuitoAberto(
+                    f'{self.host} indisponível (disjuntor '
+                    f'{self._estado.name.lower()}), tente mais tarde.'
+                )
+            if teste:
+                self._testes += 1
+
+            return Chamada(teste)
+
+    def _sair(self, chamada: Chamada) -> None:
+        with self._lock:
+            self._em_andamento -= 1
+            self.chamadas += 1
+            self.falhas += chamada.falha
+            if chamada.teste:
+                self._testes -= 1
+                if chamada.falha:
+                    self._abrir()
+                elif self._estado == EstadoDisjuntor.MEIO_ABERTO:
+                    self._estado = EstadoDisjuntor.FECHADO
+                    self._janela.clear()
+                return
+
+            self._janela.append(chamada.falha)
+            if (self._estado == EstadoDisjuntor.FECHADO
+                    and len(self._janela) >= self.minimo_chamadas
+                    and sum(self._janela) / len(self._janela)
+                        >= self.limiar_erros):
+                self._abrir()
+
+    def _abrir(self) -> None:
+        log.warning(
+            'Disjuntor aberto', host=self.host, segundos=self.tempo_aberto
+        )
+        self._estado = EstadoDisjuntor.ABERTO
+        self._aberto_em = time.monotonic()
+        self._janela.clear()
+        self.aberturas += 1
+
+
+def extrair_host(url: str) -> str:
+    partes = urlsplit(url)
+    return f'{partes.scheme}://{partes.netloc}'
+
+
+_disjuntores: dict[str, Disjuntor] = {}
+_lock_disjuntores = threading.Lock()
+
+
+def obter_disjuntor(url: str) -> Disjuntor:
+    """
+    Disjuntor do host da URL, compartilhado pelo processo e criado na
+    primeira chamada com a concorrência de Disjuntor.CONCORRENCIA.
+    """
+    host = extrair_host(url)
+    with _lock_disjuntores:
+        disjuntor = _disjuntores.get(host)
+        if disjuntor is None:
+            disjuntor = _disjuntores[host] = Disjuntor(
+                host,
+                concorrencia=CfgDisjuntor.CONCORRENCIA.get(
+                    urlsplit(host).hostname,
+                    CfgDisjuntor.CONCORRENCIA_PADRAO
+                )
+            )
+
+        return disjuntor
+
+
+@contextmanager
+def chamada_host(
+    url: str,
+    etapa: str = '',
+    erros: tuple[type[BaseException], ...] = (OSError,)
+) -> Iterator[Chamada]:
+    """
+    obter_disjuntor(url).chamada(erros), sem o disjuntor quando
+    Disjuntor.HABILITADO for False, medindo a duração em
+    metricas.CHAMADAS_REMOTAS pelo host, etapa e resultado (ok, falha,
+    recusada) e registrando um trecho no rastro atual.
+
+    Args:
+        etapa (str, optional): URL1, PAGINA_INICIAL, simulacao...
+    """
+    host: str = extrair_host(url)
+    chamada: Chamada | None = None
+    inicio: float = time.perf_counter() if metricas.habilitadas() else 0.
+    with rastreamento.trecho(
+        f'chamada {etapa}'.rstrip(), host=host, etapa=etapa
+    ) as trecho:
+        try:
+            if CfgDisjuntor.HABILITADO:
+                with obter_disjuntor(url).chamada(erros) as chamada:
+                    yield chamada
+            else:
+                chamada = Chamada(False)
+                try:
+                    yield chamada
+                except erros:
+                    chamada.falhou()
+                    raise
+        finally:
+            resultado = (
+                'recusada' if chamada is None
+                else 'falha' if chamada.falha else 'ok'
+            )
+            trecho.definir(resultado=resultado)
+            if inicio:
+                CHAMADAS_REMOTAS.observar(
+                    time.perf_counter() - inicio,
+                    host=host, etapa=etapa, resultado=resultado
+                )
+
+
+def estatisticas_disjuntores() -> dict[str, dict]:
+    """Estado de cada host, exportado como métrica."""
+    with _lock_disjuntores:
+        disjuntores = list(_disjuntores.values())
+
+    return {d.host: d.estatisticas() for d in disjuntores}
+
+
+def _coletar_metricas() -> list[Amostras]:
+    estatisticas = estatisticas_disjuntores()
+    medidores = (
+        ('estado_codigo', 'simovel_disjuntor_estado',
+         'Estado do disjuntor (0 fechado, 1 aberto, 2 meio aberto).',
+         'gauge'),
+        ('em_andamento', 'simovel_disjuntor_em_andamento',
+         'Chamadas em andamento no host.', 'gauge'),
+        ('taxa_erros', 'simovel_disjuntor_taxa_erros',
+         'Taxa de falhas na janela do disjuntor.', 'gauge'),
+        ('falhas', 'simovel_disjuntor_falhas_total',
+         'Chamadas que falharam.', 'counter'),
+        ('recusadas', 'simovel_disjuntor_recusadas_total',
+         'Chamadas recusadas (aberto ou sem vaga).', 'counter'),
+        ('aberturas', 'simovel_disjuntor_aberturas_total',
+         'Vezes que o disjuntor abriu.', 'counter'),
+    )
+    return [
+        (nome, descricao, tipo, [
+            ({'host': host}, float(e[campo]))
+            for host, e in estatisticas.items()
+        ])
+        for campo, nome, descricao, tipo in medidores
+    ]
+
+
+metricas.registrar_coletor(_coletar_metricas)
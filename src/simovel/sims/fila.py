@@ -0,0 +1,512 @@
+# coding: utf-8
+"""
+Fila de tarefas de simulação com workers por banco.
+
+Os endpoints de resultado do Multi360 simulavam dentro da thread da
+requisição HTTP e o Itaú (selenium) passa de 30 segundos, segurando a
+thread do servidor e, com várias conversas ao mesmo tempo, todas as
+outras. Aqui cada simulação vira uma tarefa numa fila em processo, com
+um ThreadPoolExecutor por fila (banco) dimensionado em
+FilaSimulacao.TRABALHADORES, assim um banco lento só ocupa os próprios
+workers.
+
+    fila = obter_fila_simulacao()
+    tarefa = fila.submeter('itau', funcao, dados={'key': ...})
+    tarefa = fila.aguardar(tarefa.id, 3.)   # ou consultar depois
+    if tarefa.concluida: ...
+
+Ao terminar a tarefa chama o callback passado em submeter e, com
+FilaSimulacao.URL_CALLBACK, faz um POST json com a tarefa. Com
+FilaSimulacao.PERSISTIR o estado das tarefas também vai pra um SQLite,
+o resultado precisa então ser serializável em json.
+
+O SQLite é o que os workers do gunicorn têm em comum: o callback
+/tarefa pode chegar em outro processo, que consulta (e aguarda) a
+tarefa pelo arquivo. Cada tarefa guarda o pid de quem a executa, e só
+as pendentes ou executando cujo processo não existe mais (reinício)
+viram erro, ao criar a fila ou ao consultá-las. Sem PERSISTIR as
+tarefas ficam só na memória do processo, o serviço precisa então de
+um worker só.
+
+A tarefa roda com uma cópia do contexto (contextvars) de quem submeteu,
+assim os trechos do rastro atual (simovel.rastreamento) continuam no
+worker.
+"""
+__version__ = '0.5'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import contextvars
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable
+
+from simovel.config.geral import FilaSimulacao as CfgFila
+from simovel.log import obter_logger
+
+
+log = obter_logger(__name__)
+
+
+class EstadoTarefa(Enum):
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+
+
+class Tarefa:
+    __slots__ = (
+        'id',
+        'fila',
+        'estado',
+        'resultado',
+        'erro',
+        'dados',
+        'criada_em',
+        'concluida_em',
+        '_evento',
+    )
+
+    def __init__(
+        self,
+        fila: str,
+        dados: dict | None = None,
+        id: str = '',
+        estado: EstadoTarefa = EstadoTarefa.PENDENTE,
+        resultado: Any = None,
+        erro: str = '',
+        criada_em: float = 0.,
+        concluida_em: float = 0.
+    ) -> None:
+        self.id = id or uuid.uuid4().hex
+        self.fila = fila
+        self.estado = estado
+        self.resultado = resultado
+        self.erro = erro
+        # informações de quem submeteu (key do contato...), vão no
+        # callback
+        self.dados = dados or {}
+        self.criada_em = criada_em or time.time()
+        self.concluida_em = concluida_em
+        self._evento = threading.Event()
+        if self.finalizada:
+            self._evento.set()
+
+    @property
+    def finalizada(self) -> bool:
+        return self.estado in (EstadoTarefa.CONCLUIDA, EstadoTarefa.ERRO)
+
+    @property
+    def concluida(self) -> bool:
+        return self.estado == EstadoTarefa.CONCLUIDA
+
+    def para_dict(self) -> dict[str, Any]:
+        return {
+            'id': self.id,
+            'fila': self.fila,
+            'estado': self.estado.value,
+            'resultado': self.resultado,
+            'erro': self.erro,
+            'dados': self.dados,
+            'criada_em': self.criada_em,
+            'concluida_em': self.concluida_em,
+        }
+
+    def __repr__(self) -> str:
+        return f'<Tarefa {self.id} {self.fila} {self.estado.value}>'
+
+
+TAREFA_INTERROMPIDA = 'Interrompida: o processo reiniciou antes de terminar.'
+
+_ESTADOS_FINALIZADOS = (EstadoTarefa.CONCLUIDA.value, EstadoTarefa.ERRO.value)
+# como em memória, expira pelo fim da tarefa, nunca uma em andamento
+_SQL_EXPIRADA = 'estado IN (?, ?) AND concluida_em <= ?'
+_ESTADOS_EM_ANDAMENTO = (
+    EstadoTarefa.PENDENTE.value, EstadoTarefa.EXECUTANDO.value
+)
+
+
+def _processo_vivo(pid: int | None) -> bool:
+    """
+    Se o processo dono da tarefa ainda existe (mesma máquina, workers
+    do gunicorn). Fora do posix o sinal 0 não serve pra consulta, então
+    considera vivo.
+    """
+    if not pid:
+        return False
+    if pid == os.getpid() or os.name != 'posix':
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+class FilaSimulacao:
+    def __init__(
+        self,
+        trabalhadores: dict[str, int] | None = None,
+        trabalhadores_padrao: int = CfgFila.TRABALHADORES_PADRAO,
+        ttl: float = CfgFila.TTL,
+        arquivo_sqlite: str = '',
+        url_callback: str = '',
+        timeout_callback: float = CfgFila.TIMEOUT_CALLBACK,
+        intervalo_consulta: float = CfgFila.INTERVALO_CONSULTA
+    ) -> None:
+        """
+        Args:
+            trabalhadores (dict[str, int], optional): workers por fila.
+            trabalhadores_padrao (int, optional): filas fora de
+                trabalhadores.
+            ttl (float, optional): segundos que a tarefa finalizada
+                continua disponível pra consulta.
+            arquivo_sqlite (str, optional): vazio guarda só em memória.
+            url_callback (str, optional): recebe um POST com cada tarefa
+                finalizada.
+            intervalo_consulta (float, optional): segundos entre as
+                leituras do SQLite ao aguardar tarefa de outro processo.
+        """
+        self.trabalhadores = (
+            CfgFila.TRABALHADORES if trabalhadores is None else trabalhadores
+        )
+        self.trabalhadores_padrao = trabalhadores_padrao
+        self.ttl = ttl
+        self.url_callback = url_callback
+        self.timeout_callback = timeout_callback
+        self.intervalo_consulta = intervalo_consulta
+        self._executores: dict[str, ThreadPoolExecutor] = {}
+        self._tarefas: dict[str, Tarefa] = {}
+        self._lock = threading.Lock()
+
+        self._conexao: sqlite3.Connection | None = None
+        self._lock_sqlite = threading.Lock()
+        if arquivo_sqlite:
+            # arquivo compartilhado entre os workers
+            self._conexao = sqlite3.connect(
+                arquivo_sqlite, timeout=10, check_same_thread=False
+            )
+            with self._lock_sqlite, self._conexao:
+                self._conexao.execute('PRAGMA journal_mode=WAL')
+                self._conexao.execute(
+                    'CREATE TABLE IF NOT EXISTS tarefa ('
+                    'id TEXT PRIMARY KEY, fila TEXT NOT NULL, '
+                    'estado TEXT NOT NULL, resultado TEXT, erro TEXT, '
+                    'dados TEXT, criada_em REAL NOT NULL, '
+                    'concluida_em REAL, pid INTEGER)'
+                )
+                colunas = [
+                    linha[1] for linha in
+                    self._conexao.execute('PRAGMA table_info(tarefa)')
+                ]
+                if 'pid' not in colunas:
+                    self._conexao.execute(
+                        'ALTER TABLE tarefa ADD COLUMN pid INTEGER'
+                    )
+                self._conexao.execute(
+                    f'DELETE FROM tarefa WHERE {_SQL_EXPIRADA}',
+                    (*_ESTADOS_FINALIZADOS, time.time() - ttl)
+                )
+            self._interromper_orfas()
+
+    def submeter(
+        self,
+        fila: str,
+        funcao: Callable[[], Any],
+        callback: Callable[[Tarefa], None] | None = None,
+        dados: dict | None = None
+    ) -> Tarefa:
+        """
+        Coloca funcao na fila, executada por um worker da fila.
+
+        Args:
+            fila (str): nome da fila, normalmente o banco ('caixa'...).
+            funcao (Callable[[], Any]): retorno vira tarefa.resultado.
+            callback (Callable[[Tarefa], None], optional): chamado no
+                worker com a tarefa finalizada (concluída ou com erro).
+            dados (dict, optional): guardado na tarefa.
+
+        Returns:
+            Tarefa: tarefa pendente, consultar pelo id.
+        """
+        self._remover_expiradas()
+        tarefa = Tarefa(fila, dados)
+        with self._lock:
+            self._tarefas[tarefa.id] = tarefa
+        self._salvar(tarefa)
+
+        contexto = contextvars.copy_context()
+        self._executor(fila).submit(
+            self._executar, tarefa, functools.partial(contexto.run, funcao),
+            callback
+        )
+        return tarefa
+
+    def consultar(self, id: str) -> Tarefa | None:
+        with self._lock:
+            tarefa = self._tarefas.get(id)
+        if tarefa is None and self._conexao is not None:
+            tarefa = self._obter_sqlite(id)
+
+        return tarefa
+
+    def aguardar(self, id: str, timeout: float | None = None) -> Tarefa | None:
+        """
+        Espera até timeout segundos a tarefa finalizar. Tarefa de outro
+        processo é relida do SQLite a cada intervalo_consulta segundos.
+
+        Returns:
+            Tarefa | None: a tarefa (finalizada ou não) ou None quando
+            não existe.
+        """
+        with self._lock:
+            tarefa = self._tarefas.get(id)
+        if tarefa is not None:
+            tarefa._evento.wait(timeout)
+            return tarefa
+
+        if self._conexao is None:
+            return None
+
+        limite = None if timeout is None else time.monotonic() + timeout
+        tarefa = self._obter_sqlite(id)
+        while tarefa is not None and not tarefa.finalizada:
+            espera = self.intervalo_consulta
+            if limite is not None:
+                espera = min(espera, limite - time.monotonic())
+                if espera <= 0:
+                    break
+            time.sleep(espera)
+            tarefa = self._obter_sqlite(id) or tarefa
+
+        return tarefa
+
+    @property
+    def estatisticas(self) -> dict[str, dict]:
+        estatisticas: dict[str, dict] = {}
+
+        def da_fila(nome: str) -> dict:
+            # tarefas podem ficar depois de encerrar (sem executores)
+            return estatisticas.setdefault(nome, {
+                'trabalhadores': self._n_trabalhadores(nome),
+                **{estado.value: 0 for estado in EstadoTarefa},
+            })
+
+        with self._lock:
+            for nome in self._executores:
+                da_fila(nome)
+            for tarefa in self._tarefas.values():
+                da_fila(tarefa.fila)[tarefa.estado.value] += 1
+
+        return estatisticas
+
+    def encerrar(self, esperar: bool = True) -> None:
+        with self._lock:
+            executores = list(self._executores.values())
+            self._executores.clear()
+        for executor in executores:
+            executor.shutdown(wait=esperar, cancel_futures=not esperar)
+
+        if self._conexao is not None:
+            with self._lock_sqlite:
+                self._conexao.close()
+                self._conexao = None
+
+    def _n_trabalhadores(self, fila: str) -> int:
+        return self.trabalhadores.get(fila, self.trabalhadores_padrao)
+
+    def _executor(self, fila: str) -> ThreadPoolExecutor:
+        with self._lock:
+            executor = self._executores.get(fila)
+            if executor is None:
+                executor = self._executores[fila] = ThreadPoolExecutor(
+                    max_workers=self._n_trabalhadores(fila),
+                    thread_name_prefix=f'fila-{fila}'
+                )
+
+            return executor
+
+    def _executar(
+        self,
+        tarefa: Tarefa,
+        funcao: Callable[[], Any],
+        callback: Callable[[Tarefa], None] | None
+    ) -> None:
+        tarefa.estado = EstadoTarefa.EXECUTANDO
+        self._salvar(tarefa)
+        try:
+            tarefa.resultado = funcao()
+            tarefa.estado = EstadoTarefa.CONCLUIDA
+        except Exception as erro:
+            log.exception('Erro na tarefa', tarefa=tarefa.id, fila=tarefa.fila)
+            tarefa.erro = f'{type(erro).__name__}: {erro}'
+            tarefa.estado = EstadoTarefa.ERRO
+
+        tarefa.concluida_em = time.time()
+        self._salvar(tarefa)
+        tarefa._evento.set()
+
+        if callback is not None:
+            try:
+                callback(tarefa)
+            except Exception:
+                log.exception('Erro no callback da tarefa', tarefa=tarefa.id)
+        if self.url_callback:
+            self._notificar(tarefa)
+
+    def _notificar(self, tarefa: Tarefa) -> None:
+        corpo = json.dumps(
+            tarefa.para_dict(), ensure_ascii=False, default=str
+        ).encode('utf-8')
+        req = urllib.request.Request(
+            self.url_callback,
+            data=corpo,
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout_callback):
+                pass
+        except Exception as erro:
+            log.warning(
+                'Erro ao notificar a tarefa', tarefa=tarefa.id, erro=repr(erro)
+            )
+
+    def _remover_expiradas(self) -> None:
+        limite = time.time() - self.ttl
+        with self._lock:
+            expiradas = [
+                id for id, tarefa in self._tarefas.items()
+                if tarefa.finalizada and tarefa.concluida_em <= limite
+            ]
+            for id in expiradas:
+                del self._tarefas[id]
+
+        if expiradas and self._conexao is not None:
+            with self._lock_sqlite, self._conexao:
+                self._conexao.execute(
+                    f'DELETE FROM tarefa WHERE {_SQL_EXPIRADA}',
+                    (*_ESTADOS_FINALIZADOS, limite)
+                )
+
+    def _salvar(self, tarefa: Tarefa) -> None:
+        if self._conexao is None:
+            return
+
+        with self._lock_sqlite, self._conexao:
+            self._conexao.execute(
+                'INSERT OR REPLACE INTO tarefa (id, fila, estado, resultado, '
+                'erro, dados, criada_em, concluida_em, pid) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (tarefa.id, tarefa.fila, tarefa.estado.value,
+                 json.dumps(tarefa.resultado, ensure_ascii=False, default=str),
+                 tarefa.erro,
+                 json.dumps(tarefa.dados, ensure_ascii=False, default=str),
+                 tarefa.criada_em, tarefa.concluida_em, os.getpid())
+            )
+
+    def _interromper_orfas(self, id: str = '') -> None:
+        """
+        Pendentes ou executando cujo processo não existe mais (reinício
+        do worker) viram erro, nenhum worker vai terminá-las. As dos
+        outros processos vivos continuam.
+        """
+        filtro_id = ' AND id = ?' if id else ''
+        with self._lock_sqlite, self._conexao:
+            linhas = self._conexao.execute(
+                f'SELECT id, pid FROM tarefa WHERE estado IN (?, ?)'
+                f'{filtro_id}',
+                (*_ESTADOS_EM_ANDAMENTO, *((id,) if id else ()))
+            ).fetchall()
+            orfas = [
+                (id_orfa,) for id_orfa, pid in linhas
+                if not _processo_vivo(pid)
+            ]
+            if not orfas:
+                return
+
+            agora = time.time()
+            # o estado confere de novo: o dono pode ter terminado agora
+            self._conexao.executemany(
+                'UPDATE tarefa SET estado = ?, erro = ?, concluida_em = ? '
+                'WHERE id = ? AND estado IN (?, ?)',
+                [(EstadoTarefa.ERRO.value, TAREFA_INTERROMPIDA, agora,
+                  *orfa, *_ESTADOS_EM_ANDAMENTO) for orfa in orfas]
+            )
+
+        log.warning('Tarefas interrompidas', total=len(orfas))
+
+    def _obter_sqlite(self, id: str) -> Tarefa | None:
+        linha = self._ler_sqlite(id)
+        if linha is not None and linha[1] in _ESTADOS_EM_ANDAMENTO \
+                and not _processo_vivo(linha[-1]):
+            self._interromper_orfas(id)
+            linha = self._ler_sqlite(id)
+
+        if linha is None:
+            return None
+
+        (fila, estado, resultado, erro, dados, criada_em, concluida_em,
+         _) = linha
+        return Tarefa(
+            fila,
+            json.loads(dados or '{}'),
+            id=id,
+            estado=EstadoTarefa(estado),
+            resultado=json.loads(resultado) if resultado else None,
+            erro=erro or '',
+            criada_em=criada_em,
+            concluida_em=concluida_em or 0.
+        )
+
+    def _ler_sqlite(self, id: str) -> tuple | None:
+        with self._lock_sqlite:
+            if self._conexao is None:
+                return None
+
+            return self._conexao.execute(
+                'SELECT fila, estado, resultado, erro, dados, criada_em, '
+                f'concluida_em, pid FROM tarefa WHERE id = ? '
+                f'AND NOT ({_SQL_EXPIRADA})',
+                (id, *_ESTADOS_FINALIZADOS, time.time() - self.ttl)
+            ).fetchone()
+
+
+_fila: FilaSimulacao | None = None
+_lock_fila = threading.Lock()
+
+
+def obter_fila_simulacao() -> FilaSimulacao | None:
+    """
+    Fila de simulação do processo, criada na primeira chamada. None
+    quando FilaSimulacao.HABILITADA for False (simula na própria
+    thread).
+    """
+    global _fila
+
+    if not CfgFila.HABILITADA:
+        return None
+
+    with _lock_fila:
+        if _fila is None:
+            _fila = FilaSimulacao(
+                arquivo_sqlite=(
+                    CfgFila.ARQUIVO_SQLITE if CfgFila.PERSISTIR else ''
+                ),
+                url_callback=CfgFila.URL_CALLBACK
+            )
+
+        return _fila
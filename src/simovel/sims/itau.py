@@ -4,27 +4,31 @@
 """
 
 __author__ = 'Vanduir Santana Medeiros'
-__version__ = '0.9'
+__version__ = '0.13'
 
 
 from datetime import date
 from enum import Enum
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.remote.webelement import WebElement
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from simovel.sims.base import Banco, SimuladorBase, SimulacaoResultadoBase
 from simovel.sims.base import SimuladorBaseL
 from simovel.util import Cpf, Decimal2, Fone
 from simovel.exceptions import ErroResultadoSimulacao, ErroTipoImovel
 from selenium.webdriver.common.keys import Keys
-from time import sleep
 from simovel.config.geral import Parametros
+from simovel.config.geral import Itau as CfgItau
+from simovel.sims.modelo import RequisicaoSimulacao, ResultadoSimulacao
+from simovel.sims.registro import registrar_fabrica, resolver_banco
+from simovel.sims.disjuntor import chamada_host
+from simovel.sims.navegador import TarefaNavegador, obter_pool_navegadores
+from simovel.log import obter_logger
+
+
+log = obter_logger(__name__)
 
 
 class TipoImovel(Enum):
@@ -83,10 +87,6 @@ class SimuladorItauS(SimuladorBase):
 
         self._tipo_imovel: TipoImovel = TipoImovel.RESIDENCIAL
 
-        # selenium
-        self._chrome_options = None
-        self._service = None
-
     @classmethod
     def a_partir_de_dados_financiamento(cls, cpf: str | Cpf, nome: str, 
             email: str, celular: str | Fone, tipo_imovel: TipoImovel, 
@@ -105,8 +105,6 @@ class SimuladorItauS(SimuladorBase):
         sim_itau.data_nascimento = data_nascimento
         sim_itau.prazo = prazo
 
-        sim_itau._setar_opcoes_navegador()
-
         return sim_itau    
 
     @property
@@ -119,176 +117,169 @@ class SimuladorItauS(SimuladorBase):
             raise ErroTipoImovel('Tipo imóvel inválido.')
         self._tipo_imovel = v
 
-    def _setar_opcoes_navegador(self):
-        self._service = Service(ChromeDriverManager().install())
+    def simular(self) -> 'SimulacaoResultadoItau':
+        """Simula num navegador do pool (ver simovel.sims.navegador).
 
-        self._chrome_options = Options()
-        self._chrome_options.headless = True
-        # performance: desabilitar carregamento imagens
-        #self._chrome_options.experimental_options["prefs"] = {
-	    #    "profile.managed_default_content_settings.images": 2
-        #} 
-        self._chrome_options.add_argument('--disable-gpu')
-        self._chrome_options.add_argument('--disable-dev-shm-usage')
-        self._chrome_options.add_argument('--incognito')
+        Raises:
+            ErroNavegadorIndisponivel: nenhum navegador livre a tempo.
+            ErroHostIndisponivel: disjuntor do site aberto ou sem vaga
+                (ver simovel.sims.disjuntor).
+        """
+        with chamada_host(self.URL, 'selenium',
+                          erros=(WebDriverException, OSError)) \
+                as chamada, obter_pool_navegadores().tarefa() as tarefa:
+            try:
+                return self._simular(tarefa)
+            except TimeoutException as erro:
+                log.warning('Tempo esgotado na simulação Itaú', erro=erro.msg)
+                chamada.falhou()
+                return None
 
-    def simular(self) -> 'SimulacaoResultadoItau':
-        with webdriver.Chrome(
-                service=self._service, options=self._chrome_options
-            ) as driver:
-            driver.get(self.URL)
+    def _simular(self, tarefa: TarefaNavegador) -> 'SimulacaoResultadoItau':
+        driver = tarefa.driver
+        driver.get(self.URL)
 
-            print(f'{driver.current_url=}')
-            print(f'{driver.title=}')
+        log.debug('Página carregada', url=driver.current_url,
+                  titulo=driver.title)
 
-            print('Preenchendo formulário #1')
-            input_cpf = driver.find_element(
-                by=By.CSS_SELECTOR, value='input#cpf'
-            )
-            input_cpf.clear()
-            input_cpf.send_keys(self.cpf)
+        log.debug('Preenchendo formulário #1')
+        input_cpf: WebElement = tarefa.aguardar(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, 'input#cpf'))
+        )
+        input_cpf.clear()
+        input_cpf.send_keys(self.cpf)
 
-            input_cpf.submit()
+        input_cpf.submit()
 
-            print('Preenchendo formulário #2')
-            input_nome: WebElement = WebDriverWait(driver, timeout=5).until(
-                lambda d: d.find_element(
-                    by=By.CSS_SELECTOR, value='input#proponent_name'
-                )
+        log.debug('Preenchendo formulário #2')
+        input_nome: WebElement = tarefa.aguardar(
+            EC.element_to_be_clickable(
+                (By.CSS_SELECTOR, 'input#proponent_name')
             )
-            input_nome.send_keys(self.nome)
+        )
+        input_nome.send_keys(self.nome)
 
-            input_email = driver.find_element(
-                by=By.CSS_SELECTOR, value='input#proponent_email'
-            )
-            input_email.send_keys(self.email)
+        input_email = driver.find_element(
+            by=By.CSS_SELECTOR, value='input#proponent_email'
+        )
+        input_email.send_keys(self.email)
 
-            input_celular = driver.find_element(
-                by=By.CSS_SELECTOR, value='input#proponent_phone'
-            )
-            input_celular.send_keys(self.celular)
-
-            # testes
-            # softlead-simulation
-            #driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-
-            input_celular.submit()
-            sleep(5)
-            #driver.save_screenshot('screenshot.png')
-
-            for i in range(1, 4):
-                print(f'Aguardando carregamento formulário #3. Tentativa {i}...')
-                try:
-                    select_tipo_imovel = WebDriverWait(driver, timeout=20).until(
-                        lambda d: d.find_element(
-                            by=By.CSS_SELECTOR, value='select#property_type'
-                        )
-                    )
-                    break
-                except TimeoutException as erro:
-                    # TODO: log
-                    #print('Erro ao aguardar carregamento do formulário #3.', erro)
-                    print('Erro ao aguardar carregamento do formulário #3.')
-            else:
-                # TODO: log
-                print('Não carregou formulário #3!')
-                return None
+        input_celular = driver.find_element(
+            by=By.CSS_SELECTOR, value='input#proponent_phone'
+        )
+        input_celular.send_keys(self.celular)
 
-            print('Preenchendo formulário #3...')
-            select = Select(select_tipo_imovel)
-            select.select_by_value(self.tipo_imovel.value)
+        input_celular.submit()
 
-            input_valor_imovel = driver.find_element(
-                by=By.CSS_SELECTOR, value='input#property_value'
+        log.debug('Aguardando carregamento formulário #3')
+        try:
+            select_tipo_imovel = tarefa.aguardar(
+                EC.element_to_be_clickable(
+                    (By.CSS_SELECTOR, 'select#property_type')
+                )
             )
-            input_valor_imovel.send_keys(self.valor_imovel)
+        except TimeoutException:
+            log.warning('Não carregou formulário #3')
+            return None
 
-            input_valor_entrada = driver.find_element(
-                by=By.CSS_SELECTOR, value='input#input_value'
-            )
-            input_valor_entrada.send_keys(self.valor_entrada)
+        log.debug('Preenchendo formulário #3')
+        select = Select(select_tipo_imovel)
+        select.select_by_value(self.tipo_imovel.value)
 
-            input_data_nasc = driver.find_element(
-                by=By.CSS_SELECTOR, value='input#birthdate'
-            )
-            input_data_nasc.send_keys(self.data_nascimento)
+        input_valor_imovel = driver.find_element(
+            by=By.CSS_SELECTOR, value='input#property_value'
+        )
+        input_valor_imovel.send_keys(self.valor_imovel)
 
-            input_prazo = driver.find_element(
-                by=By.CSS_SELECTOR, value='input#financing_term'
-            )
-            input_prazo.send_keys(self.prazo)
+        input_valor_entrada = driver.find_element(
+            by=By.CSS_SELECTOR, value='input#input_value'
+        )
+        input_valor_entrada.send_keys(self.valor_entrada)
 
-            label_input_seguradora_itau = driver.find_element(
-                by=By.XPATH, value="//label[@for='insurer-ITAU']"
-            )
-            label_input_seguradora_itau.click()
-
-            input_prazo.submit()
-            #driver.save_screenshot('screenshot2.png')
-            print('Aguardando resultado da simulação...')
-            h2_resultado = WebDriverWait(driver, timeout=20).until(
-                lambda d: d.find_element(
-                    by=By.CSS_SELECTOR, 
-                    value='form#simulation-result div.simulation-result-container div.form-container h2'
-                )
-            )
+        input_data_nasc = driver.find_element(
+            by=By.CSS_SELECTOR, value='input#birthdate'
+        )
+        input_data_nasc.send_keys(self.data_nascimento)
 
-            if h2_resultado.text.lower() != 'resultado da simulação':
-                # TODO: disparar erro?
-                print('Não encontrou resultado da simulação')
-                return False
-            
-            divs_result = driver.find_elements(
-                by=By.CSS_SELECTOR, 
-                value='li#data-result-0 div.item-body div.detail'
-            )
+        input_prazo = driver.find_element(
+            by=By.CSS_SELECTOR, value='input#financing_term'
+        )
+        input_prazo.send_keys(self.prazo)
 
-            ps_primeira_parcela = divs_result[1].find_elements(
-                by=By.TAG_NAME, value='p'
-            )
-            ps_ultima_parcela = divs_result[2].find_elements(
-                by=By.TAG_NAME, value='p'
-            )
-            ps_taxa_juros = divs_result[3].find_elements(
-                by=By.TAG_NAME, value='p')
-            ps_cet = divs_result[4].find_elements(by=By.TAG_NAME, value='p')
-            ps_somatorio_parcelas = divs_result[5].find_elements(
-                by=By.TAG_NAME, value='p'
-            )
+        label_input_seguradora_itau = driver.find_element(
+            by=By.XPATH, value="//label[@for='insurer-ITAU']"
+        )
+        label_input_seguradora_itau.click()
+
+        input_prazo.submit()
+        log.debug('Aguardando resultado da simulação')
+        h2_resultado = tarefa.aguardar(
+            EC.visibility_of_element_located((
+                By.CSS_SELECTOR,
+                'form#simulation-result div.simulation-result-container '
+                'div.form-container h2'
+            ))
+        )
 
-            # clicar botão pra exibir div extra
-            button_mais_possibilidades = driver.find_element(
-                by=By.CSS_SELECTOR, 
-                value='li#data-result-0 div.item-control button'
-            )
-            button_mais_possibilidades.click()
+        if h2_resultado.text.lower() != 'resultado da simulação':
+            # TODO: disparar erro?
+            log.warning('Não encontrou resultado da simulação')
+            return False
 
-            divs_result_extra0 = driver.find_elements(
-                by=By.CSS_SELECTOR, 
-                value='li#data-result-0 div.item-extra'
-            )[0].find_elements(by=By.CSS_SELECTOR, value='div.detail')
+        divs_result = tarefa.aguardar(
+            EC.presence_of_all_elements_located((
+                By.CSS_SELECTOR, 'li#data-result-0 div.item-body div.detail'
+            ))
+        )
 
-            ps_total_financiado = divs_result_extra0[0].find_elements(
-                by=By.TAG_NAME, value='p'
-            )
-            ps_cesh = divs_result_extra0[1].find_elements(
-                by=By.TAG_NAME, value='p'
-            )
+        ps_primeira_parcela = divs_result[1].find_elements(
+            by=By.TAG_NAME, value='p'
+        )
+        ps_ultima_parcela = divs_result[2].find_elements(
+            by=By.TAG_NAME, value='p'
+        )
+        ps_taxa_juros = divs_result[3].find_elements(
+            by=By.TAG_NAME, value='p')
+        ps_cet = divs_result[4].find_elements(by=By.TAG_NAME, value='p')
+        ps_somatorio_parcelas = divs_result[5].find_elements(
+            by=By.TAG_NAME, value='p'
+        )
 
-            # definir dados (itens)
-            return SimulacaoResultadoItau.a_partir_de_p(
-                self,
-                TITULO_02,
-                l=[
-                    ps_primeira_parcela, 
-                    ps_ultima_parcela, 
-                    ps_taxa_juros,
-                    ps_cet, 
-                    ps_somatorio_parcelas, 
-                    ps_total_financiado, 
-                    ps_cesh,
-                ]
-            )
+        # clicar botão pra exibir div extra
+        button_mais_possibilidades = tarefa.aguardar(
+            EC.element_to_be_clickable((
+                By.CSS_SELECTOR, 'li#data-result-0 div.item-control button'
+            ))
+        )
+        button_mais_possibilidades.click()
+
+        divs_result_extra0 = tarefa.aguardar(
+            EC.presence_of_all_elements_located((
+                By.CSS_SELECTOR, 'li#data-result-0 div.item-extra div.detail'
+            ))
+        )
+
+        ps_total_financiado = divs_result_extra0[0].find_elements(
+            by=By.TAG_NAME, value='p'
+        )
+        ps_cesh = divs_result_extra0[1].find_elements(
+            by=By.TAG_NAME, value='p'
+        )
+
+        # definir dados (itens)
+        return SimulacaoResultadoItau.a_partir_de_p(
+            self,
+            TITULO_02,
+            l=[
+                ps_primeira_parcela, 
+                ps_ultima_parcela, 
+                ps_taxa_juros,
+                ps_cet, 
+                ps_somatorio_parcelas, 
+                ps_total_financiado, 
+                ps_cesh,
+            ]
+        )
 
 
 class SimulacaoResultadoItau(SimulacaoResultadoBase):
@@ -368,6 +359,39 @@ class SimulacaoResultadoItau(SimulacaoResultadoBase):
         return t
 
 
+@registrar_fabrica(Banco.ITAU)
+def simular_requisicao(req: RequisicaoSimulacao) -> ResultadoSimulacao:
+    """
+    Simula pelo site (selenium) ou pela api L, de acordo com
+    Itau.TIPO_SIMULACAO.
+    """
+    if resolver_banco(Banco.ITAU) == Banco.ITAU_L:
+        return simular_requisicao_l(req)
+
+    nome, email = req.nome_email()
+    sim = SimuladorItauS.a_partir_de_dados_financiamento(
+        req.cpf, nome, email, req.celular, TipoImovel.RESIDENCIAL,
+        req.valor_imovel, req.valor_entrada, req.data_nascimento,
+        req.prazo_anos(CfgItau.PRAZO_MAX)
+    )
+    return ResultadoSimulacao.a_partir_de(
+        Banco.ITAU, sim.simular(), sim, prazo_max=CfgItau.PRAZO_MAX
+    )
+
+
+@registrar_fabrica(Banco.ITAU_L)
+def simular_requisicao_l(req: RequisicaoSimulacao) -> ResultadoSimulacao:
+    nome, email = req.nome_email()
+    sim = SimuladorItauL(
+        nome, email, req.valor_imovel, req.valor_entrada,
+        req.data_nascimento, req.prazo_anos(CfgItau.PRAZO_MAX),
+        req.renda_familiar
+    )
+    return ResultadoSimulacao.a_partir_de(
+        Banco.ITAU_L, sim.simular(), sim, prazo_max=CfgItau.PRAZO_MAX
+    )
+
+
 def test1() -> bool:
     cpf: str = '76709347001'
     nome: str = 'Guido Vanderval'
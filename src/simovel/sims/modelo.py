@@ -0,0 +1,294 @@
+# coding: utf-8
+"""
+Requisição e resultado uniformes entre os bancos.
+
+Cada simulador tem o seu construtor, os seus atributos e o seu
+resultado (SimulacaoResultadoCaixa, SimulacaoResultadoBradesco...),
+com os valores em Decimal2 atrás de propriedades que devolvem strings
+formatadas. RequisicaoSimulacao e ResultadoSimulacao são o formato
+comum usado pelas fábricas do registro (simovel.sims.registro), pela
+simulação em todos os bancos (simovel.sims.multibanco) e por quem
+precisa guardar ou agrupar simulações: valores em Decimal, prazos em
+int, formatados só na hora de exibir.
+"""
+__version__ = '0.1'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+from decimal import Decimal
+from typing import Any
+
+from simovel.config.geral import Parametros
+from simovel.sims.base import Banco, SimulacaoResultadoBase, SimuladorBase
+from simovel.util import Decimal2, email_aleatorio, sobrenome_aleatorio
+
+
+def converter_decimal(v: str | int | float | Decimal | None) -> Decimal:
+    """
+    Converte valores de entrada (inclusive strings no formato pt_BR,
+    'R$ 300.000,00') pra Decimal. Vazio ou None é 0.
+    """
+    if not v:
+        return Decimal(0)
+    if isinstance(v, Decimal):
+        return Decimal(v)
+
+    return Decimal(Decimal2.a_partir_de_valor(v))
+
+
+def formatar_moeda(v: Decimal, retirar_rs: bool = False) -> str:
+    return Decimal2(v).formatar_moeda(retirar_rs=retirar_rs)
+
+
+class RequisicaoSimulacao:
+    """
+    Dados do proponente e do imóvel usados pelos simuladores. Cada banco
+    usa apenas os campos que precisa.
+
+    O prazo é em meses, 0 usa o prazo máximo de cada banco. Pra Itaú e
+    Santander (anos) é convertido com prazo_anos.
+    """
+    __slots__ = (
+        'valor_imovel',
+        'renda_familiar',
+        'data_nascimento',
+        'cpf',
+        'celular',
+        'nome',
+        'email',
+        'valor_entrada',
+        'prazo',
+        'uf',
+        'cod_cidade_caixa',
+        'nome_cidade',
+        'nome_cidade_sem_aspa',
+        'tres_anos_fgts',
+        'mais_de_um_comprador_dependente',
+        'data_nascimento_conjuge',
+        'opcao_financiamento_caixa',
+    )
+
+    def __init__(
+        self,
+        valor_imovel: str | Decimal,
+        renda_familiar: str | Decimal,
+        data_nascimento: str,
+        cpf: str = '',
+        celular: str = '',
+        nome: str = '',
+        email: str = '',
+        valor_entrada: str | Decimal = '',
+        prazo: int = 0,
+        uf: str = Parametros.UF_PADRAO,
+        cod_cidade_caixa: int = 0,
+        nome_cidade: str = '',
+        nome_cidade_sem_aspa: str = '',
+        tres_anos_fgts: bool = False,
+        mais_de_um_comprador_dependente: bool = False,
+        data_nascimento_conjuge: str = '',
+        opcao_financiamento_caixa: int | None = None
+    ) -> None:
+        self.valor_imovel: Decimal = converter_decimal(valor_imovel)
+        self.renda_familiar: Decimal = converter_decimal(renda_familiar)
+        self.data_nascimento = data_nascimento
+        self.cpf = cpf
+        self.celular = celular
+        # Itaú e Santander (api L) exigem nome com sobrenome e e-mail
+        self.nome = nome
+        self.email = email
+        self.valor_entrada: Decimal = converter_decimal(valor_entrada)
+        self.prazo = prazo
+        self.uf = uf
+        self.cod_cidade_caixa = cod_cidade_caixa
+        self.nome_cidade = nome_cidade
+        self.nome_cidade_sem_aspa = nome_cidade_sem_aspa
+        self.tres_anos_fgts = tres_anos_fgts
+        self.mais_de_um_comprador_dependente = mais_de_um_comprador_dependente
+        self.data_nascimento_conjuge = data_nascimento_conjuge
+        # quando None usa a primeira opção retornada pela Caixa
+        self.opcao_financiamento_caixa = opcao_financiamento_caixa
+
+    def prazo_anos(self, prazo_max: int) -> int:
+        if not self.prazo:
+            return prazo_max
+
+        return min(max(self.prazo // 12, 1), prazo_max)
+
+    def nome_email(self) -> tuple[str, str]:
+        """Nome com sobrenome e e-mail, aleatórios quando faltarem."""
+        nome = self.nome
+        if nome and ' ' not in nome.strip():
+            nome = sobrenome_aleatorio(nome)
+
+        return nome, self.email or email_aleatorio()
+
+    def para_dict(self) -> dict[str, Any]:
+        return {nome: getattr(self, nome) for nome in self.__slots__}
+
+
+class ResultadoSimulacao:
+    """
+    Resultado de qualquer banco com os valores crus. original guarda o
+    resultado do simulador, usado pro texto exibido (str).
+
+    Os prazos ficam na unidade do banco (unidade_prazo): meses pra
+    Caixa e Bradesco, anos pra Itaú e Santander.
+    """
+    __slots__ = (
+        'banco',
+        'titulo',
+        'valor_imovel',
+        'valor_entrada',
+        'valor_financiamento',
+        'prazo',
+        'prazo_max',
+        'unidade_prazo',
+        'sistema_amortizacao',
+        'valor_prestacao',
+        'primeira_prestacao',
+        'ultima_prestacao',
+        'taxa_juros',
+        'somatorio_parcelas',
+        'original',
+    )
+
+    CAMPOS_MOEDA = (
+        'valor_imovel',
+        'valor_entrada',
+        'valor_financiamento',
+        'valor_prestacao',
+        'primeira_prestacao',
+        'ultima_prestacao',
+        'somatorio_parcelas',
+    )
+
+    def __init__(
+        self,
+        banco: Banco,
+        titulo: str = '',
+        valor_imovel: Decimal = Decimal(0),
+        valor_entrada: Decimal = Decimal(0),
+        valor_financiamento: Decimal = Decimal(0),
+        prazo: int = 0,
+        prazo_max: int = 0,
+        unidade_prazo: str = 'meses',
+        sistema_amortizacao: str = '',
+        valor_prestacao: Decimal = Decimal(0),
+        primeira_prestacao: Decimal = Decimal(0),
+        ultima_prestacao: Decimal = Decimal(0),
+        taxa_juros: Decimal = Decimal(0),
+        somatorio_parcelas: Decimal = Decimal(0),
+        original: SimulacaoResultadoBase | None = None
+    ) -> None:
+        self.banco = banco
+        self.titulo = titulo
+        self.valor_imovel = valor_imovel
+        self.valor_entrada = valor_entrada
+        self.valor_financiamento = valor_financiamento
+        self.prazo = prazo
+        self.prazo_max = prazo_max
+        self.unidade_prazo = unidade_prazo
+        self.sistema_amortizacao = sistema_amortizacao
+        self.valor_prestacao = valor_prestacao
+        self.primeira_prestacao = primeira_prestacao
+        self.ultima_prestacao = ultima_prestacao
+        # percentual ao ano
+        self.taxa_juros = taxa_juros
+        self.somatorio_parcelas = somatorio_parcelas
+        self.original = original
+
+    @classmethod
+    def a_partir_de(
+        cls,
+        banco: Banco,
+        resultado: SimulacaoResultadoBase,
+        simulador: SimuladorBase | None = None,
+        prazo_max: int = 0
+    ) -> 'ResultadoSimulacao':
+        """
+        Copia os valores (Decimal2 internos, sem passar pelas
+        propriedades formatadas) do resultado de um simulador.
+
+        Args:
+            prazo_max (int, optional): quando 0 usa o do simulador.
+        """
+        def valor(obj: object, nome: str) -> Decimal:
+            return Decimal(getattr(obj, nome, None) or 0)
+
+        em_meses: bool = banco in (Banco.CAIXA, Banco.BRADESCO)
+        valor_imovel = valor(resultado, '_valor_imovel')
+        valor_entrada = valor(resultado, '_valor_entrada')
+        prazo: int = resultado._prazo
+        if simulador is not None:
+            valor_imovel = valor_imovel or valor(simulador, '_valor_imovel')
+            valor_entrada = valor_entrada or valor(simulador, '_valor_entrada')
+            prazo_max = prazo_max or simulador._prazo_max
+            if not em_meses:
+                # o resultado da api L traz o prazo em meses
+                prazo = simulador._prazo
+
+        return cls(
+            banco=banco,
+            titulo=resultado.titulo,
+            valor_imovel=valor_imovel,
+            valor_entrada=valor_entrada,
+            valor_financiamento=valor(resultado, '_valor_financiamento'),
+            prazo=prazo,
+            prazo_max=prazo_max,
+            unidade_prazo='meses' if em_meses else 'anos',
+            sistema_amortizacao=resultado.sistema_amortizacao,
+            valor_prestacao=valor(resultado, '_valor_prestacao'),
+            primeira_prestacao=valor(resultado, '_primeira_prestacao'),
+            ultima_prestacao=valor(resultado, '_ultima_prestacao'),
+            taxa_juros=valor(resultado, '_taxa_juros'),
+            somatorio_parcelas=valor(resultado, '_somatorio_parcelas'),
+            original=resultado
+        )
+
+    def formatar_prazo(self, prazo: int) -> str:
+        return f'{prazo} {self.unidade_prazo}'
+
+    def formatar(self) -> dict[str, str]:
+        """
+        Valores formatados pra exibição (moeda pt_BR, prazo com a
+        unidade, taxa com %).
+        """
+        formatado: dict[str, str] = {
+            nome: formatar_moeda(getattr(self, nome))
+            for nome in self.CAMPOS_MOEDA
+        }
+        formatado.update(
+            titulo=self.titulo,
+            prazo=self.formatar_prazo(self.prazo),
+            prazo_max=self.formatar_prazo(self.prazo_max),
+            sistema_amortizacao=self.sistema_amortizacao,
+            taxa_juros=f'{self.taxa_juros:.2f}%'.replace('.', ','),
+        )
+        return formatado
+
+    def para_dict(self) -> dict[str, Any]:
+        """Valores crus, sem o original (serializável em json)."""
+        d: dict[str, Any] = {
+            nome: getattr(self, nome)
+            for nome in self.__slots__ if nome != 'original'
+        }
+        d['banco'] = self.banco.name
+        for nome in self.CAMPOS_MOEDA + ('taxa_juros',):
+            d[nome] = str(d[nome])
+
+        return d
+
+    def __str__(self) -> str:
+        if self.original is not None:
+            return str(self.original)
+
+        return f'{self.titulo}\n' + '\n'.join(
+            f'{nome}: {v}' for nome, v in self.formatar().items()
+            if nome != 'titulo'
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f'<ResultadoSimulacao {self.banco.name} '
+            f'{self.valor_financiamento} {self.prazo} {self.unidade_prazo}>'
+        )
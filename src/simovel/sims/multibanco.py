@@ -0,0 +1,221 @@
+# coding: utf-8
+"""
+Simulação em todos os bancos habilitados.
+
+A partir de um único perfil (proponente + imóvel) dispara a simulação
+de cada banco habilitado em Parametros.BANCOS_ACEITOS ao mesmo tempo,
+cada um com seu tempo limite. Os resultados são entregues na ordem em
+que os bancos terminam, assim comparar os bancos custa o tempo do mais
+lento e não a soma de todos.
+
+Exemplo:
+
+    perfil = PerfilSimulacao(
+        valor_imovel='300000', renda_familiar='9000',
+        data_nascimento='08/10/1990', cpf='...', celular='...',
+        valor_entrada='60000', cod_cidade_caixa=..., nome_cidade='GOIÂNIA',
+        nome_cidade_sem_aspa='GOIANIA'
+    )
+    for res in simular_todos_iter(perfil):
+        print(res.banco, res.resultado or res.erro)
+"""
+__version__ = '0.2'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import time
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    FIRST_COMPLETED,
+    wait
+)
+from typing import Iterator
+
+from simovel.config.geral import (
+    Parametros,
+    Caixa as CfgCaixa,
+    Bradesco as CfgBradesco,
+    Itau as CfgItau,
+    Santander as CfgSantander
+)
+from simovel.exceptions import ErroTempoEsgotadoSimulacao
+from simovel.sims.base import Banco
+from simovel.sims.modelo import RequisicaoSimulacao, ResultadoSimulacao
+from simovel.sims.registro import obter_fabrica
+
+
+# perfil = requisição uniforme de simovel.sims.modelo
+PerfilSimulacao = RequisicaoSimulacao
+
+
+class ResultadoBanco:
+    """
+    Resultado de um banco em simular_todos. Quando a simulação falha
+    ou estoura o tempo limite, resultado é None e erro guarda a
+    exceção.
+    """
+    def __init__(
+        self,
+        banco: Banco,
+        resultado: ResultadoSimulacao | None = None,
+        erro: Exception | None = None,
+        duracao: float = 0.
+    ) -> None:
+        self.banco = banco
+        self.resultado = resultado
+        self.erro = erro
+        self.duracao = duracao
+
+    @property
+    def sucesso(self) -> bool:
+        return self.erro is None and self.resultado is not None
+
+    def __repr__(self) -> str:
+        situacao = 'ok' if self.sucesso else f'erro={self.erro!r}'
+        return (
+            f'<ResultadoBanco {self.banco.name} {situacao} '
+            f'{self.duracao:.2f}s>'
+        )
+
+
+# banco -> tempo limite em segundos, a simulação vem da fábrica
+# registrada pelo módulo do banco (simovel.sims.registro)
+TIMEOUTS: dict[Banco, float] = {
+    Banco.CAIXA: CfgCaixa.TIMEOUT_SIMULACAO,
+    Banco.BRADESCO: CfgBradesco.TIMEOUT_SIMULACAO,
+    Banco.ITAU: CfgItau.TIMEOUT_SIMULACAO,
+    Banco.SANTANDER: CfgSantander.TIMEOUT_SIMULACAO,
+}
+
+
+def obter_bancos_habilitados() -> list[Banco]:
+    """
+    Bancos habilitados em Parametros.BANCOS_ACEITOS.
+    """
+    return [
+        getattr(Banco, k.upper())
+        for k, v in Parametros.BANCOS_ACEITOS.items() if v
+    ]
+
+
+def _executar(banco: Banco, perfil: PerfilSimulacao) -> ResultadoBanco:
+    inicio = time.monotonic()
+    try:
+        resultado = obter_fabrica(banco)(perfil)
+    except Exception as erro:
+        return ResultadoBanco(
+            banco, erro=erro, duracao=time.monotonic() - inicio
+        )
+
+    return ResultadoBanco(
+        banco, resultado=resultado, duracao=time.monotonic() - inicio
+    )
+
+
+def simular_todos_iter(
+    perfil: PerfilSimulacao,
+    bancos: list[Banco] | None = None,
+    timeouts: dict[Banco, float] | None = None
+) -> Iterator[ResultadoBanco]:
+    """
+    Simula o perfil em todos os bancos ao mesmo tempo e entrega cada
+    resultado assim que o banco termina.
+
+    Args:
+        perfil (PerfilSimulacao): dados do proponente e do imóvel.
+        bancos (list[Banco], optional): bancos a simular. Defaults to
+            bancos habilitados em Parametros.BANCOS_ACEITOS.
+        timeouts (dict[Banco, float], optional): sobrepõe o tempo
+            limite configurado de cada banco.
+
+    Yields:
+        ResultadoBanco: resultado de um banco. Bancos que estouram o
+        tempo limite retornam erro ErroTempoEsgotadoSimulacao.
+    """
+    if bancos is None:
+        bancos = obter_bancos_habilitados()
+
+    timeouts = timeouts or {}
+    bancos = [b for b in bancos if b in TIMEOUTS]
+    if not bancos:
+        return
+
+    executor = ThreadPoolExecutor(
+        max_workers=len(bancos),
+        thread_name_prefix='simular-todos'
+    )
+    inicio = time.monotonic()
+    pendentes: dict[Future, tuple[Banco, float]] = {}
+    try:
+        for banco in bancos:
+            timeout = timeouts.get(banco, TIMEOUTS[banco])
+            futuro = executor.submit(_executar, banco, perfil)
+            pendentes[futuro] = (banco, inicio + timeout)
+
+        while pendentes:
+            agora = time.monotonic()
+            prazo_final = min(limite for _, limite in pendentes.values())
+            prontos, _ = wait(
+                pendentes,
+                timeout=max(prazo_final - agora, 0),
+                return_when=FIRST_COMPLETED
+            )
+
+            for futuro in prontos:
+                pendentes.pop(futuro)
+                yield futuro.result()
+
+            agora = time.monotonic()
+            for futuro, (banco, limite) in list(pendentes.items()):
+                if futuro.done() or agora < limite:
+                    continue
+
+                # a thread não pode ser interrompida, apenas deixa de
+                # ser aguardada
+                futuro.cancel()
+                pendentes.pop(futuro)
+                yield ResultadoBanco(
+                    banco,
+                    erro=ErroTempoEsgotadoSimulacao(
+                        f'Simulação {banco.name} excedeu '
+                        f'{limite - inicio:g}s.'
+                    ),
+                    duracao=agora - inicio
+                )
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def simular_todos(
+    perfil: PerfilSimulacao,
+    bancos: list[Banco] | None = None,
+    timeouts: dict[Banco, float] | None = None
+) -> list[ResultadoBanco]:
+    """
+    Simula o perfil em todos os bancos habilitados ao mesmo tempo.
+
+    Returns:
+        list[ResultadoBanco]: resultados na ordem em que os bancos
+        terminaram.
+    """
+    return list(simular_todos_iter(perfil, bancos, timeouts))
+
+
+def simular_primeiro(
+    perfil: PerfilSimulacao,
+    bancos: list[Banco] | None = None,
+    timeouts: dict[Banco, float] | None = None
+) -> ResultadoBanco | None:
+    """
+    Retorna o primeiro resultado com sucesso, sem aguardar os demais
+    bancos.
+
+    Returns:
+        ResultadoBanco | None: None quando nenhum banco teve sucesso.
+    """
+    for resultado in simular_todos_iter(perfil, bancos, timeouts):
+        if resultado.sucesso:
+            return resultado
+
+    return None
@@ -0,0 +1,266 @@
+# coding: utf-8
+"""
+Pool de navegadores Chrome headless do SimuladorItauS.
+
+Abrir o Chrome (e rodar o ChromeDriverManager) a cada simulação custava
+vários segundos antes mesmo de carregar a página do Itaú, e cada usuário
+simultâneo abria o seu navegador. O PoolNavegadores mantém até
+Itau.NAVEGADOR_POOL_TAMANHO navegadores abertos; cada simulação recebe
+um contexto anônimo novo (Target.createBrowserContext, sem cookies nem
+cache das anteriores), com imagens, fontes e CSS bloqueados e um prazo
+total (Itau.NAVEGADOR_TIMEOUT_SIMULACAO) que limita todas as esperas.
+"""
+__version__ = '0.2'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support.ui import WebDriverWait
+
+from simovel.config.geral import Itau as CfgItau
+from simovel.exceptions import ErroNavegadorIndisponivel
+from simovel.log import obter_logger
+
+
+log = obter_logger(__name__)
+
+_caminho_driver: str | None = None
+_lock_caminho_driver = threading.Lock()
+
+
+def obter_caminho_driver() -> str:
+    """
+    Caminho do chromedriver, resolvido uma vez por processo
+    (ChromeDriverManager consulta a versão do Chrome a cada chamada).
+    """
+    global _caminho_driver
+
+    with _lock_caminho_driver:
+        if _caminho_driver is None:
+            if CfgItau.NAVEGADOR_CHROMEDRIVER:
+                _caminho_driver = CfgItau.NAVEGADOR_CHROMEDRIVER
+            else:
+                from webdriver_manager.chrome import ChromeDriverManager
+                _caminho_driver = ChromeDriverManager().install()
+
+        return _caminho_driver
+
+
+def criar_opcoes() -> Options:
+    opcoes = Options()
+    opcoes.add_argument('--headless=new')
+    opcoes.add_argument('--disable-gpu')
+    opcoes.add_argument('--disable-dev-shm-usage')
+    opcoes.add_argument('--disable-extensions')
+    opcoes.add_argument('--no-first-run')
+    # performance: desabilitar carregamento imagens
+    opcoes.add_experimental_option(
+        'prefs', {'profile.managed_default_content_settings.images': 2}
+    )
+    # não espera imagens/iframes, os formulários já estão no DOM
+    opcoes.page_load_strategy = 'eager'
+    return opcoes
+
+
+def criar_driver() -> WebDriver:
+    return webdriver.Chrome(
+        service=Service(obter_caminho_driver()), options=criar_opcoes()
+    )
+
+
+class TarefaNavegador:
+    """
+    Uma simulação em andamento: o driver, já na aba do contexto novo,
+    e o prazo da simulação.
+    """
+    def __init__(self, driver: WebDriver, timeout: float) -> None:
+        self.driver = driver
+        self.prazo = time.monotonic() + timeout
+
+    @property
+    def restante(self) -> float:
+        return max(self.prazo - time.monotonic(), 0.)
+
+    def aguardar(
+        self,
+        condicao: Callable[[WebDriver], Any],
+        timeout: float = CfgItau.NAVEGADOR_TIMEOUT_ETAPA
+    ) -> Any:
+        """
+        WebDriverWait limitado ao prazo da simulação.
+
+        Raises:
+            TimeoutException: condição não satisfeita a tempo.
+        """
+        timeout = min(timeout, self.restante)
+        if not timeout:
+            raise TimeoutException('Prazo da simulação esgotado.')
+
+        return WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(
+            condicao
+        )
+
+
+class Navegador:
+    """Chrome aberto, reaproveitado entre simulações."""
+    def __init__(self, driver: WebDriver) -> None:
+        self.driver = driver
+        self.usos = 0
+        self._janela_inicial: str = driver.current_window_handle
+
+    @property
+    def ativo(self) -> bool:
+        try:
+            self.driver.current_window_handle
+            return True
+        except WebDriverException:
+            return False
+
+    def abrir_contexto(self) -> str:
+        """
+        Cria um contexto anônimo com uma aba e muda o driver pra ela.
+
+        Returns:
+            str: id do contexto, pra fechar_contexto.
+        """
+        contexto: str = self.driver.execute_cdp_cmd(
+            'Target.createBrowserContext', {}
+        )['browserContextId']
+        aba: str = self.driver.execute_cdp_cmd(
+            'Target.createTarget',
+            {'url': 'about:blank', 'browserContextId': contexto}
+        )['targetId']
+        self.driver.switch_to.window(aba)
+
+        if CfgItau.NAVEGADOR_URLS_BLOQUEADAS:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd(
+                'Network.setBlockedURLs',
+                {'urls': list(CfgItau.NAVEGADOR_URLS_BLOQUEADAS)}
+            )
+
+        self.usos += 1
+        return contexto
+
+    def fechar_contexto(self, contexto: str) -> None:
+        """Descarta o contexto (abas, cookies, cache) e volta pra aba inicial."""
+        self.driver.switch_to.window(self._janela_inicial)
+        self.driver.execute_cdp_cmd(
+            'Target.disposeBrowserContext', {'browserContextId': contexto}
+        )
+
+    def encerrar(self) -> None:
+        try:
+            self.driver.quit()
+        except Exception as erro:
+            log.warning('Erro ao encerrar navegador', erro=repr(erro))
+
+
+class PoolNavegadores:
+    """
+    Mantém até tamanho navegadores abertos. Os navegadores são criados
+    sob demanda e reiniciados depois de max_usos simulações ou quando
+    param de responder.
+    """
+    def __init__(
+        self,
+        tamanho: int = CfgItau.NAVEGADOR_POOL_TAMANHO,
+        max_usos: int = CfgItau.NAVEGADOR_MAX_USOS,
+        criar_driver: Callable[[], WebDriver] = criar_driver
+    ) -> None:
+        self.tamanho = tamanho
+        self.max_usos = max_usos
+        self._criar_driver = criar_driver
+        self._livres: list[Navegador] = []
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._lock = threading.Lock()
+
+    @property
+    def total_livres(self) -> int:
+        return len(self._livres)
+
+    @contextmanager
+    def tarefa(
+        self,
+        timeout: float = CfgItau.NAVEGADOR_TIMEOUT_SIMULACAO,
+        timeout_obter: float = CfgItau.NAVEGADOR_TIMEOUT_OBTER
+    ) -> Iterator[TarefaNavegador]:
+        """
+        Entrega um navegador num contexto novo pelo tempo da simulação.
+
+        Raises:
+            ErroNavegadorIndisponivel: todos ocupados por timeout_obter.
+        """
+        if not self._vagas.acquire(timeout=timeout_obter):
+            raise ErroNavegadorIndisponivel(
+                f'Nenhum navegador livre em {timeout_obter}s.'
+            )
+
+        navegador: Navegador | None = None
+        try:
+            navegador = self._retirar()
+            contexto = navegador.abrir_contexto()
+            try:
+                navegador.driver.set_page_load_timeout(timeout)
+                yield TarefaNavegador(navegador.driver, timeout)
+            finally:
+                try:
+                    navegador.fechar_contexto(contexto)
+                except WebDriverException as erro:
+                    log.warning(
+                        'Erro ao fechar contexto do navegador',
+                        erro=repr(erro)
+                    )
+        finally:
+            if navegador is not None:
+                self._devolver(navegador)
+            self._vagas.release()
+
+    def encerrar(self) -> None:
+        with self._lock:
+            livres, self._livres = self._livres, []
+
+        for navegador in livres:
+            navegador.encerrar()
+
+    def _retirar(self) -> Navegador:
+        with self._lock:
+            if self._livres:
+                return self._livres.pop()
+
+        return Navegador(self._criar_driver())
+
+    def _devolver(self, navegador: Navegador) -> None:
+        if navegador.usos >= self.max_usos or not navegador.ativo:
+            navegador.encerrar()
+            return
+
+        with self._lock:
+            self._livres.append(navegador)
+
+
+_pool: PoolNavegadores | None = None
+_lock_pool = threading.Lock()
+
+
+def obter_pool_navegadores() -> PoolNavegadores:
+    """
+    Retorna o pool de navegadores do processo, criado na primeira
+    chamada (depois do fork dos workers).
+    """
+    global _pool
+
+    with _lock_pool:
+        if _pool is None:
+            _pool = PoolNavegadores()
+
+        return _pool
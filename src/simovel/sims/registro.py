@@ -0,0 +1,180 @@
+# coding: utf-8
+"""
+Registro dos módulos e das fábricas de simulação por Banco.
+
+Importar simovel.sims.itau carrega o selenium inteiro e cada simulador
+traz as suas dependências (bs4, ngram, requests). Quem usa os
+simuladores pega o módulo pelo registro e ele só é importado no
+primeiro acesso a um atributo, assim um worker com apenas a Caixa em
+Parametros.BANCOS_ACEITOS nunca carrega o selenium.
+
+Exemplo:
+
+    caixa = modulo_lazy(Banco.CAIXA)
+    ...
+    sim = caixa.SimuladorCaixa()    # importa simovel.sims.caixa aqui
+
+Cada módulo registra a sua fábrica (RequisicaoSimulacao ->
+ResultadoSimulacao) com @registrar_fabrica, e obter_fabrica importa o
+módulo do banco na primeira vez:
+
+    resultado = obter_fabrica(Banco.BRADESCO)(requisicao)
+"""
+__version__ = '0.3'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import importlib
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, Callable
+
+from simovel.config.geral import Parametros, Itau as CfgItau
+from simovel.config.geral import ItauTipoSimulacao
+from simovel.exceptions import ErroBancoNaoRegistrado
+from simovel.sims.base import Banco
+
+if TYPE_CHECKING:
+    from simovel.sims.modelo import RequisicaoSimulacao, ResultadoSimulacao
+
+    Fabrica = Callable[[RequisicaoSimulacao], ResultadoSimulacao]
+
+
+MODULOS: dict[Banco, str] = {
+    Banco.CAIXA: 'simovel.sims.caixa',
+    Banco.BRADESCO: 'simovel.sims.bradesco',
+    Banco.ITAU: 'simovel.sims.itau',
+    Banco.ITAU_L: 'simovel.sims.itau',
+    Banco.SANTANDER: 'simovel.sims.santander',
+    Banco.ITAU_E_SANTANDER_L: 'simovel.sims.santander',
+}
+
+# chaves de Parametros.BANCOS_ACEITOS
+BANCOS_ACEITOS: dict[str, tuple[Banco, ...]] = {
+    'caixa': (Banco.CAIXA,),
+    'bradesco': (Banco.BRADESCO,),
+    'itau': (Banco.ITAU, Banco.ITAU_L),
+    'santander': (Banco.SANTANDER,),
+}
+
+
+def obter_modulo(banco: Banco) -> ModuleType:
+    """
+    Importa (uma vez) e retorna o módulo do simulador do banco.
+
+    Raises:
+        KeyError: banco sem módulo registrado.
+    """
+    # importlib já serializa o import de cada módulo entre threads
+    return importlib.import_module(MODULOS[banco])
+
+
+class ModuloLazy:
+    """
+    Representa o módulo do simulador de um banco, importado no primeiro
+    acesso a um atributo.
+    """
+    def __init__(self, banco: Banco) -> None:
+        self.banco = banco
+        self._modulo: ModuleType | None = None
+
+    @property
+    def carregado(self) -> bool:
+        return self._modulo is not None
+
+    def __getattr__(self, nome: str) -> Any:
+        # só chamado pra atributos que não são da instância
+        if self._modulo is None:
+            self._modulo = obter_modulo(self.banco)
+        return getattr(self._modulo, nome)
+
+    def __repr__(self) -> str:
+        estado = 'carregado' if self.carregado else 'não carregado'
+        return f'<ModuloLazy {MODULOS[self.banco]} ({estado})>'
+
+
+def modulo_lazy(banco: Banco) -> ModuloLazy:
+    return ModuloLazy(banco)
+
+
+_fabricas: dict[Banco, 'Fabrica'] = {}
+
+
+def registrar_fabrica(*bancos: Banco) -> Callable[['Fabrica'], 'Fabrica']:
+    """
+    Decorador que registra a função como fábrica de simulação dos
+    bancos. Registrar de novo um banco substitui a fábrica anterior.
+    """
+    def registrar(fabrica: 'Fabrica') -> 'Fabrica':
+        for banco in bancos:
+            _fabricas[banco] = fabrica
+        return fabrica
+
+    return registrar
+
+
+def obter_fabrica(banco: Banco) -> 'Fabrica':
+    """
+    Fábrica de simulação do banco, importando o módulo dele quando
+    ainda não foi importado.
+
+    Raises:
+        ErroBancoNaoRegistrado: banco sem fábrica.
+    """
+    fabrica = _fabricas.get(banco)
+    if fabrica is None and banco in MODULOS:
+        obter_modulo(banco)
+        fabrica = _fabricas.get(banco)
+
+    if fabrica is None:
+        raise ErroBancoNaoRegistrado(
+            f'Nenhuma fábrica de simulação registrada pra {banco.name}.'
+        )
+
+    return fabrica
+
+
+def resolver_banco(banco: Banco) -> Banco:
+    """
+    Itaú tem dois simuladores, o do site (selenium) e o da api L, qual
+    é usado depende de Itau.TIPO_SIMULACAO.
+    """
+    if banco in (Banco.ITAU, Banco.ITAU_L):
+        return (
+            Banco.ITAU if CfgItau.TIPO_SIMULACAO == ItauTipoSimulacao.SEL
+            else Banco.ITAU_L
+        )
+
+    return banco
+
+
+def chave_banco(banco: Banco | None, padrao: str = 'padrao') -> str:
+    """
+    Chave do banco em Parametros.BANCOS_ACEITOS ('caixa', 'itau'...),
+    usada também pra nomear filas e configurações por banco.
+    """
+    for chave, bancos in BANCOS_ACEITOS.items():
+        if banco in bancos:
+            return chave
+
+    return padrao
+
+
+def carregar_bancos_aceitos() -> list[str]:
+    """
+    Importa os módulos dos bancos habilitados em
+    Parametros.BANCOS_ACEITOS, pra aquecer o worker antes da primeira
+    requisição quando preferível.
+
+    Returns:
+        list[str]: módulos importados.
+    """
+    nomes: list[str] = []
+    for chave, habilitado in Parametros.BANCOS_ACEITOS.items():
+        if not habilitado:
+            continue
+        for banco in BANCOS_ACEITOS.get(chave, ()):
+            modulo = obter_modulo(banco)
+            if modulo.__name__ not in nomes:
+                nomes.append(modulo.__name__)
+
+    return nomes
@@ -4,10 +4,13 @@
 """
 
 __author__ = 'Vanduir Santana Medeiros'
-__version__ = '0.2'
+__version__ = '0.3'
 
 from simovel.sims.base import Banco, SimuladorBase, SimulacaoResultadoBase
 from simovel.sims.base import SimuladorBaseL
+from simovel.config.geral import Santander as CfgSantander
+from simovel.sims.modelo import RequisicaoSimulacao, ResultadoSimulacao
+from simovel.sims.registro import registrar_fabrica
 from simovel.util import Decimal2
 
 
@@ -36,6 +39,20 @@ class SimuladorSantanderL(SimuladorBaseL):
         )
 
 
+@registrar_fabrica(Banco.SANTANDER)
+def simular_requisicao(req: RequisicaoSimulacao) -> ResultadoSimulacao:
+    nome, email = req.nome_email()
+    sim = SimuladorSantanderL(
+        nome, email, req.valor_imovel, req.valor_entrada,
+        req.data_nascimento, req.prazo_anos(CfgSantander.PRAXO_MAX),
+        req.renda_familiar
+    )
+    return ResultadoSimulacao.a_partir_de(
+        Banco.SANTANDER, sim.simular(), sim,
+        prazo_max=CfgSantander.PRAXO_MAX
+    )
+
+
 def test2() -> bool:
     nome: str = 'Blase Pascal'
     email: str = 'blasep318@gmail.com'
@@ -0,0 +1,91 @@
+# coding: utf-8
+"""
+Sessões HTTP (requests) compartilhadas pelos simuladores que não usam o
+urllib, Bradesco e Loft: uma por host, reaproveitando a conexão
+(keep-alive) entre as interações, com pool de conexões limitado e novas
+tentativas com espera exponencial (Http.TENTATIVAS, Http.BACKOFF).
+
+As sessões não guardam cookies: as interações continuam independentes
+como eram com requests.get/post e simulações simultâneas não misturam
+cookies entre si.
+
+Cada nova tentativa é contada em metricas.NOVAS_TENTATIVAS pelo host e
+motivo (status HTTP ou nome da exceção).
+"""
+__version__ = '0.2'
+__author__ = 'Vanduir Santana Medeiros'
+
+
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from simovel.config.geral import Http as CfgHttp
+from simovel.metricas import NOVAS_TENTATIVAS
+
+
+_sessoes: dict[str, requests.Session] = {}
+_lock_sessoes = threading.Lock()
+
+
+class RetryMedido(Retry):
+    """Retry que conta as novas tentativas nas métricas."""
+    def increment(self, method=None, url=None, response=None, error=None,
+                  _pool=None, _stacktrace=None) -> Retry:
+        host: str = f'{_pool.scheme}://{_pool.host}' if _pool else ''
+        motivo: str = (
+            type(error).__name__ if error is not None
+            else str(response.status) if response is not None else ''
+        )
+        NOVAS_TENTATIVAS.inc(host=host, motivo=motivo)
+        return super().increment(
+            method, url, response, error, _pool, _stacktrace
+        )
+
+
+def criar_sessao() -> requests.Session:
+    retry = RetryMedido(
+        total=CfgHttp.TENTATIVAS,
+        backoff_factor=CfgHttp.BACKOFF,
+        status_forcelist=CfgHttp.STATUS_TENTAR_NOVAMENTE,
+        # as interações com os bancos podem ser repetidas
+        allowed_methods=frozenset(('GET', 'POST')),
+        raise_on_status=False
+    )
+    adaptador = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=CfgHttp.POOL_TAMANHO,
+        max_retries=retry
+    )
+    sessao = requests.Session()
+    sessao.mount('https://', adaptador)
+    sessao.mount('http://', adaptador)
+    sessao.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return sessao
+
+
+def obter_sessao(url: str) -> requests.Session:
+    """
+    Sessão do host da URL (já resolvida, ver simovel.replay.resolver_url),
+    criada na primeira chamada.
+    """
+    partes = urlsplit(url)
+    host = f'{partes.scheme}://{partes.netloc}'
+    with _lock_sessoes:
+        sessao = _sessoes.get(host)
+        if sessao is None:
+            sessao = _sessoes[host] = criar_sessao()
+
+        return sessao
+
+
+def encerrar_sessoes() -> None:
+    """Fecha as conexões de todas as sessões."""
+    with _lock_sessoes:
+        for sessao in _sessoes.values():
+            sessao.close()
+        _sessoes.clear()
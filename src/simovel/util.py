@@ -2,7 +2,7 @@
 # coding: utf-8
 """Funções úteis como por exemplo validar_cpf ou remover_acentos.
 """
-__version__ = '0.23'
+__version__ = '0.25'
 __author__ = 'Vanduir Santana Medeiros'
 
 import math
@@ -13,13 +13,17 @@ from decimal import Decimal, InvalidOperation
 from datetime import datetime, date
 from enum import Enum
 import re
-from sqlalchemy.types import CHAR
 import unidecode
 import locale
 import os, csv
 from pathlib import Path
 
 from simovel.exceptions import ErroCPF, ErroEmail
+from simovel.log import obter_logger
+
+
+log = obter_logger(__name__)
+
 
 def remover_acentos(s: str, maiusc: bool=True) -> str:
     """
@@ -112,7 +116,7 @@ def data_eh_valida(
 def obter_diretorio_raiz(path_arq: str='') -> str:
     # 1. Obtendo o diretório do script atual
     diretorio_script = Path(__file__).resolve().parent
-    print(f'Diretório do script: {diretorio_script}')
+    log.debug('Diretório do script', diretorio=str(diretorio_script))
 
     # 2. Obtendo o diretório raiz do projeto
     diretorio_raiz = diretorio_script
@@ -142,9 +146,7 @@ def csv_pra_lista_de_dic(arq: str, nomes_campos: tuple) -> list:
         list[dict]: retorna uma lista de dicionários com as linhas.
     """
     arq = obter_diretorio_raiz(arq)
-    print('-' * 50)
-    print(f'O arquivo é: {arq}')
-    print('-' * 50)
+    log.debug('Lendo csv', arquivo=arq)
     if not os.path.exists(arq):
         raise Exception(f'Não encontrou o arquivo {arq}.')
 
@@ -233,7 +235,7 @@ class Decimal2(Decimal):
             except InvalidOperation as erro:
                 raise InvalidOperation(f'O valor "{v}" é inválido!')
             except Exception as erro:
-                print(f'{v} não é um valor aceito!')
+                log.debug('Valor não aceito', valor=v)
                 raise ValueError(f'{erro}')
         else:
             raise TypeError(
@@ -268,7 +270,7 @@ class Decimal2(Decimal):
         try:
             r = locale.currency(self, grouping=True)
         except ValueError:
-            print(
+            log.error(
                 'Problema ao formatar_moeda. Rodar '
                 'Decimal2.self.setar_local_pt_br'
             )
@@ -582,7 +584,7 @@ class Cpf:
         if disparar:
             raise ErroCPF(msg)
         else:
-            print(msg)
+            log.debug(msg)
 
     def validar(self, disparar_erro: bool=True) -> bool:
         """Verifica se CPF é válido.
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+from decimal import Decimal
+
+import pytest
+
+from simovel.sims.amortizacao import (
+    SistemaAmortizacao,
+    TabelaAmortizacao,
+    calibrar_taxa_mensal,
+    estimar_resultado,
+    resultado_de_dict,
+    resultado_para_dict
+)
+from simovel.sims.caixa import SimulacaoResultadoCaixa
+from simovel.util import Decimal2
+
+
+def tabela(sistema: SistemaAmortizacao) -> TabelaAmortizacao:
+    return TabelaAmortizacao(
+        Decimal(200000), 360, Decimal('0.008'), sistema,
+        valor_imovel=Decimal(250000)
+    )
+
+
+def test_sac() -> None:
+    t = tabela(SistemaAmortizacao.SAC)
+    assert(len(t.parcelas) == 360)
+    assert(sum(t.amortizacoes) == Decimal(200000))
+    assert(t.saldos_devedores[-1] == 0)
+    # prestações decrescentes
+    assert(t.primeira_prestacao > t.ultima_prestacao)
+    assert(t.parcelas[0].juros == Decimal('1600.00'))
+    assert(t.parcelas[0].amortizacao == Decimal('555.56'))
+
+
+def test_price() -> None:
+    t = tabela(SistemaAmortizacao.PRICE)
+    assert(sum(t.amortizacoes) == Decimal(200000))
+    # juros + amortização constante, exceto a última (resíduo)
+    fixas = {p.amortizacao + p.juros for p in t.parcelas[:-1]}
+    assert(len(fixas) == 1)
+    assert(abs(fixas.pop() - Decimal('1696.32')) <= Decimal('0.01'))
+
+
+def test_calibrar_taxa() -> None:
+    for sistema in SistemaAmortizacao:
+        t = tabela(sistema)
+        taxa = calibrar_taxa_mensal(
+            t.valor_financiamento, t.prazo, t.primeira_prestacao,
+            sistema, t.valor_imovel
+        )
+        assert(abs(taxa - Decimal('0.008')) < Decimal('0.00001'))
+
+
+def test_estimar_resultado() -> None:
+    t = tabela(SistemaAmortizacao.SAC)
+    res = SimulacaoResultadoCaixa()
+    res.sistema_amortizacao = 'SAC/TR'
+    res._valor_imovel = Decimal2(250000)
+    res._valor_entrada = Decimal2(50000)
+    t.preencher_resultado(res)
+
+    # reconstruído a partir do dicionário salvo entre requisições
+    res = resultado_de_dict(SimulacaoResultadoCaixa, resultado_para_dict(res))
+    assert(res._prazo == 360)
+
+    est = estimar_resultado(res, prazo=240)
+    assert(est.estimado)
+    assert(est._prazo == 240)
+    assert(est._primeira_prestacao > res._primeira_prestacao)
+    assert(res._prazo == 360)
+
+    est = estimar_resultado(res, valor_entrada=Decimal(100000))
+    assert(est._valor_financiamento == Decimal(150000))
+    assert(est._somatorio_parcelas < res._somatorio_parcelas)
+
+
+def test_grade() -> None:
+    from simovel.sims.amortizacao_grade import GradeAmortizacao
+
+    prazos = list(range(60, 421, 60))
+    entradas = [25000, 50000, 100000]
+    grade = GradeAmortizacao.prazo_x_entrada(
+        250000, prazos, entradas, 0.008
+    )
+    assert(grade.sac.primeira_prestacao.shape == (3, len(prazos)))
+
+    # mesmo resultado da tabela parcela a parcela, a menos do
+    # arredondamento em centavos que a tabela acumula na última parcela
+    for sistema in SistemaAmortizacao:
+        g = grade.obter(sistema)
+        for l, entrada in enumerate(entradas):
+            for c, prazo in enumerate(prazos):
+                t = TabelaAmortizacao(
+                    Decimal(250000 - entrada), prazo, Decimal('0.008'),
+                    sistema, valor_imovel=Decimal(250000)
+                )
+                assert(abs(g.primeira_prestacao[l, c] - float(t.primeira_prestacao)) < 0.05)
+                assert(abs(g.ultima_prestacao[l, c] / float(t.ultima_prestacao) - 1) < 0.02)
+                assert(abs(g.somatorio_parcelas[l, c] / float(t.somatorio_parcelas) - 1) < 1e-4)
+
+
+def test_grade_entrada_invalida() -> None:
+    from simovel.sims.amortizacao_grade import GradeAmortizacao
+
+    with pytest.raises(ValueError):
+        GradeAmortizacao.prazo_x_entrada(250000, [360], [50000, 250000], 0.008)
+    with pytest.raises(ValueError):
+        GradeAmortizacao.prazo_x_entrada(250000, [360], [-60000], 0.008)
+    # (1 + i) ** n estoura
+    for prazos, taxa in (([360, 100000], .5), ([360], 1e6)):
+        with pytest.raises(ValueError):
+            GradeAmortizacao.prazo_x_entrada(250000, prazos, [50000], taxa)
+
+
+def test_endpoint_grade_validacao() -> None:
+    from fastapi.testclient import TestClient
+    from rest_api.main import app
+
+    cliente = TestClient(app)
+    entrada = {
+        'valor_imovel': 250000, 'prazos': [120, 360],
+        'valores_entrada': [50000], 'taxa_juros_mes': 0.008
+    }
+    r = cliente.post('/amortizacao/grade', json=entrada)
+    assert(r.status_code == 200)
+    assert(len(r.json()['SAC']['primeira_prestacao'][0]) == 2)
+
+    r = cliente.post(
+        '/amortizacao/grade', json={**entrada, 'valores_entrada': [300000]}
+    )
+    assert(r.status_code == 422)
+    assert('menor que o valor do imóvel' in r.json()['detail'])
+
+    for invalida in (
+        {'prazos': [0]},
+        {'prazos': [360, 100000], 'taxa_juros_mes': .5},
+        {'taxa_juros_mes': 1e6},
+        {'taxa_juros_mes': None, 'taxa_juros_ano': 1e6},
+        {'valores_entrada': [-60000]},
+    ):
+        r = cliente.post('/amortizacao/grade', json={**entrada, **invalida})
+        assert(r.status_code == 422)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+import pytest
+
+from simovel.sims import bradesco
+from simovel.sims.bradesco import Interacao, SimuladorBradesco
+from simovel.util import Decimal2
+
+
+@pytest.fixture
+def chamadas(monkeypatch) -> list:
+    """Troca as requisições por um __VIEWSTATE que acumula os passos."""
+    chamadas: list = []
+
+    def obter_viewstate_ini(self) -> bool:
+        chamadas.append(None)
+        self._viewstate = 'ini'
+        return True
+
+    def interagir(self, campo: Interacao) -> bool:
+        chamadas.append(campo)
+        # servidor recusa __VIEWSTATE antigo
+        if self._viewstate.startswith('velho'):
+            self._viewstate = ''
+            return True
+        self._viewstate += f'>{campo.name}'
+        if campo is Interacao.A_PARTIR_VALOR_FINANCIAMENTO:
+            self._valor_max_financiamento = Decimal2('240000')
+        return True
+
+    monkeypatch.setattr(SimuladorBradesco, '_obter_viewstate_ini', obter_viewstate_ini)
+    monkeypatch.setattr(SimuladorBradesco, '_interagir', interagir)
+    bradesco.cache_viewstate.limpar()
+    yield chamadas
+    bradesco.cache_viewstate.limpar()
+
+
+def _simulador(valor_imovel: str, data_nascimento: str = '01/01/1990') -> SimuladorBradesco:
+    sim = SimuladorBradesco()
+    sim.valor_imovel = Decimal2(valor_imovel)
+    sim.data_nascimento = data_nascimento
+    return sim
+
+
+def test_prefixo_em_cache(chamadas) -> None:
+    sim = _simulador('300000')
+    sim._interagir_parte1()
+    assert(len(chamadas) == 8 and chamadas[0] is None)
+    viewstate = sim._viewstate
+
+    # mesmo perfil: nenhuma requisição
+    chamadas.clear()
+    sim2 = _simulador('300000')
+    sim2._interagir_parte1()
+    assert(chamadas == [])
+    assert(sim2._viewstate == viewstate)
+    assert(sim2._valor_max_financiamento.valor == 240000)
+
+    # outro valor de imóvel: parte do __VIEWSTATE depois da situação
+    chamadas.clear()
+    sim3 = _simulador('350000')
+    sim3._interagir_parte1()
+    assert(chamadas[0] is Interacao.VALOR_IMOVEL and len(chamadas) == 4)
+    assert(sim3._viewstate == viewstate)
+
+
+def test_viewstate_recusado(chamadas) -> None:
+    sim = _simulador('300000')
+    bradesco.cache_viewstate.definir(sim._passos_parte1()[3][1], ('velho', None))
+    sim._interagir_parte1()
+    # tentou a partir do cache, depois refez tudo
+    assert(chamadas[0] is Interacao.VALOR_IMOVEL)
+    assert(chamadas[1] is None and len(chamadas) == 9)
+    assert(sim._viewstate.endswith('>A_PARTIR_VALOR_FINANCIAMENTO'))
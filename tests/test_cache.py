@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+import time
+
+import pytest
+
+from simovel.cache import CacheTTL, ChamadaCompartilhada
+
+
+def test_cache_ttl_lru() -> None:
+    cache = CacheTTL(tamanho_max=2, ttl=60)
+    cache.definir('a', 1)
+    cache.definir('b', 2)
+    assert(cache.obter('a') == 1)
+    # 'b' é o menos usado recentemente
+    cache.definir('c', 3)
+    assert(cache.obter('b') is None)
+    assert(cache.obter('a') == 1 and cache.obter('c') == 3)
+
+    cache.definir('d', 4, ttl=0.01)
+    time.sleep(0.02)
+    assert(cache.obter('d') is None)
+    assert(cache.estatisticas['acertos'] == 3)
+
+
+def test_cache_versao() -> None:
+    cache = CacheTTL()
+    assert(not cache.validar_versao('1'))
+    cache.definir('a', 1)
+    assert(not cache.validar_versao('1'))
+    assert('a' in cache)
+    assert(cache.validar_versao('2'))
+    assert(len(cache) == 0)
+
+
+def test_chamada_compartilhada_erro() -> None:
+    chamada = ChamadaCompartilhada(ttl=60)
+    chamadas: list[int] = []
+
+    def falhar() -> None:
+        chamadas.append(1)
+        raise ValueError('falhou')
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            chamada.executar('a', falhar)
+    # erro não vai pro cache
+    assert(len(chamadas) == 2)
+    assert(chamada.executar('a', lambda: 1) == 1)
+    assert(chamada.executar('a', falhar) == 1)
+    assert(chamada.estatisticas['executadas'] == 3)
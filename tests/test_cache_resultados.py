@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+import json
+import time
+
+from simovel.config.geral import Loft as CfgLoft, Replay as CfgReplay
+from simovel.replay import Interacao, ServidorReplay
+from simovel.sims import cache_resultados
+from simovel.sims.cache_resultados import CacheResultados, gerar_chave
+from simovel.sims.itau import SimuladorItauL
+
+
+def test_chave_canonica() -> None:
+    assert(gerar_chave({'a': 1, 'b': [1, 2]}) == gerar_chave({'b': [1, 2], 'a': 1}))
+    assert(gerar_chave({'a': 1}) != gerar_chave({'a': '1.0'}))
+
+
+def test_lru_ttl_por_origem() -> None:
+    cache = CacheResultados(tamanho_max=2, ttls={'caixa': 60, 'loft': 0.01})
+    cache.guardar('caixa', {'x': 1}, 'r1')
+    cache.guardar('caixa', {'x': 2}, 'r2')
+    assert(cache.obter('caixa', {'x': 1}) == 'r1')
+    # {'x': 2} é o menos usado recentemente
+    cache.guardar('caixa', {'x': 3}, 'r3')
+    assert(cache.obter('caixa', {'x': 2}) is None)
+
+    # mesma entrada, origem diferente
+    cache.guardar('loft', {'x': 1}, 'l1')
+    assert(cache.obter('caixa', {'x': 1}) == 'r1')
+    time.sleep(0.02)
+    assert(cache.obter('loft', {'x': 1}) is None)
+
+    assert(cache.estatisticas == {
+        'caixa': {'itens': 2, 'acertos': 2, 'falhas': 1},
+        'loft': {'itens': 0, 'acertos': 0, 'falhas': 1},
+    })
+
+
+def test_persistencia_sqlite(tmp_path) -> None:
+    arquivo = str(tmp_path / 'cache.db')
+    cache = CacheResultados(arquivo_sqlite=arquivo)
+    cache.guardar('bradesco', {'cpf': '1'}, {'html': '<div/>', 'prazo_max': 420})
+    cache.guardar('loft', {'a': 1}, {'b': 2})
+    cache.fechar()
+
+    # outro processo (reinício)
+    cache = CacheResultados(arquivo_sqlite=arquivo)
+    assert(cache.obter('bradesco', {'cpf': '1'})['prazo_max'] == 420)
+    assert(cache.obter('bradesco', {'cpf': '1'})['html'] == '<div/>')
+    assert(cache.estatisticas['bradesco']['acertos'] == 2)
+    cache.fechar()
+
+
+def test_loft_em_cache(monkeypatch) -> None:
+    monkeypatch.setattr(cache_resultados, '_cache', CacheResultados())
+    monkeypatch.setattr(CfgLoft, 'CHAMADA_COMPARTILHADA_HABILITADA', False)
+    resposta = {'banksSimulation': [
+        {'bankProvider': 'Itaú', 'simulation': {'id': 'i'}},
+    ]}
+    interacoes = [Interacao(
+        'POST', SimuladorItauL.URL,
+        headers_resposta=[('Content-Type', 'application/json')],
+        corpo=json.dumps(resposta).encode()
+    )]
+    with ServidorReplay(interacoes) as srv:
+        monkeypatch.setattr(CfgReplay, 'URL_BASE', srv.url_base)
+        for nome in ('Fulano de Tal', 'Beltrano Silva'):
+            sim = SimuladorItauL(
+                nome, 'teste@teste.com', '300000', '60000', '01/01/1990',
+                30, '10000'
+            )
+            assert(sim._extrair_simulacao()[0]['simulation']['id'] == 'i')
+
+        assert(srv.estatisticas['respondidas'] == 1)
+        assert(cache_resultados._cache.estatisticas['loft']['acertos'] == 1)
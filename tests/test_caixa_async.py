@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+import asyncio
+import gzip
+import locale
+import time
+from urllib.request import Request
+
+import httpx
+import pytest
+
+from simovel import metricas, rastreamento
+from simovel.config.geral import Caixa as CfgCaixa
+from simovel.config.geral import CacheResultados as CfgCacheResultados
+from simovel.config.geral import Replay as CfgReplay
+from simovel.replay import Interacao, ServidorReplay
+from simovel.sims import caixa_sessao
+from simovel.sims.caixa import SimuladorCaixa
+from simovel.sims.caixa_async import AsyncSimuladorCaixa
+from simovel.sims.caixa_sessao import PoolSessoesCaixa, SessaoCaixa
+from simovel.util import Decimal2
+
+from test_caixa_parser import RESULTADO
+
+
+CIDADES = (
+    '//#DWR-INSERT\n//#DWR-REPLY\n'
+    'dwr.engine.remote.handleCallback("5","0",['
+    '{codigo:9373,nome:"GOIÂNIA",nomeSemAspa:"GOIANIA",uf:"GO"},'
+    '{codigo:9391,nome:"ITABERAÍ",nomeSemAspa:"ITABERAI",uf:"GO"}'
+    ']);\n'
+)
+
+OPCOES = (
+    '<ul><li class="group-block-item"><a href="#" onclick="'
+    'simuladorInternet.simular(\n100301129,\n3.21,\n\'SBPE\'\n);'
+    'jQuery(this)">SBPE</a></li></ul>'
+)
+
+SIMULACAO = (
+    '//#DWR-INSERT\n//#DWR-REPLY\n'
+    f'preencheDiv("resultadoSimulacao","{RESULTADO}");\n'
+    'dwr.engine.remote.handleCallback("5","0",null);\n'
+)
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    interacoes = [
+        Interacao(
+            'POST', SimuladorCaixa.URL1,
+            headers_resposta=[('Content-Encoding', 'gzip')],
+            corpo=gzip.compress(CIDADES.encode('utf-8'))
+        ),
+        Interacao('POST', SimuladorCaixa.URL3, corpo=OPCOES.encode('latin-1')),
+        Interacao('POST', SimuladorCaixa.URL4, corpo=SIMULACAO.encode('utf-8')),
+    ]
+    with ServidorReplay(interacoes) as srv:
+        monkeypatch.setattr(CfgReplay, 'URL_BASE', srv.url_base)
+        monkeypatch.setattr(CfgCaixa, 'POOL_SESSOES_HABILITADO', True)
+        monkeypatch.setattr(CfgCaixa, 'CACHE_OPCOES_HABILITADO', False)
+        monkeypatch.setattr(CfgCacheResultados, 'HABILITADO', False)
+        yield srv
+
+
+@pytest.fixture
+def pool(monkeypatch) -> PoolSessoesCaixa:
+    # sem a thread de manutenção: a sessão já está pronta no pool
+    pool = PoolSessoesCaixa(tamanho=1)
+    sessao = SessaoCaixa()
+    sessao.script_session_id = SessaoCaixa.gerar_script_session_id()
+    sessao.criada_em = sessao.verificada_em = time.monotonic()
+    pool._sessoes.append(sessao)
+    monkeypatch.setattr(caixa_sessao, '_pool', pool)
+    return pool
+
+
+@pytest.fixture
+def local_pt_br():
+    # valores em moeda nos parâmetros das requisições
+    anterior = locale.setlocale(locale.LC_MONETARY)
+    try:
+        Decimal2.setar_local_pt_br()
+    except locale.Error:
+        pytest.skip('locale pt_BR.utf8 não disponível')
+    yield
+    locale.setlocale(locale.LC_MONETARY, anterior)
+
+
+def test_obter_cidades(servidor, pool) -> None:
+    async def obter() -> list[dict] | None:
+        async with AsyncSimuladorCaixa() as sim:
+            return await sim.obter_cidades('GO')
+
+    cidades = asyncio.run(obter())
+    assert(cidades == [
+        {'cod_caixa': '9373', 'nome': 'GOIÂNIA', 'nome_sem_aspa': 'GOIANIA'},
+        {'cod_caixa': '9391', 'nome': 'ITABERAÍ', 'nome_sem_aspa': 'ITABERAI'},
+    ])
+    assert(servidor.estatisticas['respondidas'] == 1)
+
+
+def test_opcoes_e_simular(servidor, pool, local_pt_br) -> None:
+    async def simular(sim: AsyncSimuladorCaixa):
+        await sim.obter_cidades('GO')
+        sim.cidade_indice = 0
+        sim.valor_imovel = '300.000,00'
+        sim.cpf = '023.282.691-92'
+        sim.celular = '62-99843-2122'
+        sim.renda_familiar = '10.000,00'
+        sim.data_nascimento = '08/02/1990'
+
+        opcoes = await sim.obter_opcoes_financiamento()
+        sim.opcao_financiamento = opcoes[0]
+        resultado = await sim.simular()
+        # até o aclose a sessão fica com o simulador
+        assert(pool.total_disponiveis == 0)
+        await sim.aclose()
+        return opcoes, resultado
+
+    sim = AsyncSimuladorCaixa()
+    opcoes, resultado = asyncio.run(simular(sim))
+    assert([(o.value, o.versao, o.descricao) for o in opcoes]
+           == [(100301129, '3.21', 'SBPE')])
+    assert(resultado.prazo_max == '420 meses')
+    assert(resultado.sistema_amortizacao_chave_sel == 'SAC / TR')
+    assert(sim.cod_sistema_amortizacao == '32@SAC / TR')
+    assert(servidor.estatisticas['respondidas'] == 3)
+    assert(servidor.estatisticas['nao_encontradas'] == 0)
+
+
+def test_aclose_devolve_sessao(servidor, pool) -> None:
+    sessao = pool._sessoes[0]
+
+    async def obter(sim: AsyncSimuladorCaixa) -> None:
+        await sim.obter_cidades('GO')
+        assert(sim._sessao is sessao and pool.total_disponiveis == 0)
+        await sim.aclose()
+
+    sim = AsyncSimuladorCaixa()
+    asyncio.run(obter(sim))
+    assert(sim._sessao is None and sim._cliente is None)
+    # volta ao pool, entregue de novo só depois de verificada
+    assert(pool._usadas == [sessao] and pool.total_disponiveis == 0)
+    sessao.verificar = lambda: True
+    pool._reciclar()
+    assert(pool.total_disponiveis == 1 and pool._sessoes[0] is sessao)
+
+
+def test_metricas_e_trechos(servidor, pool, monkeypatch) -> None:
+    trechos: list[rastreamento.Trecho] = []
+
+    class ExportadorMemoria:
+        def exportar(self, trecho: rastreamento.Trecho) -> None:
+            trechos.append(trecho)
+
+        def encerrar(self) -> None:
+            pass
+
+    monkeypatch.setattr(rastreamento.CfgRastreamento, 'TAXA_AMOSTRAGEM', 1.)
+    metricas.habilitar(True)
+    metricas.limpar()
+    rastreamento.habilitar(True)
+    rastreamento.definir_exportador(ExportadorMemoria())
+
+    async def chamar() -> None:
+        async with AsyncSimuladorCaixa() as sim:
+            await sim.obter_cidades('GO')
+            # sem gravação: 404
+            with pytest.raises(httpx.HTTPStatusError):
+                await sim._enviar(Request(SimuladorCaixa.URL3), 'URL3')
+
+    try:
+        with rastreamento.iniciar_rastro('POST /menu/resultado') as raiz:
+            asyncio.run(chamar())
+        host = 'https://www8.caixa.gov.br'
+        assert(metricas.CHAMADAS_REMOTAS.contagem(
+            host=host, etapa='URL1', resultado='ok') == 1)
+        assert(metricas.CHAMADAS_REMOTAS.contagem(
+            host=host, etapa='URL3', resultado='falha') == 1)
+    finally:
+        metricas.habilitar(metricas.CfgMetricas.HABILITADAS)
+        rastreamento.definir_exportador(None)
+        rastreamento.habilitar(rastreamento.CfgRastreamento.HABILITADO)
+
+    url1, url3 = trechos[:2]
+    assert(url1.nome == 'chamada URL1' and url1.pai_id == raiz.span_id)
+    assert(url1.atributos == {'host': host, 'etapa': 'URL1', 'resultado': 'ok'})
+    assert(url3.atributos['resultado'] == 'falha')
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+import pytest
+
+from simovel.cache import CacheTTL
+from simovel.config.geral import Caixa as CfgCaixa
+from simovel.exceptions import ErroRendaFamiliarInsuficente
+from simovel.sims import caixa, caixa_parser
+from simovel.sims.caixa import (
+    OpcaoFinanciamento,
+    SimuladorCaixa,
+    SimulacaoResultadoCaixa
+)
+from simovel.sims.caixa_sessao import SessaoCaixa
+
+
+# como retornado pelo DWR: escapes \n, \/ e \uXXXX
+RESULTADO = (
+    r'<input type=\"hidden\" name=\"prestacaoMaxDesejada\" value=\"3.000,00\"\/>'
+    r'<h3 class=\"simulation-result-title zeta\">\n  SBPE Crédito\n<\/h3>'
+    r'<table class=\"simple-table\"><tbody>'
+    r'<tr><td class=\"lighter milli\">Valor do imóvel<\/td><td>R$ 300.000,00<\/td><\/tr>'
+    r'<tr><td>Prazo máximo<\/td><td>420  meses<\/td><\/tr>'
+    r'<tr><td>Prazo escolhido<\/td><td><b>360<\/b> meses<\/td><\/tr>'
+    r'<tr><td>Cota máxima do financiamento<\/td><td>80%<\/td><\/tr>'
+    r'<tr><td>Valor da entrada<\/td><td>R$ 60.000,00<\/td><\/tr>'
+    r'<tr><td>Valor do financiamento<\/td><td>R$ 240.000,00<\/td><\/tr>'
+    r'<tr><td>Sistema de amortização\n  \/indexador<\/td><td>SAC &amp; TR<\/td><\/tr>'
+    r'<\/tbody><\/table>'
+    r'<table class=\"simple-table\"><tr><td>Taxa<\/td><td>9,99%<\/td><\/tr><\/table>'
+    r'<table class=\"simple-table\">'
+    r'<tr><td>a<\/td><td>b<\/td><\/tr><tr><td>a<\/td><td>b<\/td><\/tr>'
+    r'<tr><td>a<\/td><td>b<\/td><\/tr>'
+    r'<tr><td>1ª Prestação<\/td><td><center>\n\tR$\n\t2.890,10\n<\/center><\/td><\/tr>'
+    r'<tr><td>Última Prestação<\/td><td><center>R$\n700,55\n<\/center><\/td><\/tr>'
+    r'<\/table>'
+    r'<select id=\"codSistemaAmortizacaoAlterado\">'
+    r'<option value=\"33@PRICE \/ TR\">PRICE \/ TR<\/option>'
+    r'<option selected=\"selected\" value=\"32@SAC \/ TR\">SAC \/ TR<\/option>'
+    r'<\/select>'
+)
+
+
+def _extrair(parser: str, html: str, monkeypatch) -> dict:
+    monkeypatch.setattr(CfgCaixa, 'PARSER_HTML', parser)
+    # dicionário compartilhado entre instâncias
+    monkeypatch.setattr(
+        SimulacaoResultadoCaixa, '_cods_sistema_amortizacao', {}
+    )
+    sim_res = SimulacaoResultadoCaixa()
+    assert(sim_res.extrair_dados(html))
+    return dict(
+        vars(sim_res),
+        cods_sistema_amortizacao=dict(sim_res.cods_sistema_amortizacao)
+    )
+
+
+def test_extrair_resultado(monkeypatch) -> None:
+    html = RESULTADO.replace('\\/', '/')
+    html = html.encode('latin-1').decode('unicode_escape')
+    assert(caixa_parser.extrair_resultado(html) is not None)
+
+    rapido = _extrair(caixa_parser.PARSER_RAPIDO, RESULTADO, monkeypatch)
+    bs = _extrair(caixa_parser.PARSER_BS4, RESULTADO, monkeypatch)
+    assert(rapido == bs)
+    assert(rapido['_prestacao_max'] == '3.000,00')
+    assert(rapido['_sistema_amortizacao_chave_sel'] == 'SAC / TR')
+    assert(rapido['cods_sistema_amortizacao']['PRICE / TR'] == '33@PRICE / TR')
+
+
+def test_extrair_resultado_erro(monkeypatch) -> None:
+    # página sem as tabelas: o rápido não reconhece e usa o BeautifulSoup
+    html = (
+        r'<div class=\"erro_feedback\">ATENÇÃO!  RENDA '
+        r'INSUFICIENTE PARA REALIZAR A OPERAÇÃO.<\/div>'
+    )
+    monkeypatch.setattr(CfgCaixa, 'PARSER_HTML', caixa_parser.PARSER_RAPIDO)
+    with pytest.raises(ErroRendaFamiliarInsuficente):
+        SimulacaoResultadoCaixa().extrair_dados(html)
+
+
+def test_extrair_opcoes_e_versao(monkeypatch) -> None:
+    def li(cod: int, descricao: str) -> str:
+        return (
+            '<li class="group-block-item"><a href="#" onclick="'
+            f'simuladorInternet.simular(\n{cod},\n3.21,\n'
+            f'\'{descricao}\'\n);jQuery(this)">{descricao}</a></li>'
+        )
+
+    html = f'<ul>{li(100301129, "SBPE")}{li(100501103, "Casa &amp; Verde")}</ul>'
+    sim = SimuladorCaixa.__new__(SimuladorCaixa)
+    opcoes = {}
+    for parser in (caixa_parser.PARSER_RAPIDO, caixa_parser.PARSER_BS4):
+        monkeypatch.setattr(CfgCaixa, 'PARSER_HTML', parser)
+        opcoes[parser] = [
+            (o.value, o.versao, o.descricao)
+            for o in sim._extrair_opcoes_financiamento(html)
+        ]
+    assert(opcoes[caixa_parser.PARSER_RAPIDO] == opcoes[caixa_parser.PARSER_BS4])
+    assert(opcoes[caixa_parser.PARSER_RAPIDO][1] == (100501103, '3.21', 'Casa & Verde'))
+
+    html = '<form><input name="versao" type="hidden" value=" 3.21.69 "></form>'
+    assert(caixa_parser.extrair_versao(html) == '3.21.69')
+    assert(caixa_parser.extrair_versao('<form></form>') is None)
+
+
+def test_chave_cache_opcoes_limites() -> None:
+    def chave(renda: str, valor_imovel: str, data_nascimento: str) -> tuple:
+        sim = SimuladorCaixa()
+        sim.uf = 'GO'
+        sim._cidades = [{'cod_caixa': 1234, 'nome': 'GOIANIA'}]
+        sim.cidade_indice = 0
+        sim.renda_familiar = renda
+        sim.valor_imovel = valor_imovel
+        sim.data_nascimento = data_nascimento
+        return sim._chave_cache_opcoes_financiamento()
+
+    base = chave('2.849,00', '350.000,00', '08/02/1990')
+    assert(base == chave('2.849,00', '350.000,00', '08/02/1990'))
+    # perfis dos dois lados de limites de renda e valor do imóvel
+    assert(base != chave('2.999,00', '350.000,00', '08/02/1990'))
+    assert(base != chave('2.849,00', '359.999,00', '08/02/1990'))
+    assert(base != chave('2.849,00', '350.000,00', '08/02/1960'))
+
+
+def test_cache_opcoes_sem_sessao(monkeypatch) -> None:
+    monkeypatch.setattr(CfgCaixa, 'CACHE_OPCOES_HABILITADO', True)
+    monkeypatch.setattr(caixa, 'cache_opcoes_financiamento', CacheTTL())
+
+    def sessao(versao: str) -> SessaoCaixa:
+        sessao = SessaoCaixa()
+        sessao.versao_atual = versao
+        return sessao
+
+    def simulador(sessao: SessaoCaixa | None = None) -> SimuladorCaixa:
+        sim = SimuladorCaixa(sessao=sessao)
+        sim.uf = 'GO'
+        sim._cidades = [{'cod_caixa': '9373', 'nome_sem_aspa': 'GOIANIA'}]
+        sim.cidade_indice = 0
+        sim.valor_imovel = '300.000,00'
+        sim.cpf = '023.282.691-92'
+        sim.celular = '62-99843-2122'
+        sim.renda_familiar = '10.000,00'
+        sim.data_nascimento = '08/02/1990'
+        return sim
+
+    opcao = OpcaoFinanciamento(100301129)
+    opcao.versao, opcao.descricao = '3.21', 'SBPE'
+    simulador(sessao('3.21'))._guardar_opcoes_financiamento_cache([opcao])
+
+    def iniciar_sessao(self) -> None:
+        raise AssertionError('sessão obtida com o cache válido')
+
+    monkeypatch.setattr(SimuladorCaixa, '_iniciar_sessao', iniciar_sessao)
+    sim = simulador()
+    opcoes = sim.obter_opcoes_financiamento()
+    assert([(o.value, o.versao, o.descricao) for o in opcoes]
+           == [(100301129, '3.21', 'SBPE')])
+    assert(sim._sessao is None)
+
+    # sessão obtida depois com outra versão do simulador descarta o cache
+    sim = simulador(sessao('3.22'))
+    sim._registrar_versao_sessao()
+    assert(sim._obter_opcoes_financiamento_cache() is None)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+import time
+
+import pytest
+
+from simovel.config.geral import Caixa as CfgCaixa
+from simovel.sims.caixa_sessao import PoolSessoesCaixa, SessaoCaixa
+
+
+def nova_sessao(idade: float = 0., valida: bool = True) -> SessaoCaixa:
+    sessao = SessaoCaixa()
+    sessao.script_session_id = SessaoCaixa.gerar_script_session_id()
+    sessao.criada_em = sessao.verificada_em = time.monotonic() - idade
+    sessao.verificar = lambda: valida
+    return sessao
+
+
+@pytest.fixture
+def criadas(monkeypatch) -> list[SessaoCaixa]:
+    # sem ida à Caixa: criar() entrega sessões novas e válidas
+    criadas: list[SessaoCaixa] = []
+
+    def criar(cls) -> SessaoCaixa:
+        sessao = nova_sessao()
+        criadas.append(sessao)
+        return sessao
+
+    monkeypatch.setattr(SessaoCaixa, 'criar', classmethod(criar))
+    return criadas
+
+
+def test_obter_descarta_expiradas(criadas) -> None:
+    pool = PoolSessoesCaixa(tamanho=2)
+    expirada = nova_sessao(idade=CfgCaixa.SESSAO_TTL + 1)
+    pronta = nova_sessao()
+    pool._sessoes.extend((expirada, pronta))
+
+    assert(pool.obter() is pronta)
+    assert(pool.total_disponiveis == 0)
+    # pool vazio: cria na hora
+    assert(pool.obter() is criadas[0])
+
+
+def test_reciclar_verifica_ociosas(criadas) -> None:
+    pool = PoolSessoesCaixa(tamanho=3)
+    ociosa = CfgCaixa.SESSAO_INTERVALO_VERIFICACAO + 1
+    valida = nova_sessao(idade=ociosa)
+    invalida = nova_sessao(idade=ociosa, valida=False)
+    recente = nova_sessao()
+    recente.verificar = lambda: pytest.fail('verificou sessão recente')
+    pool._sessoes.extend((valida, invalida, recente))
+
+    pool._reciclar()
+    assert(list(pool._sessoes) == [recente, valida])
+
+
+def test_devolver_verifica_usadas(criadas) -> None:
+    pool = PoolSessoesCaixa(tamanho=2)
+    usada, invalidada = nova_sessao(), nova_sessao(valida=False)
+    script_session_id = usada.script_session_id
+    pool.devolver(usada)
+    pool.devolver(invalidada)
+    # excedente: descartada
+    pool.devolver(nova_sessao())
+    assert(pool.total_disponiveis == 0 and len(pool._usadas) == 2)
+
+    pool._reciclar()
+    assert(list(pool._sessoes) == [usada] and pool._usadas == [])
+    assert(usada.script_session_id != script_session_id)
+
+    pool.devolver(nova_sessao(idade=CfgCaixa.SESSAO_TTL + 1))
+    assert(pool._usadas == [])
+
+
+def test_abastecer_nao_passa_do_tamanho(monkeypatch) -> None:
+    pool = PoolSessoesCaixa(tamanho=1)
+    devolvida = nova_sessao()
+
+    def criar(cls) -> SessaoCaixa:
+        # a vaga é ocupada enquanto a sessão é criada
+        pool._sessoes.append(devolvida)
+        return nova_sessao()
+
+    monkeypatch.setattr(SessaoCaixa, 'criar', classmethod(criar))
+    pool._abastecer()
+    assert(list(pool._sessoes) == [devolvida])
+
+
+def test_thread_abastece_e_encerrar(criadas) -> None:
+    pool = PoolSessoesCaixa(tamanho=2, intervalo_verificacao=60)
+    pool.iniciar()
+
+    def aguardar(total: int) -> bool:
+        limite = time.monotonic() + 2
+        while pool.total_disponiveis != total:
+            if time.monotonic() > limite:
+                return False
+            time.sleep(.01)
+        return True
+
+    assert(aguardar(2))
+    # obter acorda a thread, que repõe a sessão entregue
+    sessao = pool.obter()
+    assert(aguardar(2) and len(criadas) == 3)
+    assert(sessao not in pool._sessoes)
+
+    thread = pool._thread
+    pool.encerrar()
+    assert(pool._thread is None and not thread.is_alive())
+    assert(pool.total_disponiveis == 0)
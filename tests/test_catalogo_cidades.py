@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from simovel.db import bootstrap
+from simovel.db.base import Base
+from simovel.db.indice_cidades import IndiceCidades
+from simovel.db.models import CidadeModel, PessoaModel
+
+
+def test_bootstrap_e_atualizar_cidades(monkeypatch) -> None:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+
+    remotas = {
+        'GO': [
+            {'cod_caixa': 1, 'nome': 'GOIANIA', 'nome_sem_aspa': 'GOIANIA'},
+            {'cod_caixa': 2, 'nome': 'ITABERAI', 'nome_sem_aspa': 'ITABERAI'},
+            {'cod_caixa': 3, 'nome': 'INHUMAS', 'nome_sem_aspa': 'INHUMAS'},
+        ],
+        'DF': [
+            {'cod_caixa': 9, 'nome': 'BRASILIA', 'nome_sem_aspa': 'BRASILIA'},
+        ],
+    }
+    falhar = {'DF'}
+
+    def obter_cidades_caixa(uf, sessao):
+        if uf in falhar:
+            raise Exception('sem conexão')
+        return [dict(c) for c in remotas[uf]]
+
+    monkeypatch.setattr(bootstrap, 'obter_cidades_caixa', obter_cidades_caixa)
+    monkeypatch.setattr(bootstrap.SessaoCaixa, 'criar', lambda: None)
+
+    with Session(engine) as session:
+        situacao = bootstrap.bootstrap_db(session, ('GO', 'DF'))
+        assert(situacao == {'GO': 'concluido', 'DF': 'erro'})
+
+        # retoma apenas a UF com erro
+        falhar.clear()
+        assert(bootstrap.obter_ufs_pendentes(session, ('GO', 'DF')) == ['DF'])
+        bootstrap.bootstrap_db(session, ('GO', 'DF'))
+        assert(CidadeModel.contar(session) == 4)
+
+        # sem alterações
+        alteracoes = bootstrap.atualizar_cidades(session, ('GO', 'DF'))
+        assert(alteracoes['GO'].sem_alteracao)
+
+        inhumas = CidadeModel.buscar_por_nome(session, 'INHUMAS')
+        pessoa = PessoaModel('Fulano', '00000000000')
+        pessoa.fone = '62999999999'
+        pessoa.data_nasc = pessoa.data_nasc_conjuge = date(1990, 1, 1)
+        pessoa.possui_imovel_cidade = pessoa.tres_anos_fgts = False
+        pessoa.mais_de_um_comprador_dependente = False
+        pessoa.servidor_publico = False
+        pessoa.estado_id = inhumas.estado_id
+        pessoa.cidade = inhumas
+        session.add(pessoa)
+        session.commit()
+
+        remotas['GO'] = [
+            {'cod_caixa': 1, 'nome': 'GOIÂNIA', 'nome_sem_aspa': 'GOIÂNIA'},
+            {'cod_caixa': 4, 'nome': 'ANAPOLIS', 'nome_sem_aspa': 'ANAPOLIS'},
+        ]
+        go = bootstrap.atualizar_cidades(session, ('GO', 'DF'))['GO']
+        assert((go.inseridas, go.renomeadas, go.excluidas, go.mantidas)
+               == (1, 1, 1, 1))
+        assert(CidadeModel.buscar_por_nome(session, 'ITABERAI') is None)
+        assert(CidadeModel.buscar_por_nome(session, 'INHUMAS') is not None)
+
+
+def test_atualizar_cidades_renomeia_no_indice_de_outro_processo(
+    monkeypatch
+) -> None:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+
+    remotas = [
+        {'cod_caixa': 1, 'nome': 'GOIANIA', 'nome_sem_aspa': 'GOIANIA'},
+        {'cod_caixa': 2, 'nome': 'ITABERAI', 'nome_sem_aspa': 'ITABERAI'},
+    ]
+    monkeypatch.setattr(
+        bootstrap, 'obter_cidades_caixa',
+        lambda uf, sessao: [dict(c) for c in remotas]
+    )
+    monkeypatch.setattr(bootstrap.SessaoCaixa, 'criar', lambda: None)
+
+    with Session(engine) as session:
+        bootstrap.bootstrap_db(session, ('GO',))
+        # índice de um worker da API, montado antes: não é o do processo,
+        # invalidar() e os eventos do ORM não chegam nele
+        indice = IndiceCidades(intervalo_verificacao=0)
+        assert(indice.procurar(session, 'GO', 'goiania')[0]['rank'] == 1.0)
+
+        remotas[0] = {
+            'cod_caixa': 1, 'nome': 'GOIÂNIA', 'nome_sem_aspa': 'GOIÂNIA'
+        }
+        go = bootstrap.atualizar_cidades(session, ('GO',))['GO']
+        assert(go.renomeadas == 1)
+        assert(indice.procurar(session, 'GO', 'goiania')[0]['nome']
+               == 'GOIÂNIA')
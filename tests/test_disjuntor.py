@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+import threading
+import time
+
+import pytest
+
+from simovel.exceptions import ErroCircuitoAberto, ErroLimiteConcorrencia
+from simovel.sims.disjuntor import Disjuntor, EstadoDisjuntor
+
+
+def _falhar(disjuntor: Disjuntor) -> None:
+    with pytest.raises(TimeoutError):
+        with disjuntor.chamada():
+            raise TimeoutError('timed out')
+
+
+def test_abre_e_meio_abre() -> None:
+    disjuntor = Disjuntor(
+        'https://www8.caixa.gov.br', janela=4, minimo_chamadas=4,
+        limiar_erros=0.5, tempo_aberto=0.05
+    )
+    with disjuntor.chamada():
+        pass
+    # erro de negócio é resposta do host, não conta como falha
+    with pytest.raises(ValueError):
+        with disjuntor.chamada():
+            raise ValueError('renda insuficiente')
+    _falhar(disjuntor)
+    assert(disjuntor.estado == EstadoDisjuntor.FECHADO)
+    _falhar(disjuntor)
+    assert(disjuntor.estado == EstadoDisjuntor.ABERTO)
+
+    with pytest.raises(ErroCircuitoAberto):
+        with disjuntor.chamada():
+            pass
+
+    time.sleep(0.06)
+    assert(disjuntor.estado == EstadoDisjuntor.MEIO_ABERTO)
+    # teste que falha abre de novo
+    with disjuntor.chamada() as chamada:
+        chamada.falhou()
+    assert(disjuntor.estado == EstadoDisjuntor.ABERTO)
+
+    time.sleep(0.06)
+    with disjuntor.chamada():
+        pass
+    assert(disjuntor.estado == EstadoDisjuntor.FECHADO)
+    estatisticas = disjuntor.estatisticas()
+    assert(estatisticas['aberturas'] == 2 and estatisticas['recusadas'] == 1)
+    assert(estatisticas['falhas'] == 3 and estatisticas['chamadas'] == 6)
+
+
+def test_limite_concorrencia() -> None:
+    disjuntor = Disjuntor('https://wspf.banco.bradesco', concorrencia=1,
+                          espera_vaga=0.05)
+    entrou, liberar = threading.Event(), threading.Event()
+
+    def ocupar() -> None:
+        with disjuntor.chamada():
+            entrou.set()
+            liberar.wait(2)
+
+    thread = threading.Thread(target=ocupar)
+    thread.start()
+    assert(entrou.wait(2))
+    assert(disjuntor.estatisticas()['em_andamento'] == 1)
+    with pytest.raises(ErroLimiteConcorrencia):
+        with disjuntor.chamada():
+            pass
+
+    liberar.set()
+    thread.join()
+    with disjuntor.chamada():
+        pass
+    assert(disjuntor.estatisticas()['em_andamento'] == 0)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+import subprocess
+import sys
+import threading
+
+from simovel.sims.base import Banco
+from simovel.sims.fila import EstadoTarefa, FilaSimulacao
+from simovel.sims.registro import chave_banco
+
+
+def test_banco_lento_nao_bloqueia_outro() -> None:
+    fila = FilaSimulacao(trabalhadores={'itau': 1, 'caixa': 1})
+    iniciou, liberar = threading.Event(), threading.Event()
+
+    def simular_lento() -> bool:
+        iniciou.set()
+        return liberar.wait(5)
+
+    lenta = fila.submeter('itau', simular_lento)
+    outra_itau = fila.submeter('itau', lambda: 'itau')
+    caixa = fila.submeter('caixa', lambda: ({'type': 'MENU'}, 200))
+
+    tarefa = fila.aguardar(caixa.id, 2)
+    assert(tarefa.concluida and tarefa.resultado == ({'type': 'MENU'}, 200))
+    # o único worker do itaú continua ocupado
+    assert(iniciou.wait(2))
+    assert(fila.consultar(lenta.id).estado == EstadoTarefa.EXECUTANDO)
+    assert(fila.consultar(outra_itau.id).estado == EstadoTarefa.PENDENTE)
+    assert(fila.estatisticas['itau']['pendente'] == 1)
+
+    liberar.set()
+    assert(fila.aguardar(outra_itau.id, 2).resultado == 'itau')
+    fila.encerrar()
+
+
+def test_erro_e_callback() -> None:
+    fila = FilaSimulacao()
+    finalizadas = []
+    concluido = threading.Event()
+
+    def callback(tarefa) -> None:
+        finalizadas.append(tarefa)
+        concluido.set()
+
+    tarefa = fila.submeter('caixa', lambda: 1 / 0, callback=callback,
+                           dados={'key': '5562999999999'})
+    assert(concluido.wait(2))
+    assert(finalizadas[0] is tarefa and tarefa.estado == EstadoTarefa.ERRO)
+    assert(tarefa.erro.startswith('ZeroDivisionError'))
+    assert(tarefa.para_dict()['dados'] == {'key': '5562999999999'})
+    assert(fila.consultar('inexistente') is None)
+    fila.encerrar()
+
+
+def test_persistencia(tmp_path) -> None:
+    arquivo = str(tmp_path / 'fila.db')
+    fila = FilaSimulacao(arquivo_sqlite=arquivo)
+    tarefa = fila.submeter('bradesco', lambda: ({'text': 'ok'}, 200))
+    fila.aguardar(tarefa.id, 2)
+    fila.encerrar()
+
+    # outro processo (nova instância) consulta pelo id
+    fila = FilaSimulacao(arquivo_sqlite=arquivo)
+    lida = fila.consultar(tarefa.id)
+    assert(lida.concluida and lida.resultado == [{'text': 'ok'}, 200])
+    fila.encerrar()
+
+
+def test_chave_banco() -> None:
+    assert(chave_banco(Banco.ITAU_L) == 'itau')
+    assert(chave_banco(Banco.CAIXA) == 'caixa')
+    assert(chave_banco(None) == 'padrao')
+
+
+def test_estatisticas_depois_de_encerrar() -> None:
+    fila = FilaSimulacao()
+    tarefa = fila.submeter('caixa', lambda: 1)
+    fila.aguardar(tarefa.id, 2)
+    fila.encerrar()
+    assert(fila.estatisticas['caixa']['concluida'] == 1)
+
+
+def pid_encerrado() -> int:
+    processo = subprocess.Popen([sys.executable, '-c', ''])
+    processo.wait()
+    return processo.pid
+
+
+def test_dois_workers_mesmo_arquivo(tmp_path) -> None:
+    arquivo = str(tmp_path / 'fila.db')
+    worker1 = FilaSimulacao(arquivo_sqlite=arquivo, intervalo_consulta=.01)
+    iniciou, liberar = threading.Event(), threading.Event()
+
+    def simular() -> list:
+        iniciou.set()
+        liberar.wait(5)
+        return [{'text': 'ok'}, 200]
+
+    tarefa = worker1.submeter('caixa', simular)
+    assert(iniciou.wait(2))
+
+    # o segundo worker cria a fila depois: a tarefa do primeiro continua
+    worker2 = FilaSimulacao(arquivo_sqlite=arquivo, intervalo_consulta=.01)
+    assert(worker2.consultar(tarefa.id).estado == EstadoTarefa.EXECUTANDO)
+    assert(worker2.aguardar(tarefa.id, .05).estado == EstadoTarefa.EXECUTANDO)
+
+    # o callback chega no segundo worker e aguarda pelo arquivo
+    threading.Timer(.1, liberar.set).start()
+    lida = worker2.aguardar(tarefa.id, 2)
+    assert(lida.concluida and lida.resultado == [{'text': 'ok'}, 200])
+    assert(worker2.aguardar('inexistente', .05) is None)
+
+    # o dono morreu com a tarefa executando: vira erro na consulta
+    orfa = worker1.submeter('caixa', lambda: liberar.wait(5))
+    worker1.aguardar(orfa.id, .05)
+    with worker1._lock_sqlite, worker1._conexao:
+        worker1._conexao.execute(
+            'UPDATE tarefa SET estado = ?, pid = ? WHERE id = ?',
+            (EstadoTarefa.EXECUTANDO.value, pid_encerrado(), orfa.id)
+        )
+    lida = worker2.consultar(orfa.id)
+    assert(lida.estado == EstadoTarefa.ERRO)
+    assert(lida.erro.startswith('Interrompida'))
+    worker2.encerrar()
+    worker1.encerrar()
+
+
+def test_persistencia_interrompida_e_expiracao(tmp_path) -> None:
+    arquivo = str(tmp_path / 'fila.db')
+    fila = FilaSimulacao(arquivo_sqlite=arquivo, ttl=60)
+    liberar = threading.Event()
+    lenta = fila.submeter('itau', lambda: liberar.wait(5))
+    # criada há mais que o ttl mas ainda executando: não expira
+    with fila._lock_sqlite, fila._conexao:
+        fila._conexao.execute(
+            'UPDATE tarefa SET criada_em = criada_em - 120 WHERE id = ?',
+            (lenta.id,)
+        )
+    fila._remover_expiradas()
+    assert(fila._obter_sqlite(lenta.id) is not None)
+
+    # reinício com a tarefa ainda executando: o processo dono não existe
+    with fila._lock_sqlite, fila._conexao:
+        fila._conexao.execute(
+            'UPDATE tarefa SET pid = ? WHERE id = ?',
+            (pid_encerrado(), lenta.id)
+        )
+    outra = FilaSimulacao(arquivo_sqlite=arquivo, ttl=60)
+    lida = outra.aguardar(lenta.id, 0)
+    assert(lida.estado == EstadoTarefa.ERRO and lida.finalizada)
+    assert(lida.erro.startswith('Interrompida'))
+    outra.encerrar()
+    liberar.set()
+    fila.encerrar()
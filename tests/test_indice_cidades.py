@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from simovel.db.base import Base
+from simovel.db.models import (
+    CatalogoCidadesModel,
+    CidadeModel,
+    EstadoModel
+)
+from simovel.db.indice_cidades import IndiceCidades
+
+
+def test_procurar() -> None:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    nomes = ('GOIANIA', 'GOIANESIA', 'ITABERAI', 'APARECIDA DE GOIANIA')
+
+    with Session(engine) as session:
+        EstadoModel.inserir_estados(session, [{'nome': 'Goiás', 'uf': 'GO'}])
+        CidadeModel.inserir_cidades(session, [
+            {'cod_caixa': i, 'nome': n, 'nome_sem_aspa': n, 'estado_id': 1}
+            for i, n in enumerate(nomes)
+        ])
+
+        indice = IndiceCidades(intervalo_verificacao=0)
+        cidades = indice.procurar(session, 'go', 'Goiânia')
+        assert(len(cidades) == 1)
+        assert(cidades[0]['cod_caixa'] == 0 and cidades[0]['rank'] == 1.0)
+
+        cidades = indice.procurar(session, 'GO', 'itaber')
+        assert(cidades[0]['nome'] == 'ITABERAI')
+
+        # inserção em massa detectada pela assinatura da UF
+        CidadeModel.inserir_cidades(session, [
+            {'cod_caixa': 10, 'nome': 'INHUMAS', 'nome_sem_aspa': 'INHUMAS',
+             'estado_id': 1}
+        ])
+        cidades = indice.procurar(session, 'GO', 'inhumas')
+        assert(cidades[0]['cod_caixa'] == 10)
+
+
+def test_buscar_fuzzy() -> None:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    nomes = ('GOIANIA', 'GOIANESIA', 'ITABERAI', 'APARECIDA DE GOIANIA')
+
+    with Session(engine) as session:
+        EstadoModel.inserir_estados(session, [
+            {'nome': 'Goiás', 'uf': 'GO'}, {'nome': 'Minas Gerais', 'uf': 'MG'}
+        ])
+        CidadeModel.inserir_cidades(session, [
+            {'cod_caixa': i, 'nome': n, 'nome_sem_aspa': n, 'estado_id': 1}
+            for i, n in enumerate(nomes)
+        ] + [{'cod_caixa': 99, 'nome': 'GOIANA', 'nome_sem_aspa': 'GOIANA',
+              'estado_id': 2}])
+
+        # sem a tabela FTS5 usa LIKE
+        cidades = CidadeModel.buscar_fuzzy(session, 'go', 'goian', 10)
+        assert(len(cidades) == 3)
+
+        assert(CidadeModel.criar_indice_busca(session))
+        cidades = CidadeModel.buscar_fuzzy(session, 'go', 'Goiânia', 10)
+        assert(len(cidades) == 1 and cidades[0]['cod_caixa'] == 0)
+
+        # erro de digitação
+        cidades = CidadeModel.buscar_fuzzy(session, 'GO', 'itaberaii', 3)
+        assert(cidades[0]['nome'] == 'ITABERAI')
+        assert(all(c['cod_caixa'] != 99 for c in
+                   CidadeModel.buscar_fuzzy(session, 'GO', 'goiana', 10)))
+
+
+def test_renomeacao_outro_processo() -> None:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        EstadoModel.inserir_estados(session, [{'nome': 'Goiás', 'uf': 'GO'}])
+        CidadeModel.inserir_cidades(session, [
+            {'cod_caixa': 1, 'nome': 'GOIANIA', 'nome_sem_aspa': 'GOIANIA',
+             'estado_id': 1}
+        ])
+        CatalogoCidadesModel.registrar(
+            session, 1, CatalogoCidadesModel.CONCLUIDO, 'a', 1
+        )
+        session.commit()
+
+        indice = IndiceCidades(intervalo_verificacao=0)
+        assert(indice.procurar(session, 'GO', 'goiania')[0]['rank'] == 1.0)
+
+        # outro processo renomeia (sem eventos do ORM neste processo),
+        # total, maior id e maior cod_caixa não mudam
+        session.execute(text(
+            "UPDATE cidade SET nome = 'GOIÂNIA', nome_sem_aspa = 'GOIÂNIA'"
+        ))
+        CatalogoCidadesModel.registrar(
+            session, 1, CatalogoCidadesModel.CONCLUIDO, 'b', 1
+        )
+        session.commit()
+        assert(indice.procurar(session, 'GO', 'goiania')[0]['nome']
+               == 'GOIÂNIA')
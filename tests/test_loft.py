@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+import json
+import threading
+
+import pytest
+
+from simovel.config.geral import Replay as CfgReplay
+from simovel.exceptions import ErroResultadoSimulacao
+from simovel.replay import Interacao, ServidorReplay
+from simovel.sims import base
+from simovel.sims.base import SimuladorBaseL
+from simovel.sims.itau import SimuladorItauL
+from simovel.sims.santander import SimuladorSantanderL
+
+
+# ordem diferente da esperada antes (Itaú na posição 2, Santander na 3)
+RESPOSTA = {'banksSimulation': [
+    {'bankProvider': 'Santander', 'simulation': {'id': 's'}},
+    {'bankProvider': 'Bradesco', 'simulation': {'id': 'b'}},
+    {'bankProvider': 'Itaú', 'simulation': {'id': 'i'}},
+]}
+
+
+def _simuladores(nome: str, email: str) -> list[SimuladorBaseL]:
+    dados = ('300000', '60000', '01/01/1990', 30, '10000')
+    return [
+        SimuladorItauL(nome, email, *dados),
+        SimuladorSantanderL(nome, email, *dados),
+    ]
+
+
+def test_chamada_compartilhada(monkeypatch) -> None:
+    base.chamadas_loft.cache.limpar()
+    interacoes = [Interacao(
+        'POST', SimuladorBaseL.URL,
+        headers_resposta=[('Content-Type', 'application/json')],
+        corpo=json.dumps(RESPOSTA).encode()
+    )]
+    with ServidorReplay(interacoes, latencia_min=0.2, latencia_max=0.2) as srv:
+        monkeypatch.setattr(CfgReplay, 'URL_BASE', srv.url_base)
+        resultados: dict = {}
+
+        def extrair(sim: SimuladorBaseL) -> None:
+            resultados[sim.banco] = sim._extrair_simulacao()
+
+        # nomes diferentes, mesmo perfil
+        threads = [
+            threading.Thread(target=extrair, args=(sim,))
+            for sim in _simuladores('Fulano de Tal', 'fulano@teste.com')
+            + _simuladores('Beltrano Silva', 'beltrano@teste.com')[1:]
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert(srv.estatisticas['respondidas'] == 1)
+        ids = sorted(r[0]['simulation']['id'] for r in resultados.values())
+        assert(ids == ['i', 's'])
+
+        # em cache
+        itau = _simuladores('Ciclano Souza', 'ciclano@teste.com')[0]
+        assert(itau._extrair_simulacao()[0]['bankProvider'] == 'Itaú')
+        assert(srv.estatisticas['respondidas'] == 1)
+
+
+def test_banco_nao_encontrado() -> None:
+    with pytest.raises(ErroResultadoSimulacao):
+        SimuladorBaseL._procurar_banco(RESPOSTA['banksSimulation'], 'Inter')
+    assert(
+        SimuladorBaseL._procurar_banco(
+            RESPOSTA['banksSimulation'], 'Itau'
+        )['simulation']['id'] == 'i'
+    )
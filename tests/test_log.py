@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+import logging
+import os
+import queue
+
+import pytest
+
+from simovel import log as simovel_log
+from simovel import rastreamento
+
+
+class HandlerLista(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.linhas: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.linhas.append(self.format(record))
+
+
+@pytest.fixture
+def saida():
+    handler = HandlerLista()
+    simovel_log.configurar(nivel='DEBUG', saida=handler)
+    yield handler.linhas
+    simovel_log.configurar()
+
+
+def escrever() -> None:
+    # a thread da fila escreve tudo antes de parar
+    simovel_log.encerrar()
+
+
+def test_campos_estruturados(saida) -> None:
+    log = simovel_log.obter_logger('simovel.sims.teste')
+    log.warning('Cidade não encontrada', uf='GO', cidade='Goiânia')
+    escrever()
+    assert(len(saida) == 1)
+    assert(saida[0].endswith(
+        "WARNING simovel.sims.teste: Cidade não encontrada uf='GO' "
+        "cidade='Goiânia'"
+    ))
+
+
+def test_json() -> None:
+    handler = HandlerLista()
+    simovel_log.configurar(formato='json', saida=handler)
+    simovel_log.obter_logger('simovel.teste').info('Simulou', banco='caixa')
+    escrever()
+    simovel_log.configurar()
+    assert('"msg": "Simulou", "banco": "caixa"}' in handler.linhas[0])
+
+
+def test_nivel(saida) -> None:
+    log = simovel_log.obter_logger('simovel.teste')
+    assert(log.isEnabledFor(logging.DEBUG))
+    simovel_log.configurar(nivel='INFO', saida=HandlerLista())
+    assert(not log.isEnabledFor(logging.DEBUG))
+
+
+def test_repeticoes() -> None:
+    filtro = simovel_log.FiltroRepeticao(limite=2, janela=60)
+    registro = logging.LogRecord(
+        'simovel.teste', logging.WARNING, 'caixa.py', 10, 'msg', None, None
+    )
+    assert([filtro.filter(registro) for _ in range(5)]
+           == [True, True, False, False, False])
+
+    filtro.janela = 0
+    assert(filtro.filter(registro))
+    assert(registro.campos == {'suprimidas': 3})
+
+
+def test_despejo(saida, monkeypatch) -> None:
+    log = simovel_log.obter_logger('simovel.teste')
+    log.despejo('Html', '<html>')
+    monkeypatch.setattr(simovel_log.CfgLog, 'DESPEJOS', True)
+    monkeypatch.setattr(simovel_log.CfgLog, 'TAMANHO_DESPEJO', 5)
+    log.despejo('Html', '<html></html>')
+    escrever()
+    assert(len(saida) == 1)
+    assert(saida[0].endswith('Html: <html... (13 caracteres)'))
+
+
+def test_fila_cheia() -> None:
+    handler = simovel_log.HandlerFila(queue.Queue(1))
+    registro = logging.LogRecord(
+        'simovel.teste', logging.INFO, 'caixa.py', 10, 'msg', None, None
+    )
+    handler.handle(registro)
+    handler.handle(registro)
+    assert(handler.descartados == 1)
+
+
+def test_trace_id(saida, monkeypatch) -> None:
+    monkeypatch.setattr(rastreamento.CfgRastreamento, 'TAXA_AMOSTRAGEM', 1.)
+    rastreamento.habilitar(True)
+    rastreamento.definir_exportador(rastreamento.ExportadorArquivo(os.devnull))
+    try:
+        with rastreamento.iniciar_rastro('POST /inicio') as raiz:
+            simovel_log.obter_logger('simovel.teste').info('Início')
+    finally:
+        rastreamento.habilitar(rastreamento.CfgRastreamento.HABILITADO)
+        rastreamento.definir_exportador(None)
+    escrever()
+    assert(saida[0].endswith(f"Início trace_id='{raiz.trace_id}'"))
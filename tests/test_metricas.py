@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+import pytest
+
+from simovel import metricas
+from simovel.config.geral import Http as CfgHttp
+from simovel.exceptions import ErroCircuitoAberto, ErroRendaFamiliarInsuficente
+from simovel.replay import Interacao, ServidorReplay
+from simovel.sims import disjuntor, sessao_http
+
+
+@pytest.fixture(autouse=True)
+def habilitadas():
+    metricas.habilitar(True)
+    metricas.limpar()
+    yield
+    metricas.habilitar(metricas.CfgMetricas.HABILITADAS)
+
+
+def test_exportar_histograma() -> None:
+    h = metricas.histograma(
+        'teste_segundos', 'Teste.', ('etapa',), buckets=(0.1, 1)
+    )
+    h.observar(0.05, etapa='URL4')
+    h.observar(0.5, etapa='URL4')
+    h.observar(5, etapa='URL4')
+    texto = metricas.exportar()
+    assert('# TYPE teste_segundos histogram' in texto)
+    assert('teste_segundos_bucket{etapa="URL4",le="0.1"} 1\n' in texto)
+    assert('teste_segundos_bucket{etapa="URL4",le="1"} 2\n' in texto)
+    assert('teste_segundos_bucket{etapa="URL4",le="+Inf"} 3\n' in texto)
+    assert('teste_segundos_count{etapa="URL4"} 3\n' in texto)
+
+
+def test_desabilitadas() -> None:
+    metricas.habilitar(False)
+    assert(metricas.EXTRACOES.medir(banco='caixa') is metricas._NULO)
+    metricas.CACHE.inc(cache='resultados', origem='caixa', resultado='acerto')
+    assert(metricas.CACHE.valor(
+        cache='resultados', origem='caixa', resultado='acerto') == 0)
+
+
+def test_falhas_extracao() -> None:
+    @metricas.extracao('caixa', 'simulacao')
+    def processar() -> None:
+        raise ErroRendaFamiliarInsuficente('renda insuficiente')
+
+    with pytest.raises(ErroRendaFamiliarInsuficente):
+        processar()
+    assert(metricas.FALHAS_EXTRACAO.valor(
+        banco='caixa', etapa='simulacao', erro='ErroRendaFamiliarInsuficente'
+    ) == 1)
+    assert(metricas.EXTRACOES.contagem(banco='caixa', etapa='simulacao') == 1)
+
+
+def test_chamadas_remotas(monkeypatch) -> None:
+    url = 'https://metricas.test/simulacao'
+    monkeypatch.setitem(
+        disjuntor._disjuntores, 'https://metricas.test',
+        disjuntor.Disjuntor('https://metricas.test', minimo_chamadas=1)
+    )
+    with pytest.raises(TimeoutError):
+        with disjuntor.chamada_host(url, 'URL4'):
+            raise TimeoutError()
+    with pytest.raises(ErroCircuitoAberto):
+        with disjuntor.chamada_host(url, 'URL4'):
+            pass
+
+    rotulos = {'host': 'https://metricas.test', 'etapa': 'URL4'}
+    for resultado in ('falha', 'recusada'):
+        assert(metricas.CHAMADAS_REMOTAS.contagem(
+            **rotulos, resultado=resultado) == 1)
+    assert('simovel_disjuntor_estado{host="https://metricas.test"} 1\n'
+           in metricas.exportar())
+
+
+def test_novas_tentativas(monkeypatch) -> None:
+    monkeypatch.setattr(CfgHttp, 'BACKOFF', 0)
+    interacoes = [Interacao('GET', 'https://banco.test/a', corpo=b'ok')]
+    with ServidorReplay(interacoes, taxa_erro=1.) as srv:
+        sessao = sessao_http.criar_sessao()
+        sessao.get(f'{srv.url_base}/banco.test/a', timeout=5)
+        sessao.close()
+
+    total = sum(
+        valor for nome, _, valor in metricas.NOVAS_TENTATIVAS.amostras()
+    )
+    assert(total == CfgHttp.TENTATIVAS + 1)
+
+
+def test_endpoint_metrics() -> None:
+    from fastapi.testclient import TestClient
+    from rest_api.main import app
+
+    metricas.CACHE.inc(cache='resultados', origem='loft', resultado='falha')
+    r = TestClient(app).get('/metrics')
+    assert(r.status_code == 200)
+    assert('simovel_cache_total{cache="resultados",origem="loft",'
+           'resultado="falha"} 1' in r.text)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+from decimal import Decimal
+
+import pytest
+
+from simovel.exceptions import ErroBancoNaoRegistrado
+from simovel.sims import registro
+from simovel.sims.base import Banco, SimulacaoResultadoBase
+from simovel.sims.modelo import RequisicaoSimulacao, ResultadoSimulacao
+from simovel.sims.multibanco import simular_todos
+from simovel.sims.santander import SimuladorSantanderL
+
+
+def test_requisicao_decimal() -> None:
+    req = RequisicaoSimulacao(
+        'R$ 300.000,00', '9000', '01/01/1990', valor_entrada=Decimal('6E4'),
+        prazo=420
+    )
+    assert(req.valor_imovel == Decimal('300000') and req.renda_familiar == 9000)
+    assert(req.valor_entrada == 60000 and req.prazo_anos(35) == 35)
+    with pytest.raises(AttributeError):
+        req.outro = 1
+
+
+def test_resultado_loft() -> None:
+    sim = SimuladorSantanderL(
+        'Fulano de Tal', 'fulano@teste.com', '300000', '60000',
+        '01/01/1990', 30, '10000'
+    )
+    original = SimulacaoResultadoBase.a_partir_de_valores_l(sim, 'Santander', {
+        'anualInterestRate': 0.1149, 'firstPaymentValue': 3100.5,
+        'lastPaymentValue': 700.25, 'mortgageTotalPaymentValue': 500000,
+        'requestedValue': 240000, 'term': 360,
+    })
+    res = ResultadoSimulacao.a_partir_de(
+        Banco.SANTANDER, original, sim, prazo_max=35
+    )
+    assert(res.original is original)
+    assert(res.para_dict() == {
+        'banco': 'SANTANDER', 'titulo': 'Santander',
+        'valor_imovel': '300000', 'valor_entrada': '60000',
+        'valor_financiamento': '240000', 'prazo': 30, 'prazo_max': 35,
+        'unidade_prazo': 'anos', 'sistema_amortizacao': '',
+        'valor_prestacao': '0', 'primeira_prestacao': '3100.5',
+        'ultima_prestacao': '700.25', 'taxa_juros': '11.4900',
+        'somatorio_parcelas': '500000',
+    })
+    assert(res.formatar_prazo(res.prazo_max) == '35 anos')
+
+
+def test_fabricas(monkeypatch) -> None:
+    with pytest.raises(ErroBancoNaoRegistrado):
+        registro.obter_fabrica(Banco.ITAU_E_SANTANDER_L)
+
+    def simular(req: RequisicaoSimulacao) -> ResultadoSimulacao:
+        return ResultadoSimulacao(Banco.CAIXA, valor_imovel=req.valor_imovel)
+
+    monkeypatch.setitem(registro._fabricas, Banco.CAIXA, simular)
+    resultados = simular_todos(
+        RequisicaoSimulacao('300.000,00', '9000', '01/01/1990'),
+        bancos=[Banco.CAIXA]
+    )
+    assert(resultados[0].sucesso)
+    assert(resultados[0].resultado.valor_imovel == Decimal('300000'))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+
+from simovel.exceptions import (
+    ErroRendaFamiliarInsuficente,
+    ErroTempoEsgotadoSimulacao
+)
+from simovel.sims import multibanco, registro
+from simovel.sims.base import Banco
+from simovel.sims.modelo import RequisicaoSimulacao, ResultadoSimulacao
+from simovel.sims.multibanco import (
+    simular_primeiro,
+    simular_todos,
+    simular_todos_iter
+)
+
+
+PERFIL = RequisicaoSimulacao('300.000,00', '9000', '01/01/1990')
+
+
+@pytest.fixture
+def liberar():
+    # solta a fábrica lenta no fim, a thread não é interrompida
+    evento = threading.Event()
+    yield evento
+    evento.set()
+
+
+@pytest.fixture
+def fabricas(monkeypatch, liberar):
+    def rapida(req: RequisicaoSimulacao) -> ResultadoSimulacao:
+        time.sleep(.05)
+        return ResultadoSimulacao(Banco.CAIXA, valor_imovel=req.valor_imovel)
+
+    def falha(req: RequisicaoSimulacao) -> ResultadoSimulacao:
+        raise ErroRendaFamiliarInsuficente('Renda insuficiente.')
+
+    def lenta(req: RequisicaoSimulacao) -> ResultadoSimulacao:
+        liberar.wait(5)
+        return ResultadoSimulacao(Banco.SANTANDER)
+
+    monkeypatch.setitem(registro._fabricas, Banco.CAIXA, rapida)
+    monkeypatch.setitem(registro._fabricas, Banco.BRADESCO, falha)
+    monkeypatch.setitem(registro._fabricas, Banco.SANTANDER, lenta)
+    monkeypatch.setitem(multibanco.TIMEOUTS, Banco.SANTANDER, .3)
+
+
+def test_ordem_erro_e_tempo_limite(fabricas) -> None:
+    inicio = time.monotonic()
+    chegadas = []
+    for res in simular_todos_iter(
+        PERFIL, bancos=[Banco.SANTANDER, Banco.CAIXA, Banco.BRADESCO]
+    ):
+        chegadas.append((res, time.monotonic() - inicio))
+
+    # na ordem em que terminam, não na ordem pedida
+    assert([res.banco for res, _ in chegadas]
+           == [Banco.BRADESCO, Banco.CAIXA, Banco.SANTANDER])
+
+    falha, rapida, lenta = (res for res, _ in chegadas)
+    assert(not falha.sucesso and falha.resultado is None)
+    assert(isinstance(falha.erro, ErroRendaFamiliarInsuficente))
+    assert(rapida.sucesso)
+    assert(rapida.resultado.valor_imovel == Decimal('300000'))
+
+    # tempo limite de multibanco.TIMEOUTS: não espera a fábrica que segue bloqueada
+    assert(not lenta.sucesso)
+    assert(isinstance(lenta.erro, ErroTempoEsgotadoSimulacao))
+    assert(.3 <= chegadas[-1][1] < 1.)
+
+
+def test_timeouts_sobrepostos(fabricas) -> None:
+    inicio = time.monotonic()
+    resultados = simular_todos(
+        PERFIL, bancos=[Banco.SANTANDER, Banco.CAIXA],
+        timeouts={Banco.SANTANDER: .01}
+    )
+    assert(time.monotonic() - inicio < .5)
+    assert([res.banco for res in resultados] == [Banco.SANTANDER, Banco.CAIXA])
+    assert(isinstance(resultados[0].erro, ErroTempoEsgotadoSimulacao))
+
+
+def test_simular_primeiro(fabricas) -> None:
+    inicio = time.monotonic()
+    res = simular_primeiro(
+        PERFIL, bancos=[Banco.SANTANDER, Banco.BRADESCO, Banco.CAIXA]
+    )
+    # a falha do bradesco chega antes e é ignorada, o santander não é
+    # aguardado
+    assert(res.banco == Banco.CAIXA and res.sucesso)
+    assert(time.monotonic() - inicio < .3)
+
+    assert(simular_primeiro(PERFIL, bancos=[Banco.BRADESCO]) is None)
+    assert(simular_todos(PERFIL, bancos=[]) == [])
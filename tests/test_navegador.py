@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+import threading
+
+import pytest
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from simovel.exceptions import ErroNavegadorIndisponivel
+from simovel.sims.navegador import PoolNavegadores
+
+
+class _SwitchTo:
+    def __init__(self, driver: '_DriverFalso') -> None:
+        self._driver = driver
+
+    def window(self, aba: str) -> None:
+        self._driver.aba = aba
+
+
+class _DriverFalso:
+    """Responde os comandos CDP usados pelo pool."""
+    criados = 0
+
+    def __init__(self) -> None:
+        _DriverFalso.criados += 1
+        self.aba = 'inicial'
+        self.contextos: set[str] = set()
+        self.bloqueadas: list[str] = []
+        self.encerrado = False
+        self.travado = False
+        self.switch_to = _SwitchTo(self)
+
+    @property
+    def current_window_handle(self) -> str:
+        if self.travado:
+            raise WebDriverException('chrome não responde')
+        return self.aba
+
+    def execute_cdp_cmd(self, comando: str, args: dict) -> dict:
+        if comando == 'Target.createBrowserContext':
+            contexto = f'ctx{len(self.contextos)}'
+            self.contextos.add(contexto)
+            return {'browserContextId': contexto}
+        if comando == 'Target.createTarget':
+            return {'targetId': f'aba-{args["browserContextId"]}'}
+        if comando == 'Target.disposeBrowserContext':
+            self.contextos.remove(args['browserContextId'])
+        if comando == 'Network.setBlockedURLs':
+            self.bloqueadas = args['urls']
+        return {}
+
+    def set_page_load_timeout(self, timeout: float) -> None:
+        pass
+
+    def quit(self) -> None:
+        self.encerrado = True
+
+
+def test_pool_reaproveita_navegador() -> None:
+    _DriverFalso.criados = 0
+    pool = PoolNavegadores(tamanho=1, max_usos=2, criar_driver=_DriverFalso)
+
+    with pool.tarefa() as tarefa:
+        driver = tarefa.driver
+        assert(driver.aba.startswith('aba-ctx') and '*.css' in driver.bloqueadas)
+    # contexto descartado, volta pra aba inicial
+    assert(driver.contextos == set() and driver.aba == 'inicial')
+
+    with pool.tarefa() as tarefa:
+        assert(tarefa.driver is driver)
+        with pytest.raises(TimeoutException):
+            tarefa.aguardar(lambda d: False, timeout=0.2)
+
+    # max_usos atingido: reiniciado
+    assert(driver.encerrado and pool.total_livres == 0)
+    with pool.tarefa() as tarefa:
+        tarefa.driver.travado = True
+    assert(_DriverFalso.criados == 2 and pool.total_livres == 0)
+
+
+def test_pool_ocupado() -> None:
+    pool = PoolNavegadores(tamanho=1, criar_driver=_DriverFalso)
+    ocupado, liberar = threading.Event(), threading.Event()
+
+    def simular() -> None:
+        with pool.tarefa():
+            ocupado.set()
+            liberar.wait()
+
+    t = threading.Thread(target=simular)
+    t.start()
+    ocupado.wait()
+    with pytest.raises(ErroNavegadorIndisponivel):
+        with pool.tarefa(timeout_obter=0.1):
+            pass
+    liberar.set()
+    t.join()
+    pool.encerrar()
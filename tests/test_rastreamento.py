@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+import pytest
+
+from simovel import rastreamento
+from simovel.sims import disjuntor
+from simovel.sims.fila import FilaSimulacao
+
+
+class ExportadorMemoria:
+    def __init__(self) -> None:
+        self.trechos: list[rastreamento.Trecho] = []
+
+    def exportar(self, trecho: rastreamento.Trecho) -> None:
+        self.trechos.append(trecho)
+
+    def encerrar(self) -> None:
+        pass
+
+
+@pytest.fixture
+def exportados(monkeypatch):
+    monkeypatch.setattr(rastreamento.CfgRastreamento, 'TAXA_AMOSTRAGEM', 1.)
+    exportador = ExportadorMemoria()
+    rastreamento.habilitar(True)
+    rastreamento.definir_exportador(exportador)
+    yield exportador.trechos
+    rastreamento.definir_exportador(None)
+    rastreamento.habilitar(rastreamento.CfgRastreamento.HABILITADO)
+
+
+def test_amostragem() -> None:
+    assert(rastreamento.amostrar('0' * 32, 0.1))
+    assert(not rastreamento.amostrar('f' * 32, 0.1))
+    assert(not rastreamento.amostrar('0' * 32, 0.))
+    trace_id = rastreamento.gerar_trace_id()
+    assert(rastreamento.amostrar(trace_id, .5)
+           == rastreamento.amostrar(trace_id, .5))
+
+
+def test_trechos_filhos(exportados) -> None:
+    with rastreamento.iniciar_rastro('POST /menu/resultado') as raiz:
+        with rastreamento.trecho('simulador.simular', banco='caixa') as filho:
+            assert(rastreamento.trecho_atual() is filho)
+        with pytest.raises(ValueError):
+            with rastreamento.trecho('simulador.construir'):
+                raise ValueError('falhou')
+    assert(rastreamento.trecho_atual() is None)
+
+    simular, construir, _ = exportados
+    assert(simular.pai_id == raiz.span_id == construir.pai_id)
+    assert(simular.trace_id == raiz.trace_id)
+    assert(simular.atributos == {'banco': 'caixa'})
+    assert(construir.erro == 'ValueError: falhou')
+    assert(exportados[-1] is raiz and raiz.pai_id == '')
+
+
+def test_nao_amostrado(exportados) -> None:
+    with rastreamento.iniciar_rastro('POST /inicio', amostrado=False):
+        assert(rastreamento.trecho('db') is rastreamento._NULO)
+    assert(exportados == [])
+
+    rastreamento.habilitar(False)
+    assert(rastreamento.trecho('db') is rastreamento._NULO)
+
+
+def test_traceparent(exportados) -> None:
+    trace_id, pai_id = 'a' * 32, 'b' * 16
+    with rastreamento.iniciar_rastro(
+        'POST /inicio', traceparent=f'00-{trace_id}-{pai_id}-01'
+    ) as raiz:
+        pass
+    assert(raiz.trace_id == trace_id and raiz.pai_id == pai_id)
+    assert(raiz.traceparent() == f'00-{trace_id}-{raiz.span_id}-01')
+
+
+def test_jornada() -> None:
+    chave = rastreamento.gerar_span_id()
+    trace_id = rastreamento.rastro_jornada(chave, nova=True)
+    assert(rastreamento.rastro_jornada(chave) == trace_id)
+    assert(rastreamento.rastro_jornada(chave, nova=True) != trace_id)
+
+
+def test_exportador_arquivo(exportados, tmp_path) -> None:
+    arquivo = str(tmp_path / 'rastros.jsonl')
+    rastreamento.definir_exportador(rastreamento.ExportadorArquivo(arquivo))
+    with rastreamento.iniciar_rastro('POST /inicio'):
+        with rastreamento.trecho('db.multi360.buscar_por_key'):
+            pass
+
+    filho, raiz = rastreamento.ler_arquivo(arquivo)
+    assert(filho['nome'] == 'db.multi360.buscar_por_key')
+    assert(filho['pai_id'] == raiz['span_id'])
+    assert(raiz['duracao_ms'] >= filho['duracao_ms'])
+
+
+def test_otlp_montar(exportados) -> None:
+    with rastreamento.iniciar_rastro('POST /inicio', tentativa=2) as raiz:
+        pass
+    exportador = rastreamento.ExportadorOtlp.__new__(
+        rastreamento.ExportadorOtlp
+    )
+    exportador.servico = 'simovel'
+    corpo = exportador.montar([raiz])
+    span = corpo['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+    assert(span['traceId'] == raiz.trace_id and span['name'] == 'POST /inicio')
+    assert(span['attributes'] == [
+        {'key': 'tentativa', 'value': {'intValue': '2'}}
+    ])
+    assert(span['status'] == {'code': 1})
+
+
+def test_chamada_host(exportados, monkeypatch) -> None:
+    url = 'https://rastreamento.test/simulacao'
+    monkeypatch.setitem(
+        disjuntor._disjuntores, 'https://rastreamento.test',
+        disjuntor.Disjuntor('https://rastreamento.test')
+    )
+    with rastreamento.iniciar_rastro('POST /menu/resultado') as raiz:
+        with pytest.raises(TimeoutError):
+            with disjuntor.chamada_host(url, 'URL4'):
+                raise TimeoutError()
+
+    chamada = exportados[0]
+    assert(chamada.nome == 'chamada URL4' and chamada.pai_id == raiz.span_id)
+    assert(chamada.atributos['resultado'] == 'falha')
+
+
+def test_fila_propaga_contexto(exportados) -> None:
+    fila = FilaSimulacao()
+
+    def simular() -> str:
+        with rastreamento.trecho('simulador.simular'):
+            return rastreamento.trecho_atual().trace_id
+
+    with rastreamento.iniciar_rastro('POST /menu/resultado') as raiz:
+        tarefa = fila.submeter('caixa', simular)
+    assert(fila.aguardar(tarefa.id, 2).resultado == raiz.trace_id)
+    fila.encerrar()
+
+
+def test_consultas_db(exportados) -> None:
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine('sqlite://')
+    rastreamento.instrumentar_engine(engine)
+    rastreamento.instrumentar_engine(engine)
+    with rastreamento.iniciar_rastro('POST /inicio') as raiz:
+        with engine.connect() as conexao:
+            conexao.execute(text('SELECT 1'))
+            with pytest.raises(Exception):
+                conexao.execute(text('SELECT * FROM inexistente'))
+        assert(rastreamento.trecho_atual() is raiz)
+
+    consulta, erro, _ = exportados
+    assert(consulta.nome == 'db SELECT' and consulta.pai_id == raiz.span_id)
+    assert(consulta.erro == '' and 'inexistente' in erro.erro)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+import os
+import subprocess
+import sys
+
+from simovel.cli.importacao import analisar_importtime
+from simovel.sims.base import Banco
+from simovel.sims.registro import modulo_lazy
+
+
+def test_registro_nao_carrega_selenium() -> None:
+    codigo = (
+        'import sys\n'
+        'from simovel.sims.base import Banco\n'
+        'from simovel.sims.registro import modulo_lazy\n'
+        'itau = modulo_lazy(Banco.ITAU)\n'
+        'assert "selenium" not in sys.modules and "bs4" not in sys.modules\n'
+        'itau.SimuladorItauS\n'
+        'assert "selenium" in sys.modules\n'
+    )
+    r = subprocess.run(
+        [sys.executable, '-c', codigo],
+        capture_output=True, text=True, env={'PYTHONPATH': os.pathsep.join(sys.path)}
+    )
+    assert(r.returncode == 0), r.stderr
+
+
+def test_modulo_lazy() -> None:
+    bradesco = modulo_lazy(Banco.BRADESCO)
+    assert(not bradesco.carregado)
+    assert(bradesco.SimuladorBradesco.__module__ == 'simovel.sims.bradesco')
+    assert(bradesco.carregado)
+
+
+def test_analisar_importtime() -> None:
+    saida = (
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       120 |        120 |     bs4.element\n'
+        'import time:      3000 |       3120 |   bs4\n'
+        'outra linha\n'
+    )
+    assert(analisar_importtime(saida) == [
+        ('bs4.element', 120, 120), ('bs4', 3000, 3120)
+    ])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+import gzip
+import urllib.error
+from urllib.request import Request
+
+import pytest
+import requests
+
+from simovel.config.geral import Replay as CfgReplay
+from simovel.replay import (
+    Interacao,
+    ServidorReplay,
+    carregar_interacoes,
+    resolver_url
+)
+from simovel.replay.gravacao import hooks_requests
+from simovel.sims.caixa import SimuladorCaixa
+from simovel.sims.caixa_sessao import SessaoCaixa
+
+
+def test_replay_e_gravacao(tmp_path, monkeypatch) -> None:
+    corpo = gzip.compress(b'dwr.engine.remote.handleCallback("1","0",[])')
+    interacoes = [
+        Interacao('POST', SimuladorCaixa.URL1, b'a', status=200,
+                  headers_resposta=[('Content-Encoding', 'gzip')], corpo=corpo),
+        Interacao('POST', SimuladorCaixa.URL1, b'b', corpo=b'segunda'),
+    ]
+    arquivo = tmp_path / 'gravacoes.jsonl'
+
+    with ServidorReplay(interacoes) as srv:
+        monkeypatch.setattr(CfgReplay, 'URL_BASE', srv.url_base)
+        monkeypatch.setattr(CfgReplay, 'GRAVAR', True)
+        monkeypatch.setattr(CfgReplay, 'ARQUIVO_GRAVACOES', str(arquivo))
+        assert(resolver_url(SimuladorCaixa.URL1).startswith(
+            srv.url_base + '/www8.caixa.gov.br/siopiinternet-web/'
+        ))
+
+        opener = SessaoCaixa().opener
+        with opener.open(Request(SimuladorCaixa.URL1, data=b'a')) as r:
+            assert(r.read() == corpo)
+        # mesmo payload
+        with opener.open(Request(SimuladorCaixa.URL1, data=b'b')) as r:
+            assert(r.read() == b'segunda')
+
+        r = requests.post(
+            resolver_url(SimuladorCaixa.URL1), data=b'x',
+            hooks=hooks_requests()
+        )
+        assert(r.content == gzip.decompress(corpo))
+
+        with pytest.raises(urllib.error.HTTPError):
+            opener.open(Request(SimuladorCaixa.URL2, data=b''))
+        assert(srv.estatisticas['nao_encontradas'] == 1)
+
+    # gravado com a URL original, gzip intacto no urllib
+    gravadas = carregar_interacoes(str(arquivo))
+    assert(len(gravadas) == 4)
+    assert(gravadas[0].url == SimuladorCaixa.URL1)
+    assert(gravadas[0].corpo == corpo and gravadas[0].payload == b'a')
+    assert(gravadas[3].status == 404)
+
+
+def test_injecao_erros() -> None:
+    interacoes = [Interacao('GET', 'https://banco.test/a', corpo=b'ok')]
+    srv = ServidorReplay(interacoes, taxa_erro=0.5, semente=1)
+    sequencia = [srv.responder('GET', '/banco.test/a', b'')[1].status
+                 for _ in range(20)]
+    assert(set(sequencia) == {200, CfgReplay.SERVIDOR_STATUS_ERRO})
+
+    srv2 = ServidorReplay(interacoes, taxa_erro=0.5, semente=1)
+    assert(sequencia == [srv2.responder('GET', '/banco.test/a', b'')[1].status
+                         for _ in range(20)])
+    srv.parar()
+    srv2.parar()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+from simovel.config.geral import Http as CfgHttp, Replay as CfgReplay
+from simovel.replay import Interacao, ServidorReplay
+from simovel.sims import sessao_http
+
+
+def test_conexao_reaproveitada() -> None:
+    interacoes = [Interacao('GET', 'https://banco.test/a', corpo=b'ok')]
+    with ServidorReplay(interacoes) as srv:
+        url = f'{srv.url_base}/banco.test/a'
+        sessao = sessao_http.obter_sessao(url)
+        assert(sessao is sessao_http.obter_sessao(url + '?b=1'))
+        for _ in range(3):
+            assert(sessao.get(url, timeout=5).content == b'ok')
+
+        pools = sessao.get_adapter(url).poolmanager.pools
+        # uma conexão só pras três requisições
+        assert([pools[k].num_connections for k in pools.keys()] == [1])
+        sessao_http.encerrar_sessoes()
+
+
+def test_novas_tentativas(monkeypatch) -> None:
+    monkeypatch.setattr(CfgHttp, 'BACKOFF', 0)
+    interacoes = [Interacao('POST', 'https://banco.test/a', corpo=b'ok')]
+    with ServidorReplay(interacoes, taxa_erro=1.) as srv:
+        sessao = sessao_http.criar_sessao()
+        r = sessao.post(f'{srv.url_base}/banco.test/a', data=b'x', timeout=5)
+        assert(r.status_code == CfgReplay.SERVIDOR_STATUS_ERRO)
+        assert(srv.estatisticas['erros_injetados'] == CfgHttp.TENTATIVAS + 1)
+        sessao.close()
+